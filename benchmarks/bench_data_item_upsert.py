@@ -0,0 +1,170 @@
+"""
+Benchmark: ticker_data_items upsert latency on a large table.
+
+Builds a ticker_data_items table of ~500k rows (one ANALYST_PRICE_TARGETS snapshot plus annual/quarterly
+statements per ticker) and then refreshes the snapshot of a sample of tickers with changed payloads.
+Compares:
+    - old: delete-then-insert (the previous upsert_ticker_data_item): every refresh deletes the row
+      and its ticker_data_values, then inserts a new row with a new data_item_id
+    - new: upsert_ticker_data_item, one call per ticker: with the stored key date (INSERT ... ON CONFLICT
+      DO UPDATE) and with a new key date (the stored row is re-keyed by one UPDATE); ids are kept
+    - new batched: upsert_ticker_data_items with WRITE_BATCH items per call
+Each setup runs on its own copy of the same database file. Reports per-call latency, total time and
+how many data_item_ids survived the refresh.
+
+Run from the project root:
+    python benchmarks/bench_data_item_upsert.py [tickers] [refreshes]
+"""
+import asyncio
+import logging
+import os
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+logging.disable(logging.CRITICAL)
+
+from sqlalchemy import delete, insert, select
+
+from src.V3_app import fastjson
+from src.V3_app.db_engine_registry import engine_registry
+from src.V3_app.payload_codec import payload_hash
+from src.V3_app.yahoo_models import TickerDataItemsModel, TickerDataValuesModel
+from src.V3_app.yahoo_repository import YahooDataRepository
+
+SNAPSHOT_TYPE = "ANALYST_PRICE_TARGETS"
+SNAPSHOT_DATE = datetime(2025, 1, 2)
+STATEMENT_SPECS = [("INCOME_STATEMENT", "FYEAR"), ("BALANCE_SHEET", "FYEAR"), ("CASH_FLOW_STATEMENT", "FYEAR"),
+                   ("INCOME_STATEMENT", "QUARTER"), ("BALANCE_SHEET", "QUARTER"), ("CASH_FLOW_STATEMENT", "QUARTER")]
+STATEMENT_DATES = [datetime(2021, 12, 31), datetime(2022, 12, 31), datetime(2023, 12, 31)]
+WRITE_BATCH = 500
+
+
+def _snapshot_payload(rnd: random.Random) -> dict:
+    return {"low": rnd.uniform(1, 50), "high": rnd.uniform(50, 200), "mean": rnd.uniform(20, 120), "median": rnd.uniform(20, 120)}
+
+
+def _build_database(path: str, tickers: int) -> int:
+    """Creates the tables and bulk-loads the rows with sqlite3 (the repository is not what is measured here)."""
+    async def create():
+        await YahooDataRepository(f"sqlite+aiosqlite:///{path}").create_tables()
+        await engine_registry.dispose()
+    asyncio.run(create())
+
+    rnd = random.Random(0)
+    stored_date = lambda value: value.strftime("%Y-%m-%d %H:%M:%S.%f")  # SQLAlchemy's SQLite DateTime format
+    fetched = stored_date(datetime(2025, 1, 2))
+    rows = []
+    for i in range(tickers):
+        ticker = f"T{i:05d}"
+        text = fastjson.dumps(_snapshot_payload(rnd), allow_nan=True)
+        rows.append((ticker, SNAPSHOT_TYPE, "CUMULATIVE_SNAPSHOT", stored_date(SNAPSHOT_DATE), fetched, "bench", text, payload_hash(text)))
+        for item_type, coverage in STATEMENT_SPECS:
+            for key_date in STATEMENT_DATES:
+                text = fastjson.dumps({f"Field {k}": rnd.uniform(-1e9, 1e9) for k in range(10)}, allow_nan=True)
+                rows.append((ticker, item_type, coverage, stored_date(key_date), fetched, "bench", text, payload_hash(text)))
+    connection = sqlite3.connect(path)
+    connection.executemany(
+        "INSERT INTO ticker_data_items (ticker, item_type, item_time_coverage, item_key_date, fetch_timestamp_utc, "
+        "item_source, item_data_payload, payload_hash, prun) VALUES (?, ?, ?, ?, ?, ?, ?, ?, 0)", rows)
+    connection.commit()
+    connection.close()
+    return len(rows)
+
+
+def _refresh_items(sample: list, key_date: datetime) -> list:
+    rnd = random.Random(1)
+    return [{
+        "ticker": ticker, "item_type": SNAPSHOT_TYPE, "item_time_coverage": "CUMULATIVE_SNAPSHOT",
+        "item_key_date": key_date, "item_source": "bench", "item_data_payload": _snapshot_payload(rnd)
+    } for ticker in sample]
+
+
+async def _snapshot_ids(repo: YahooDataRepository) -> dict:
+    async with repo.read_session_factory() as session:
+        result = await session.execute(
+            select(TickerDataItemsModel.ticker, TickerDataItemsModel.data_item_id).where(TickerDataItemsModel.item_type == SNAPSHOT_TYPE)
+        )
+        return dict(result.all())
+
+
+async def _old_upsert(repo: YahooDataRepository, item: dict) -> None:
+    """The previous upsert_ticker_data_item: delete the ticker/item_type rows, then insert the new one."""
+    item = dict(item, item_data_payload=fastjson.dumps(item["item_data_payload"], allow_nan=True), fetch_timestamp_utc=datetime.now())
+    async with repo._write_session() as session:
+        async with session.begin():
+            await session.execute(delete(TickerDataItemsModel).where(
+                TickerDataItemsModel.ticker == item["ticker"], TickerDataItemsModel.item_type == item["item_type"]))
+            await session.execute(delete(TickerDataValuesModel).where(
+                TickerDataValuesModel.ticker == item["ticker"], TickerDataValuesModel.item_type == item["item_type"]))
+            await session.execute(insert(TickerDataItemsModel).values(**item))
+
+
+def _percentile(values: list, fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] if ordered else float("nan")
+
+
+async def _run(label: str, source_path: str, mode: str, sample: list) -> None:
+    db_dir = tempfile.mkdtemp()
+    path = os.path.join(db_dir, "bench.db")
+    shutil.copy(source_path, path)
+    repo = YahooDataRepository(f"sqlite+aiosqlite:///{path}")
+    ids_before = await _snapshot_ids(repo)
+    # 'old' and 'rekey' get a new key date, like the analyst targets fetch (datetime.now()); 'single'
+    # and 'batch' refresh the stored key date, so the upsert hits the unique key
+    items = _refresh_items(sample, SNAPSHOT_DATE if mode in ("single", "batch") else datetime(2025, 2, 3))
+
+    latencies_ms = []
+    start = time.perf_counter()
+    if mode == "batch":
+        for offset in range(0, len(items), WRITE_BATCH):
+            call_start = time.perf_counter()
+            await repo.upsert_ticker_data_items(items[offset:offset + WRITE_BATCH])
+            latencies_ms.append((time.perf_counter() - call_start) * 1000)
+    else:
+        for item in items:
+            call_start = time.perf_counter()
+            if mode == "old":
+                await _old_upsert(repo, item)
+            else:
+                await repo.upsert_ticker_data_item(item)
+            latencies_ms.append((time.perf_counter() - call_start) * 1000)
+    elapsed = time.perf_counter() - start
+
+    ids_after = await _snapshot_ids(repo)
+    kept = sum(1 for ticker in sample if ids_after.get(ticker) == ids_before.get(ticker))
+    per_item_ms = elapsed * 1000 / len(items)
+    print(f"{label:<34} total {elapsed:7.2f} s | {per_item_ms:6.2f} ms/item | per call p50 {_percentile(latencies_ms, 0.5):7.2f} ms, "
+          f"p95 {_percentile(latencies_ms, 0.95):7.2f} ms | ids kept {kept}/{len(sample)}")
+    await engine_registry.dispose()
+    shutil.rmtree(db_dir, ignore_errors=True)
+
+
+async def main(source_path: str, tickers: int, refreshes: int) -> None:
+    sample = random.Random(2).sample([f"T{i:05d}" for i in range(tickers)], min(refreshes, tickers))
+    await _run("delete-then-insert (old)", source_path, "old", sample)
+    await _run("ON CONFLICT DO UPDATE (new)", source_path, "single", sample)
+    await _run("re-key UPDATE, new key date (new)", source_path, "rekey", sample)
+    await _run(f"ON CONFLICT, batches of {WRITE_BATCH} (new)", source_path, "batch", sample)
+
+
+if __name__ == "__main__":
+    ticker_count = int(sys.argv[1]) if len(sys.argv) > 1 else 26000
+    refresh_count = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+    build_dir = tempfile.mkdtemp()
+    source = os.path.join(build_dir, "source.db")
+    build_start = time.perf_counter()
+    row_count = _build_database(source, ticker_count)
+    print(f"ticker_data_items rows: {row_count} ({ticker_count} tickers), built in {time.perf_counter() - build_start:.1f} s. "
+          f"Refreshing {refresh_count} snapshots.")
+    try:
+        asyncio.run(main(source, ticker_count, refresh_count))
+    finally:
+        shutil.rmtree(build_dir, ignore_errors=True)
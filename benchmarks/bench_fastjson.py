@@ -0,0 +1,163 @@
+"""
+Benchmark: fastjson (orjson) versus the stdlib json module on the analytics cache.
+
+Times the three places the analytics cache goes through JSON:
+    - cache write: fastjson.dumps(..., default=str, allow_nan=True) in analytics_data_processor
+    - cache read: fastjson.loads of the stored data_json
+    - GET /api/v3/analytics/data from cache: the old route (json.loads + clean_for_json + jsonable_encoder
+      + JSONResponse) versus the new one (fastjson.loads + FastJSONResponse)
+Each fastjson case is run with the orjson backend and with the stdlib fallback.
+
+The records are synthesized in the shape of data/yahoo_info_dumps/*_info_*.txt (mixed numbers, text,
+missing values and NaN). Pass a database URL to use the real cached_analytics_data row instead.
+
+Run from the project root:
+    python benchmarks/bench_fastjson.py [records] [database_url]
+"""
+import asyncio
+import json
+import logging
+import math
+import os
+import random
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+logging.disable(logging.CRITICAL)
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from src.V3_app import fastjson
+
+
+def _synthetic_records(count: int) -> list:
+    rnd = random.Random(42)
+    sectors = ["Technology", "Healthcare", "Financial Services", "Energy", "Industrials"]
+    records = []
+    for i in range(count):
+        record = {
+            "ticker": f"T{i:05d}",
+            "source": "yahoo",
+            "company_name": f"Company {i} Corporation",
+            "sector": rnd.choice(sectors),
+            "industry": "software-infrastructure",
+            "country": "United States",
+            "exchange": "NMS",
+            "update_last_full": datetime(2025, 5, 1, 12, 30).isoformat(),
+        }
+        for field_index in range(60):
+            roll = rnd.random()
+            if roll < 0.05:
+                value = None
+            elif roll < 0.08:
+                value = float("nan")
+            elif roll < 0.3:
+                value = rnd.randint(1, 10**12)
+            else:
+                value = rnd.uniform(-100.0, 1000.0)
+            record[f"field_{field_index:02d}"] = value
+        records.append({"ticker": record["ticker"], "source": "yahoo", "processed_data": record})
+    return records
+
+
+async def _load_cached_data_json(database_url: str) -> str:
+    from sqlalchemy import text
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    engine = create_async_engine(database_url)
+    try:
+        async with engine.connect() as conn:
+            result = await conn.execute(text("SELECT data_json FROM cached_analytics_data ORDER BY id DESC LIMIT 1"))
+            row = result.first()
+    finally:
+        await engine.dispose()
+    if row is None:
+        raise SystemExit(f"No cached_analytics_data row in {database_url}")
+    return row[0]
+
+
+def _clean_for_json(obj):
+    """The helper the analytics endpoint used before FastJSONResponse."""
+    if isinstance(obj, dict):
+        return {k: _clean_for_json(v) for k, v in obj.items()}
+    elif isinstance(obj, list):
+        return [_clean_for_json(i) for i in obj]
+    elif isinstance(obj, float) and not math.isfinite(obj):
+        return None
+    return obj
+
+
+def _old_endpoint(data_json: str) -> bytes:
+    content = {"originalData": _clean_for_json(json.loads(data_json)), "message": "Served from cache."}
+    return JSONResponse(content=jsonable_encoder(content)).body
+
+
+def _new_endpoint(data_json: str) -> bytes:
+    content = {"originalData": fastjson.loads(data_json), "message": "Served from cache."}
+    return fastjson.FastJSONResponse(content=content).body
+
+
+def _timeit(label: str, func, iterations: int) -> float:
+    func()
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    per_call_ms = (time.perf_counter() - start) / iterations * 1e3
+    print(f"{label:<55} {per_call_ms:10.2f} ms")
+    return per_call_ms
+
+
+def main(record_count: int, database_url: str = None) -> None:
+    if database_url:
+        data_json = asyncio.run(_load_cached_data_json(database_url))
+        records = json.loads(data_json)
+    else:
+        records = _synthetic_records(record_count)
+        data_json = json.dumps(records, default=str)
+    iterations = 5
+    orjson_module = fastjson.orjson
+
+    print(f"Records: {len(records)}, cache size: {len(data_json) / 1e6:.1f} MB, orjson available: {orjson_module is not None}")
+
+    print("--- Cache write ---")
+    base = _timeit("json.dumps(default=str) (old)", lambda: json.dumps(records, default=str), iterations)
+    for backend in ("orjson", "json"):
+        fastjson.orjson = orjson_module if backend == "orjson" else None
+        if backend == "orjson" and orjson_module is None:
+            continue
+        cost = _timeit(f"fastjson.dumps [{backend}]", lambda: fastjson.dumps(records, default=str, allow_nan=True), iterations)
+        print(f"{'':<55} {base / cost:9.1f}x")
+
+    print("--- Cache read ---")
+    base = _timeit("json.loads (old)", lambda: json.loads(data_json), iterations)
+    for backend in ("orjson", "json"):
+        fastjson.orjson = orjson_module if backend == "orjson" else None
+        if backend == "orjson" and orjson_module is None:
+            continue
+        cost = _timeit(f"fastjson.loads [{backend}]", lambda: fastjson.loads(data_json), iterations)
+        print(f"{'':<55} {base / cost:9.1f}x")
+
+    print("--- Analytics endpoint (served from cache) ---")
+    base = _timeit("loads + clean + jsonable_encoder + JSONResponse (old)", lambda: _old_endpoint(data_json), iterations)
+    for backend in ("orjson", "json"):
+        fastjson.orjson = orjson_module if backend == "orjson" else None
+        if backend == "orjson" and orjson_module is None:
+            continue
+        cost = _timeit(f"fastjson.loads + FastJSONResponse [{backend}]", lambda: _new_endpoint(data_json), iterations)
+        print(f"{'':<55} {base / cost:9.1f}x")
+
+    fastjson.orjson = orjson_module
+    if json.loads(_old_endpoint(data_json)) != json.loads(_new_endpoint(data_json)):
+        raise SystemExit("Old and new endpoint bodies differ")
+    print("Old and new endpoint bodies decode to the same document.")
+
+
+if __name__ == "__main__":
+    main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 5000,
+        sys.argv[2] if len(sys.argv) > 2 else None,
+    )
@@ -0,0 +1,119 @@
+"""
+Benchmark: payload codec size versus field-projection reads.
+
+Builds a ticker_data_items table of statement payloads (yfinance field names, TEXT as written with the
+'none' codec) and rewrites a copy of it with each codec (migrate_data_item_payload_encoding, as
+'db_maintenance compress-payloads' does). Then streams one field of every ticker with
+iter_field_values_for_tickers, whose json_extract projection only applies to TEXT rows; compressed
+rows are transferred whole and decoded in Python. Reports the stored payload bytes, the file size
+after VACUUM, the rewrite time and the stream time per codec.
+
+Run from the project root:
+    python benchmarks/bench_payload_codec.py [tickers]
+"""
+import asyncio
+import logging
+import os
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+logging.disable(logging.CRITICAL)
+
+from src.V3_app import fastjson
+from src.V3_app.db_engine_registry import engine_registry
+from src.V3_app.payload_codec import PAYLOAD_CODECS, STATEMENT_PAYLOAD_KEYS_V1, payload_hash, set_write_codec, zstandard
+from src.V3_app.yahoo_repository import YahooDataRepository
+
+ITEM_TYPE = "INCOME_STATEMENT"
+COVERAGE = "FYEAR"
+KEY_DATES = [datetime(2021, 12, 31), datetime(2022, 12, 31), datetime(2023, 12, 31), datetime(2024, 12, 31)]
+FIELD_KEY = "Total Revenue"
+FIELDS_PER_PAYLOAD = 60
+
+
+def _build_database(path: str, tickers: int) -> int:
+    """Creates the tables and bulk-loads TEXT payloads with sqlite3 (the repository is not what is measured here)."""
+    async def create():
+        await YahooDataRepository(f"sqlite+aiosqlite:///{path}").create_tables()
+        await engine_registry.dispose()
+    asyncio.run(create())
+
+    rnd = random.Random(0)
+    stored_date = lambda value: value.strftime("%Y-%m-%d %H:%M:%S.%f")  # SQLAlchemy's SQLite DateTime format
+    fetched = stored_date(datetime(2025, 1, 2))
+    keys = [FIELD_KEY] + [key for key in STATEMENT_PAYLOAD_KEYS_V1 if key != FIELD_KEY][:FIELDS_PER_PAYLOAD - 1]
+    rows = []
+    for i in range(tickers):
+        for key_date in KEY_DATES:
+            text = fastjson.dumps({key: rnd.choice([rnd.uniform(-1e9, 1e9), None]) for key in keys}, allow_nan=True)
+            rows.append((f"T{i:05d}", ITEM_TYPE, COVERAGE, stored_date(key_date), fetched, "bench", text, payload_hash(text)))
+    connection = sqlite3.connect(path)
+    connection.executemany(
+        "INSERT INTO ticker_data_items (ticker, item_type, item_time_coverage, item_key_date, fetch_timestamp_utc, "
+        "item_source, item_data_payload, payload_hash, prun) VALUES (?, ?, ?, ?, ?, ?, ?, ?, 0)", rows)
+    connection.commit()
+    connection.close()
+    return len(rows)
+
+
+def _stored_sizes(path: str):
+    """Stored payload bytes and the file size after VACUUM."""
+    connection = sqlite3.connect(path)
+    payload_bytes = connection.execute("SELECT SUM(LENGTH(CAST(item_data_payload AS BLOB))) FROM ticker_data_items").fetchone()[0]
+    connection.execute("VACUUM")
+    connection.close()
+    return payload_bytes or 0, os.path.getsize(path)
+
+
+async def _run(codec: str, source_path: str, tickers: int) -> None:
+    db_dir = tempfile.mkdtemp()
+    path = os.path.join(db_dir, "bench.db")
+    shutil.copy(source_path, path)
+    repo = YahooDataRepository(f"sqlite+aiosqlite:///{path}")
+
+    set_write_codec(codec)
+    start = time.perf_counter()
+    summary = await repo.migrate_data_item_payload_encoding()
+    rewrite_s = time.perf_counter() - start
+    await engine_registry.dispose()
+    payload_bytes, file_bytes = _stored_sizes(path)
+
+    ticker_list = [f"T{i:05d}" for i in range(tickers)]
+    start = time.perf_counter()
+    values = 0
+    async for _ in repo.iter_field_values_for_tickers(ticker_list, ITEM_TYPE, COVERAGE, FIELD_KEY):
+        values += 1
+    stream_s = time.perf_counter() - start
+
+    print(f"{codec:<5} rewritten {summary['items_rewritten']:7d} in {rewrite_s:6.2f} s | payloads {payload_bytes / 1024**2:7.1f} MB, "
+          f"file {file_bytes / 1024**2:7.1f} MB | '{FIELD_KEY}' stream {stream_s:6.2f} s ({values} values)")
+    await engine_registry.dispose()
+    shutil.rmtree(db_dir, ignore_errors=True)
+
+
+async def main(source_path: str, tickers: int) -> None:
+    for codec in PAYLOAD_CODECS:
+        if codec == "zstd" and zstandard is None:
+            print("zstd  skipped (zstandard is not installed)")
+            continue
+        await _run(codec, source_path, tickers)
+
+
+if __name__ == "__main__":
+    ticker_count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    build_dir = tempfile.mkdtemp()
+    source = os.path.join(build_dir, "source.db")
+    build_start = time.perf_counter()
+    row_count = _build_database(source, ticker_count)
+    print(f"ticker_data_items rows: {row_count} ({ticker_count} tickers), built in {time.perf_counter() - build_start:.1f} s.")
+    try:
+        asyncio.run(main(source, ticker_count))
+    finally:
+        shutil.rmtree(build_dir, ignore_errors=True)
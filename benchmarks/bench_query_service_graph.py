@@ -0,0 +1,99 @@
+"""
+Benchmark: per-request overhead of the Yahoo query service dependencies.
+
+Compares the old pattern (a new engine, YahooDataRepository and fully-initialized
+YahooDataQueryService graph per request) with the app-scoped graph served from app.state.
+Also times an end-to-end /api/v3/timeseries/synthetic_fundamental request through
+httpx's ASGI transport, using an unknown fundamental name so no DB rows are needed.
+
+Run from the project root:
+    python benchmarks/bench_query_service_graph.py [iterations]
+"""
+import asyncio
+import logging
+import os
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+logging.disable(logging.CRITICAL)
+
+import httpx
+from fastapi import FastAPI
+
+from src.V3_app.db_engine_registry import engine_registry
+from src.V3_app.dependencies import build_yahoo_service_graph, get_yahoo_query_service
+from src.V3_app.yahoo_repository import YahooDataRepository
+from src.V3_app.yahoo_data_query_srv import YahooDataQueryService
+from src.V3_app.yahoo_data_query_pro import YahooDataQueryProService
+from src.V3_app.V3_backend_api import router as backend_router
+
+
+async def _per_request_graph(database_url: str) -> None:
+    """Emulates the old per-request construction (fresh engine + eager sub-services)."""
+    await engine_registry.dispose(database_url)
+    repo = YahooDataRepository(database_url=database_url)
+    service = YahooDataQueryService(db_repo=repo)
+    _ = service.supported_fundamentals  # forces adv + ratio services like the old __init__
+    YahooDataQueryProService(db_repo=repo, base_query_srv=service)
+
+
+async def _timeit(label: str, func, iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        await func()
+    elapsed = time.perf_counter() - start
+    per_call_us = elapsed / iterations * 1e6
+    print(f"{label:<55} {per_call_us:10.1f} us/request")
+    return per_call_us
+
+
+async def main(iterations: int) -> None:
+    db_dir = tempfile.mkdtemp()
+    database_url = f"sqlite+aiosqlite:///{os.path.join(db_dir, 'bench.db')}"
+
+    print(f"Iterations: {iterations}")
+    print("--- Dependency resolution ---")
+    old_cost = await _timeit("per-request engine + service graph (old)", lambda: _per_request_graph(database_url), iterations)
+
+    app_state = SimpleNamespace(repository=SimpleNamespace(database_url=database_url))
+    app_state.yahoo_repository = YahooDataRepository(database_url=database_url)
+    build_yahoo_service_graph(app_state, app_state.yahoo_repository)
+    fake_request = SimpleNamespace(app=SimpleNamespace(state=app_state))
+
+    async def shared_dependency():
+        get_yahoo_query_service(fake_request)
+
+    new_cost = await _timeit("app-scoped service graph (new)", shared_dependency, iterations)
+    print(f"Speed-up: {old_cost / max(new_cost, 1e-9):.0f}x")
+
+    print("--- End-to-end /api/v3/timeseries/synthetic_fundamental ---")
+    app = FastAPI()
+    app.include_router(backend_router)
+    app.state.repository = app_state.repository
+    app.state.yahoo_repository = app_state.yahoo_repository
+    build_yahoo_service_graph(app.state, app.state.yahoo_repository)
+    payload = {"tickers": ["AAPL", "MSFT"]}
+    url = "/api/v3/timeseries/synthetic_fundamental/BENCH_UNKNOWN"
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        async def shared_request():
+            await client.post(url, json=payload)
+
+        async def per_request():
+            app.state.yahoo_query_service = None
+            app.state.yahoo_query_pro_service = None
+            await _per_request_graph(database_url)
+            await client.post(url, json=payload)
+
+        e2e_old = await _timeit("request with per-request graph (old)", per_request, iterations)
+        e2e_new = await _timeit("request with app-scoped graph (new)", shared_request, iterations)
+    print(f"Per-request overhead removed: {e2e_old - e2e_new:.1f} us")
+    await engine_registry.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 200))
@@ -0,0 +1,148 @@
+"""
+Benchmark: analytics reads while a mass fetch is committing.
+
+A writer process upserts ticker_master batches back to back (bulk_upsert_yahoo_ticker_master, as the
+mass loader does) while the main process streams the latest statement payloads of every ticker
+(iter_latest_data_item_payloads, as the analytics refresh does from its process-pool worker),
+doing a little work per row. Compares:
+    - old: one default engine for reads and writes, rollback journal. The reader's open cursor holds
+      a shared lock, so the writer's commits wait for the whole scan (or fail with "database is locked")
+    - new: registry writer engine (WAL) plus the read-only reader engine. Neither side waits.
+Reports the stream time of the reader, and commit latency, failures and throughput of the writer.
+
+Run from the project root:
+    python benchmarks/bench_read_write_split.py [seconds] [tickers]
+"""
+import asyncio
+import logging
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+logging.disable(logging.CRITICAL)
+
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from src.V3_app.db_engine_registry import engine_registry
+from src.V3_app.yahoo_repository import YahooDataRepository
+
+STATEMENT_SPECS = [("INCOME_STATEMENT", "FY"), ("BALANCE_SHEET", "FY")]
+WRITE_BATCH = 200
+
+
+def _master_records(count: int, seed: int) -> list:
+    rnd = random.Random(seed)
+    return [
+        {"ticker": f"T{i:05d}", "company_name": f"Company {i}", "trailing_pe": rnd.uniform(1, 80), "beta": rnd.uniform(0, 3)}
+        for i in range(count)
+    ]
+
+
+def _statement_items(tickers: int) -> list:
+    rnd = random.Random(0)
+    items = []
+    for i in range(tickers):
+        for item_type, coverage in STATEMENT_SPECS:
+            for year in (2022, 2023, 2024):
+                items.append({
+                    "ticker": f"T{i:05d}", "item_type": item_type, "item_time_coverage": coverage,
+                    "item_key_date": datetime(year, 12, 31), "item_source": "bench",
+                    "item_data_payload": {f"Field {k}": rnd.uniform(-1e9, 1e9) for k in range(40)},
+                })
+    return items
+
+
+def _percentile(values: list, fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] if ordered else float("nan")
+
+
+def _use_old_setup(repo: YahooDataRepository, database_url: str):
+    """Old setup: one default engine (rollback journal) for reads and writes."""
+    plain_engine = create_async_engine(database_url)
+    repo.engine = plain_engine
+    repo.async_session_factory = async_sessionmaker(bind=plain_engine, expire_on_commit=False, class_=AsyncSession)
+    repo.read_engine = plain_engine
+    repo.read_session_factory = repo.async_session_factory
+    return plain_engine
+
+
+def _writer_process(database_url: str, split: bool, tickers: int, seconds: float, results) -> None:
+    async def write():
+        repo = YahooDataRepository(database_url)
+        plain_engine = None if split else _use_old_setup(repo, database_url)
+        deadline = time.perf_counter() + seconds
+        seed = 1
+        while time.perf_counter() < deadline:
+            records = _master_records(tickers, seed)[(seed * WRITE_BATCH) % tickers:][:WRITE_BATCH]
+            start = time.perf_counter()
+            try:
+                await repo.bulk_upsert_yahoo_ticker_master(records)
+                results.append(("ok", (time.perf_counter() - start) * 1000))
+            except Exception:
+                results.append(("failed", (time.perf_counter() - start) * 1000))
+            seed += 1
+        if plain_engine is not None:
+            await plain_engine.dispose()
+        await engine_registry.dispose()
+    asyncio.run(write())
+
+
+async def _run(label: str, split: bool, seconds: float, tickers: int) -> None:
+    db_dir = tempfile.mkdtemp()
+    database_url = f"sqlite+aiosqlite:///{os.path.join(db_dir, 'bench.db')}"
+    repo = YahooDataRepository(database_url)
+    plain_engine = None if split else _use_old_setup(repo, database_url)
+    await repo.create_tables()
+    await repo.bulk_upsert_yahoo_ticker_master(_master_records(tickers, 0))
+    await repo.insert_ticker_data_items(_statement_items(tickers))
+
+    context = multiprocessing.get_context("spawn")
+    manager = context.Manager()
+    results = manager.list()
+    writer = context.Process(target=_writer_process, args=(database_url, split, tickers, seconds, results))
+    writer.start()
+    await asyncio.sleep(1.0)  # Let the writer process start committing
+
+    stream_s = []
+    deadline = time.perf_counter() + seconds - 1.0
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        rows = 0
+        async for row in repo.iter_latest_data_item_payloads(STATEMENT_SPECS):
+            rows += 1
+            sum(v for v in row["item_data_payload"].values() if isinstance(v, float))  # Per-row processing
+            if rows % 50 == 0:
+                await asyncio.sleep(0.005)  # Stand-in for the refresh's per-chunk work
+        stream_s.append(time.perf_counter() - start)
+    writer.join()
+
+    batches = list(results)
+    commit_ms = [ms for status, ms in batches if status == "ok"]
+    failed = sum(1 for status, _ in batches if status == "failed")
+    print(f"{label:<38} reader: {len(stream_s)} streams, avg {sum(stream_s) / len(stream_s):5.2f} s | "
+          f"writer: {len(commit_ms)} commits, {failed} failed, p50 {_percentile(commit_ms, 0.5):7.1f} ms, "
+          f"p95 {_percentile(commit_ms, 0.95):7.1f} ms, max {max(commit_ms, default=float('nan')):7.1f} ms")
+    manager.shutdown()
+    if plain_engine is not None:
+        await plain_engine.dispose()
+    await engine_registry.dispose(database_url)
+
+
+async def main(seconds: float, tickers: int) -> None:
+    print(f"Duration: {seconds:.0f} s per setup, tickers: {tickers}, write batch: {WRITE_BATCH}")
+    await _run("shared engine, rollback journal (old)", False, seconds, tickers)
+    await _run("WAL writer + read-only reader (new)", True, seconds, tickers)
+
+
+if __name__ == "__main__":
+    asyncio.run(main(
+        float(sys.argv[1]) if len(sys.argv) > 1 else 15.0,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 2000,
+    ))
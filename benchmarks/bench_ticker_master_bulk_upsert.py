@@ -0,0 +1,80 @@
+"""
+Benchmark: ticker_master writes during a mass load.
+
+Compares one upsert_yahoo_ticker_master transaction per ticker (the old mass-load path) with
+bulk_upsert_yahoo_ticker_master over batches of MASS_LOAD_MASTER_FLUSH_SIZE records, on a
+file-backed SQLite database. Records are shaped like fetch_and_process_yahoo_info output.
+
+Run from the project root:
+    python benchmarks/bench_ticker_master_bulk_upsert.py [tickers]
+"""
+import asyncio
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+logging.disable(logging.CRITICAL)
+
+from src.V3_app.V3_yahoo_fetch import MASS_LOAD_MASTER_FLUSH_SIZE
+from src.V3_app.yahoo_models import YahooTickerMasterModel
+from src.V3_app.yahoo_repository import YahooDataRepository
+
+
+def _master_records(count: int) -> list:
+    rnd = random.Random(42)
+    columns = [c.name for c in YahooTickerMasterModel.__table__.columns if c.name not in ("ticker", "update_last_full")]
+    records = []
+    for i in range(count):
+        record = {"ticker": f"T{i:05d}"}
+        for column in columns:
+            python_type = YahooTickerMasterModel.__table__.columns[column].type.python_type
+            if python_type is float:
+                record[column] = rnd.uniform(0, 1000)
+            elif python_type is int:
+                record[column] = rnd.randint(1, 5)
+            elif python_type is datetime:
+                record[column] = datetime(2025, 1, 1 + i % 28)
+            else:
+                record[column] = f"{column}-{i % 50}"
+        records.append(record)
+    return records
+
+
+async def _run(label: str, records: list, write) -> float:
+    db_dir = tempfile.mkdtemp()
+    repo = YahooDataRepository(f"sqlite+aiosqlite:///{os.path.join(db_dir, 'bench.db')}")
+    await repo.create_tables()
+    start = time.perf_counter()
+    await write(repo, records)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<50} {elapsed:8.2f} s  ({len(records) / elapsed:8.0f} tickers/s)")
+    await repo.engine.dispose()
+    return elapsed
+
+
+async def _per_ticker(repo: YahooDataRepository, records: list) -> None:
+    for record in records:
+        await repo.upsert_yahoo_ticker_master(dict(record))
+
+
+async def _batched(repo: YahooDataRepository, records: list) -> None:
+    for offset in range(0, len(records), MASS_LOAD_MASTER_FLUSH_SIZE):
+        await repo.bulk_upsert_yahoo_ticker_master(records[offset:offset + MASS_LOAD_MASTER_FLUSH_SIZE])
+
+
+async def main(count: int) -> None:
+    records = _master_records(count)
+    print(f"Tickers: {count}, batch size: {MASS_LOAD_MASTER_FLUSH_SIZE}")
+    old = await _run("upsert_yahoo_ticker_master per ticker (old)", records, _per_ticker)
+    new = await _run("bulk_upsert_yahoo_ticker_master batches (new)", records, _batched)
+    print(f"Speed-up: {old / new:.1f}x")
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 5000))
@@ -0,0 +1,86 @@
+"""
+Benchmark: concurrent writers with and without the write coordinator.
+
+Simulates the jobs that write to the database at the same time:
+    - several async "mass fetch" workers upserting ticker_master rows one ticker at a time
+    - a worker thread updating screener rows through update_screener_multi_fields_sync
+      (the IBKR snapshot job path)
+Each configuration runs on a fresh file-backed SQLite database. Reports wall time, write throughput,
+failed writes (e.g. "database is locked") and, with the coordinator, its batch/latency metrics.
+
+Run from the project root:
+    python benchmarks/bench_write_coordinator.py [writes_per_worker] [async_workers]
+"""
+import asyncio
+import logging
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+logging.disable(logging.CRITICAL)
+
+from src.V3_app.V3_database import SQLiteRepository, update_screener_multi_fields_sync
+from src.V3_app.db_write_coordinator import write_coordinators
+from src.V3_app.yahoo_repository import YahooDataRepository
+
+
+async def _async_worker(repo: YahooDataRepository, worker: int, writes: int, failures: list) -> None:
+    for i in range(writes):
+        try:
+            await repo.upsert_yahoo_ticker_master({"ticker": f"W{worker}T{i:05d}", "company_name": f"Company {i}", "trailing_pe": float(i)})
+        except Exception:
+            failures.append(1)
+
+
+def _thread_worker(db_path: str, writes: int, failures: list) -> None:
+    for i in range(writes):
+        if not update_screener_multi_fields_sync(db_path, f"S{i % 50:03d}", {"sector": f"Sector {i}", "beta": i / 100}):
+            failures.append(1)
+
+
+async def _run(label: str, use_coordinator: bool, writes: int, workers: int) -> None:
+    db_dir = tempfile.mkdtemp()
+    db_path = os.path.join(db_dir, "bench.db")
+    database_url = f"sqlite+aiosqlite:///{db_path}"
+    sqlite_repo = SQLiteRepository(database_url)
+    yahoo_repo = YahooDataRepository(database_url)
+    await sqlite_repo.create_tables()
+    await yahoo_repo.create_tables()
+    for i in range(50):
+        await sqlite_repo.add_or_update_screener_ticker(f"S{i:03d}", status="candidate")
+    if use_coordinator:
+        await write_coordinators.start(database_url)
+
+    failures: list = []
+    loop = asyncio.get_running_loop()
+    start = time.perf_counter()
+    await asyncio.gather(
+        loop.run_in_executor(None, _thread_worker, db_path, writes, failures),
+        *(_async_worker(yahoo_repo, worker, writes, failures) for worker in range(workers)),
+    )
+    elapsed = time.perf_counter() - start
+    total = writes * (workers + 1)
+    print(f"{label:<28} {elapsed:8.2f} s  ({total / elapsed:8.0f} writes/s, {len(failures)} failed)")
+    if use_coordinator:
+        metrics = write_coordinators.metrics()[0]
+        print(f"{'':<28} batches {metrics['batches_committed']}, avg batch {metrics['avg_batch_size']}, "
+              f"commit p95 {metrics['commit_ms_p95']:.2f} ms, latency p50/p95 "
+              f"{metrics['command_latency_ms_p50']:.2f}/{metrics['command_latency_ms_p95']:.2f} ms")
+        await write_coordinators.stop_all()
+    await sqlite_repo.engine.dispose()
+
+
+async def main(writes: int, workers: int) -> None:
+    print(f"Writes per worker: {writes}, async workers: {workers}, sync threads: 1")
+    await _run("direct writes (old)", False, writes, workers)
+    await _run("write coordinator (new)", True, writes, workers)
+
+
+if __name__ == "__main__":
+    asyncio.run(main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 500,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 8,
+    ))
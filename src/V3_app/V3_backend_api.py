@@ -1,5 +1,4 @@
 from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks, Request, Query, status
-from fastapi.responses import JSONResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 from .V3_database import ScreenerModel, PositionModel, SQLiteRepository
@@ -7,36 +6,28 @@ from .V3_web import get_db
 from pydantic import BaseModel, Field
 import uuid
 import asyncio
-from typing import List, Dict, Any, Optional, Union
+from typing import Iterator, List, Dict, Any, Optional, Union
 import logging
 from datetime import datetime
 import json
-import math
 
-# Import for ProcessPoolExecutor
-from concurrent.futures import ProcessPoolExecutor
 
 # Import your Yahoo fetch logic (adjust import as needed)
 from .V3_yahoo_fetch import mass_load_yahoo_data_from_file, YahooDataRepository, fetch_daily_historical_data
 from .V3_yahoo_fetch import mass_load_yahoo_data_from_file, YahooDataRepository, fetch_daily_historical_data
 from .yahoo_data_query_srv import YahooDataQueryService
 from .analytics_data_processor import AnalyticsDataProcessor
-from .yahoo_data_query_adv import YahooDataQueryAdvService
 from .yahoo_data_query_pro import YahooDataQueryProService
-
-# --- Helper to clean data for JSON serialization ---
-def clean_for_json(obj: Any) -> Any:
-    """
-    Recursively traverses a data structure and replaces non-finite float values
-    (NaN, infinity, -infinity) with None, making it JSON-compliant.
-    """
-    if isinstance(obj, dict):
-        return {k: clean_for_json(v) for k, v in obj.items()}
-    elif isinstance(obj, list):
-        return [clean_for_json(i) for i in obj]
-    elif isinstance(obj, float) and not math.isfinite(obj):
-        return None
-    return obj
+from .dependencies import get_yahoo_repository as get_shared_yahoo_repository
+from .db_write_coordinator import write_coordinators
+from .dependencies import get_yahoo_query_service as get_shared_yahoo_query_service
+from .dependencies import get_yahoo_query_pro_service as get_shared_yahoo_query_pro_service
+from . import fastjson
+from .fastjson import FastJSONResponse
+from fastapi.responses import StreamingResponse
+from fastapi.concurrency import run_in_threadpool
+from . import analytics_store
+from .analytics_worker_pool import analytics_worker_pool, report_progress, run_job_coroutine
 
 router = APIRouter()
 
@@ -80,8 +71,7 @@ async def start_yahoo_mass_fetch(
             'last_ticker': None,
             'errors': []
         }
-    # Get YahooDataRepository instance from app state or create new
-    db_repo = YahooDataRepository(request.app.state.repository.database_url)
+    db_repo = get_shared_yahoo_repository(request)
     background_tasks.add_task(run_yahoo_mass_fetch, db_repo, tickers, job_id)
     return {'job_id': job_id}
 
@@ -127,7 +117,7 @@ async def get_screener_tickers(db: AsyncSession = Depends(get_db)):
     try:
         result = await db.execute(select(ScreenerModel.ticker).distinct())
         tickers = [row[0] for row in result.fetchall() if row[0]]
-        return JSONResponse(content=tickers)
+        return FastJSONResponse(content=tickers)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching screener tickers: {e}")
 
@@ -137,51 +127,39 @@ async def get_portfolio_tickers(db: AsyncSession = Depends(get_db)):
     try:
         result = await db.execute(select(PositionModel.ticker).distinct())
         tickers = [row[0] for row in result.fetchall() if row[0]]
-        return JSONResponse(content=tickers)
+        return FastJSONResponse(content=tickers)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching portfolio tickers: {e}")
 
 @router.get('/api/yahoo/master_tickers', summary='Get all tickers from Yahoo master ticker table')
 async def get_yahoo_master_tickers(request: Request):
-    repo = YahooDataRepository(request.app.state.repository.database_url)
+    repo = get_shared_yahoo_repository(request)
     tickers = await repo.get_all_master_tickers()
-    return JSONResponse(content=tickers)
+    return FastJSONResponse(content=tickers)
 
-# --- Dependency Provider (Example - Adapt to your setup) ---
-# You need a way to provide instances of your repository and service.
-# This is a placeholder. Replace with your actual dependency setup.
+# --- Dependency Providers ---
+# Repositories are shared for the lifetime of the app; their engines come from the
+# process-wide engine registry, so no per-request engine or pool is created here.
 async def get_yahoo_repository(request: Request) -> YahooDataRepository:
-    # If repository needs the raw db_url string:
     if not hasattr(request.app.state, 'repository') or not hasattr(request.app.state.repository, 'database_url'):
         logger.error("CRITICAL: SQLiteRepository or its database_url not found in application state!")
         raise HTTPException(status_code=500, detail="Internal server error: YahooDataRepository cannot be initialized.")
-    db_url = request.app.state.repository.database_url
-    # Or if it just needs the session factory:
-    # return YahooDataRepository(db.bind) # Adjust based on YahooDataRepository constructor
-    return YahooDataRepository(database_url=db_url)
+    return get_shared_yahoo_repository(request)
 
-async def get_sqlite_repository(request: Request) -> SQLiteRepository: # <-- NEW Dependency Provider
-    """Provides an instance of SQLiteRepository."""
+async def get_sqlite_repository(request: Request) -> SQLiteRepository:
+    """Provides the app-scoped SQLiteRepository instance."""
     if not hasattr(request.app.state, 'repository') or not hasattr(request.app.state.repository, 'database_url'):
         logger.error("CRITICAL: SQLiteRepository or its database_url not found in application state!")
         raise HTTPException(status_code=500, detail="Internal server error: SQLiteRepository cannot be initialized.")
-    db_url = request.app.state.repository.database_url
-    return SQLiteRepository(database_url=db_url)
+    return request.app.state.repository
 
-async def get_yahoo_query_service(
-    db_repo: YahooDataRepository = Depends(get_yahoo_repository)
-) -> YahooDataQueryService:
-    return YahooDataQueryService(db_repo=db_repo)
+async def get_yahoo_query_service(request: Request) -> YahooDataQueryService:
+    """Provides the app-scoped YahooDataQueryService (sub-services are created lazily)."""
+    return get_shared_yahoo_query_service(request)
 
-async def get_yahoo_data_query_pro_service(
-    db_repo: YahooDataRepository = Depends(get_yahoo_repository),
-    base_query_srv: YahooDataQueryService = Depends(get_yahoo_query_service)
-) -> YahooDataQueryProService:
-    """FastAPI dependency provider for YahooDataQueryProService.""" 
-    logger.debug("Dependency: YahooDataQueryProService requested.")
-    service_instance = YahooDataQueryProService(db_repo=db_repo, base_query_srv=base_query_srv)
-    logger.debug(f"YahooDataQueryProService instance created: {service_instance}")
-    return service_instance
+async def get_yahoo_data_query_pro_service(request: Request) -> YahooDataQueryProService:
+    """FastAPI dependency provider for the app-scoped YahooDataQueryProService.""" 
+    return get_shared_yahoo_query_pro_service(request)
 
 # --- Target Item Types ---
 TARGET_ITEM_TYPES = [
@@ -225,59 +203,44 @@ async def get_analytics_yahoo_combined_data(
         all_master_data_list = await db_repo.get_master_data_for_analytics()
         all_master_data_map = {item['ticker']: item for item in all_master_data_list}
 
-        # 3. Fetch item data for each ticker (can be parallelized)
-        async def fetch_ticker_combined_data(ticker):
-            master_data = all_master_data_map.get(ticker, {"ticker": ticker}) # Use fetched data or default
-            financial_items = {}
-            
-            item_fetch_tasks = []
-            # Create tasks for fetching each target item type payload
-            for item_type, item_coverage, output_key in TARGET_ITEM_TYPES:
-                 item_fetch_tasks.append(
-                     asyncio.create_task(
-                         query_service.get_latest_data_item_payload(ticker, item_type, item_coverage),
-                         name=f"{ticker}-{output_key}" # Add name for easier debugging
-                     )
-                 )
-            
-            # Await all item fetch tasks for this ticker
-            item_results = await asyncio.gather(*item_fetch_tasks, return_exceptions=True)
-
-            # Process results
-            for i, result in enumerate(item_results):
-                item_type, item_coverage, output_key = TARGET_ITEM_TYPES[i]
-                if isinstance(result, Exception):
-                     logger.warning(f"Failed to fetch item {output_key} for ticker {ticker}: {result}")
-                elif result is not None:
-                    financial_items[output_key] = result
-                # else: result is None (no data found), do nothing
+        # 3. Stream the latest item payloads for all tickers from chunked windowed queries
+        financial_items_by_ticker: Dict[str, Dict[str, Any]] = {ticker: {} for ticker in master_tickers}
+        async for ticker, output_key, payload in query_service.iter_latest_data_item_payloads(
+            master_tickers, TARGET_ITEM_TYPES, dict(all_master_data_map)
+        ):
+            financial_items_by_ticker.setdefault(ticker, {})[output_key] = payload
 
-            return {
+        # 4. Assemble per-ticker results in master order
+        combined_data_list = [
+            {
                 "ticker": ticker,
-                "master_data": master_data,
-                "financial_items": financial_items
+                "master_data": all_master_data_map.get(ticker, {"ticker": ticker}), # Use fetched data or default
+                "financial_items": financial_items_by_ticker.get(ticker, {})
             }
+            for ticker in master_tickers
+        ]
 
-        # 4. Run fetches for all tickers concurrently
-        fetch_all_tickers_tasks = [fetch_ticker_combined_data(ticker) for ticker in master_tickers]
-        combined_data_list = await asyncio.gather(*fetch_all_tickers_tasks, return_exceptions=True)
-
-        # Filter out potential exceptions from gather results (though fetch_ticker_combined_data handles internal ones)
-        successful_results = [res for res in combined_data_list if not isinstance(res, Exception)]
-        
-        # Log errors if any top-level task failed
-        for i, res in enumerate(combined_data_list):
-            if isinstance(res, Exception):
-                 logger.error(f"Error fetching combined data for ticker {master_tickers[i]}: {res}", exc_info=res)
-
-
-        logger.info(f"Successfully fetched combined data for {len(successful_results)} tickers.")
-        return successful_results
+        logger.info(f"Successfully fetched combined data for {len(combined_data_list)} tickers.")
+        return combined_data_list
 
     except Exception as e:
         logger.error(f"Error in get_analytics_yahoo_combined_data endpoint: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail="Internal server error fetching combined Yahoo data")
 
+def _stream_processed_data(dataset: analytics_store.AnalyticsDataset, fields: Optional[List[str]], response_tail: Dict[str, Any]) -> Iterator[bytes]:
+    """
+    Body of the processed_data response for an analytics_store dataset: {"originalData": [...], **response_tail},
+    with the records materialized and serialized RECORD_CHUNK_SIZE at a time (NaN/Infinity as null, like FastJSONResponse).
+    """
+    yield b'{"originalData":['
+    first_chunk = True
+    for records in dataset.iter_record_chunks(fields=fields):
+        chunk = fastjson.dumps_bytes(records)[1:-1] # Without the list's brackets
+        if chunk:
+            yield chunk if first_chunk else b',' + chunk
+            first_chunk = False
+    yield b'],' + fastjson.dumps_bytes(response_tail)[1:]
+
 # --- NEW API Route for AnalyticsDataProcessor ---
 @router.get("/api/v3/analytics/processed_data",
             summary="Process and retrieve analytics data (Finviz, Yahoo, or Both) - NOW SERVES FROM CACHE",
@@ -286,6 +249,7 @@ async def get_analytics_yahoo_combined_data(
 async def get_processed_analytics_data(
     data_source_selection: str, # Query param: "finviz_only", "yahoo_only", "both" - NOW IGNORED by new cache logic
     request: Request, 
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return per record (ticker is always included); all fields if omitted"),
     sqlite_repo: SQLiteRepository = Depends(get_sqlite_repository) 
 ):
     logger.info(f"API: Request for /api/v3/analytics/processed_data. CACHE IMPLEMENTATION. data_source_selection '{data_source_selection}' is now ignored.")
@@ -299,25 +263,44 @@ async def get_processed_analytics_data(
             metadata_json, metadata_generated_at = metadata_json_tuple
 
             logger.info(f"API: Serving analytics data from cache. Data generated at: {data_generated_at}, Metadata generated at: {metadata_generated_at}")
+            field_list = [field.strip() for field in fields.split(',') if field.strip()] if fields else None
             
             try:
-                cached_data = json.loads(data_json)
-                cached_metadata = json.loads(metadata_json)
+                store_version = analytics_store.parse_store_pointer(data_json)
+                cached_metadata = fastjson.loads(metadata_json)
             except json.JSONDecodeError as e_json:
                 logger.error(f"API: JSONDecodeError when loading analytics from cache: {e_json}", exc_info=True)
                 raise HTTPException(status_code=500, detail="Error decoding cached analytics data.")
 
-            # NEW: Clean data to remove non-JSON-compliant values like NaN, Infinity
-            cleaned_data = clean_for_json(cached_data)
-            cleaned_metadata = clean_for_json(cached_metadata)
-
-            return {
-                "originalData": cleaned_data, 
-                "metaData": {"field_metadata": cleaned_metadata},
+            response_tail = {
+                "metaData": {"field_metadata": cached_metadata},
                 "message": "Served from cache.",
                 "data_cached_at": data_generated_at.isoformat() if data_generated_at else None,
                 "metadata_cached_at": metadata_generated_at.isoformat() if metadata_generated_at else None
             }
+            if store_version:
+                # Columnar store: records are streamed from the memory-mapped version, a chunk at a time
+                store_dir = analytics_store.store_dir_for_url(sqlite_repo.database_url)
+                try:
+                    dataset = await run_in_threadpool(analytics_store.open_dataset, store_dir, store_version)
+                except (OSError, ValueError) as e_store:
+                    logger.error(f"API: Could not open analytics store version {store_version}: {e_store}", exc_info=True)
+                    raise HTTPException(status_code=500, detail="Error reading cached analytics data. Please trigger a refresh.")
+                return StreamingResponse(_stream_processed_data(dataset, field_list, response_tail), media_type="application/json")
+
+            # Data cache written before the columnar store (a JSON list in the row)
+            try:
+                cached_data = fastjson.loads(data_json)
+            except json.JSONDecodeError as e_json:
+                logger.error(f"API: JSONDecodeError when loading analytics from cache: {e_json}", exc_info=True)
+                raise HTTPException(status_code=500, detail="Error decoding cached analytics data.")
+            if field_list:
+                wanted = set(field_list) | {'ticker'}
+                cached_data = [{key: value for key, value in record.items() if key in wanted} for record in cached_data]
+
+            # Returned as a response so FastAPI skips its jsonable_encoder pass over the whole cache.
+            # FastJSONResponse writes non-JSON-compliant values like NaN, Infinity as null.
+            return FastJSONResponse(content={"originalData": cached_data, **response_tail})
         else:
             missing_parts = []
             if not data_json_tuple: missing_parts.append("data")
@@ -379,106 +362,95 @@ async def get_processed_analytics_data(
 
 # --- NEW: Analytics Cache Refresh Endpoints ---
 
-# --- Top-level worker function for ProcessPoolExecutor (Analytics Data Cache) ---
-def process_analytics_data_cache_in_process(db_url: str) -> bool:
+# --- Top-level worker function for the analytics worker pool (Analytics Data Cache) ---
+def process_analytics_data_cache_in_process(db_url: str, full_refresh: bool = False) -> bool:
     # This function runs in a SEPARATE PROCESS
+    # Re-initialize logger for the new process if necessary, or configure root logger
+    # For simplicity, assuming top-level logger config applies or is inherited.
+    process_logger = logging.getLogger(__name__ + ".ProcessPoolWorker_Data")
     try:
-        # Re-initialize logger for the new process if necessary, or configure root logger
-        # For simplicity, assuming top-level logger config applies or is inherited.
-        process_logger = logging.getLogger(__name__ + ".ProcessPoolWorker_Data")
         process_logger.info(f"ProcessPoolWorker (DataCache): Initializing repository with DB URL: {db_url}")
         
         # Ensure SQLiteRepository can be initialized just with db_url
         temp_sqlite_repo = SQLiteRepository(database_url=db_url)
         
+        # A full rebuild reads the source data from a snapshot taken when it starts scanning; the cache is written to the live database
         process_logger.info("ProcessPoolWorker (DataCache): Initializing AnalyticsDataProcessor.")
-        processor = AnalyticsDataProcessor(db_repository=temp_sqlite_repo)
+        processor = AnalyticsDataProcessor(db_repository=temp_sqlite_repo, snapshot_source=True)
         
         process_logger.info("ProcessPoolWorker (DataCache): Calling force_refresh_data_cache.")
         
         async def do_refresh():
-            # No progress callback passed from here as it's hard to share across processes directly
-            await processor.force_refresh_data_cache(progress_callback=None) 
+            # Progress is relayed to the app through the pool's progress queue
+            return await processor.force_refresh_data_cache(progress_callback=report_progress, full_refresh=full_refresh)
             # await processor.close_http_client()
 
-        asyncio.run(do_refresh()) # Runs the async function in a new event loop in this process
-        process_logger.info("ProcessPoolWorker (DataCache): force_refresh_data_cache completed.")
-        return True
+        error = run_job_coroutine(do_refresh()) # On the worker's event loop, which keeps its engines between jobs
     except Exception as e:
         # Use a logger specific to this worker context if defined, or the main one
         logger_to_use = logging.getLogger(__name__ + ".ProcessPoolWorker_Data") if logging.getLogger(__name__ + ".ProcessPoolWorker_Data").hasHandlers() else logger
         logger_to_use.error(f"ProcessPoolWorker (DataCache): Error during data cache refresh: {e}", exc_info=True)
-        return False
-
-# --- Top-level worker function for ProcessPoolExecutor (Analytics Metadata Cache) ---
+        error = str(e)
+    # Raised so the pool marks the job failed with this message (the refresh itself reports errors and returns)
+    if error is not None:
+        raise RuntimeError(f"Data cache refresh failed: {error}")
+    process_logger.info("ProcessPoolWorker (DataCache): force_refresh_data_cache completed.")
+    return True
+
+# --- Top-level worker function for the analytics worker pool (Analytics Metadata Cache) ---
 def process_analytics_metadata_cache_in_process(db_url: str) -> bool:
     # This function runs in a SEPARATE PROCESS
+    process_logger = logging.getLogger(__name__ + ".ProcessPoolWorker_Metadata")
     try:
-        process_logger = logging.getLogger(__name__ + ".ProcessPoolWorker_Metadata")
         process_logger.info(f"ProcessPoolWorker (MetadataCache): Initializing repository with DB URL: {db_url}")
         
         temp_sqlite_repo = SQLiteRepository(database_url=db_url)
         
+        # Source data is only read (from a snapshot taken then) if the data cache is empty; the cache is written to the live database
         process_logger.info("ProcessPoolWorker (MetadataCache): Initializing AnalyticsDataProcessor.")
-        processor = AnalyticsDataProcessor(db_repository=temp_sqlite_repo)
+        processor = AnalyticsDataProcessor(db_repository=temp_sqlite_repo, snapshot_source=True)
         
         process_logger.info("ProcessPoolWorker (MetadataCache): Calling force_refresh_metadata_cache.")
         
         async def do_refresh():
-            await processor.force_refresh_metadata_cache(progress_callback=None)
+            return await processor.force_refresh_metadata_cache(progress_callback=report_progress)
             # await processor.close_http_client()
 
-        asyncio.run(do_refresh())
-        process_logger.info("ProcessPoolWorker (MetadataCache): force_refresh_metadata_cache completed.")
-        return True
+        error = run_job_coroutine(do_refresh())
     except Exception as e:
         logger_to_use = logging.getLogger(__name__ + ".ProcessPoolWorker_Metadata") if logging.getLogger(__name__ + ".ProcessPoolWorker_Metadata").hasHandlers() else logger
         logger_to_use.error(f"ProcessPoolWorker (MetadataCache): Error during metadata cache refresh: {e}", exc_info=True)
-        return False
+        error = str(e)
+    if error is not None:
+        raise RuntimeError(f"Metadata cache refresh failed: {error}")
+    process_logger.info("ProcessPoolWorker (MetadataCache): force_refresh_metadata_cache completed.")
+    return True
 
 
-# Global ProcessPoolExecutor (initialize once, or manage its lifecycle with app startup/shutdown)
-# For simplicity here, we'll create it on demand, but this is not ideal for production.
-# A better approach is to have one executor instance managed by the app's lifespan.
-# process_pool_executor = ProcessPoolExecutor(max_workers=1) # Example: Max 1 worker to serialize these heavy tasks
-
-async def submit_to_process_pool(worker_func, db_url: str, loop: asyncio.AbstractEventLoop):
-    logger.info(f"Submitting task ({worker_func.__name__}) to process pool with DB URL: {db_url}")
-    try:
-        # Using a context manager for the executor ensures it's shutdown if created on demand.
-        # If using a global executor, don't use 'with' here.
-        with ProcessPoolExecutor(max_workers=1) as executor:
-            future = executor.submit(worker_func, db_url)
-            # Run the blocking future.result() in a thread to not block the main asyncio event loop
-            success = await loop.run_in_executor(None, future.result) 
-        
-        if success:
-            logger.info(f"Process pool task ({worker_func.__name__}) completed successfully.")
-        else:
-            logger.warning(f"Process pool task ({worker_func.__name__}) encountered an error or returned False.")
-    except Exception as e:
-        logger.error(f"Error submitting/executing task in process pool ({worker_func.__name__}): {e}", exc_info=True)
+def _job_submission_response(job, queued: bool, description: str) -> Dict[str, Any]:
+    if queued:
+        message = f"{description} queued in the analytics worker pool. Progress: /api/analytics/cache/jobs/{job.job_id}."
+    else:
+        message = f"An identical {description.lower()} is already waiting (job {job.job_id}); not queued again."
+    return {"message": message, "job_id": job.job_id, "status": job.status, "deduplicated": not queued}
 
 @router.post("/api/analytics/cache/refresh_data",
-             summary="Manually trigger a refresh of the analytics data cache (via Process Pool)",
+             summary="Manually trigger a refresh of the analytics data cache (via the analytics worker pool)",
              status_code=status.HTTP_202_ACCEPTED,
              tags=["Analytics Data V3", "Cache Management"])
 async def trigger_analytics_data_cache_refresh(
     # background_tasks: BackgroundTasks, # No longer using FastAPI's BackgroundTasks for this
     request: Request, 
+    full: bool = Query(False, description="Rebuild the whole dataset instead of only the tickers changed since the last refresh"),
     sqlite_repo: SQLiteRepository = Depends(get_sqlite_repository) # Keep for getting db_url
 ):
-    logger.info("API: Received request to manually refresh analytics data cache (using Process Pool).")
+    logger.info(f"API: Received request to manually refresh analytics data cache (using the analytics worker pool, full={full}).")
     try:
         db_url = sqlite_repo.database_url
-        app_loop = asyncio.get_running_loop()
-
-        # Create an asyncio task that will manage the ProcessPoolExecutor interaction
-        asyncio.create_task(submit_to_process_pool(process_analytics_data_cache_in_process, db_url, app_loop))
-        
-        return {"message": "Analytics data cache refresh submitted to background process. Check logs for completion."}
+        job, queued = await analytics_worker_pool.submit("analytics_data_cache_refresh", process_analytics_data_cache_in_process, db_url, full)
+        return _job_submission_response(job, queued, "Analytics data cache refresh")
     except Exception as e:
-        logger.error(f"API: Error initiating data cache refresh (Process Pool): {e}", exc_info=True)
+        logger.error(f"API: Error initiating data cache refresh (analytics worker pool): {e}", exc_info=True)
         raise HTTPException(status_code=500, detail="Failed to initiate analytics data cache refresh.")
 
 # OLD _run_metadata_cache_refresh (REMOVE or COMMENT OUT)
@@ -499,7 +471,7 @@ async def trigger_analytics_data_cache_refresh(
 #                 logger.error(f"Error closing ADP HTTP client after metadata cache refresh task: {e_close}", exc_info=True)
 
 @router.post("/api/analytics/cache/refresh_metadata",
-             summary="Manually trigger a refresh of the analytics metadata cache (via Process Pool)",
+             summary="Manually trigger a refresh of the analytics metadata cache (via the analytics worker pool)",
              status_code=status.HTTP_202_ACCEPTED,
              tags=["Analytics Data V3", "Cache Management"])
 async def trigger_analytics_metadata_cache_refresh(
@@ -507,18 +479,57 @@ async def trigger_analytics_metadata_cache_refresh(
     request: Request,
     sqlite_repo: SQLiteRepository = Depends(get_sqlite_repository) # Keep for getting db_url
 ):
-    logger.info("API: Received request to manually refresh analytics metadata cache (using Process Pool).")
+    logger.info("API: Received request to manually refresh analytics metadata cache (using the analytics worker pool).")
     try:
         db_url = sqlite_repo.database_url
-        app_loop = asyncio.get_running_loop()
-
-        asyncio.create_task(submit_to_process_pool(process_analytics_metadata_cache_in_process, db_url, app_loop))
-        
-        return {"message": "Analytics metadata cache refresh submitted to background process. Check logs for completion."}
+        job, queued = await analytics_worker_pool.submit("analytics_metadata_cache_refresh", process_analytics_metadata_cache_in_process, db_url)
+        return _job_submission_response(job, queued, "Analytics metadata cache refresh")
     except Exception as e:
-        logger.error(f"API: Error initiating metadata cache refresh (Process Pool): {e}", exc_info=True)
+        logger.error(f"API: Error initiating metadata cache refresh (analytics worker pool): {e}", exc_info=True)
         raise HTTPException(status_code=500, detail="Failed to initiate analytics metadata cache refresh.")
 
+@router.get("/api/analytics/cache/jobs",
+            summary="Analytics cache refresh jobs (waiting, running and recently finished)",
+            tags=["Analytics Data V3", "Cache Management"])
+async def get_analytics_cache_jobs():
+    return FastJSONResponse({"pool": analytics_worker_pool.get_stats(), "jobs": analytics_worker_pool.jobs()})
+
+@router.get("/api/analytics/cache/jobs/events",
+            summary="Analytics cache refresh job events (SSE)",
+            tags=["Analytics Data V3", "Cache Management", "SSE"])
+async def stream_analytics_cache_job_events(request: Request):
+    """Server-Sent Events: the current jobs, then an event per job state change or (throttled) progress update."""
+    queue = analytics_worker_pool.subscribe()
+
+    async def event_generator():
+        try:
+            for job in analytics_worker_pool.jobs():
+                yield f"data: {fastjson.dumps({'event': 'analytics_job', 'job': job, 'progress': job.get('progress')}, default=str)}\n\n"
+            while True:
+                if await request.is_disconnected():
+                    break
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=15.0)
+                except asyncio.TimeoutError:
+                    yield ": analytics jobs heartbeat\n\n"
+                    continue
+                yield f"data: {fastjson.dumps(event, default=str)}\n\n"
+        except asyncio.CancelledError:
+            logger.info("[API ANALYTICS JOBS SSE] Stream cancelled by client disconnect or server shutdown.")
+        finally:
+            analytics_worker_pool.unsubscribe(queue)
+
+    return StreamingResponse(event_generator(), media_type="text/event-stream")
+
+@router.get("/api/analytics/cache/jobs/{job_id}",
+            summary="State and latest progress of an analytics cache refresh job",
+            tags=["Analytics Data V3", "Cache Management"])
+async def get_analytics_cache_job(job_id: str):
+    job = analytics_worker_pool.job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Analytics cache job {job_id} not found.")
+    return FastJSONResponse(job)
+
 @router.get("/api/yahoo/ticker_currencies/{ticker_symbol}", 
             summary="Get trade and financial currencies for a ticker",
             response_model=Optional[Dict[str, Optional[str]]],
@@ -675,6 +686,28 @@ async def get_fundamentals_history_data(
 
 # --- END NEW: Timeseries Price History API Endpoint --- 
 
+# Synthetic fundamentals routed straight to the advanced/pro services.
+# Format: 'FUNDAMENTAL_NAME': (service, method_name) where service is 'adv' or 'pro'.
+# Anything not listed falls through to YahooDataQueryService.calculate_synthetic_fundamental_timeseries.
+SYNTHETIC_FUNDAMENTAL_ROUTES = {
+    "FCF_MARGIN_TTM": ("adv", "calculate_fcf_margin_ttm"),
+    "GROSS_MARGIN_TTM": ("adv", "calculate_gross_margin_ttm"),
+    "OPERATING_MARGIN_TTM": ("adv", "calculate_operating_margin_ttm"),
+    "NET_PROFIT_MARGIN_TTM": ("adv", "calculate_net_profit_margin_ttm"),
+    "PRICE_TO_SALES_TTM": ("adv", "calculate_price_to_sales_ttm"),
+    "DEBT_TO_EQUITY": ("adv", "calculate_debt_to_equity_for_tickers"),
+    "TOTAL_LIABILITIES_TO_EQUITY": ("adv", "calculate_total_liabilities_to_equity_for_tickers"),
+    "TOTAL_LIABILITIES_TO_ASSETS": ("adv", "calculate_total_liabilities_to_assets_for_tickers"),
+    "DEBT_TO_ASSETS": ("adv", "calculate_debt_to_assets_for_tickers"),
+    "ROA_TTM": ("adv", "calculate_roa_ttm"),
+    "ROE_TTM": ("adv", "calculate_roe_ttm"),
+    "ROIC_TTM": ("adv", "calculate_roic_ttm"),
+    "ASSET_TURNOVER_TTM": ("adv", "calculate_asset_turnover_ttm"),
+    "EV_TO_FCF_TTM": ("pro", "get_ev_to_fcf_ttm_timeseries"),
+    "EV_TO_SALES_TTM": ("pro", "get_ev_to_sales_ttm_timeseries"),
+    "EV_TO_EBITDA_TTM": ("pro", "get_ev_to_ebitda_ttm_timeseries"),
+}
+
 class SyntheticFundamentalRequest(BaseModel):
     tickers: List[str]
     start_date: Optional[str] = None # YYYY-MM-DD
@@ -699,194 +732,26 @@ async def get_synthetic_fundamental_timeseries(
     - **end_date**: Optional end date for the timeseries (YYYY-MM-DD). Defaults to today if not provided.
     """
     try:
-        # NEW: Logic to use YahooDataQueryAdvService for specific fundamentals
-        if fundamental_name.upper() == "FCF_MARGIN_TTM":
-            logger.info(f"Routing FCF_MARGIN_TTM to YahooDataQueryAdvService for tickers: {request_payload.tickers}")
-            # Assuming db_repo is accessible or can be passed if AdvService needs it directly.
-            # For now, AdvService constructor takes db_repo and base_query_srv.
-            # The base_query_srv already has db_repo.
-            adv_query_service = YahooDataQueryAdvService(
-                db_repo=query_service.db_repo, # Pass the db_repo from the base service
-                base_query_srv=query_service   # Pass the base service instance
-            )
-            result = await adv_query_service.calculate_fcf_margin_ttm(
-                tickers=request_payload.tickers,
-                start_date_str=request_payload.start_date,
-                end_date_str=request_payload.end_date
-            )
-        # END NEW
-        # NEW: Add routing for GROSS_MARGIN_TTM
-        elif fundamental_name.upper() == "GROSS_MARGIN_TTM":
-            logger.info(f"Routing GROSS_MARGIN_TTM to YahooDataQueryAdvService for tickers: {request_payload.tickers}")
-            adv_query_service = YahooDataQueryAdvService(
-                db_repo=query_service.db_repo, 
-                base_query_srv=query_service
-            )
-            result = await adv_query_service.calculate_gross_margin_ttm(
-                tickers=request_payload.tickers,
-                start_date_str=request_payload.start_date,
-                end_date_str=request_payload.end_date
-            )
-        # END NEW
-        # NEW: Add routing for OPERATING_MARGIN_TTM
-        elif fundamental_name.upper() == "OPERATING_MARGIN_TTM":
-            logger.info(f"Routing OPERATING_MARGIN_TTM to YahooDataQueryAdvService for tickers: {request_payload.tickers}")
-            adv_query_service = YahooDataQueryAdvService(
-                db_repo=query_service.db_repo, 
-                base_query_srv=query_service
-            )
-            result = await adv_query_service.calculate_operating_margin_ttm(
-                tickers=request_payload.tickers,
-                start_date_str=request_payload.start_date,
-                end_date_str=request_payload.end_date
-            )
-        # END NEW
-        # NEW: Add routing for NET_PROFIT_MARGIN_TTM
-        elif fundamental_name.upper() == "NET_PROFIT_MARGIN_TTM":
-            logger.info(f"Routing NET_PROFIT_MARGIN_TTM to YahooDataQueryAdvService for tickers: {request_payload.tickers}")
-            adv_query_service = YahooDataQueryAdvService(
-                db_repo=query_service.db_repo, 
-                base_query_srv=query_service
-            )
-            result = await adv_query_service.calculate_net_profit_margin_ttm(
-                tickers=request_payload.tickers,
-                start_date_str=request_payload.start_date,
-                end_date_str=request_payload.end_date
-            )
-        # END NEW
-        # NEW: Add routing for PRICE_TO_SALES_TTM
-        elif fundamental_name.upper() == "PRICE_TO_SALES_TTM":
-            logger.info(f"Routing PRICE_TO_SALES_TTM to YahooDataQueryAdvService for tickers: {request_payload.tickers}")
-            adv_query_service = YahooDataQueryAdvService(
-                db_repo=query_service.db_repo, 
-                base_query_srv=query_service
-            )
-            result = await adv_query_service.calculate_price_to_sales_ttm(
-                tickers=request_payload.tickers,
-                start_date_str=request_payload.start_date,
-                end_date_str=request_payload.end_date
-            )
-        # NEW: Add routing for DEBT_TO_EQUITY
-        elif fundamental_name.upper() == "DEBT_TO_EQUITY":
-            logger.info(f"Routing DEBT_TO_EQUITY to YahooDataQueryAdvService for tickers: {request_payload.tickers}")
-            adv_query_service = YahooDataQueryAdvService(
-                db_repo=query_service.db_repo, 
-                base_query_srv=query_service
-            )
-            result = await adv_query_service.calculate_debt_to_equity_for_tickers(
-                tickers=request_payload.tickers,
-                start_date_str=request_payload.start_date,
-                end_date_str=request_payload.end_date
-            )
-        # NEW: Add routing for TOTAL_LIABILITIES_TO_EQUITY
-        elif fundamental_name.upper() == "TOTAL_LIABILITIES_TO_EQUITY":
-            logger.info(f"Routing TOTAL_LIABILITIES_TO_EQUITY to YahooDataQueryAdvService for tickers: {request_payload.tickers}")
-            adv_query_service = YahooDataQueryAdvService(
-                db_repo=query_service.db_repo, 
-                base_query_srv=query_service
-            )
-            result = await adv_query_service.calculate_total_liabilities_to_equity_for_tickers(
-                tickers=request_payload.tickers,
-                start_date_str=request_payload.start_date,
-                end_date_str=request_payload.end_date
-            )
-        # NEW: Add routing for TOTAL_LIABILITIES_TO_ASSETS
-        elif fundamental_name.upper() == "TOTAL_LIABILITIES_TO_ASSETS":
-            logger.info(f"Routing TOTAL_LIABILITIES_TO_ASSETS to YahooDataQueryAdvService for tickers: {request_payload.tickers}")
-            adv_query_service = YahooDataQueryAdvService(
-                db_repo=query_service.db_repo, 
-                base_query_srv=query_service
-            )
-            result = await adv_query_service.calculate_total_liabilities_to_assets_for_tickers(
-                tickers=request_payload.tickers,
-                start_date_str=request_payload.start_date,
-                end_date_str=request_payload.end_date
-            )
-        # NEW: Add routing for DEBT_TO_ASSETS
-        elif fundamental_name.upper() == "DEBT_TO_ASSETS":
-            logger.info(f"Routing DEBT_TO_ASSETS to YahooDataQueryAdvService for tickers: {request_payload.tickers}")
-            adv_query_service = YahooDataQueryAdvService(
-                db_repo=query_service.db_repo, 
-                base_query_srv=query_service
-            )
-            result = await adv_query_service.calculate_debt_to_assets_for_tickers(
-                tickers=request_payload.tickers,
-                start_date_str=request_payload.start_date,
-                end_date_str=request_payload.end_date
-            )
-        # NEW: Add routing for ROA_TTM
-        elif fundamental_name.upper() == "ROA_TTM":
-            logger.info(f"Routing ROA_TTM to YahooDataQueryAdvService for tickers: {request_payload.tickers}")
-            adv_query_service = YahooDataQueryAdvService(
-                db_repo=query_service.db_repo, 
-                base_query_srv=query_service
-            )
-            result = await adv_query_service.calculate_roa_ttm(
-                tickers=request_payload.tickers,
-                start_date_str=request_payload.start_date,
-                end_date_str=request_payload.end_date
-            )
-        # NEW: Add routing for ROE_TTM
-        elif fundamental_name.upper() == "ROE_TTM":
-            logger.info(f"Routing ROE_TTM to YahooDataQueryAdvService for tickers: {request_payload.tickers}")
-            adv_query_service = YahooDataQueryAdvService(
-                db_repo=query_service.db_repo, 
-                base_query_srv=query_service
-            )
-            result = await adv_query_service.calculate_roe_ttm(
-                tickers=request_payload.tickers,
-                start_date_str=request_payload.start_date,
-                end_date_str=request_payload.end_date
-            )
-        # NEW: Add routing for ROIC_TTM
-        elif fundamental_name.upper() == "ROIC_TTM":
-            logger.info(f"Routing ROIC_TTM to YahooDataQueryAdvService for tickers: {request_payload.tickers}")
-            adv_query_service = YahooDataQueryAdvService(
-                db_repo=query_service.db_repo, 
-                base_query_srv=query_service
-            )
-            result = await adv_query_service.calculate_roic_ttm(
-                tickers=request_payload.tickers,
-                start_date_str=request_payload.start_date,
-                end_date_str=request_payload.end_date
-            )
-        # NEW: Add routing for ASSET_TURNOVER_TTM
-        elif fundamental_name.upper() == "ASSET_TURNOVER_TTM":
-            logger.info(f"Routing ASSET_TURNOVER_TTM to YahooDataQueryAdvService for tickers: {request_payload.tickers}")
-            adv_query_service = YahooDataQueryAdvService(
-                db_repo=query_service.db_repo, 
-                base_query_srv=query_service
-            )
-            result = await adv_query_service.calculate_asset_turnover_ttm(
-                tickers=request_payload.tickers,
-                start_date_str=request_payload.start_date,
-                end_date_str=request_payload.end_date
-            )
-        # NEW: Add routing for EV_TO_FCF_TTM
-        elif fundamental_name.upper() == "EV_TO_FCF_TTM":
-            logger.info(f"Routing EV_TO_FCF_TTM to YahooDataQueryProService for tickers: {request_payload.tickers}")
-            result = await pro_query_service.get_ev_to_fcf_ttm_timeseries(
-                tickers=request_payload.tickers,
-                start_date=request_payload.start_date,
-                end_date=request_payload.end_date
-            )
-        # NEW: Add routing for EV_TO_SALES_TTM
-        elif fundamental_name.upper() == "EV_TO_SALES_TTM":
-            logger.info(f"Routing EV_TO_SALES_TTM to YahooDataQueryProService for tickers: {request_payload.tickers}")
-            result = await pro_query_service.get_ev_to_sales_ttm_timeseries(
-                tickers=request_payload.tickers,
-                start_date=request_payload.start_date,
-                end_date=request_payload.end_date
-            )
-        # NEW: Add routing for EV_TO_EBITDA_TTM
-        elif fundamental_name.upper() == "EV_TO_EBITDA_TTM":
-            logger.info(f"Routing EV_TO_EBITDA_TTM to YahooDataQueryProService for tickers: {request_payload.tickers}")
-            result = await pro_query_service.get_ev_to_ebitda_ttm_timeseries(
-                tickers=request_payload.tickers,
-                start_date=request_payload.start_date,
-                end_date=request_payload.end_date
-            )
-        # END NEW
+        route = SYNTHETIC_FUNDAMENTAL_ROUTES.get(fundamental_name.upper())
+        if route is not None:
+            service_key, method_name = route
+            if service_key == "adv":
+                # Reuse the base service's lazily-created advanced service instead of building a new one
+                logger.info(f"Routing {fundamental_name.upper()} to YahooDataQueryAdvService for tickers: {request_payload.tickers}")
+                handler = getattr(query_service.adv_service, method_name)
+                result = await handler(
+                    tickers=request_payload.tickers,
+                    start_date_str=request_payload.start_date,
+                    end_date_str=request_payload.end_date
+                )
+            else:
+                logger.info(f"Routing {fundamental_name.upper()} to YahooDataQueryProService for tickers: {request_payload.tickers}")
+                handler = getattr(pro_query_service, method_name)
+                result = await handler(
+                    tickers=request_payload.tickers,
+                    start_date=request_payload.start_date,
+                    end_date=request_payload.end_date
+                )
         else:
             result = await query_service.calculate_synthetic_fundamental_timeseries(
                 fundamental_name=fundamental_name,
@@ -953,5 +818,50 @@ async def get_database_status(
         raise HTTPException(status_code=500, detail="Internal server error fetching database status.")
 # --- END Database Status Endpoint ---
 
+# --- Database Write Coordinator Metrics Endpoint ---
+@router.get("/api/v3/database/write_metrics",
+            summary="Get write coordinator queue and commit metrics",
+            tags=["Database Utilities"])
+async def get_database_write_metrics() -> List[Dict[str, Any]]:
+    """Queue depth, batch sizes and commit/queue latencies of the running write coordinators."""
+    return write_coordinators.metrics()
+# --- END Database Write Coordinator Metrics Endpoint ---
+
+# --- Database Optimize Endpoints (see db_optimizer) ---
+@router.get("/api/v3/database/optimize",
+            summary="Get database size/fragmentation telemetry and recent optimize runs",
+            tags=["Database Utilities"])
+async def get_database_optimize_status(
+    runs: int = Query(10, ge=0, le=50, description="Number of recent optimize reports to return."),
+    sqlite_repo: SQLiteRepository = Depends(get_sqlite_repository)
+) -> Dict[str, Any]:
+    """Current page count, freelist, WAL size and planner statistics (cheap PRAGMAs only), plus the before/after
+    reports of the most recent optimize runs, whose 'before' has the per-table fill/out-of-order pages."""
+    try:
+        return {
+            "running": sqlite_repo.is_db_optimize_running(),
+            "current": await sqlite_repo.get_db_optimize_stats(),
+            "runs": await sqlite_repo.get_db_optimize_runs(limit=runs) if runs else []
+        }
+    except Exception as e:
+        logger.error(f"API: Error in get_database_optimize_status: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail="Internal server error fetching database optimize status.")
+
+@router.post("/api/v3/database/optimize",
+             summary="Start an online database optimize run",
+             status_code=status.HTTP_202_ACCEPTED,
+             tags=["Database Utilities"])
+async def trigger_database_optimize(
+    time_budget_seconds: Optional[float] = Query(None, gt=0, le=3600, description="Time budget of the run (default: db_optimizer.OPTIMIZE_TIME_BUDGET_SECONDS)."),
+    sqlite_repo: SQLiteRepository = Depends(get_sqlite_repository)
+):
+    """Starts an optimize run in the background; its report appears in GET /api/v3/database/optimize."""
+    if sqlite_repo.is_db_optimize_running():
+        raise HTTPException(status_code=409, detail="An optimize run is already in progress.")
+    budget_kwargs = {"time_budget_seconds": time_budget_seconds} if time_budget_seconds else {}
+    asyncio.create_task(sqlite_repo.optimize_database(trigger="api", **budget_kwargs))
+    return {"message": "Database optimize run started. Check GET /api/v3/database/optimize for the report."}
+# --- END Database Optimize Endpoints ---
+
 # Ensure router is included in the main app if this is a separate file, e.g., app.include_router(router)
 # Or if V3_backend_api.py defines `router = APIRouter()`, ensure this router is used. 
\ No newline at end of file
@@ -14,7 +14,7 @@ from typing import Dict, Any, List, Optional, Set, Union, Tuple, AsyncGenerator
 from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, create_engine, delete, MetaData, Table, insert, update, and_, distinct, Text, Boolean, text, func, UniqueConstraint, Index, event, inspect
 from sqlalchemy.exc import SQLAlchemyError, IntegrityError
 from sqlalchemy.orm import relationship, declarative_base, sessionmaker, Session
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 import os
 import json
@@ -22,6 +22,11 @@ from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 import sqlite3
 import aiosqlite
 import asyncio
+import time
+from .db_engine_registry import engine_registry
+from .db_write_coordinator import DriverSQLWrite, begin_write, write_session, write_coordinators
+from . import db_optimizer
+from . import fastjson
 
 # Remove the temporary Pydantic import and definitions here
 # from pydantic import BaseModel
@@ -37,6 +42,9 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Tickers per IN query when analytics_raw is read for a list of tickers
+ANALYTICS_RAW_TICKER_CHUNK_SIZE = 500
+
 Base = declarative_base()
 
 class AccountModel(Base):
@@ -254,6 +262,8 @@ class CachedAnalyticsDataModel(Base):
     id = Column(Integer, primary_key=True) # Simpler: PK means unique. Repo logic will ensure id=1.
     data_json = Column(Text, nullable=False)
     generated_at = Column(DateTime, nullable=False, default=datetime.now, onupdate=datetime.now)
+    # JSON of the source watermarks data_json was built from (AnalyticsDataProcessor's incremental refresh); NULL forces a full refresh
+    source_state_json = Column(Text, nullable=True)
 
     __table_args__ = (
         UniqueConstraint('id', name='uq_cached_analytics_data_id'), # Enforce id is 1 via repo. This ensures the column is unique.
@@ -291,6 +301,23 @@ class NotificationSettingModel(Base):
     def __repr__(self):
         return f"<NotificationSettingModel(service_name='{self.service_name}', is_active={self.is_active})>"
 
+class DbOptimizeRunModel(Base):
+    """Report of one online optimization run (see db_optimizer); the newest OPTIMIZE_RUNS_KEPT are kept."""
+    __tablename__ = 'db_optimize_runs'
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    started_at = Column(DateTime, nullable=False, default=datetime.now)
+    finished_at = Column(DateTime, nullable=True)
+    trigger = Column(String, nullable=True) # 'scheduler', 'api', 'cli'
+    status = Column(String, nullable=False) # 'completed', 'budget_exhausted', 'failed'
+    report_json = Column(Text, nullable=False) # Before/after telemetry, steps and query plans
+
+    def __repr__(self):
+        return f"<DbOptimizeRunModel(id={self.id}, started_at='{self.started_at}', status='{self.status}')>"
+
+# Database URLs with an optimize run in progress in this process (one run per database at a time)
+_db_optimize_in_progress: Set[str] = set()
+
 class SQLiteRepository:
     """Repository for SQLite database operations."""
     print("--- SQLiteRepository class definition loaded ---") # <--- ADD THIS LINE
@@ -299,14 +326,20 @@ class SQLiteRepository:
         """Initialize the repository with a database URL."""
         self.database_url = database_url
         logger.info(f"SQLiteRepository initialized with DB URL: {self.database_url}")
-        self.engine = create_async_engine(database_url)
-        # --- ADDED ---
-        self.async_session_factory = async_sessionmaker(
-            bind=self.engine, 
-            expire_on_commit=False, # Good practice for async sessions
-            class_=AsyncSession # Explicitly state the session class to be used
-        )
-        # --- END ADDED ---
+        # Engine and session factory are shared per database URL via the process-wide registry
+        self.engine = engine_registry.get_engine(database_url)
+        self.async_session_factory = engine_registry.get_session_factory(database_url)
+        # Read-only engine (WAL snapshot reads); read methods use it so they never wait on writers
+        self.read_engine = engine_registry.get_read_engine(database_url)
+        self.read_session_factory = engine_registry.get_read_session_factory(database_url)
+
+    def _begin_write(self, description: str = "write block"):
+        """Write transaction; goes through the database's write coordinator when one is running."""
+        return begin_write(self.engine, self.database_url, description)
+
+    def _write_session(self, description: str = "write block"):
+        """AsyncSession on a _begin_write() connection, for the ORM-style writers."""
+        return write_session(self.engine, self.database_url, description)
 
     async def get_db_path(self) -> str:
         # Extracts the file path from the SQLite URL
@@ -333,6 +366,9 @@ class SQLiteRepository:
              async with self.engine.begin() as conn:
                   await conn.run_sync(Base.metadata.create_all)
                   await conn.run_sync(lambda sync_conn: exchange_rates.create(sync_conn, checkfirst=True))
+                  # Columns and indexes added to existing tables (imported here: db_migrations imports this module)
+                  from .db_migrations import apply_migrations
+                  await conn.run_sync(apply_migrations)
              logger.info("[DB Init] Tables created successfully.")
          except Exception as e:
              logger.error(f"[DB Init] Error during table creation: {e}", exc_info=True)
@@ -369,7 +405,7 @@ class SQLiteRepository:
         """Clear all positions for a specific account using ORM model."""
         try:
             logger.info(f"[DB] Clearing positions for account {account_id}")
-            async with self.engine.begin() as conn:
+            async with self._begin_write() as conn:
                 # Use ORM model for delete
                 stmt = delete(PositionModel).where(PositionModel.account_id == account_id)
                 await conn.execute(stmt)
@@ -382,7 +418,7 @@ class SQLiteRepository:
         """Save position to database using ORM model."""
         try:
             logger.info(f"[DB] Saving position {position.get('ticker', 'N/A')} for account {position.get('account_id', 'N/A')}")
-            async with self.engine.begin() as conn:
+            async with self._begin_write() as conn:
                  # Use ORM model for insert
                 stmt = insert(PositionModel).values(**position)
                 await conn.execute(stmt)
@@ -395,7 +431,7 @@ class SQLiteRepository:
         """Get all positions from database using ORM model."""
         try:
             logger.info("[DB] Fetching all positions")
-            async with self.engine.connect() as conn: # Use connect for select
+            async with self.read_engine.connect() as conn: # Use connect for select
                 # Use ORM model for select
                 result = await conn.execute(select(PositionModel))
                 rows = result.mappings().all() # Use mappings() for dict-like rows
@@ -415,7 +451,7 @@ class SQLiteRepository:
 
         logger.info(f"[DB] Saving account {account_id}")
         try:
-            async with self.engine.begin() as conn:
+            async with self._begin_write() as conn:
                 # Check if exists
                 result = await conn.execute(
                     select(AccountModel).where(AccountModel.account_id == account_id)
@@ -438,12 +474,12 @@ class SQLiteRepository:
                     stmt = insert(AccountModel).values(**account)
                 
                 await conn.execute(stmt)
-                # Commit is handled by engine.begin() context manager
+                # Commit is handled by the _begin_write() context manager
                 
             logger.info(f"[DB] Account {account_id} saved/updated successfully in DB.")
             
             # --- Fetch the saved/updated record to return it --- 
-            async with self.engine.connect() as conn:
+            async with self.read_engine.connect() as conn:
                 result = await conn.execute(
                     select(AccountModel).where(AccountModel.account_id == account_id)
                 )
@@ -465,7 +501,7 @@ class SQLiteRepository:
         """Get all accounts from database using ORM model."""
         try:
             logger.info("[DB] Fetching all accounts")
-            async with self.engine.connect() as conn: # Use connect for select
+            async with self.read_engine.connect() as conn: # Use connect for select
                 # Use ORM model for select
                 result = await conn.execute(select(AccountModel))
                 rows = result.mappings().all() # Use mappings() for dict-like rows
@@ -480,7 +516,7 @@ class SQLiteRepository:
         """Delete an account using ORM model."""
         try:
             logger.info(f"[DB] Deleting account {account_id}")
-            async with self.engine.begin() as conn:
+            async with self._begin_write() as conn:
                  # Use ORM model for delete
                 stmt = delete(AccountModel).where(AccountModel.account_id == account_id)
                 await conn.execute(stmt)
@@ -493,7 +529,7 @@ class SQLiteRepository:
         """Get a specific account by its ID using ORM model."""
         try:
             logger.info(f"[DB] Fetching account {account_id}")
-            async with self.engine.connect() as conn: # Use connect for select
+            async with self.read_engine.connect() as conn: # Use connect for select
                 # Use ORM model for select
                 result = await conn.execute(
                     select(AccountModel).where(AccountModel.account_id == account_id)
@@ -518,7 +554,7 @@ class SQLiteRepository:
             
         try:
             logger.info(f"[DB] Updating account {account_id} with data: {updates}")
-            async with self.engine.begin() as conn:
+            async with self._begin_write() as conn:
                  # Use ORM model for update, pass the updates dictionary
                 stmt = update(AccountModel).where(AccountModel.account_id == account_id).values(**updates)
                 result = await conn.execute(stmt)
@@ -537,7 +573,7 @@ class SQLiteRepository:
         """Get all orders from database using ORM model."""
         try:
             logger.info("[DB] Fetching all orders")
-            async with self.engine.connect() as conn: # Use connect for select
+            async with self.read_engine.connect() as conn: # Use connect for select
                 # Use ORM model for select
                 result = await conn.execute(select(OrderModel))
                 rows = result.mappings().all() # Use mappings() for dict-like rows
@@ -554,7 +590,7 @@ class SQLiteRepository:
         account_id = order_data.get('account_id', 'Unknown')
         try:
             logger.info(f"[DB] Saving order {order_id} for account {account_id}")
-            async with self.engine.begin() as conn:
+            async with self._begin_write() as conn:
                  # Use ORM model for insert
                 stmt = insert(OrderModel).values(**order_data)
                 await conn.execute(stmt)
@@ -566,7 +602,7 @@ class SQLiteRepository:
     async def get_job_config(self, job_id: str) -> Optional[Dict[str, Any]]:
         """Get job configuration by ID."""
         try:
-            async with self.engine.connect() as conn:
+            async with self.read_engine.connect() as conn:
                 stmt = select(JobConfigModel).filter_by(job_id=job_id)
                 result = await conn.execute(stmt)
                 # CORRECTED: Use mappings().first() to get a dict-like object or None
@@ -603,7 +639,7 @@ class SQLiteRepository:
                 set_=update_fields
             )
             
-            async with self.engine.begin() as conn:
+            async with self._begin_write() as conn:
                 await conn.execute(upsert_stmt)
             logger.info(f"[DB] Saved/Updated job config for: {job_config_data.get('job_id')}")
         except Exception as e:
@@ -613,7 +649,7 @@ class SQLiteRepository:
     async def update_job_config(self, job_id: str, updates: Dict[str, Any]) -> None:
         """Update job configuration."""
         try:
-            async with self.engine.begin() as conn:
+            async with self._begin_write() as conn:
                 await conn.execute(
                     update(JobConfigModel).where(JobConfigModel.job_id == job_id).values(**updates)
                 )
@@ -625,14 +661,14 @@ class SQLiteRepository:
         """Get the fetch interval in seconds from job_configs (expects JSON format for ibkr_fetch)."""
         job_id = 'ibkr_fetch' # Hardcoded for original functionality
         try:
-            async with self.engine.connect() as conn:
+            async with self.read_engine.connect() as conn:
                 result = await conn.execute(
                     select(JobConfigModel.schedule).where(JobConfigModel.job_id == job_id)
                 )
                 schedule_str = result.scalar_one_or_none()
                 if schedule_str:
                     try:
-                        schedule_data = json.loads(schedule_str)
+                        schedule_data = fastjson.loads(schedule_str)
                         # UPDATED: Look for the standard format: {"trigger": "interval", "seconds": NNN}
                         if isinstance(schedule_data, dict) and schedule_data.get('trigger') == 'interval' and 'seconds' in schedule_data:
                             interval = int(schedule_data['seconds'])
@@ -668,9 +704,9 @@ class SQLiteRepository:
         """Save or update the fetch interval in job_configs (stores as JSON for ibkr_fetch)."""
         job_id = 'ibkr_fetch'
         schedule_data = {'interval_seconds': interval_seconds}
-        schedule_str = json.dumps(schedule_data)
+        schedule_str = fastjson.dumps(schedule_data)
         try:
-            async with self.engine.begin() as conn:
+            async with self._begin_write() as conn:
                 result = await conn.execute(
                     select(JobConfigModel.id).where(JobConfigModel.job_id == job_id)
                 )
@@ -703,7 +739,7 @@ class SQLiteRepository:
     async def get_job_schedule_seconds(self, job_id: str, default_seconds: int = 0) -> int:
         """Get the schedule interval in seconds for a generic job_id, expecting standard JSON format."""
         try:
-            async with self.engine.connect() as conn:
+            async with self.read_engine.connect() as conn:
                 result = await conn.execute(
                     select(JobConfigModel.schedule).where(JobConfigModel.job_id == job_id)
                 )
@@ -711,7 +747,7 @@ class SQLiteRepository:
                 
                 if schedule_str:
                     try:
-                        schedule_data = json.loads(schedule_str)
+                        schedule_data = fastjson.loads(schedule_str)
                         # Expecting {"trigger": "interval", "seconds": NNNN}
                         if isinstance(schedule_data, dict) and schedule_data.get('trigger') == 'interval' and 'seconds' in schedule_data:
                             seconds = int(schedule_data['seconds'])
@@ -737,7 +773,7 @@ class SQLiteRepository:
     async def get_job_is_active(self, job_id: str, default_active: bool = True) -> bool:
         """Get the is_active status (as boolean) for a specific job_id."""
         try:
-            async with self.engine.connect() as conn:
+            async with self.read_engine.connect() as conn:
                 result = await conn.execute(
                     select(JobConfigModel.is_active).where(JobConfigModel.job_id == job_id)
                 )
@@ -757,7 +793,7 @@ class SQLiteRepository:
         """Update the is_active status for a specific job_id. Returns True on success, False otherwise."""
         try:
             logger.info(f"[DB] Updating is_active status for {job_id} to {is_active}")
-            async with self.engine.begin() as conn:
+            async with self._begin_write() as conn:
                 values_to_set = {'is_active': int(is_active), 'updated_at': datetime.now()}
                 logger.debug(f"[DB Update Status] Prepared values: {values_to_set}") # Log prepared values
                 
@@ -783,7 +819,7 @@ class SQLiteRepository:
         """Clear all data from the database using ORM models."""
         try:
             logger.info("[DB] Clearing all data from database")
-            async with self.engine.begin() as conn:
+            async with self._begin_write() as conn:
                 # Delete in order due to foreign key constraints, using ORM models
                 await conn.execute(delete(PositionModel)) # Clear positions first
                 await conn.execute(delete(OrderModel))    # Then orders
@@ -799,7 +835,7 @@ class SQLiteRepository:
         """Delete all orders for a specific account using ORM model."""
         try:
             logger.info(f"[DB] Deleting orders for account {account_id}")
-            async with self.engine.begin() as conn:
+            async with self._begin_write() as conn:
                  # Use ORM model for delete
                 stmt = delete(OrderModel).where(OrderModel.account_id == account_id)
                 await conn.execute(stmt)
@@ -813,7 +849,7 @@ class SQLiteRepository:
         """Get all tickers and their source info from the screener table."""
         try:
             logger.info("[DB] Fetching all screened tickers (full model)") # Updated log
-            async with self.engine.connect() as conn:
+            async with self.read_engine.connect() as conn:
                 # Select the full model again for the UI
                 stmt = select(ScreenerModel).order_by(ScreenerModel.ticker) # Select full model and order
                 result = await conn.execute(stmt)
@@ -910,7 +946,7 @@ class SQLiteRepository:
 
         try:
             logger.info(f"[DB] Adding/Updating screener ticker: {ticker_upper} with status {status}, ConID: {conid}")
-            async with self.engine.begin() as conn:
+            async with self._begin_write() as conn:
                 # --- Check if ticker exists and fetch its conid --- 
                 stmt_check = select(ScreenerModel.conid).where(ScreenerModel.ticker == ticker_upper)
                 result = await conn.execute(stmt_check)
@@ -964,7 +1000,7 @@ class SQLiteRepository:
 
         try:
             logger.info(f"[DB] Updating screener ticker status: {ticker_upper} to {status}")
-            async with self.engine.begin() as conn:
+            async with self._begin_write() as conn:
                 stmt = update(ScreenerModel).where(ScreenerModel.ticker == ticker_upper).values(status=status, updated_at=datetime.now())
                 result = await conn.execute(stmt)
                 if result.rowcount == 0:
@@ -982,7 +1018,7 @@ class SQLiteRepository:
         ticker_upper = ticker.strip().upper()
         try:
             logger.info(f"[DB] Deleting screener ticker: {ticker_upper}")
-            async with self.engine.begin() as conn:
+            async with self._begin_write() as conn:
                 stmt = delete(ScreenerModel).where(ScreenerModel.ticker == ticker_upper)
                 result = await conn.execute(stmt)
                 if result.rowcount == 0:
@@ -1061,7 +1097,7 @@ class SQLiteRepository:
 
         # --- Refactored Update Logic using SQLAlchemy Core --- 
         try:
-            async with self.engine.begin() as conn: # Use engine.begin() for transaction
+            async with self._begin_write() as conn: # Write transaction (coordinator or engine.begin())
                 stmt = (
                     update(ScreenerModel)
                     .where(ScreenerModel.ticker == ticker)
@@ -1092,7 +1128,7 @@ class SQLiteRepository:
         """Get a set of unique ticker symbols from the positions table."""
         try:
             logger.info("[DB] Fetching all unique position tickers")
-            async with self.engine.connect() as conn:
+            async with self.read_engine.connect() as conn:
                 result = await conn.execute(select(distinct(PositionModel.ticker)))
                 # Fetch all results and extract the ticker from each row (which is a tuple)
                 tickers_set = {row[0] for row in result.fetchall() if row[0]}
@@ -1105,7 +1141,7 @@ class SQLiteRepository:
     async def ticker_exists_in_positions(self, ticker: str) -> bool:
         """Check if a specific ticker exists in the positions table."""
         try:
-            async with self.engine.connect() as conn:
+            async with self.read_engine.connect() as conn:
                 # Select 1 is slightly more efficient than selecting the ticker itself
                 stmt = select(PositionModel.ticker).where(PositionModel.ticker == ticker).limit(1)
                 result = await conn.execute(stmt)
@@ -1121,7 +1157,7 @@ class SQLiteRepository:
         """Check if a specific ticker exists in the screener table."""
         ticker_upper = ticker.strip().upper()
         try:
-            async with self.engine.connect() as conn:
+            async with self.read_engine.connect() as conn:
                 stmt = select(ScreenerModel.ticker).where(ScreenerModel.ticker == ticker_upper).limit(1)
                 result = await conn.execute(stmt)
                 exists = result.scalar_one_or_none() is not None
@@ -1135,7 +1171,7 @@ class SQLiteRepository:
         """Fetch all portfolio rules from the database."""
         try:
             logger.info("[DB] Fetching all portfolio rules")
-            async with self.engine.connect() as conn:
+            async with self.read_engine.connect() as conn:
                 stmt = select(PortfolioRuleModel).order_by(PortfolioRuleModel.rule_name, PortfolioRuleModel.id)
                 result = await conn.execute(stmt)
                 rules = result.mappings().all()
@@ -1158,7 +1194,7 @@ class SQLiteRepository:
             else:
                 insert_dict['is_active'] = True # Default if not provided
 
-            async with self.engine.begin() as conn:
+            async with self._begin_write() as conn:
                 stmt = insert(PortfolioRuleModel).values(**insert_dict)
                 result = await conn.execute(stmt)
                 inserted_id = result.inserted_primary_key[0]
@@ -1194,7 +1230,7 @@ class SQLiteRepository:
 
             updates_dict['updated_at'] = datetime.now() # Manually update timestamp
 
-            async with self.engine.begin() as conn:
+            async with self._begin_write() as conn:
                 stmt = update(PortfolioRuleModel).where(PortfolioRuleModel.id == rule_id).values(**updates_dict)
                 result = await conn.execute(stmt)
 
@@ -1222,7 +1258,7 @@ class SQLiteRepository:
         """Delete a portfolio rule from the database."""
         try:
             logger.info(f"[DB] Deleting portfolio rule ID: {rule_id}")
-            async with self.engine.begin() as conn:
+            async with self._begin_write() as conn:
                 stmt = delete(PortfolioRuleModel).where(PortfolioRuleModel.id == rule_id)
                 result = await conn.execute(stmt)
                 deleted = result.rowcount > 0
@@ -1254,7 +1290,7 @@ class SQLiteRepository:
         """Deletes all records from the finviz_raw table."""
         logger.info("[DB] Clearing all data from finviz_raw table.")
         try:
-            async with self.engine.begin() as conn:
+            async with self._begin_write() as conn:
                 stmt = delete(FinvizRawDataModel) # Delete all rows from the model's table
                 await conn.execute(stmt)
             logger.info("[DB] finviz_raw table cleared successfully.")
@@ -1268,7 +1304,7 @@ class SQLiteRepository:
         """Fetches all records (ticker, raw_data) from the finviz_raw table."""
         logger.info("[DB] Fetching all data from finviz_raw table.")
         try:
-            async with self.engine.connect() as conn:
+            async with self.read_engine.connect() as conn:
                 stmt = select(FinvizRawDataModel.ticker, FinvizRawDataModel.raw_data)
                 result = await conn.execute(stmt)
                 rows = result.mappings().all()
@@ -1280,11 +1316,12 @@ class SQLiteRepository:
     # --- End Method to Get All Finviz Raw Data ---
 
     # --- NEW Method to Get Analytics Raw Data by Source ---
-    async def get_analytics_raw_data_by_source(self, source_filter: str) -> List[Dict[str, Any]]:
-        """Fetches all records from the analytics_raw table, filtered by a specific source."""
+    async def get_analytics_raw_data_by_source(self, source_filter: str, tickers: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """Fetches all records from the analytics_raw table, filtered by a specific source
+           (and, if tickers is given, to those tickers; queried in chunks of ANALYTICS_RAW_TICKER_CHUNK_SIZE)."""
         logger.info(f"[DB Analytics Raw] Fetching data from analytics_raw table for source: {source_filter}")
         try:
-            async with self.engine.connect() as conn:
+            async with self.read_engine.connect() as conn:
                 stmt = select(
                     AnalyticsRawDataModel.ticker,
                     AnalyticsRawDataModel.source,
@@ -1292,8 +1329,15 @@ class SQLiteRepository:
                     AnalyticsRawDataModel.last_fetched_at
                 ).where(AnalyticsRawDataModel.source == source_filter)
                 
-                result = await conn.execute(stmt)
-                rows = result.mappings().all() # Get results as dict-like rows
+                if tickers is None:
+                    result = await conn.execute(stmt)
+                    rows = result.mappings().all() # Get results as dict-like rows
+                else:
+                    rows = []
+                    for chunk_start in range(0, len(tickers), ANALYTICS_RAW_TICKER_CHUNK_SIZE):
+                        ticker_chunk = tickers[chunk_start:chunk_start + ANALYTICS_RAW_TICKER_CHUNK_SIZE]
+                        result = await conn.execute(stmt.where(AnalyticsRawDataModel.ticker.in_(ticker_chunk)))
+                        rows.extend(result.mappings().all())
                 logger.info(f"[DB Analytics Raw] Fetched {len(rows)} records for source '{source_filter}'.")
                 return [dict(row) for row in rows]
         except Exception as e:
@@ -1301,6 +1345,19 @@ class SQLiteRepository:
             raise # Re-raise the exception after logging
     # --- End Method to Get Analytics Raw Data by Source ---
 
+    async def get_analytics_raw_fetch_times(self, source_filter: str) -> Dict[str, datetime]:
+        """Returns {ticker: last_fetched_at} of the analytics_raw records of a source, without their raw_data."""
+        try:
+            async with self.read_engine.connect() as conn:
+                result = await conn.execute(
+                    select(AnalyticsRawDataModel.ticker, AnalyticsRawDataModel.last_fetched_at)
+                    .where(AnalyticsRawDataModel.source == source_filter)
+                )
+                return {row.ticker: row.last_fetched_at for row in result}
+        except Exception as e:
+            logger.error(f"[DB Analytics Raw] Error fetching last_fetched_at for source '{source_filter}': {e}", exc_info=True)
+            raise
+
     # --- NEW Method for Analytics Raw Data Save/Update ---
     async def save_or_update_analytics_raw_data(self, ticker: str, source: str, raw_data: str) -> None:
         """Saves or updates raw analytics data for a specific ticker and source."""
@@ -1309,7 +1366,7 @@ class SQLiteRepository:
             logger.error("[DB Analytics Raw] Ticker and Source cannot be empty.")
             return
         try:
-            async with self.engine.begin() as conn:
+            async with self._begin_write() as conn:
                 data_to_insert = {
                     'ticker': ticker,
                     'source': source,
@@ -1343,7 +1400,7 @@ class SQLiteRepository:
         """Saves or updates raw Finviz data for a ticker."""
         logger.info(f"[DB] Saving/Updating Finviz raw data for ticker: {ticker}")
         try:
-            async with self.engine.begin() as conn:
+            async with self._begin_write() as conn:
                 # Prepare data dictionary, including the timestamp
                 data_to_insert = {
                     'ticker': ticker,
@@ -1382,7 +1439,7 @@ class SQLiteRepository:
         logger.info("[DB] Fetching latest active order configurations (stop/limit/offset).")
         configs = {}
         try:
-            async with self.engine.connect() as conn:
+            async with self.read_engine.connect() as conn:
                 # Use a CTE with row_number() to get the latest order per ticker that meets the criteria
                 ranked_orders_cte = (
                     select(
@@ -1438,7 +1495,7 @@ class SQLiteRepository:
         target_currencies = []
         try:
             # Create a session for this specific operation
-            async with AsyncSession(self.engine) as session:
+            async with self.read_session_factory() as session:
                 # Call the existing standalone function
                 rates_dict = await get_exchange_rates(session)
                 # Extract the keys (currency codes)
@@ -1469,6 +1526,35 @@ class SQLiteRepository:
             logger.error("[DB Sync Update Rates] Cannot determine valid database file path from URL for synchronous update.")
             return
 
+        coordinator = write_coordinators.get_for_sqlite_path(db_path)
+        if coordinator is not None:
+            # Queue the upserts on the app's writer instead of opening a competing sqlite3 write connection
+            sql = """
+            INSERT INTO exchange_rates (currency, rate)
+            VALUES (?, ?)
+            ON CONFLICT(currency) DO UPDATE SET rate=excluded.rate;
+            """
+            # Only database errors are handled here; a call from the event loop thread (RuntimeError) is a bug
+            # in the caller and must surface rather than leave the rates silently unwritten.
+            try:
+                updates_made = coordinator.execute_threadsafe(
+                    DriverSQLWrite("Exchange rates update", sql, [(currency, rate) for currency, rate in rates.items()])
+                )
+            except SQLAlchemyError as batch_err:
+                # Retry one command (and SAVEPOINT) per currency, so a bad rate only fails itself
+                logger.warning(f"[DB Sync Update Rates] Batch update failed ({batch_err}). Retrying rate by rate.")
+                updates_made = 0
+                for currency, rate in rates.items():
+                    try:
+                        updates_made += coordinator.execute_threadsafe(
+                            DriverSQLWrite(f"Exchange rate update {currency}", sql, (currency, rate))
+                        )
+                    except SQLAlchemyError as single_err:
+                        logger.error(f"[DB Sync Update Rates] Error upserting rate for {currency}: {single_err}")
+                        # Continue with other currencies
+            logger.info(f"[DB Sync Update Rates] Finished updating rates. {updates_made} rows affected.")
+            return
+
         conn = None
         try:
             conn = sqlite3.connect(db_path, timeout=10) # Add timeout
@@ -1507,7 +1593,7 @@ class SQLiteRepository:
         """Fetch a single portfolio rule by its ID."""
         logger.info(f"[DB] Fetching portfolio rule ID: {rule_id}")
         try:
-            async with self.engine.connect() as conn:
+            async with self.read_engine.connect() as conn:
                 stmt = select(PortfolioRuleModel).where(PortfolioRuleModel.id == rule_id)
                 result = await conn.execute(stmt)
                 rule = result.mappings().first()
@@ -1524,7 +1610,7 @@ class SQLiteRepository:
     async def get_job_config_str(self, job_id: str) -> Optional[str]:
         """Get the raw schedule JSON string for a job configuration by ID."""
         try:
-            async with self.engine.connect() as conn:
+            async with self.read_engine.connect() as conn:
                 stmt = select(JobConfigModel.schedule).where(JobConfigModel.job_id == job_id)
                 result = await conn.execute(stmt)
                 schedule_str = result.scalar_one_or_none()
@@ -1565,7 +1651,7 @@ class SQLiteRepository:
                 set_=update_fields
             )
             
-            async with self.engine.begin() as conn:
+            async with self._begin_write() as conn:
                 await conn.execute(upsert_stmt)
             logger.info(f"[DB] Saved/Updated job config for: {job_config_data.get('job_id')}")
         except Exception as e:
@@ -1592,15 +1678,13 @@ class SQLiteRepository:
             job_data.get("job_specific_data"), # e.g., JSON string of extra details
             job_data.get("updated_at", datetime.now().isoformat()) # Should be ISO string
         )
-        db_path = await self.get_db_path()
         try:
-            async with aiosqlite.connect(db_path) as conn:
-                await conn.execute(sql, params)
-                await conn.commit()
+            async with self._begin_write("Persistent job state") as conn:
+                await conn.exec_driver_sql(sql, params)
             logger.info(f"Persistent job state saved for job_id: {job_data.get('job_id')}")
-        except aiosqlite.Error as e:
+        except SQLAlchemyError as e:
             logger.error(f"Error saving persistent job state for job_id {job_data.get('job_id')}: {e}", exc_info=True)
-            raise # Re-raise the aiosqlite.Error
+            raise # Re-raise the database error
         except Exception as e: # Catch any other potential errors during the operation
             logger.error(f"Unexpected error saving persistent job state for job_id {job_data.get('job_id')}: {e}", exc_info=True)
             raise # Re-raise any other exception
@@ -1625,14 +1709,15 @@ class SQLiteRepository:
 
     # <<< START NEW CACHE METHODS >>>
 
-    async def update_cached_analytics_data(self, data_json: str) -> None:
+    async def update_cached_analytics_data(self, data_json: str, source_state_json: Optional[str] = None) -> None:
         """
         Updates or inserts the cached analytics data.
         The cache is designed to hold a single entry with id=1.
+        source_state_json is stored with the data in the same transaction (None: the next refresh is a full one).
         """
         cache_id = 1
         try:
-            async with self.async_session_factory() as session: # MODIFIED
+            async with self._write_session("Analytics cache data") as session:
                 async with session.begin():
                     # Try to get existing cache entry
                     stmt_select = select(CachedAnalyticsDataModel).filter_by(id=cache_id)
@@ -1643,6 +1728,7 @@ class SQLiteRepository:
                     if cache_entry:
                         # Update existing entry
                         cache_entry.data_json = data_json
+                        cache_entry.source_state_json = source_state_json
                         cache_entry.generated_at = current_time # Explicitly set, though onupdate should also work
                         logging.info(f"Updating cached analytics data (id={cache_id}).")
                     else:
@@ -1650,6 +1736,7 @@ class SQLiteRepository:
                         cache_entry = CachedAnalyticsDataModel(
                             id=cache_id,
                             data_json=data_json,
+                            source_state_json=source_state_json,
                             generated_at=current_time
                         )
                         session.add(cache_entry)
@@ -1670,7 +1757,7 @@ class SQLiteRepository:
         """
         cache_id = 1
         try:
-            async with self.async_session_factory() as session: # MODIFIED
+            async with self.read_session_factory() as session: # MODIFIED
                 async with session.begin(): # begin_nested might be an option if part of larger transaction
                     stmt = select(CachedAnalyticsDataModel.data_json, CachedAnalyticsDataModel.generated_at).filter_by(id=cache_id)
                     result = await session.execute(stmt)
@@ -1685,6 +1772,28 @@ class SQLiteRepository:
             logging.error(f"Error getting cached analytics data (id={cache_id}): {e}")
             return None # Or re-raise based on error handling strategy
 
+    async def get_cached_analytics_data_with_state(self) -> Optional[Tuple[str, datetime, Optional[str]]]:
+        """
+        Retrieves the cached analytics data (id=1) with its source state.
+        Returns a tuple of (data_json, generated_at, source_state_json) or None if not found.
+        """
+        cache_id = 1
+        try:
+            async with self.read_session_factory() as session:
+                stmt = select(
+                    CachedAnalyticsDataModel.data_json,
+                    CachedAnalyticsDataModel.generated_at,
+                    CachedAnalyticsDataModel.source_state_json
+                ).filter_by(id=cache_id)
+                row = (await session.execute(stmt)).one_or_none()
+                if row is None:
+                    logging.info(f"No cached analytics data found for id={cache_id}.")
+                    return None
+                return row.data_json, row.generated_at, row.source_state_json
+        except Exception as e:
+            logging.error(f"Error getting cached analytics data with state (id={cache_id}): {e}")
+            return None
+
     async def update_cached_analytics_metadata(self, metadata_json: str) -> None:
         """
         Updates or inserts the cached analytics metadata.
@@ -1692,7 +1801,7 @@ class SQLiteRepository:
         """
         cache_id = 1
         try:
-            async with self.async_session_factory() as session: # MODIFIED
+            async with self._write_session("Analytics cache metadata") as session:
                 async with session.begin():
                     stmt_select = select(CachedAnalyticsMetadataModel).filter_by(id=cache_id)
                     result = await session.execute(stmt_select)
@@ -1725,7 +1834,7 @@ class SQLiteRepository:
         """
         cache_id = 1
         try:
-            async with self.async_session_factory() as session: # MODIFIED
+            async with self.read_session_factory() as session: # MODIFIED
                 async with session.begin():
                     stmt = select(CachedAnalyticsMetadataModel.metadata_json, CachedAnalyticsMetadataModel.generated_at).filter_by(id=cache_id)
                     result = await session.execute(stmt)
@@ -1769,7 +1878,7 @@ class SQLiteRepository:
         """Gets the total number of rows in the specified table."""
         logger.debug(f"[DB Status] Getting row count for table: {table_name}")
         try:
-            async with self.async_session_factory() as session:
+            async with self.read_session_factory() as session:
                 # Use text() for raw SQL count query for flexibility with table names
                 stmt = text(f"SELECT COUNT(*) FROM {table_name}")
                 result = await session.execute(stmt)
@@ -1781,14 +1890,173 @@ class SQLiteRepository:
             return None
     # --- END DATABASE STATUS METHODS ---
 
+    # --- DATABASE OPTIMIZE METHODS (see db_optimizer) ---
+    async def get_db_optimize_stats(self, detailed: bool = False) -> Dict[str, Any]:
+        """Size and fragmentation telemetry of the database file (db_optimizer.collect_db_stats). detailed scans
+           every table and dbstat; only optimize runs ask for it."""
+        async with self.read_engine.connect() as conn:
+            return await conn.run_sync(db_optimizer.collect_db_stats, detailed)
+
+    def is_db_optimize_running(self) -> bool:
+        return self.database_url in _db_optimize_in_progress
+
+    async def optimize_database(
+        self,
+        trigger: str = "manual",
+        time_budget_seconds: float = db_optimizer.OPTIMIZE_TIME_BUDGET_SECONDS,
+        vacuum_pages_per_step: int = db_optimizer.VACUUM_PAGES_PER_STEP,
+        analysis_limit: int = db_optimizer.ANALYZE_ANALYSIS_LIMIT
+    ) -> Dict[str, Any]:
+        """
+        Runs the online optimization steps (WAL checkpoint, ANALYZE of stale tables, incremental vacuum,
+        PRAGMA optimize) as short write blocks within a time budget, and stores the report in db_optimize_runs.
+        Work left when the budget runs out is picked up by the next run.
+
+        Args:
+            trigger: Who started the run ('scheduler', 'api', 'cli'), recorded with the report.
+            time_budget_seconds: No new step is started after this many seconds.
+            vacuum_pages_per_step: Free pages released per incremental_vacuum write block.
+            analysis_limit: PRAGMA analysis_limit for ANALYZE and PRAGMA optimize.
+
+        Returns:
+            The report: 'status' ('completed', 'budget_exhausted' or 'failed'), 'before'/'after'
+            (db_optimizer.collect_db_stats; 'before' detailed), 'steps', 'pages_reclaimed', 'query_plans' and 'notes'.
+            Raises RuntimeError if a run for this database is already in progress.
+        """
+        if self.is_db_optimize_running():
+            raise RuntimeError(f"An optimize run for {self.database_url} is already in progress.")
+        _db_optimize_in_progress.add(self.database_url)
+        started_at = datetime.now()
+        start = time.perf_counter()
+        deadline = start + time_budget_seconds
+        report: Dict[str, Any] = {
+            'trigger': trigger,
+            'started_at': started_at.isoformat(),
+            'time_budget_s': time_budget_seconds,
+            'steps': [],
+            'notes': []
+        }
+        status = 'completed'
+        logger.info(f"[DB Optimize] Starting optimize run ({trigger}), time budget {time_budget_seconds:.0f} s.")
+        try:
+            db_path = await self.get_db_path()
+            report['before'] = await self.get_db_optimize_stats(detailed=True)
+
+            # 1. Checkpoint first, so the WAL does not keep growing with the steps below
+            report['steps'].append(await asyncio.to_thread(db_optimizer.wal_checkpoint, db_path, "PASSIVE"))
+
+            # 2. Statistics of new and changed tables, one table per write block
+            stale_tables = report['before']['stale_stat_tables']
+            for position, table_stats in enumerate(stale_tables):
+                if time.perf_counter() >= deadline:
+                    status = 'budget_exhausted'
+                    report['notes'].append(f"Time budget used up; not analyzed yet: {[entry['table'] for entry in stale_tables[position:]]}")
+                    break
+                step_start = time.perf_counter()
+                async with self._begin_write(f"Optimize: ANALYZE {table_stats['table']}") as conn:
+                    await conn.run_sync(db_optimizer.analyze_table, table_stats['table'], analysis_limit)
+                report['steps'].append({'step': 'analyze', **table_stats, 'duration_ms': round((time.perf_counter() - step_start) * 1000, 1)})
+                await asyncio.sleep(db_optimizer.OPTIMIZE_STEP_PAUSE_SECONDS)
+
+            # 3. Release free pages in small blocks
+            if report['before']['auto_vacuum'] != 'incremental':
+                report['notes'].append(
+                    f"auto_vacuum is {report['before']['auto_vacuum']}: free pages are reused but the file does not shrink. "
+                    "Run 'python -m src.V3_app.db_maintenance enable-incremental-vacuum' once with the app stopped."
+                )
+            elif report['before']['freelist_count'] > 0:
+                vacuum = {'step': 'incremental_vacuum', 'blocks': 0, 'pages_released': 0, 'max_block_ms': 0.0, 'duration_ms': 0.0}
+                while status != 'budget_exhausted':
+                    if time.perf_counter() >= deadline:
+                        status = 'budget_exhausted'
+                        report['notes'].append("Time budget used up before all free pages were released.")
+                        break
+                    block_start = time.perf_counter()
+                    async with self._begin_write("Optimize: incremental vacuum") as conn:
+                        released = await conn.run_sync(db_optimizer.incremental_vacuum_step, vacuum_pages_per_step)
+                    block_ms = (time.perf_counter() - block_start) * 1000
+                    vacuum['blocks'] += 1
+                    vacuum['pages_released'] += released
+                    vacuum['max_block_ms'] = round(max(vacuum['max_block_ms'], block_ms), 1)
+                    vacuum['duration_ms'] = round(vacuum['duration_ms'] + block_ms, 1)
+                    if released < vacuum_pages_per_step:
+                        break  # Free list drained
+                    await asyncio.sleep(db_optimizer.OPTIMIZE_STEP_PAUSE_SECONDS)
+                report['steps'].append(vacuum)
+
+            # 4. PRAGMA optimize, then checkpoint the steps above; TRUNCATE shrinks the WAL file once it is fully copied back
+            step_start = time.perf_counter()
+            async with self._begin_write("Optimize: PRAGMA optimize") as conn:
+                await conn.run_sync(db_optimizer.optimize_pragma, analysis_limit)
+            report['steps'].append({'step': 'pragma_optimize', 'duration_ms': round((time.perf_counter() - step_start) * 1000, 1)})
+            checkpoint = await asyncio.to_thread(db_optimizer.wal_checkpoint, db_path, "PASSIVE")
+            if not checkpoint['busy'] and checkpoint['wal_frames'] > 0 and checkpoint['checkpointed_frames'] == checkpoint['wal_frames']:
+                checkpoint = await asyncio.to_thread(db_optimizer.wal_checkpoint, db_path, "TRUNCATE")
+            report['steps'].append(checkpoint)
+
+            report['after'] = await self.get_db_optimize_stats()
+            report['pages_reclaimed'] = report['before']['page_count'] - report['after']['page_count']
+        except Exception as e:
+            status = 'failed'
+            report['error'] = str(e)
+            logger.error(f"[DB Optimize] Optimize run failed: {e}", exc_info=True)
+        finally:
+            _db_optimize_in_progress.discard(self.database_url)
+
+        try:
+            async with self.read_engine.connect() as conn:
+                report['query_plans'] = await conn.run_sync(db_optimizer.query_plan_summary)
+        except Exception as e:
+            logger.warning(f"[DB Optimize] Could not check the query plans: {e}")
+            report['query_plans'] = {'ok': None, 'error': str(e)}
+
+        finished_at = datetime.now()
+        report.update(status=status, finished_at=finished_at.isoformat(), duration_s=round(time.perf_counter() - start, 2))
+        try:
+            await self.save_db_optimize_run(report, started_at, finished_at)
+        except Exception as e:
+            logger.error(f"[DB Optimize] Failed to store the optimize report: {e}", exc_info=True)
+        if 'after' in report:
+            logger.info(f"[DB Optimize] Run {status} in {report['duration_s']} s: pages {report['before']['page_count']} -> "
+                        f"{report['after']['page_count']}, free pages {report['before']['freelist_count']} -> {report['after']['freelist_count']}, "
+                        f"WAL {report['before']['wal_bytes']} -> {report['after']['wal_bytes']} bytes.")
+        return report
+
+    async def save_db_optimize_run(self, report: Dict[str, Any], started_at: datetime, finished_at: Optional[datetime]) -> None:
+        """Stores an optimize report and drops all but the newest OPTIMIZE_RUNS_KEPT."""
+        async with self._begin_write("Save optimize run") as conn:
+            await conn.execute(insert(DbOptimizeRunModel).values(
+                started_at=started_at,
+                finished_at=finished_at,
+                trigger=report.get('trigger'),
+                status=report.get('status', 'failed'),
+                report_json=fastjson.dumps(report)
+            ))
+            newest_ids = select(DbOptimizeRunModel.id).order_by(DbOptimizeRunModel.id.desc()).limit(db_optimizer.OPTIMIZE_RUNS_KEPT)
+            await conn.execute(delete(DbOptimizeRunModel).where(DbOptimizeRunModel.id.not_in(newest_ids.scalar_subquery())))
+
+    async def get_db_optimize_runs(self, limit: int = 10) -> List[Dict[str, Any]]:
+        """The newest optimize reports, newest first (each with its 'id')."""
+        try:
+            async with self.read_session_factory() as session:
+                result = await session.execute(
+                    select(DbOptimizeRunModel.id, DbOptimizeRunModel.report_json)
+                    .order_by(DbOptimizeRunModel.id.desc()).limit(limit)
+                )
+                return [{'id': run_id, **fastjson.loads(report_json)} for run_id, report_json in result.all()]
+        except Exception as e:
+            logger.error(f"[DB Optimize] Error reading optimize reports: {e}", exc_info=True)
+            return []
+    # --- END DATABASE OPTIMIZE METHODS ---
+
     # --- START NOTIFICATION SETTINGS METHODS ---
     async def save_notification_settings(self, service_name: str, settings: Dict[str, Any], is_active: bool) -> None:
         """Saves or updates notification settings for a service."""
         logger.info(f"[DB Notifications] Saving settings for service: {service_name}")
-        settings_json = json.dumps(settings)
+        settings_json = fastjson.dumps(settings)
         now = datetime.now()
         try:
-            async with self.async_session_factory() as session:
+            async with self._write_session("Notification settings") as session:
                 async with session.begin():
                     stmt_select = select(NotificationSettingModel).filter_by(service_name=service_name)
                     result = await session.execute(stmt_select)
@@ -1817,12 +2085,12 @@ class SQLiteRepository:
         """Retrieves notification settings for a service. Returns a dict with 'settings' and 'is_active'."""
         logger.debug(f"[DB Notifications] Getting settings for service: {service_name}")
         try:
-            async with self.async_session_factory() as session:
+            async with self.read_session_factory() as session:
                 stmt = select(NotificationSettingModel.settings_json, NotificationSettingModel.is_active).filter_by(service_name=service_name)
                 result = await session.execute(stmt)
                 row = result.one_or_none()
                 if row:
-                    settings_dict = json.loads(row.settings_json)
+                    settings_dict = fastjson.loads(row.settings_json)
                     logger.debug(f"[DB Notifications] Found settings for {service_name}.")
                     return {"settings": settings_dict, "is_active": row.is_active}
                 else:
@@ -1836,7 +2104,7 @@ class SQLiteRepository:
         """Updates the is_active status for a notification service. Returns True on success."""
         logger.info(f"[DB Notifications] Updating active status for {service_name} to {is_active}")
         try:
-            async with self.async_session_factory() as session:
+            async with self._write_session("Notification status") as session:
                 async with session.begin():
                     stmt = update(NotificationSettingModel).\
                         where(NotificationSettingModel.service_name == service_name).\
@@ -2041,7 +2309,7 @@ async def add_or_update_exchange_rate_conid(session: AsyncSession, currency: str
         ticker_upper = ticker.strip().upper()
         logger.debug(f"[DB] Fetching screener data for ticker: {ticker_upper}")
         try:
-            async with self.engine.connect() as conn:
+            async with self.read_engine.connect() as conn:
                 stmt = select(ScreenerModel).where(ScreenerModel.ticker == ticker_upper).limit(1)
                 result = await conn.execute(stmt)
                 row = result.mappings().first()
@@ -2068,7 +2336,7 @@ async def add_or_update_exchange_rate_conid(session: AsyncSession, currency: str
 
         logger.debug(f"[DB Multi Update] Updating screener for {ticker_upper} with: {updates}")
         try:
-            async with self.engine.begin() as conn:
+            async with self._begin_write() as conn:
                 stmt = (
                     update(ScreenerModel)
                     .where(ScreenerModel.ticker == ticker_upper)
@@ -2114,7 +2382,7 @@ async def add_or_update_exchange_rate_conid(session: AsyncSession, currency: str
         logger.info(f"[DB Add/Update Screener] Processing: Ticker={ticker_upper}, Status={status}, ConID={conid}")
 
         # Use the repository's engine
-        async with self.engine.begin() as conn: # Use conn instead of session
+        async with self._begin_write() as conn: # Use conn instead of session
             try:
                 # Define table and columns based on ScreenerModel
                 # Use ticker as the primary key column
@@ -2213,11 +2481,11 @@ async def add_or_update_exchange_rate_conid(session: AsyncSession, currency: str
                     return {"status": "inserted", "message": f"Inserted new entry for {ticker_upper}."}
 
             except SQLAlchemyError as e:
-                # Rollback is handled by engine.begin() context manager on exception
+                # Rollback is handled by the _begin_write() context manager on exception
                 logger.error(f"[DB Add/Update Screener] Database error for {ticker_upper}: {e}", exc_info=True)
                 return {"status": "error", "message": f"Database error: {e}"}
             except Exception as e:
-                # Rollback is handled by engine.begin() context manager on exception
+                # Rollback is handled by the _begin_write() context manager on exception
                 logger.error(f"[DB Add/Update Screener] Unexpected error for {ticker_upper}: {e}", exc_info=True)
                 return {"status": "error", "message": f"Unexpected error: {e}"}
     # --- End Add/Update Screener --- 
@@ -2320,9 +2588,6 @@ def update_screener_multi_fields_sync(db_path: str, ticker: str, updates: Dict[s
     conn = None
     success = False
     try:
-        conn = sqlite3.connect(db_path, timeout=10)
-        cursor = conn.cursor()
-
         # Prepare the SET part of the SQL query dynamically
         # Corrected f-string formatting for literal double quotes around the key
         set_clause = ", ".join([f'\"{k}\" = ?' for k in updates.keys()]) 
@@ -2337,10 +2602,18 @@ def update_screener_multi_fields_sync(db_path: str, ticker: str, updates: Dict[s
         sql = f"UPDATE screener SET {set_clause} WHERE ticker = ?"
         
         logger.debug(f"[DB Sync Multi Update] Executing SQL: {sql} with values: {values}")
-        cursor.execute(sql, values)
-        conn.commit()
+        coordinator = write_coordinators.get_for_sqlite_path(db_path)
+        if coordinator is not None:
+            # Queue the update on the app's writer instead of opening a competing sqlite3 write connection
+            rowcount = coordinator.execute_threadsafe(DriverSQLWrite(f"Screener multi-field update {ticker_upper}", sql, tuple(values)))
+        else:
+            conn = sqlite3.connect(db_path, timeout=10)
+            cursor = conn.cursor()
+            cursor.execute(sql, values)
+            conn.commit()
+            rowcount = cursor.rowcount
 
-        if cursor.rowcount > 0:
+        if rowcount > 0:
             logger.debug(f"[DB Sync Multi Update] Successfully updated {len(updates)-1} fields for {ticker_upper}.")
             success = True
         else:
@@ -7,11 +7,13 @@ from typing import List
 
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect
 
+from . import fastjson
+
 # Get a logger instance
 logger = logging.getLogger(__name__)
 
 # --- Module-level variable to store the latest status --- 
-latest_status_payload = json.dumps({"type": "ibkr_status", "status": "INITIALIZING"})
+latest_status_payload = fastjson.dumps({"type": "ibkr_status", "status": "INITIALIZING"})
 
 # --- WebSocket Connection Manager (Dedicated for IBKR Status) --- 
 class ConnectionManager:
@@ -107,7 +109,7 @@ async def monitor_ibkr_connection(manager: ConnectionManager):
                     logger.error(f"IBKR Monitor Task: Data at time of error: {status_details}")
 
             # Store the latest status payload globally
-            latest_status_payload = json.dumps({"type": "ibkr_status", "status": status_code})
+            latest_status_payload = fastjson.dumps({"type": "ibkr_status", "status": status_code})
             
             # Broadcast the latest status
             try:
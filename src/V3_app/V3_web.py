@@ -59,6 +59,12 @@ from .V3_finviz_fetch import fetch_and_store_analytics_finviz
 from .V3_database import SQLiteRepository, get_exchange_rates, update_exchange_rate, add_or_update_exchange_rate_conid, update_screener_multi_fields_sync, get_screener_tickers_and_conids_sync, get_exchange_rates_and_conids_sync # Import new DB function AND SQLiteRepository
 from .services.notification_service import dispatch_notification
 from .yahoo_repository import YahooDataRepository
+from .dependencies import get_yahoo_repository as get_shared_yahoo_repository, build_yahoo_service_graph
+from .db_engine_registry import engine_registry
+from .db_write_coordinator import DriverSQLWrite, write_coordinators
+from .analytics_worker_pool import analytics_worker_pool
+from . import fastjson
+from .fastjson import FastJSONResponse
 # --- End Local Application Imports ---
 
 # --- Import V3_ibkr_monitor (Keep existing imports) ---
@@ -161,10 +167,10 @@ async def get_job_detailed_run_log(
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Failed to get detailed job log: {str(e)}")
 
 def get_yahoo_repository(request: Request) -> YahooDataRepository:
-    """Dependency injector for YahooDataRepository."""
+    """Dependency injector for the app-scoped YahooDataRepository."""
     if not hasattr(request.app.state, 'repository') or not hasattr(request.app.state.repository, 'database_url'):
         raise HTTPException(status_code=500, detail="Database URL not configured in repository")
-    return YahooDataRepository(database_url=request.app.state.repository.database_url)
+    return get_shared_yahoo_repository(request)
 
 @finviz_job_api_router.post("/finviz/trigger", response_model=JobDetailsResponse, summary="Trigger Finviz Mass Fetch Job")
 async def trigger_finviz_job(
@@ -253,7 +259,7 @@ async def finviz_job_sse(
             if initial_status:
                 logger.debug(f"[API FINVIZ SSE] INITIAL_STATUS_BLOCK: Preparing to yield initial status: {initial_status.get('status')}.") # ADDED LOG
                 # REVERTED: Send the full initial_status object
-                yield f"data: {json.dumps(initial_status)}\n\n"
+                yield f"data: {fastjson.dumps(initial_status)}\n\n"
                 initial_status_sent = True
                 logger.debug(f"[API FINVIZ SSE] INITIAL_STATUS_BLOCK: Successfully yielded full initial status: {initial_status.get('status')}.") # MODIFIED LOG
             else:
@@ -270,7 +276,7 @@ async def finviz_job_sse(
             logger.error(f"[API FINVIZ SSE] INITIAL_STATUS_BLOCK: Exception during initial status fetch/send: {e_initial}", exc_info=True)
             error_event = {"job_id": FINVIZ_MASS_FETCH_JOB_ID, "status": "error", "message": f"Error fetching initial state: {str(e_initial)}"}
             try:
-                yield f"data: {json.dumps(error_event)}\n\n"
+                yield f"data: {fastjson.dumps(error_event)}\n\n"
                 logger.debug(f"[API FINVIZ SSE] INITIAL_STATUS_BLOCK: Yielded error event due to exception.")
             except Exception as e_yield_err:
                 logger.error(f"[API FINVIZ SSE] INITIAL_STATUS_BLOCK: Exception while yielding error event: {e_yield_err}", exc_info=True)
@@ -302,7 +308,7 @@ async def finviz_job_sse(
                     if status_update.get("job_id") == FINVIZ_MASS_FETCH_JOB_ID and status_update.get("job_type") == "finviz_mass_fetch":
                         logger.debug(f"[API FINVIZ SSE] YIELDING data for job {FINVIZ_MASS_FETCH_JOB_ID}: Status {status_update.get('status')}")
                         # REVERTED: Send the full status_update object
-                        yield f"data: {json.dumps(status_update)}\n\n"
+                        yield f"data: {fastjson.dumps(status_update)}\n\n"
                         log_msg = status_update.get('progress_message', status_update.get('message', 'No message'))
                         if len(log_msg) > 70 : log_msg = log_msg[:67] + "..."
                         logger.debug(f"[API FINVIZ SSE] Sent update: {status_update.get('status')}, Msg: {log_msg}")
@@ -322,7 +328,7 @@ async def finviz_job_sse(
                     logger.error(f"[API FINVIZ SSE] Error in Finviz SSE event generator main loop: {e}", exc_info=True)
                     error_event = {"job_id": FINVIZ_MASS_FETCH_JOB_ID, "job_type": "finviz_mass_fetch", "status": "error", "message": "SSE stream error occurred on server"}
                     try:
-                        yield f"data: {json.dumps(error_event)}\n\n"
+                        yield f"data: {fastjson.dumps(error_event)}\n\n"
                     except Exception as send_err:
                         logger.error(f"[API FINVIZ SSE] Failed to send error event to client (Finviz): {send_err}")
                     await asyncio.sleep(2)
@@ -462,17 +468,23 @@ def _update_screener_single_field_sync(db_path: str, ticker: str, field_name: st
     now = datetime.now() # Get current timestamp
     try:
         # logger.debug(f"[Sync Update Screener Single] Connecting to DB sync to update {field_name} for {ticker}: {db_path}") # Keep commented
-        with sqlite3.connect(db_path) as conn:
-            cursor = conn.cursor()
-            sql = f"UPDATE screener SET {field_name} = ?, updated_at = ? WHERE ticker = ?"
-            cursor.execute(sql, (value, now, ticker))
-            conn.commit()
-            if cursor.rowcount > 0:
-                # logger.debug(f"[Sync Update Screener Single] Successfully updated {field_name} to '{value}' and timestamp for ticker {ticker}") # Keep commented
-                success = True
-            else:
-                logger.warning(f"[Sync Update Screener Single] Ticker {ticker} not found for updating {field_name}.")
-                success = False
+        sql = f"UPDATE screener SET {field_name} = ?, updated_at = ? WHERE ticker = ?"
+        coordinator = write_coordinators.get_for_sqlite_path(db_path)
+        if coordinator is not None:
+            # Queue the update on the app's writer instead of opening a competing sqlite3 write connection
+            rowcount = coordinator.execute_threadsafe(DriverSQLWrite(f"Screener {field_name} update {ticker}", sql, (value, now, ticker)))
+        else:
+            with sqlite3.connect(db_path) as conn:
+                cursor = conn.cursor()
+                cursor.execute(sql, (value, now, ticker))
+                conn.commit()
+                rowcount = cursor.rowcount
+        if rowcount > 0:
+            # logger.debug(f"[Sync Update Screener Single] Successfully updated {field_name} to '{value}' and timestamp for ticker {ticker}") # Keep commented
+            success = True
+        else:
+            logger.warning(f"[Sync Update Screener Single] Ticker {ticker} not found for updating {field_name}.")
+            success = False
     except sqlite3.Error as e:
         logger.error(f"[Sync Update Screener Single] DB error updating {field_name} for {ticker}: {e}")
         success = False
@@ -945,22 +957,17 @@ class AddInstrumentRequest(BaseModel):
 def create_app():
     try: # <-- Add try block here
         # --- Correct Indentation Starts Here ---
-        app = FastAPI(title="Financial App V3") # Revert: Keep title
+        app = FastAPI(title="Financial App V3", default_response_class=FastJSONResponse) # Revert: Keep title
         from .V3_backend_api import router as backend_router
         @app.get("/api/analytics/fields", summary="Get unified analytics field list", tags=["Analytics"])
         async def get_analytics_fields_endpoint(
-            repository: SQLiteRepository = Depends(get_repository)
+            yahoo_repo: YahooDataRepository = Depends(get_yahoo_repository)
         ):
             """
             Returns a unified list of all fields available for analytics configuration (Finviz + Yahoo).
             """
             from .V3_analytics import get_finviz_fields_for_analytics
             finviz_fields = get_finviz_fields_for_analytics(global_processed_analytics_data)
-            yahoo_db_url = repository.database_url if hasattr(repository, 'database_url') else None
-            if not yahoo_db_url:
-                return {"error": "Yahoo DB URL not found"}
-            from .yahoo_repository import YahooDataRepository
-            yahoo_repo = YahooDataRepository(yahoo_db_url)
             yahoo_fields = await yahoo_repo.get_all_yahoo_fields_for_analytics()
             return finviz_fields + yahoo_fields
         app.include_router(backend_router)
@@ -1058,6 +1065,10 @@ def create_app():
             # --- End Logging ---
             # Store repository in app state AFTER successful initialization
             app.state.repository = repository
+            # App-scoped Yahoo repository; shares the registry engine with the main repository
+            app.state.yahoo_repository = YahooDataRepository(database_url=DATABASE_URL)
+            # Long-lived Yahoo query service graph (sub-services are created lazily)
+            build_yahoo_service_graph(app.state, app.state.yahoo_repository)
             # Initialize IBKRService AFTER repository is successfully created and stored
             # Pass the repository instance to the service
             # --- FIX: Remove base_url argument --- 
@@ -1325,7 +1336,7 @@ def create_app():
                     # --- Broadcast Update --- 
                     try:
                         logger.info(f"[{job_id}] Broadcasting data update notification.")
-                        await app.state.manager.broadcast(json.dumps({"event": "data_updated"}))
+                        await app.state.manager.broadcast(fastjson.dumps({"event": "data_updated"}))
                     except Exception as broadcast_err:
                         logger.error(f"[{job_id}] Error during broadcast: {broadcast_err}")
                     # --- End Broadcast --- 
@@ -1410,7 +1421,7 @@ def create_app():
                 # --- Broadcast Update --- 
                 try:
                     logger.info(f"[{job_id}] Broadcasting data update notification.")
-                    await app.state.manager.broadcast(json.dumps({"event": "data_updated"}))
+                    await app.state.manager.broadcast(fastjson.dumps({"event": "data_updated"}))
                 except Exception as broadcast_err:
                     logger.error(f"[{job_id}] Error during broadcast: {broadcast_err}")
                 # --- End Broadcast --- 
@@ -1449,11 +1460,24 @@ def create_app():
             logger.info("Application startup: Initializing scheduler and jobs...")
             try:
                 repository: SQLiteRepository = app.state.repository
+
+                # --- Shared engine registry (disposed in shutdown_event) ---
+                app.state.engine_registry = engine_registry
+                logger.info(f"Engine registry ready: {engine_registry.get_stats()}")
                 
                 # --- Add table creation step --- 
                 logger.info("Ensuring all database tables exist...")
                 await repository.create_tables() # Call method to create tables if they don't exist
                 logger.info("Database tables checked/created.")
+
+                # --- Single-writer group-commit coordinator (stopped in shutdown_event) ---
+                app.state.write_coordinator = await write_coordinators.start(repository.database_url)
+                logger.info("Database write coordinator started.")
+
+                # --- Warm worker processes for the analytics cache refreshes (stopped in shutdown_event) ---
+                app.state.analytics_worker_pool = await analytics_worker_pool.start()
+                analytics_worker_pool.add_listener(lambda event: app.state.manager.broadcast(fastjson.dumps(event, default=str)))
+                logger.info("Analytics worker pool started; job events are broadcast to WebSocket clients.")
                 # --- End table creation --- 
                 
                 # --- Determine DB Path for Sync Job --- 
@@ -1468,14 +1492,15 @@ def create_app():
                 loop = asyncio.get_running_loop()
                 manager: ConnectionManager = app.state.manager
                  
-                job_ids_to_configure = ["ibkr_fetch", "finviz_data_fetch", "yahoo_data_fetch", "ibkr_sync_snapshot", "analytics_data_cache_refresh", "analytics_metadata_cache_refresh"]
+                job_ids_to_configure = ["ibkr_fetch", "finviz_data_fetch", "yahoo_data_fetch", "ibkr_sync_snapshot", "analytics_data_cache_refresh", "analytics_metadata_cache_refresh", "db_optimize"]
                 default_cron_schedules = {
                     "ibkr_fetch": "0 * * * *",  # Default: every hour
                     "finviz_data_fetch": "0 */2 * * *", # Default: every 2 hours
                     "yahoo_data_fetch": "*/15 * * * *", # Default: every 15 minutes (example, adjust as needed)
                     "ibkr_sync_snapshot": "*/10 * * * *", # Default: every 10 minutes
                     "analytics_data_cache_refresh": "0 */6 * * *", # Default: every 6 hours
-                    "analytics_metadata_cache_refresh": "0 */6 * * *" # Default: every 6 hours
+                    "analytics_metadata_cache_refresh": "0 */6 * * *", # Default: every 6 hours
+                    "db_optimize": "30 3 * * *" # Default: daily at 03:30 (runs in small steps, see db_optimizer)
                 }
                 job_functions = {
                     "ibkr_fetch": scheduled_fetch_job,
@@ -1483,12 +1508,14 @@ def create_app():
                     "yahoo_data_fetch": scheduled_yahoo_job,
                     "ibkr_sync_snapshot": run_sync_ibkr_snapshot_job,
                     "analytics_data_cache_refresh": scheduled_analytics_data_cache_refresh_job,
-                    "analytics_metadata_cache_refresh": scheduled_analytics_metadata_cache_refresh_job
+                    "analytics_metadata_cache_refresh": scheduled_analytics_metadata_cache_refresh_job,
+                    "db_optimize": scheduled_db_optimize_job
                 }
                 job_args = {
                     "ibkr_sync_snapshot": lambda: [app.state.repository, loop, manager, os.environ.get("IBKR_BASE_URL", "https://localhost:5000/v1/api/")],
                     "analytics_data_cache_refresh": lambda: [app, app.state.repository, os.environ.get("APP_BASE_URL", "http://localhost:8000")],
-                    "analytics_metadata_cache_refresh": lambda: [app, app.state.repository, os.environ.get("APP_BASE_URL", "http://localhost:8000")]
+                    "analytics_metadata_cache_refresh": lambda: [app, app.state.repository, os.environ.get("APP_BASE_URL", "http://localhost:8000")],
+                    "db_optimize": lambda: [app.state.repository]
                 }
 
                 for job_id in job_ids_to_configure:
@@ -1499,7 +1526,7 @@ def create_app():
 
                     if job_config_str:
                         try:
-                            job_config = json.loads(job_config_str)
+                            job_config = fastjson.loads(job_config_str)
                             if isinstance(job_config, dict) and "cron" in job_config:
                                 cron_expression = job_config["cron"]
                                 # Also fetch is_active status which should be stored alongside or fetched separately
@@ -1513,7 +1540,7 @@ def create_app():
                     if not cron_expression: # If config missing, malformed, or cron key not found
                         logger.info(f"No valid cron config found for '{job_id}'. Ensuring default config exists.")
                         cron_expression = default_cron_schedules.get(job_id, "0 0 * * *") # Fallback default
-                        default_config_json = json.dumps({"cron": cron_expression})
+                        default_config_json = fastjson.dumps({"cron": cron_expression})
                         # is_active_from_db is already True by default here.
                         # If creating for the first time, save it with active status.
                         try:
@@ -1599,7 +1626,7 @@ def create_app():
                 try:
                     schedule_json = job_config['schedule']
                     if isinstance(schedule_json, str):
-                        schedule_json = json.loads(schedule_json)
+                        schedule_json = fastjson.loads(schedule_json)
                     cron_expr = schedule_json.get('cron')
                     if not cron_expr:
                         logger.warning(f"No cron expression found in schedule for {job_id}.")
@@ -1665,6 +1692,12 @@ def create_app():
             if scheduler.running:
                 scheduler.shutdown(wait=False) # MODIFIED: Added wait=False
             logger.info("Scheduler stopped.")
+            logger.info("Application shutdown: Stopping analytics worker pool.")
+            await analytics_worker_pool.stop()
+            logger.info("Application shutdown: Committing queued database writes.")
+            await write_coordinators.stop_all()
+            logger.info("Application shutdown: Disposing database engines.")
+            await engine_registry.dispose()
 
         @app.get("/")
         async def read_root(request: Request):
@@ -2008,7 +2041,7 @@ def create_app():
                 if job_config_data and 'schedule' in job_config_data and job_config_data['schedule']:
                     try:
                         schedule_details_str = job_config_data['schedule']
-                        schedule_details = json.loads(schedule_details_str)
+                        schedule_details = fastjson.loads(schedule_details_str)
                         if isinstance(schedule_details, dict) and "cron" in schedule_details:
                             cron_expression = schedule_details["cron"]
                         else:
@@ -2041,7 +2074,7 @@ def create_app():
                 # Fetch other necessary data
                 exchange_rates = await get_exchange_rates(request.state.db_session) 
                 portfolio_rules = await repository.get_all_portfolio_rules()
-                portfolio_rules_json = json.dumps(portfolio_rules, default=str)
+                portfolio_rules_json = fastjson.dumps(portfolio_rules, default=str)
 
                 # Context strictly for CRON-based UI
                 context = {
@@ -2170,7 +2203,7 @@ def create_app():
                 logger.error(f"Invalid cron expression '{cron_expression}' for job '{job_id}': {cron_val_err}")
                 raise HTTPException(status_code=400, detail=f"Invalid cron syntax: {cron_val_err}. Example: '0 */2 * * *' for every 2 hours.")
             
-            schedule_json_str = json.dumps({"cron": cron_expression})
+            schedule_json_str = fastjson.dumps({"cron": cron_expression})
 
             try:
                 job_config_data = {
@@ -2500,10 +2533,10 @@ def create_app():
                     "tickers": enriched_tickers, # Pass enriched data
                     "status_counts": status_counts,
                     "available_accounts": available_accounts,
-                    "all_accounts_data": json.dumps(accounts_data, default=json_datetime_serializer),
-                    "exchange_rates_data": json.dumps(exchange_rates_data, default=json_datetime_serializer),
+                    "all_accounts_data": fastjson.dumps(accounts_data, default=json_datetime_serializer),
+                    "exchange_rates_data": fastjson.dumps(exchange_rates_data, default=json_datetime_serializer),
                     # --- ADD formatted live positions data --- 
-                    "live_positions_data": json.dumps(formatted_positions_for_tracker, default=json_datetime_serializer) 
+                    "live_positions_data": fastjson.dumps(formatted_positions_for_tracker, default=json_datetime_serializer) 
                 }
                 
                 logger.info(f"[Tracker] Rendering tracker.html with {len(enriched_tickers)} tickers.")
@@ -3143,7 +3176,7 @@ def create_app():
                         if not current_job_info:
                             logger.warning(f"[SSE] Job ID {job_id} not found in status tracking. Closing stream.")
                             # Optionally send an error event before closing
-                            yield f"event: error\ndata: {json.dumps({'status': 'error', 'message': 'Job ID not found'})}\n\n"
+                            yield f"event: error\ndata: {fastjson.dumps({'status': 'error', 'message': 'Job ID not found'})}\n\n"
                             break
                             
                         current_status = current_job_info.get("status")
@@ -3158,7 +3191,7 @@ def create_app():
                                     "status": current_status,
                                     "message": current_job_info.get("message", "Job finished.")
                                 }
-                                yield f"data: {json.dumps(data_to_send)}\n\n"
+                                yield f"data: {fastjson.dumps(data_to_send)}\n\n"
                                 logger.debug(f"[SSE] Sent final data for {job_id}. Breaking loop.")
                                 break # Exit loop after sending final status
                             # else: # Optional: send 'running' or other intermediate statuses if needed
@@ -3179,7 +3212,7 @@ def create_app():
                     logger.error(f"[SSE] Error during event generation for job_id {job_id}: {e}", exc_info=True)
                     # Optionally send an error event to the client
                     try:
-                        yield f"event: error\ndata: {json.dumps({'status': 'error', 'message': f'SSE Error: {e}'})}\n\n"
+                        yield f"event: error\ndata: {fastjson.dumps({'status': 'error', 'message': f'SSE Error: {e}'})}\n\n"
                     except Exception as send_err:
                         logger.error(f"[SSE] Failed to send error event to client for job_id {job_id}: {send_err}")
                 finally:
@@ -3389,6 +3422,34 @@ async def scheduled_analytics_metadata_cache_refresh_job(app: FastAPI, repositor
         logger.debug(f"Job lock released by {job_id}")
 
 
+async def scheduled_db_optimize_job(repository: SQLiteRepository):
+    """Online database optimization (checkpoint, ANALYZE, incremental vacuum) within a time budget; see db_optimizer."""
+    job_id = "db_optimize"
+    logger.info(f"Scheduler executing {job_id}...")
+
+    try:
+        is_active = await repository.get_job_is_active(job_id)
+        if not is_active:
+            logger.info(f"Job '{job_id}' is inactive in DB. Skipping execution.")
+            return
+    except Exception as check_err:
+        logger.error(f"Error checking active status for {job_id}: {check_err}. Skipping execution.", exc_info=True)
+        return
+
+    if repository.is_db_optimize_running():
+        logger.warning(f"Skipping {job_id}: an optimize run is already in progress.")
+        return
+
+    try:
+        report = await repository.optimize_database(trigger="scheduler")
+        logger.info(f"Job '{job_id}' finished with status '{report['status']}' in {report['duration_s']} s.")
+
+        now = datetime.now()
+        await repository.update_job_config(job_id, {'last_run': now})
+        logger.info(f"Updated last_run for job '{job_id}' to {now}")
+    except Exception as e:
+        logger.error(f"Error during scheduled {job_id} execution: {e}", exc_info=True)
+
         
 # --- Add WebSocket Endpoint Definition --- 
 # Note: This needs to be defined *outside* create_app if app is global,
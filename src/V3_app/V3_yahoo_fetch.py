@@ -1610,6 +1610,127 @@ async def fetch_and_store_ttm_cash_flow_statement(ticker_symbol: str, db_repo: Y
 
 # --- End Cash Flow Statement Functions ---
 
+# --- Function to fetch and store all financial statements for a ticker in one transaction ---
+
+# (yfinance attribute, item_type, item_time_coverage) for the annual/quarterly reports
+STATEMENT_PERIOD_SOURCES = [
+    ("balance_sheet", "BALANCE_SHEET", "FYEAR"),
+    ("quarterly_balance_sheet", "BALANCE_SHEET", "QUARTER"),
+    ("income_stmt", "INCOME_STATEMENT", "FYEAR"),
+    ("quarterly_income_stmt", "INCOME_STATEMENT", "QUARTER"),
+    ("cashflow", "CASH_FLOW_STATEMENT", "FYEAR"),
+    ("quarterly_cashflow", "CASH_FLOW_STATEMENT", "QUARTER"),
+]
+# (yfinance attribute, item_type) for the TTM statements, stored with item_time_coverage TTM
+STATEMENT_TTM_SOURCES = [
+    ("ttm_income_stmt", "INCOME_STATEMENT"),
+    ("ttm_cashflow", "CASH_FLOW_STATEMENT"),
+]
+
+def _build_period_statement_items(ticker_symbol: str, statement_df, item_type: str, item_time_coverage: str, attribute: str) -> List[Dict[str, Any]]:
+    """One item per DataFrame column (report date), as built by the fetch_and_store_*_statements functions."""
+    if not isinstance(statement_df, pd.DataFrame) or statement_df.empty:
+        logger.warning(f"[Statements Store] No DataFrame from .{attribute} for {ticker_symbol}, or empty. Skipping.")
+        return []
+    items = []
+    for date_col in statement_df.columns:
+        try:
+            item_key_date_naive = pd.to_datetime(date_col).to_pydatetime().replace(tzinfo=None)
+            statement_data = statement_df[date_col]
+            payload_dict = statement_data.where(pd.notnull(statement_data), None).to_dict()
+            if not payload_dict: continue
+            items.append({
+                'ticker': ticker_symbol,
+                'item_type': item_type,
+                'item_time_coverage': item_time_coverage,
+                'item_key_date': item_key_date_naive,
+                'item_source': f"yfinance.Ticker.{attribute}",
+                'item_data_payload': payload_dict
+            })
+        except Exception as col_err:
+            logger.error(f"[Statements Store] Error processing .{attribute} column '{str(date_col)}' for {ticker_symbol}: {col_err}", exc_info=True)
+    return items
+
+def _build_ttm_statement_item(ticker_symbol: str, ttm_data_raw, item_type: str, attribute: str) -> Optional[Dict[str, Any]]:
+    """The TTM item as built by fetch_and_store_ttm_income_statement / fetch_and_store_ttm_cash_flow_statement."""
+    if isinstance(ttm_data_raw, pd.DataFrame):
+        if ttm_data_raw.empty or len(ttm_data_raw.columns) == 0:
+            logger.warning(f"[Statements Store] .{attribute} for {ticker_symbol} is an empty DataFrame. Skipping.")
+            return None
+        ttm_series = ttm_data_raw.iloc[:, 0]
+        series_name_date_str = str(ttm_data_raw.columns[0])
+    elif isinstance(ttm_data_raw, pd.Series):
+        ttm_series = ttm_data_raw
+        series_name_date_str = str(ttm_series.name)
+    else:
+        logger.warning(f"[Statements Store] .{attribute} for {ticker_symbol} is not Series/DataFrame. Type: {type(ttm_data_raw)}. Skipping.")
+        return None
+    if ttm_series.empty:
+        logger.warning(f"[Statements Store] TTM series from .{attribute} for {ticker_symbol} is empty. Skipping.")
+        return None
+
+    item_key_date_naive = None
+    if series_name_date_str:
+        try:
+            item_key_date_naive = pd.to_datetime(series_name_date_str).to_pydatetime().replace(tzinfo=None)
+        except ValueError as ve:
+            logger.error(f"[Statements Store] Could not parse date '{series_name_date_str}' from .{attribute} for {ticker_symbol}: {ve}. Using current date.")
+    if item_key_date_naive is None:
+        item_key_date_naive = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+
+    payload_dict = ttm_series.where(pd.notnull(ttm_series), None).to_dict()
+    if not payload_dict:
+        return None
+    return {
+        'ticker': ticker_symbol,
+        'item_type': item_type,
+        'item_time_coverage': "TTM",
+        'item_key_date': item_key_date_naive,
+        'item_source': f"yfinance.Ticker.{attribute}",
+        'item_data_payload': payload_dict
+    }
+
+async def fetch_and_store_all_statements(ticker_symbol: str, db_repo: YahooDataRepository) -> Optional[Dict[str, Any]]:
+    """Fetches the annual, quarterly and TTM balance sheets, income statements and cash flow statements
+       and stores them with a single db_repo.store_ticker_statements call (one transaction per ticker).
+       Items are identical to the ones written by the individual fetch_and_store_* functions.
+       Returns the store_ticker_statements result (new/updated/unchanged counts and changed rows), or None on error.
+    """
+    logger.info(f"--- Starting Fetch & Store for All Statements: {ticker_symbol} ---")
+    try:
+        def _sync_get_statements():
+            yf_ticker = yf.Ticker(ticker_symbol)
+            fetched = {}
+            for attribute in [source[0] for source in STATEMENT_PERIOD_SOURCES + STATEMENT_TTM_SOURCES]:
+                try:
+                    fetched[attribute] = getattr(yf_ticker, attribute)
+                except Exception as e_fetch:
+                    # One unavailable statement does not prevent storing the others
+                    logger.error(f"[Statements Store] Error fetching .{attribute} for {ticker_symbol}: {e_fetch}")
+            return fetched
+        fetched = await asyncio.to_thread(_sync_get_statements)
+
+        period_items = []
+        for attribute, item_type, item_time_coverage in STATEMENT_PERIOD_SOURCES:
+            if attribute in fetched:
+                period_items.extend(_build_period_statement_items(ticker_symbol, fetched[attribute], item_type, item_time_coverage, attribute))
+        ttm_items = []
+        for attribute, item_type in STATEMENT_TTM_SOURCES:
+            if attribute in fetched:
+                ttm_item = _build_ttm_statement_item(ticker_symbol, fetched[attribute], item_type, attribute)
+                if ttm_item:
+                    ttm_items.append(ttm_item)
+
+        stats = await db_repo.store_ticker_statements(period_items, ttm_items)
+        logger.info(f"[Statements Store] Stored statements for {ticker_symbol}: {stats['items_new']} new, {stats['items_updated']} updated, {stats['items_unchanged']} unchanged.")
+        return stats
+    except Exception as e:
+        logger.error(f"[Statements Store] Error fetching/storing statements for {ticker_symbol}: {e}", exc_info=True)
+        return None
+    finally:
+        logger.info(f"--- Fetch & Store FINISHED for All Statements: {ticker_symbol} ---")
+# --- End All Statements Function ---
+
 # --- NEW: Function to fetch and store Dividend History ---
 async def fetch_and_store_dividend_history(ticker_symbol: str, db_repo: YahooDataRepository):
     """Fetches dividend history using yfinance (.get_dividends())
@@ -2064,6 +2185,100 @@ async def get_latest_atr( # RENAMED and SIMPLIFIED from fetch_and_calculate_atr_
 
 # --- End ATR Calculation Functions ---
 
+# Mass loads buffer ticker_master records and write them with bulk_upsert_yahoo_ticker_master
+# once this many are pending or this many seconds have passed since the last write.
+MASS_LOAD_MASTER_FLUSH_SIZE = 100
+MASS_LOAD_MASTER_FLUSH_SECONDS = 30.0
+
+class TickerMasterUpsertBuffer:
+    """Collects ticker_master records during a mass load and upserts them in batches.
+
+    A batch is written when flush_size records are pending, by a timer task once flush_seconds have passed
+    since the last write (even if no record is added meanwhile), and by close(), which the caller runs in a
+    finally block. Use start() before the first add().
+
+    Ordering: a ticker's ticker_data_items are stored while its master record may still be pending, so its
+    items can be committed up to one batch (flush_size records or flush_seconds) before its master row.
+    SQLite does not enforce the declared ticker_data_items -> ticker_master foreign key (foreign_keys is off),
+    and the analytics data processor builds its records from ticker_master tickers, so such items are used
+    once their master row exists: its update_last_full is the time of its batch, which the incremental
+    analytics refresh picks up.
+    """
+
+    def __init__(self, db_repo: YahooDataRepository, flush_size: int = MASS_LOAD_MASTER_FLUSH_SIZE,
+                 flush_seconds: float = MASS_LOAD_MASTER_FLUSH_SECONDS):
+        self.db_repo = db_repo
+        self.flush_size = flush_size
+        self.flush_seconds = flush_seconds
+        self.pending: List[Dict[str, Any]] = []
+        self.last_flush = time.monotonic()
+        self.failed_tickers: List[str] = [] # Tickers of timer flushes that failed, not yet reported
+        self._closed = asyncio.Event()
+        self._timer: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        """Starts the timer task that flushes the pending records once they are due."""
+        if self._timer is None:
+            self._timer = asyncio.create_task(self._flush_when_due())
+
+    async def _flush_when_due(self) -> None:
+        while not self._closed.is_set():
+            delay = self.last_flush + self.flush_seconds - time.monotonic()
+            try:
+                await asyncio.wait_for(self._closed.wait(), max(delay, 0.0))
+            except asyncio.TimeoutError:
+                if time.monotonic() - self.last_flush >= self.flush_seconds:
+                    self.failed_tickers.extend(await self.flush())
+
+    def _take_failed_tickers(self) -> List[str]:
+        failed, self.failed_tickers = self.failed_tickers, []
+        return failed
+
+    async def add(self, master_data: Dict[str, Any]) -> List[str]:
+        """Buffers a record and flushes if the batch is full or due. Returns the tickers of failed flushes
+           (this one and timer flushes since the last call)."""
+        self.pending.append(master_data)
+        if len(self.pending) >= self.flush_size or time.monotonic() - self.last_flush >= self.flush_seconds:
+            return self._take_failed_tickers() + await self.flush()
+        return self._take_failed_tickers()
+
+    async def flush(self) -> List[str]:
+        """Upserts the pending records. Returns their tickers if the write failed, else an empty list."""
+        self.last_flush = time.monotonic()
+        if not self.pending:
+            return []
+        batch, self.pending = self.pending, []
+        try:
+            await self.db_repo.bulk_upsert_yahoo_ticker_master(batch)
+            logger.info(f"[Mass Load] Ticker Master records written for {len(batch)} tickers.")
+            return []
+        except Exception as e:
+            logger.error(f"[Mass Load] Failed to write Ticker Master records for {len(batch)} tickers: {e}", exc_info=True)
+            return [record['ticker'] for record in batch]
+
+    async def close(self) -> List[str]:
+        """Stops the timer (letting a flush it started finish) and writes the pending records.
+           Returns the tickers of failed flushes not reported by add() yet."""
+        self._closed.set()
+        if self._timer is not None:
+            await self._timer
+        return self._take_failed_tickers() + await self.flush()
+
+class StatementWriteTally:
+    """Totals of the store_ticker_statements results of a mass load: new, updated and unchanged statement rows.
+       The per-row changed_items of each result are not kept; incremental consumers find changed rows by their
+       fetch_timestamp_utc instead."""
+
+    def __init__(self):
+        self.counts = {'items_new': 0, 'items_updated': 0, 'items_unchanged': 0, 'ttm_items_replaced': 0}
+
+    def add(self, stats: Optional[Dict[str, Any]]) -> None:
+        """Adds one ticker's store_ticker_statements result (None when the ticker's statements failed)."""
+        if not stats:
+            return
+        for counter in self.counts:
+            self.counts[counter] += stats.get(counter, 0)
+
 async def mass_load_yahoo_data_from_file(ticker_source, db_repo, progress_callback=None):
     """Reads tickers from a file or list and processes them for full data loading.
     Optionally calls progress_callback(current, total, last_ticker) after each ticker."""
@@ -2087,93 +2302,113 @@ async def mass_load_yahoo_data_from_file(ticker_source, db_repo, progress_callba
         return
 
     total = len(tickers)
-    for idx, ticker_symbol in enumerate(tickers, 1):
-        logger.info(f"[Mass Load] >>> Processing ticker: {ticker_symbol} <<<")
-        ticker_master_data_found = False # Tracks if the core ticker info was found
-        ticker_had_critical_error = False # Tracks if a top-level exception occurred for the ticker
+    # Master records are written in batches instead of one transaction per ticker
+    master_buffer = TickerMasterUpsertBuffer(db_repo)
+    master_buffer.start()
+    statement_tally = StatementWriteTally()
+
+    def _mark_master_write_failures(failed_tickers: List[str]) -> None:
+        # These tickers were counted as processed when their record was buffered
+        nonlocal processed_count, error_count
+        for failed_ticker in failed_tickers:
+            if failed_ticker not in tickers_with_errors:
+                processed_count -= 1
+                error_count += 1
+                tickers_with_errors.append(failed_ticker)
 
-        try:
-            # --- Step B: Master Ticker Update ---
-            logger.info(f"[Mass Load][{ticker_symbol}] Updating Ticker Master record...")
-            master_data = await fetch_and_process_yahoo_info(ticker_symbol)
-            
-            if master_data:
-                ticker_master_data_found = True
-                await db_repo.upsert_yahoo_ticker_master(master_data)
-                logger.info(f"[Mass Load][{ticker_symbol}] Ticker Master record updated/inserted.")
-
-                # --- Step C: Ticker Data Items Update (only if master_data was found) ---
-                logger.info(f"[Mass Load][{ticker_symbol}] Updating Ticker Data Items...")
-                data_item_fetch_functions = {
-                    "AnalystPriceTargets": fetch_and_upsert_analyst_targets_summary,
-                    "AnnualBalanceSheets": fetch_and_store_annual_balance_sheets,
-                    "QuarterlyBalanceSheets": fetch_and_store_quarterly_balance_sheets,
-                    "AnnualIncomeStatements": fetch_and_store_annual_income_statements,
-                    "QuarterlyIncomeStatements": fetch_and_store_quarterly_income_statements,
-                    "TTMIncomeStatement": fetch_and_store_ttm_income_statement,
-                    "AnnualCashFlow": fetch_and_store_annual_cash_flow_statements,
-                    "QuarterlyCashFlow": fetch_and_store_quarterly_cash_flow_statements,
-                    "TTMCashFlow": fetch_and_store_ttm_cash_flow_statement,
-                    "DividendHistory": fetch_and_store_dividend_history,
-                    "EarningsEstimateHistory": fetch_and_store_earnings_estimate_history,
-                    "ForecastSummary": fetch_and_store_forecast_summary
-                }
+    try:
+        for idx, ticker_symbol in enumerate(tickers, 1):
+            logger.info(f"[Mass Load] >>> Processing ticker: {ticker_symbol} <<<")
+            ticker_master_data_found = False # Tracks if the core ticker info was found
+            ticker_had_critical_error = False # Tracks if a top-level exception occurred for the ticker
+            master_write_failures = [] # Tickers of a batched master write that failed while adding this ticker
 
-                for item_name, fetch_func in data_item_fetch_functions.items():
-                    try:
-                        logger.info(f"[Mass Load][{ticker_symbol}] Fetching/Storing {item_name}...")
-                        await fetch_func(ticker_symbol, db_repo)
-                        logger.info(f"[Mass Load][{ticker_symbol}] {item_name} processed.")
-                    except Exception as e_item: # Individual item fetch error
-                        logger.error(f"[Mass Load][{ticker_symbol}] Error processing {item_name}: {e_item}", exc_info=False)
-                        # This does NOT set ticker_master_data_found to False or ticker_had_critical_error to True
-            else:
-                # master_data is None
-                logger.warning(f"[Mass Load][{ticker_symbol}] Failed to fetch master data. Ticker considered not found.")
-                # ticker_master_data_found remains False
-
-            # Determine final status for counting and logging for this ticker
-            if ticker_master_data_found:
-                processed_count += 1
-                logger.info(f"[Mass Load] <<< Finished processing for ticker: {ticker_symbol} - MASTER DATA FOUND >>>")
-            else:
-                # This branch is hit if master_data was None
-                error_count += 1
-                tickers_with_errors.append(ticker_symbol)
-                logger.warning(f"[Mass Load] <<< Finished processing for ticker: {ticker_symbol} - MASTER DATA NOT FOUND OR FAILED >>>")
-
-        except Exception as e_ticker: # This is for truly unexpected critical errors for the whole ticker
-            logger.error(f"[Mass Load] UNEXPECTED CRITICAL ERROR processing ticker {ticker_symbol}: {e_ticker}", exc_info=True)
-            ticker_had_critical_error = True
-            if not ticker_master_data_found: # If master data wasn't found AND a critical error occurred
-                if ticker_symbol not in tickers_with_errors: # Add to errors if not already there due to master data fail
-                    error_count +=1 # Increment error if it wasn't already from master_data fail path
-                    tickers_with_errors.append(ticker_symbol)
-            else: # Master data was found, but then a critical error happened
-                # This ticker was likely counted in processed_count already if error is late.
-                # We need to re-classify it as an error.
-                processed_count -=1 # Decrement if it was optimistically counted
-                error_count += 1
-                if ticker_symbol not in tickers_with_errors:
+            try:
+                # --- Step B: Master Ticker Update ---
+                logger.info(f"[Mass Load][{ticker_symbol}] Updating Ticker Master record...")
+                master_data = await fetch_and_process_yahoo_info(ticker_symbol)
+            
+                if master_data:
+                    ticker_master_data_found = True
+                    master_write_failures = await master_buffer.add(master_data)
+                    logger.info(f"[Mass Load][{ticker_symbol}] Ticker Master record queued for upsert.")
+
+                    # --- Step C: Ticker Data Items Update (only if master_data was found) ---
+                    logger.info(f"[Mass Load][{ticker_symbol}] Updating Ticker Data Items...")
+                    data_item_fetch_functions = {
+                        "AnalystPriceTargets": fetch_and_upsert_analyst_targets_summary,
+                        # Annual, quarterly and TTM balance sheets, income and cash flow statements in one transaction
+                        "Statements": fetch_and_store_all_statements,
+                        "DividendHistory": fetch_and_store_dividend_history,
+                        "EarningsEstimateHistory": fetch_and_store_earnings_estimate_history,
+                        "ForecastSummary": fetch_and_store_forecast_summary
+                    }
+
+                    for item_name, fetch_func in data_item_fetch_functions.items():
+                        try:
+                            logger.info(f"[Mass Load][{ticker_symbol}] Fetching/Storing {item_name}...")
+                            fetch_result = await fetch_func(ticker_symbol, db_repo)
+                            if item_name == "Statements":
+                                statement_tally.add(fetch_result)
+                            logger.info(f"[Mass Load][{ticker_symbol}] {item_name} processed.")
+                        except Exception as e_item: # Individual item fetch error
+                            logger.error(f"[Mass Load][{ticker_symbol}] Error processing {item_name}: {e_item}", exc_info=False)
+                            # This does NOT set ticker_master_data_found to False or ticker_had_critical_error to True
+                else:
+                    # master_data is None
+                    logger.warning(f"[Mass Load][{ticker_symbol}] Failed to fetch master data. Ticker considered not found.")
+                    # ticker_master_data_found remains False
+
+                # Determine final status for counting and logging for this ticker
+                if ticker_master_data_found:
+                    processed_count += 1
+                    logger.info(f"[Mass Load] <<< Finished processing for ticker: {ticker_symbol} - MASTER DATA FOUND >>>")
+                else:
+                    # This branch is hit if master_data was None
+                    error_count += 1
                     tickers_with_errors.append(ticker_symbol)
+                    logger.warning(f"[Mass Load] <<< Finished processing for ticker: {ticker_symbol} - MASTER DATA NOT FOUND OR FAILED >>>")
+
+            except Exception as e_ticker: # This is for truly unexpected critical errors for the whole ticker
+                logger.error(f"[Mass Load] UNEXPECTED CRITICAL ERROR processing ticker {ticker_symbol}: {e_ticker}", exc_info=True)
+                ticker_had_critical_error = True
+                if not ticker_master_data_found: # If master data wasn't found AND a critical error occurred
+                    if ticker_symbol not in tickers_with_errors: # Add to errors if not already there due to master data fail
+                        error_count +=1 # Increment error if it wasn't already from master_data fail path
+                        tickers_with_errors.append(ticker_symbol)
+                else: # Master data was found, but then a critical error happened
+                    # This ticker was likely counted in processed_count already if error is late.
+                    # We need to re-classify it as an error.
+                    processed_count -=1 # Decrement if it was optimistically counted
+                    error_count += 1
+                    if ticker_symbol not in tickers_with_errors:
+                        tickers_with_errors.append(ticker_symbol)
         
-        # Determine the status to pass to the callback
-        # Callback's 'had_error' should be true if master data wasn't found OR a critical error occurred.
-        callback_had_error_status = not ticker_master_data_found or ticker_had_critical_error
-
-        # --- Progress callback ---
-        if progress_callback:
-            await progress_callback(idx, total, ticker_symbol, callback_had_error_status)
-            await asyncio.sleep(0.01)  # Explicit additional yield after each ticker
+            # Applied once this ticker has been counted, as the failed batch can include it
+            _mark_master_write_failures(master_write_failures)
+
+            # Determine the status to pass to the callback
+            # Callback's 'had_error' should be true if master data wasn't found OR a critical error occurred.
+            callback_had_error_status = not ticker_master_data_found or ticker_had_critical_error or ticker_symbol in master_write_failures
+
+            # --- Progress callback ---
+            if progress_callback:
+                await progress_callback(idx, total, ticker_symbol, callback_had_error_status)
+                await asyncio.sleep(0.01)  # Explicit additional yield after each ticker
+    finally:
+        # Pending master records are written even if the loop is interrupted
+        _mark_master_write_failures(await master_buffer.close())
     logger.info(f"--- Mass Load from File FINISHED ---")
     logger.info(f"Tickers processed (master data found): {processed_count}")
     logger.info(f"Tickers with errors (master data not found or critical error): {error_count}")
+    logger.info(f"Statement rows: {statement_tally.counts['items_new']} new, {statement_tally.counts['items_updated']} updated, {statement_tally.counts['items_unchanged']} unchanged")
     if tickers_with_errors:
         logger.warning(f"Tickers that encountered errors: {tickers_with_errors}")
     return {
         'errors': tickers_with_errors,
         'success_count': processed_count,
-        'error_count': error_count
+        'error_count': error_count,
+        'statement_writes': statement_tally.counts
     }
 
 if __name__ == '__main__':
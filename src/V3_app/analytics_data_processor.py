@@ -4,24 +4,47 @@ Handles loading, merging, and filtering of analytics data from various sources.
 """
 import logging
 import asyncio
+import contextlib
+import time
+from datetime import datetime, timedelta
 from typing import List, Dict, Any, Optional, Callable, Union, Tuple
 import json
+import numpy as np
 from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.engine import make_url
 
 from .V3_database import SQLiteRepository
 from . import V3_finviz_fetch
 from .V3_finviz_fetch import parse_raw_data
 from . import V3_analytics
+from . import fastjson
+from . import analytics_store
+from . import analytics_field_metadata
+from . import analytics_metadata_sketches
+from .db_engine_registry import engine_registry, is_sqlite_file_url
+from .db_snapshot import create_snapshot, remove_snapshot, snapshots_enabled
 from .services.notification_service import dispatch_notification
 
 # --- ADD IMPORTS for direct Yahoo data handling ---
 from .V3_yahoo_fetch import YahooDataRepository
+from .yahoo_repository import LATEST_PAYLOAD_TICKER_CHUNK_SIZE
 from .yahoo_data_query_srv import YahooDataQueryService
 # --- END ADD IMPORTS ---
 
 logger = logging.getLogger(__name__)
 
-MAX_UNIQUE_TEXT_SAMPLE_SIZE = 10
+# --- Incremental data cache refresh ---
+# force_refresh_data_cache rebuilds only the tickers whose source rows changed since the cached data was built,
+# found by comparing analytics_raw.last_fetched_at, ticker_master.update_last_full/update_marketonly and
+# ticker_data_items.fetch_timestamp_utc against the watermarks stored with the cache (source_state_json).
+DATA_CACHE_SOURCE_STATE_VERSION = 1
+# Rows stamped shortly before the watermarks were read can commit after the read, so rows stamped less than this
+# before it count as changed in the next refresh too
+INCREMENTAL_REFRESH_OVERLAP = timedelta(minutes=2)
+# Changes the watermarks cannot see (deleted items, exchange rates) are picked up by a periodic full refresh
+FULL_REFRESH_INTERVAL = timedelta(hours=24)
+# Above this share of changed tickers a full refresh is cheaper
+INCREMENTAL_MAX_CHANGED_RATIO = 0.5
 
 # --- COPIED TARGET_ITEM_TYPES from V3_backend_api.py ---
 # Ideally, this would be in a shared constants module
@@ -151,9 +174,18 @@ def _adp_preprocess_raw_entries(raw_analytics_entries: List[Dict[str, Any]]) ->
 # --- END OF EXISTING MODULE-LEVEL HELPERS ---
 
 class AnalyticsDataProcessor:
-    def __init__(self, db_repository: SQLiteRepository):
+    def __init__(self, db_repository: SQLiteRepository, source_repository: Optional[SQLiteRepository] = None,
+                 snapshot_source: bool = False):
+        """
+        Args:
+            db_repository: The live database; the caches are read from and written to it.
+            source_repository: Where the Finviz/Yahoo source data is read from (defaults to db_repository).
+            snapshot_source: Read the source data of full rebuilds from a db_snapshot copy of the live database
+                             (see _full_rebuild_source). Incremental refreshes always read the live database.
+        """
         logger.info("AnalyticsDataProcessor initialized.")
         self.db_repository = db_repository
+        self.snapshot_source = snapshot_source and source_repository is None
         # --- Initialize Yahoo specific repositories/services ---
         if not hasattr(self.db_repository, 'database_url') or not self.db_repository.database_url:
             err_msg = "ADP Critical: db_repository does not have a valid database_url attribute."
@@ -161,23 +193,56 @@ class AnalyticsDataProcessor:
             raise ValueError(err_msg)
         
         try:
-            self.yahoo_db_repo = YahooDataRepository(database_url=self.db_repository.database_url)
-            self.yahoo_query_service = YahooDataQueryService(db_repo=self.yahoo_db_repo)
+            self._set_source_repository(source_repository or db_repository)
             logger.info("ADP: YahooDataRepository and YahooDataQueryService initialized.")
         except Exception as e:
             logger.error(f"ADP: Failed to initialize YahooDataRepository/YahooDataQueryService: {e}", exc_info=True)
             # Depending on how critical these are, you might re-raise or handle appropriately
             raise  # Re-raise for now, as these are essential for _load_yahoo_data
 
-    async def _load_finviz_data(self, progress_callback: Optional[Callable] = None) -> List[Dict[str, Any]]:
+    def _set_source_repository(self, source_repository: SQLiteRepository) -> None:
+        self.source_repository = source_repository
+        self.yahoo_db_repo = YahooDataRepository(database_url=source_repository.database_url)
+        self.yahoo_query_service = YahooDataQueryService(db_repo=self.yahoo_db_repo)
+
+    @contextlib.asynccontextmanager
+    async def _full_rebuild_source(self):
+        """
+        Wraps the full-table source scans of a full rebuild. With snapshot_source (and snapshots enabled for a
+        file database), the source repositories point at a db_snapshot copy for the block, so the long scan does
+        not hold a read transaction on the live database; the copy is taken here, only when the scan is about to
+        run, and removed afterwards. If it cannot be taken, the live database is read.
+        """
+        database_url = self.db_repository.database_url
+        snapshot_path = None
+        if self.snapshot_source and snapshots_enabled() and is_sqlite_file_url(database_url):
+            try:
+                snapshot_path = await run_in_threadpool(create_snapshot, make_url(database_url).database)
+            except Exception as e:
+                logger.warning(f"ADP: Could not snapshot the database ({e}). Reading the live database.", exc_info=True)
+        if snapshot_path is None:
+            yield
+            return
+        live_repository = self.source_repository
+        snapshot_url = f"sqlite+aiosqlite:///{snapshot_path}"
+        self._set_source_repository(SQLiteRepository(database_url=snapshot_url))
+        logger.info(f"ADP: Reading the source data from snapshot {snapshot_path}.")
+        try:
+            yield
+        finally:
+            self._set_source_repository(live_repository)
+            await engine_registry.dispose(snapshot_url) # Before the snapshot file is removed
+            await run_in_threadpool(remove_snapshot, snapshot_path)
+
+    async def _load_finviz_data(self, progress_callback: Optional[Callable] = None, tickers: Optional[List[str]] = None) -> List[Dict[str, Any]]:
         """
         Loads Finviz data by querying the 'analytics_raw' table via the SQLiteRepository.
-        Filters for source='finviz' and expects the repository to parse the raw_data JSON.
+        Filters for source='finviz' (and tickers, if given) and expects the repository to parse the raw_data JSON.
         """
         logger.info("ADP: Loading Finviz data from analytics_raw table...")
         processed_data: List[Dict[str, Any]] = []
         try:
-            all_finviz_raw_entries = await self.db_repository.get_analytics_raw_data_by_source('finviz')
+            all_finviz_raw_entries = await self.source_repository.get_analytics_raw_data_by_source('finviz', tickers=tickers)
             total_entries = len(all_finviz_raw_entries)
             logger.info(f"ADP: Found {total_entries} raw Finviz entries.")
 
@@ -214,7 +279,7 @@ class AnalyticsDataProcessor:
                     })
 
                 if progress_callback and callable(progress_callback):
-                    await asyncio.sleep(0.001) # Reduced sleep, was 0.01
+                    await asyncio.sleep(0) # Yield only; a 1 ms sleep per entry added ~30 s for 26k tickers once a callback is set
                     progress_payload = {
                         "current": i + 1,
                         "total": total_entries,
@@ -232,7 +297,8 @@ class AnalyticsDataProcessor:
         
         return processed_data
 
-    async def _load_yahoo_data(self, progress_callback: Optional[Callable] = None) -> List[Dict[str, Any]]:
+    async def _load_yahoo_data(self, progress_callback: Optional[Callable] = None, tickers: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """Loads master data and the latest TARGET_ITEM_TYPES payloads of every master ticker (or only of tickers, if given)."""
         logger.info("ADP: Loading Yahoo combined data directly using services...")
         is_async_callback = asyncio.iscoroutinefunction(progress_callback)
 
@@ -252,7 +318,12 @@ class AnalyticsDataProcessor:
         combined_data_list: List[Dict[str, Any]] = []
         try:
             await do_progress_update("load_yahoo_data", "running", 5, "Fetching master tickers...")
-            master_tickers = await self.yahoo_db_repo.get_all_master_tickers()
+            if tickers is None:
+                master_tickers = await self.yahoo_db_repo.get_all_master_tickers()
+                all_master_data_list = None
+            else:
+                all_master_data_list = await self.yahoo_db_repo.get_master_data_for_analytics(tickers=tickers)
+                master_tickers = [item['ticker'] for item in all_master_data_list]
             if not master_tickers:
                 logger.warning("ADP Yahoo: No tickers found in Yahoo master table.")
                 await do_progress_update("load_yahoo_data", "completed", 100, "No master tickers found.", count=0)
@@ -262,53 +333,37 @@ class AnalyticsDataProcessor:
             logger.info(f"ADP Yahoo: Found {total_master_tickers} tickers in master table.")
             await do_progress_update("load_yahoo_data", "running", 10, f"Found {total_master_tickers} master tickers. Fetching master data...")
 
-            all_master_data_list = await self.yahoo_db_repo.get_master_data_for_analytics()
+            if all_master_data_list is None:
+                all_master_data_list = await self.yahoo_db_repo.get_master_data_for_analytics()
             all_master_data_map = {item['ticker']: item for item in all_master_data_list}
             await do_progress_update("load_yahoo_data", "running", 20, "Master data fetched. Preparing item fetches...")
 
-            async def fetch_ticker_combined_data_internal(ticker_idx: int, ticker_symbol: str):
-                current_ticker_progress_start = 20 + int((ticker_idx / total_master_tickers) * 70)
-                master_data = all_master_data_map.get(ticker_symbol, {"ticker": ticker_symbol})
-                financial_items = {}
-                
-                item_fetch_tasks = []
-                for item_type, item_coverage, output_key in TARGET_ITEM_TYPES:
-                    item_fetch_tasks.append(
-                        asyncio.create_task(
-                            self.yahoo_query_service.get_latest_data_item_payload(ticker_symbol, item_type, item_coverage),
-                            name=f"ADP-{ticker_symbol}-{output_key}"
-                        )
-                    )
-                
-                item_results = await asyncio.gather(*item_fetch_tasks, return_exceptions=True)
-
-                for i, result in enumerate(item_results):
-                    _, _, output_key = TARGET_ITEM_TYPES[i]
-                    if isinstance(result, Exception):
-                        logger.warning(f"ADP Yahoo: Failed to fetch item {output_key} for ticker {ticker_symbol}: {result}")
-                    elif result is not None:
-                        financial_items[output_key] = result
-                
-                if progress_callback and (ticker_idx + 1) % (total_master_tickers // 10 or 1) == 0:
-                     await do_progress_update("load_yahoo_data", "running", current_ticker_progress_start, f"Processing items for {ticker_symbol} ({ticker_idx+1}/{total_master_tickers})")
-
-                return {
+            # Latest payloads for all tickers/item types are streamed from a few windowed queries
+            # (one per chunk of tickers) instead of one query per ticker and item type.
+            financial_items_by_ticker: Dict[str, Dict[str, Any]] = {ticker: {} for ticker in master_tickers}
+            ticker_profiles_cache = dict(all_master_data_map)
+            chunk_size = LATEST_PAYLOAD_TICKER_CHUNK_SIZE
+            for chunk_start in range(0, total_master_tickers, chunk_size):
+                ticker_chunk = master_tickers[chunk_start:chunk_start + chunk_size]
+                try:
+                    async for ticker_symbol, output_key, payload in self.yahoo_query_service.iter_latest_data_item_payloads(
+                        ticker_chunk, TARGET_ITEM_TYPES, ticker_profiles_cache
+                    ):
+                        financial_items_by_ticker.setdefault(ticker_symbol, {})[output_key] = payload
+                except Exception as e_chunk:
+                    logger.error(f"ADP Yahoo: Error fetching item payloads for tickers {chunk_start}-{chunk_start + len(ticker_chunk)}: {e_chunk}", exc_info=True)
+
+                processed_count = chunk_start + len(ticker_chunk)
+                progress_percent = 20 + int((processed_count / total_master_tickers) * 70)
+                await do_progress_update("load_yahoo_data", "running", progress_percent, f"Processing items for {ticker_chunk[-1]} ({processed_count}/{total_master_tickers})")
+
+            for ticker_symbol in master_tickers:
+                combined_data_list.append({
                     "ticker": ticker_symbol,
-                    "master_data": master_data,
-                    "financial_items": financial_items
-                }
-
-            fetch_all_tickers_tasks = [fetch_ticker_combined_data_internal(idx, ticker) for idx, ticker in enumerate(master_tickers)]
-            
-            raw_combined_data_list = await asyncio.gather(*fetch_all_tickers_tasks, return_exceptions=True)
-
-            successful_results_count = 0
-            for i, res in enumerate(raw_combined_data_list):
-                if isinstance(res, Exception):
-                    logger.error(f"ADP Yahoo: Error fetching combined data for ticker {master_tickers[i]}: {res}", exc_info=res)
-                else:
-                    combined_data_list.append(res)
-                    successful_results_count +=1
+                    "master_data": all_master_data_map.get(ticker_symbol, {"ticker": ticker_symbol}),
+                    "financial_items": financial_items_by_ticker.get(ticker_symbol, {})
+                })
+            successful_results_count = len(combined_data_list)
             
             logger.info(f"ADP Yahoo: Successfully fetched combined data for {successful_results_count} of {total_master_tickers} tickers.")
             await do_progress_update("load_yahoo_data", "completed", 100, f"Yahoo data load complete ({successful_results_count}/{total_master_tickers} tickers).", count=successful_results_count, total_count=total_master_tickers)
@@ -329,11 +384,14 @@ class AnalyticsDataProcessor:
         
         is_async_callback = asyncio.iscoroutinefunction(progress_callback)
 
+        def transform_progress_payload(current, total, ticker_symbol):
+            progress_percent = int((current / total) * 100) if total > 0 else 0
+            msg = f"Transforming Yahoo: {ticker_symbol} ({current}/{total})"
+            return {"task_name":"transform_yahoo_data", "status":"processing", "progress":progress_percent, "message":msg}
+
         async def do_transform_progress_update(current, total, ticker_symbol):
             if progress_callback:
-                progress_percent = int((current / total) * 100) if total > 0 else 0
-                msg = f"Transforming Yahoo: {ticker_symbol} ({current}/{total})"
-                payload = {"task_name":"transform_yahoo_data", "status":"processing", "progress":progress_percent, "message":msg}
+                payload = transform_progress_payload(current, total, ticker_symbol)
                 if is_async_callback:
                     await progress_callback(payload)
                 else:
@@ -386,7 +444,8 @@ class AnalyticsDataProcessor:
                 if is_async_callback:
                     asyncio.create_task(do_transform_progress_update(index + 1, total_records, ticker))
                 else:
-                    do_transform_progress_update(index + 1, total_records, ticker) # Call sync version
+                    # The coroutine would never be awaited here (no running loop, e.g. in a worker thread): call directly
+                    progress_callback(transform_progress_payload(index + 1, total_records, ticker))
         
         logger.info(f"ADP: Successfully transformed {len(transformed_data_list)} Yahoo records (from direct load).")
         if progress_callback:
@@ -403,17 +462,21 @@ class AnalyticsDataProcessor:
         logger.info(f"ADP: Merging {len(finviz_data)} Finviz records and {len(yahoo_data)} Yahoo records...")
         
         is_async_callback = asyncio.iscoroutinefunction(progress_callback)
+        def merge_progress_payload(status_str, progress_percent, message_str, current_count=None):
+            payload = {"task_name":"merge_data", "status":status_str, "progress":progress_percent, "message":message_str}
+            if current_count is not None: payload["count"] = current_count
+            return payload
+
         async def do_merge_progress_update(status_str, progress_percent, message_str, current_count=None):
             if progress_callback:
-                payload = {"task_name":"merge_data", "status":status_str, "progress":progress_percent, "message":message_str}
-                if current_count is not None: payload["count"] = current_count
+                payload = merge_progress_payload(status_str, progress_percent, message_str, current_count)
                 if is_async_callback: await progress_callback(payload)
                 else: progress_callback(payload)
                 await asyncio.sleep(0) # yield
 
         if progress_callback: # Initial call for merge starting
              if is_async_callback: asyncio.create_task(do_merge_progress_update("started", 0, "Starting data merge"))
-             else: do_merge_progress_update("started", 0, "Starting data merge")
+             else: progress_callback(merge_progress_payload("started", 0, "Starting data merge"))
 
 
         merged_data_dict: Dict[str, Dict[str, Any]] = {}
@@ -427,7 +490,7 @@ class AnalyticsDataProcessor:
 
         if progress_callback:
              if is_async_callback: asyncio.create_task(do_merge_progress_update("processing", 33, "Finviz data processed, starting Yahoo merge."))
-             else: do_merge_progress_update("processing", 33, "Finviz data processed, starting Yahoo merge.")
+             else: progress_callback(merge_progress_payload("processing", 33, "Finviz data processed, starting Yahoo merge."))
 
         for y_item in yahoo_data:
             ticker = y_item.get('ticker')
@@ -445,134 +508,32 @@ class AnalyticsDataProcessor:
         if progress_callback:
              final_count = len(merged_data_dict)
              if is_async_callback: asyncio.create_task(do_merge_progress_update("processing", 66, "Yahoo data merged.", current_count=final_count))
-             else: do_merge_progress_update("processing", 66, "Yahoo data merged.", current_count=final_count)
+             else: progress_callback(merge_progress_payload("processing", 66, "Yahoo data merged.", current_count=final_count))
         
         logger.info(f"ADP Merge: Merged data contains {len(merged_data_dict)} unique records.")
         if progress_callback:
             final_count = len(merged_data_dict)
             if is_async_callback: asyncio.create_task(do_merge_progress_update("completed", 100, "Merge complete.", current_count=final_count))
-            else: do_merge_progress_update("completed", 100, "Merge complete.", current_count=final_count)
+            else: progress_callback(merge_progress_payload("completed", 100, "Merge complete.", current_count=final_count))
         
         return list(merged_data_dict.values())
 
     def _generate_field_metadata(self, data: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
         """
         Generates comprehensive metadata for each field in the dataset.
-        Calculates type, count, unique values (sample), min/max/avg/median for numerics,
-        and an example value.
+        Calculates type, count, unique values (sample), min/max/avg/median for numerics and boolean counts
+        (column-wise, see analytics_field_metadata; from bounded-memory sketches if
+        ANALYTICS_METADATA_SKETCHES is set, see analytics_metadata_sketches).
         """
-        if not data:
-            return {}
-
-        field_stats: Dict[str, Dict[str, Any]] = {}
-        
-        all_field_names = set()
-        for record in data:
-            if isinstance(record, dict):
-                for key in record.keys():
-                    all_field_names.add(key)
-
-        if 'ticker' in all_field_names:
-            all_field_names.remove('ticker') # Exclude 'ticker' itself
-
-        for field_name in all_field_names:
-            field_stats[field_name] = {
-                "name": field_name, "count": 0, "type": "unknown",
-                "numeric_values": [], "text_values": set(),
-                "min_value": float('inf'), "max_value": float('-inf'), "sum_value": 0,
-                "boolean_true_count": 0, "boolean_false_count": 0,
-                "all_null_or_empty": True, "example_value": None,
-                "has_numeric": False, "has_text": False, "has_boolean": False
-            }
-
-        for record_index, record in enumerate(data):
-            if not isinstance(record, dict): continue
-            for field_name, value in record.items():
-                if field_name not in field_stats: continue # Skip 'ticker' or unexpected fields
-
-                stats = field_stats[field_name]
-                if stats["example_value"] is None and value is not None and value != '' and value != [] and value != {}:
-                    stats["example_value"] = value
-                
-                is_truly_empty = value is None or str(value).strip() == '' or str(value).strip() == '-'
-                
-                if not is_truly_empty:
-                    stats["all_null_or_empty"] = False
-                    stats["count"] += 1
-                    try:
-                        num_value = float(value)
-                        if not (isinstance(value, bool)):
-                            stats["has_numeric"] = True
-                            stats["numeric_values"].append(num_value)
-                            if num_value < stats["min_value"]: stats["min_value"] = num_value
-                            if num_value > stats["max_value"]: stats["max_value"] = num_value
-                            stats["sum_value"] += num_value
-                        else: 
-                            stats["has_boolean"] = True
-                            if num_value == 1.0: stats["boolean_true_count"] +=1
-                            else: stats["boolean_false_count"] +=1
-                            stats["text_values"].add(str(value)) 
-                    except (ValueError, TypeError):
-                        if isinstance(value, bool):
-                            stats["has_boolean"] = True
-                            if value: stats["boolean_true_count"] +=1
-                            else: stats["boolean_false_count"] +=1
-                            stats["text_values"].add(str(value))
-                        elif isinstance(value, str): 
-                            stats["has_text"] = True
-                            stats["text_values"].add(value)
-                        elif isinstance(value, (list, dict)): 
-                            stats["has_text"] = True
-                            try: stats["text_values"].add(json.dumps(value)) 
-                            except TypeError: stats["text_values"].add(str(value)) 
-                        else: 
-                            stats["has_text"] = True 
-                            stats["text_values"].add(str(value))
-
-        final_metadata = {}
-        sorted_field_stats_items = sorted(field_stats.items())
-
-        for field_name, stats in sorted_field_stats_items:
-            meta_entry: Dict[str, Any] = {"name": field_name, "count": stats["count"]}
-            if stats["all_null_or_empty"]:
-                meta_entry["type"] = "empty"
-            else:
-                if stats["has_numeric"]: meta_entry["type"] = "numeric"
-                elif stats["has_text"]: meta_entry["type"] = "text"
-                elif stats["has_boolean"]: meta_entry["type"] = "boolean"
-                else: meta_entry["type"] = "unknown"
-
-                if stats["numeric_values"]:
-                    num_values = sorted(stats["numeric_values"])
-                    meta_entry["min_value"] = num_values[0]
-                    meta_entry["max_value"] = num_values[-1]
-                    meta_entry["avg_value"] = sum(num_values) / len(num_values)
-                    meta_entry["median_value"] = self._calculate_median(num_values) # Use helper
-
-                unique_sample_list = list(stats["text_values"])
-                if len(unique_sample_list) > MAX_UNIQUE_TEXT_SAMPLE_SIZE:
-                    meta_entry["unique_values_sample"] = unique_sample_list[:MAX_UNIQUE_TEXT_SAMPLE_SIZE]
-                else:
-                    meta_entry["unique_values_sample"] = unique_sample_list
-            
-            if stats["has_boolean"]: # Add boolean counts if type is boolean or if any booleans were found
-                 meta_entry["boolean_counts"] = {"true": stats["boolean_true_count"], "false": stats["boolean_false_count"]}
+        if analytics_metadata_sketches.sketches_enabled():
+            return analytics_metadata_sketches.sketch_field_metadata_from_records(data)
+        return analytics_field_metadata.field_metadata_from_records(data)
 
-
-            final_metadata[field_name] = meta_entry
-        return final_metadata
-
-    def _calculate_median(self, numeric_values: List[Union[int, float]]) -> Optional[Union[int, float]]:
-        """Helper to calculate median for a list of numeric values."""
-        if not numeric_values: return None
-        sorted_values = sorted(numeric_values)
-        n = len(sorted_values)
-        mid = n // 2
-        if n % 2 == 0: 
-            median_val = (sorted_values[mid - 1] + sorted_values[mid]) / 2.0
-            return median_val
-        else: 
-            return sorted_values[mid]
+    def _generate_field_metadata_from_dataset(self, dataset: analytics_store.AnalyticsDataset) -> Dict[str, Dict[str, Any]]:
+        """_generate_field_metadata of an analytics_store dataset, from its columns."""
+        if analytics_metadata_sketches.sketches_enabled():
+            return analytics_metadata_sketches.sketch_field_metadata_from_dataset(dataset)
+        return analytics_field_metadata.field_metadata_from_dataset(dataset)
 
     async def _prepare_analytics_components(self, 
                                            create_original_data: bool, 
@@ -716,16 +677,230 @@ class AnalyticsDataProcessor:
             error = str(e)
             return None, None
 
-    async def force_refresh_data_cache(self, progress_callback: Optional[Callable] = None) -> None:
-        logger.info("ADP: Starting data cache refresh process...")
+    async def _load_cached_records(self, data_json: str) -> Any:
+        """Records of the data cache: read from the analytics_store version data_json points to, or parsed from
+           data_json itself (JSON list written before the store existed, or for a database that is not a file)."""
+        version = analytics_store.parse_store_pointer(data_json)
+        if version is None:
+            return await run_in_threadpool(fastjson.loads, data_json)
+        store_dir = analytics_store.store_dir_for_url(self.db_repository.database_url)
+        dataset = await run_in_threadpool(analytics_store.open_dataset, store_dir, version)
+        return await run_in_threadpool(dataset.to_records)
+
+    async def _save_data_cache(self, analytics_data: Union[List[Dict[str, Any]], analytics_store.DatasetPatch],
+                               source_state: Optional[Dict[str, Any]]) -> None:
+        """Writes the records (or the DatasetPatch of an incremental refresh) as a new analytics_store version and
+           points the data cache row at it (a JSON list in the row if the database is not a file), together with the
+           source state."""
+        store_dir = analytics_store.store_dir_for_url(self.db_repository.database_url)
+        if isinstance(analytics_data, analytics_store.DatasetPatch):
+            version = await run_in_threadpool(analytics_store.write_patched_dataset, analytics_data, store_dir)
+            data_json = analytics_store.store_pointer(version, len(analytics_data))
+        elif store_dir:
+            version = await run_in_threadpool(analytics_store.write_dataset, analytics_data, store_dir)
+            data_json = analytics_store.store_pointer(version, len(analytics_data))
+        else:
+            data_json = await run_in_threadpool(fastjson.dumps, analytics_data, default=str, allow_nan=True)
+        source_state_json = fastjson.dumps(source_state) if source_state else None
+        await self.db_repository.update_cached_analytics_data(data_json=data_json, source_state_json=source_state_json)
+        if store_dir:
+            await run_in_threadpool(analytics_store.remove_old_versions, store_dir, version)
+
+    async def _collect_source_state(self) -> Tuple[Dict[str, Any], Dict[str, Optional[datetime]], Dict[str, Optional[datetime]]]:
+        """
+        Reads the change-tracking timestamps of the source data (cheap queries, no payloads).
+
+        Returns:
+            (source_state, finviz_fetch_times, master_update_times): source_state holds the watermarks stored with
+            the cache (latest finviz last_fetched_at, ticker_master update and ticker_data_items fetch_timestamp_utc)
+            and the time they were read, the dicts map each Finviz/ticker_master ticker to its own timestamp.
+        """
+        read_at = datetime.now()
+        finviz_fetch_times = await self.source_repository.get_analytics_raw_fetch_times('finviz')
+        master_update_times = await self.yahoo_db_repo.get_ticker_master_update_times()
+        source_state = {
+            'version': DATA_CACHE_SOURCE_STATE_VERSION,
+            'read_at': read_at,
+            'finviz_fetched_at': max((ts for ts in finviz_fetch_times.values() if ts), default=None),
+            'master_updated_at': max((ts for ts in master_update_times.values() if ts), default=None),
+            'items_fetched_at': await self.yahoo_db_repo.get_latest_data_item_fetch_time()
+        }
+        return source_state, finviz_fetch_times, master_update_times
+
+    @staticmethod
+    def _parse_source_state(source_state_json: Optional[str]) -> Optional[Dict[str, Any]]:
+        """source_state_json of the data cache with its timestamps as datetimes; None if missing, unreadable or of another version."""
+        if not source_state_json:
+            return None
+        try:
+            state = fastjson.loads(source_state_json)
+            if not isinstance(state, dict) or state.get('version') != DATA_CACHE_SOURCE_STATE_VERSION or not state.get('full_refresh_at') or not state.get('read_at'):
+                return None
+            for key in ('full_refresh_at', 'read_at', 'finviz_fetched_at', 'master_updated_at', 'items_fetched_at'):
+                if state.get(key):
+                    state[key] = datetime.fromisoformat(state[key])
+            return state
+        except (ValueError, TypeError) as e:
+            logger.warning(f"ADP Incremental: Unreadable data cache source state ({e}).")
+            return None
+
+    async def _cached_tickers(self, data_json: str):
+        """
+        Ticker of each cached record, and what the cache is patched against: the analytics_store dataset (only its
+        'ticker' column is read) or the parsed record list of a JSON data cache. (None, None) if unusable.
+        """
+        version = analytics_store.parse_store_pointer(data_json)
+        if version is None:
+            cached_records = await run_in_threadpool(fastjson.loads, data_json)
+            if not isinstance(cached_records, list):
+                return None, None
+            return [record.get('ticker') if isinstance(record, dict) else None for record in cached_records], cached_records
+        store_dir = analytics_store.store_dir_for_url(self.db_repository.database_url)
+        dataset = await run_in_threadpool(analytics_store.open_dataset, store_dir, version)
+        if 'ticker' not in dataset.column_names:
+            return None, None
+        ticker_column = await run_in_threadpool(dataset.column, 'ticker')
+        if ticker_column.kind != 'str':
+            return None, None
+        return ticker_column.values, dataset
+
+    async def _refresh_data_cache_incrementally(self) -> Tuple[Optional[Union[List[Dict[str, Any]], analytics_store.DatasetPatch]], Optional[Dict[str, Any]]]:
+        """
+        Rebuilds the records of the tickers whose source rows changed since the cached data was built and patches
+        them into the cached data (records of tickers gone from both sources are dropped, new tickers appended).
+        For an analytics_store cache the result is a DatasetPatch: the unchanged rows are copied column-wise by
+        write_patched_dataset and the rebuilt records come after them, so only the changed tickers become dicts.
+
+        Returns:
+            (analytics_data, source_state), or (None, None) if a full refresh is needed instead: no cached data or
+            source state, last full refresh older than FULL_REFRESH_INTERVAL, or more than INCREMENTAL_MAX_CHANGED_RATIO
+            of the tickers changed.
+        """
+        start = time.perf_counter()
+        cached = await self.db_repository.get_cached_analytics_data_with_state()
+        if not cached:
+            logger.info("ADP Incremental: No cached data. A full refresh is needed.")
+            return None, None
+        data_json, generated_at, source_state_json = cached
+        previous_state = self._parse_source_state(source_state_json)
+        if previous_state is None:
+            logger.info(f"ADP Incremental: Data cache (generated {generated_at}) has no source state. A full refresh is needed.")
+            return None, None
+        if datetime.now() - previous_state['full_refresh_at'] > FULL_REFRESH_INTERVAL:
+            logger.info(f"ADP Incremental: Last full refresh at {previous_state['full_refresh_at']} is older than {FULL_REFRESH_INTERVAL}. A full refresh is needed.")
+            return None, None
+
+        source_state, finviz_fetch_times, master_update_times = await self._collect_source_state()
+        source_state['full_refresh_at'] = previous_state['full_refresh_at']
+
+        def changed_since(key: str) -> datetime:
+            # Rows after the watermark, and rows committed late (stamped within the overlap before the read)
+            watermark = previous_state.get(key)
+            return min(watermark, previous_state['read_at'] - INCREMENTAL_REFRESH_OVERLAP) if watermark else datetime.min
+
+        finviz_since = changed_since('finviz_fetched_at')
+        master_since = changed_since('master_updated_at')
+        changed_tickers = {ticker for ticker, ts in finviz_fetch_times.items() if ts and ts > finviz_since}
+        changed_tickers.update(ticker for ticker, ts in master_update_times.items() if ts and ts > master_since)
+        # Item tickers are NOCASE in the database; records are keyed by the ticker_master spelling
+        master_tickers_by_upper = {ticker.upper(): ticker for ticker in master_update_times}
+        for ticker in await self.yahoo_db_repo.get_tickers_with_data_items_fetched_since(changed_since('items_fetched_at')):
+            master_ticker = master_tickers_by_upper.get(ticker.upper())
+            if master_ticker:
+                changed_tickers.add(master_ticker)
+
+        record_tickers, cached = await self._cached_tickers(data_json)
+        if cached is None:
+            logger.warning("ADP Incremental: Cached data is not a list of ticker records. A full refresh is needed.")
+            return None, None
+        cached_tickers = set(record_tickers)
+        cached_tickers.discard(None)
+        all_tickers = set(finviz_fetch_times) | set(master_update_times)
+        changed_tickers.update(all_tickers - cached_tickers)
+        removed_tickers = cached_tickers - all_tickers
+
+        if len(changed_tickers) > INCREMENTAL_MAX_CHANGED_RATIO * len(all_tickers):
+            logger.info(f"ADP Incremental: {len(changed_tickers)} of {len(all_tickers)} tickers changed. A full refresh is needed.")
+            return None, None
+
+        changed_list = sorted(changed_tickers)
+        finviz_records: List[Dict[str, Any]] = []
+        yahoo_records: List[Dict[str, Any]] = []
+        if changed_list:
+            finviz_records = await self._load_finviz_data(tickers=[t for t in changed_list if t in finviz_fetch_times])
+            yahoo_tickers = [t for t in changed_list if t in master_update_times]
+            raw_yahoo_data = await self._load_yahoo_data(tickers=yahoo_tickers)
+            if yahoo_tickers and not raw_yahoo_data:
+                # _load_yahoo_data logs and returns [] on errors; patching would drop the Yahoo fields of these tickers
+                logger.warning(f"ADP Incremental: No Yahoo data loaded for {len(yahoo_tickers)} changed tickers. A full refresh is needed.")
+                return None, None
+            if raw_yahoo_data:
+                yahoo_records = await run_in_threadpool(self._transform_raw_yahoo_data, raw_yahoo_data)
+        new_records = {
+            record['ticker']: record
+            for record in await run_in_threadpool(self._merge_data, finviz_records, yahoo_records)
+        }
+
+        replaced_tickers = changed_tickers | removed_tickers
+        if isinstance(cached, analytics_store.AnalyticsDataset):
+            keep_rows = np.fromiter((i for i, ticker in enumerate(record_tickers) if ticker not in replaced_tickers), dtype=np.int64)
+            patch = analytics_store.DatasetPatch(cached, keep_rows, list(new_records.values()))
+            logger.info(f"ADP Incremental: Rebuilt {len(changed_tickers)} changed and dropped {len(removed_tickers)} removed tickers "
+                        f"of {len(all_tickers)} in {time.perf_counter() - start:.2f} s ({keep_rows.size} cached rows kept).")
+            return patch, source_state
+
+        analytics_data: List[Dict[str, Any]] = []
+        for record in cached:
+            ticker = record.get('ticker') if isinstance(record, dict) else None
+            if ticker in replaced_tickers:
+                new_record = new_records.pop(ticker, None)
+                if new_record is not None:
+                    analytics_data.append(new_record)
+            else:
+                analytics_data.append(record)
+        analytics_data.extend(new_records.values()) # Tickers not in the cache yet
+
+        logger.info(f"ADP Incremental: Rebuilt {len(changed_tickers)} changed and dropped {len(removed_tickers)} removed tickers "
+                    f"of {len(all_tickers)} in {time.perf_counter() - start:.2f} s.")
+        return analytics_data, source_state
+
+    async def force_refresh_data_cache(self, progress_callback: Optional[Callable] = None, full_refresh: bool = False) -> Optional[str]:
+        """
+        Refreshes the analytics data cache. Incremental (see _refresh_data_cache_incrementally) unless full_refresh is
+        set or the incremental refresh is not possible, in which case the whole dataset is rebuilt.
+        Errors are reported through progress_callback and the notification; returns the error message, or None.
+        """
+        logger.info(f"ADP: Starting data cache refresh process ({'full' if full_refresh else 'incremental if possible'})...")
         error: Optional[str] = None # Initialize error to None
         try:
-            # Use the internal helper that has progress reporting built-in
-            analytics_data, _ = await self._prepare_analytics_components(
-                create_original_data=True, 
-                create_metadata=False, 
-                progress_callback=progress_callback
-            )
+            analytics_data: Optional[Union[List[Dict[str, Any]], analytics_store.DatasetPatch]] = None
+            source_state: Optional[Dict[str, Any]] = None
+            if not full_refresh:
+                if progress_callback:
+                    cb_payload_incremental = {"type":"status", "task_name":"force_refresh_data_cache", "status":"running", "progress":5, "message": "Rebuilding the tickers changed since the last refresh..."}
+                    if asyncio.iscoroutinefunction(progress_callback): await progress_callback(cb_payload_incremental)
+                    else: progress_callback(cb_payload_incremental)
+                try:
+                    analytics_data, source_state = await self._refresh_data_cache_incrementally()
+                except Exception as e_incremental:
+                    logger.error(f"ADP: Incremental data cache refresh failed, falling back to a full refresh: {e_incremental}", exc_info=True)
+                    analytics_data, source_state = None, None
+
+            if analytics_data is None:
+                # Watermarks are read before the data, so rows written during the rebuild are picked up by the next refresh
+                try:
+                    source_state, _, _ = await self._collect_source_state()
+                    source_state['full_refresh_at'] = datetime.now()
+                except Exception as e_state:
+                    logger.error(f"ADP: Could not read the source state; the next refresh will be a full one: {e_state}", exc_info=True)
+                    source_state = None
+                # Use the internal helper that has progress reporting built-in
+                async with self._full_rebuild_source():
+                    analytics_data, _ = await self._prepare_analytics_components(
+                        create_original_data=True, 
+                        create_metadata=False, 
+                        progress_callback=progress_callback
+                    )
 
             if analytics_data is not None:
                 logger.info(f"ADP: Data generated for cache ({len(analytics_data)} records). Saving to DB...")
@@ -734,8 +909,7 @@ class AnalyticsDataProcessor:
                     if asyncio.iscoroutinefunction(progress_callback): await progress_callback(cb_payload_saving)
                     else: progress_callback(cb_payload_saving)
 
-                data_json = await run_in_threadpool(json.dumps, analytics_data, default=str) 
-                await self.db_repository.update_cached_analytics_data(data_json=data_json)
+                await self._save_data_cache(analytics_data, source_state)
                 logger.info("ADP: Data cache updated successfully.")
                 if progress_callback:
                     cb_payload_done = {"type":"status", "task_name":"force_refresh_data_cache", "status":"completed", "progress":100, "message": "Data cache refresh completed successfully."}
@@ -758,12 +932,16 @@ class AnalyticsDataProcessor:
         finally:
             logger.info("ADP: Data cache refresh process finished.")
             if progress_callback:
-                await progress_callback({"status": "finished", "progress": 100, "message": "Data cache refresh complete."})
+                cb_payload_finished = {"status": "finished", "progress": 100, "message": "Data cache refresh complete."}
+                if asyncio.iscoroutinefunction(progress_callback): await progress_callback(cb_payload_finished)
+                else: progress_callback(cb_payload_finished)
             
             summary_log = "Analytics data cache refreshed successfully." if error is None else f"Analytics data cache refresh failed: {error}"
             await dispatch_notification(db_repo=self.db_repository, task_id='scheduled_analytics_data_refresh', message=summary_log)
+        return error
 
-    async def force_refresh_metadata_cache(self, progress_callback: Optional[Callable] = None) -> None:
+    async def force_refresh_metadata_cache(self, progress_callback: Optional[Callable] = None) -> Optional[str]:
+        """Refreshes the analytics metadata cache. Returns the error message if the refresh failed, else None."""
         logger.info("ADP: Starting metadata cache refresh process...")
         error: Optional[str] = None # Initialize error to None
 
@@ -787,30 +965,45 @@ class AnalyticsDataProcessor:
                 data_json_from_cache, generated_at = cached_data_tuple
                 await _send_progress("running", 20, f"Data cache found (generated {generated_at}), deserializing...")
                 try:
-                    original_data_for_metadata = await run_in_threadpool(json.loads, data_json_from_cache)
-                    if not isinstance(original_data_for_metadata, list):
-                        logger.warning("ADP Metadata Refresh: Cached data is not a list. Fallback to fresh generation.")
-                        original_data_for_metadata = None 
-                        await _send_progress("warning", 25, "Cached data format error. Will generate fresh data.")
+                    store_version = analytics_store.parse_store_pointer(data_json_from_cache)
+                    if store_version:
+                        # Summarized from the store's columns, without building the records
+                        store_dir = analytics_store.store_dir_for_url(self.db_repository.database_url)
+                        dataset = await run_in_threadpool(analytics_store.open_dataset, store_dir, store_version)
+                        source_of_data = f"data_cache store version {store_version} (generated_at: {generated_at})"
+                        await _send_progress("running", 75, f"Generating metadata from {source_of_data} ({dataset.row_count} records)...")
+                        metadata_output = await run_in_threadpool(self._generate_field_metadata_from_dataset, dataset)
+                        await _send_progress("running", 85, f"Metadata generated ({len(metadata_output)} fields).")
                     else:
-                        logger.info(f"ADP Metadata Refresh: Successfully deserialized {len(original_data_for_metadata)} records from data cache.")
-                        source_of_data = f"data_cache (generated_at: {generated_at})"
-                        await _send_progress("running", 30, f"Using {len(original_data_for_metadata)} records from data cache.")
+                        original_data_for_metadata = await self._load_cached_records(data_json_from_cache)
+                        if not isinstance(original_data_for_metadata, list):
+                            logger.warning("ADP Metadata Refresh: Cached data is not a list. Fallback to fresh generation.")
+                            original_data_for_metadata = None 
+                            await _send_progress("warning", 25, "Cached data format error. Will generate fresh data.")
+                        else:
+                            logger.info(f"ADP Metadata Refresh: Successfully deserialized {len(original_data_for_metadata)} records from data cache.")
+                            source_of_data = f"data_cache (generated_at: {generated_at})"
+                            await _send_progress("running", 30, f"Using {len(original_data_for_metadata)} records from data cache.")
                 except json.JSONDecodeError as e_json:
                     logger.warning(f"ADP Metadata Refresh: JSONDecodeError for cached data: {e_json}. Fallback to fresh generation.")
                     original_data_for_metadata = None 
                     await _send_progress("warning", 25, f"Data cache JSON error: {e_json}. Will generate fresh data.")
+                except (OSError, ValueError) as e_store: # analytics_store version missing or unreadable
+                    logger.warning(f"ADP Metadata Refresh: Could not read the cached data store: {e_store}. Fallback to fresh generation.")
+                    original_data_for_metadata = None
+                    await _send_progress("warning", 25, f"Data cache store error: {e_store}. Will generate fresh data.")
             else:
                 logger.info("ADP Metadata Refresh: Data cache is empty. Will generate fresh data.")
                 await _send_progress("running", 20, "Data cache empty. Generating fresh data for metadata.")
 
-            if original_data_for_metadata is None: # Fallback to fresh generation
+            if original_data_for_metadata is None and metadata_output is None: # Fallback to fresh generation
                 await _send_progress("running", 30, "Generating fresh data and metadata via _prepare_analytics_components...")
-                fresh_original_data, fresh_metadata = await self._prepare_analytics_components(
-                    create_original_data=True,
-                    create_metadata=True, 
-                    progress_callback=progress_callback # Pass through for sub-component progress
-                )
+                async with self._full_rebuild_source():
+                    fresh_original_data, fresh_metadata = await self._prepare_analytics_components(
+                        create_original_data=True,
+                        create_metadata=True, 
+                        progress_callback=progress_callback # Pass through for sub-component progress
+                    )
                 metadata_output = fresh_metadata
                 original_data_for_metadata = fresh_original_data 
                 source_of_data = "freshly_generated"
@@ -824,11 +1017,11 @@ class AnalyticsDataProcessor:
                 metadata_output = await run_in_threadpool(self._generate_field_metadata, original_data_for_metadata)
                 await _send_progress("running", 85, f"Metadata generated ({len(metadata_output if metadata_output else {})} fields).")
             elif metadata_output is not None:
-                 logger.info(f"ADP Metadata Refresh: Using metadata directly generated by _prepare_analytics_components (source: {source_of_data}).")
+                 logger.info(f"ADP Metadata Refresh: Using metadata already generated (source: {source_of_data}).")
 
             if metadata_output is not None:
                 await _send_progress("saving_metadata", 90, f"Saving {len(metadata_output)} metadata fields to cache...")
-                metadata_json = await run_in_threadpool(json.dumps, metadata_output, default=str)
+                metadata_json = await run_in_threadpool(fastjson.dumps, metadata_output, default=str, allow_nan=True)
                 await self.db_repository.update_cached_analytics_metadata(metadata_json=metadata_json)
                 logger.info(f"ADP: Metadata cache updated successfully (source: {source_of_data}).")
                 await _send_progress("completed", 100, "Metadata cache refresh completed successfully.")
@@ -848,6 +1041,7 @@ class AnalyticsDataProcessor:
 
             summary_log = "Analytics metadata cache refreshed successfully." if error is None else f"Analytics metadata cache refresh failed: {error}"
             await dispatch_notification(db_repo=self.db_repository, task_id='scheduled_analytics_metadata_refresh', message=summary_log)
+        return error
 
 # Example usage (for testing, would not be here in production)
 # async def example_progress_reporter(status_update: Dict[str, Any]):
@@ -0,0 +1,278 @@
+"""
+Field metadata of the analytics dataset (cached_analytics_metadata, served with /api/v3/analytics/processed_data).
+
+Per field (every key of the records except 'ticker'), in field name order:
+    name, count                    count of the values that are not None, '' or '-' (after stripping)
+    type                           'empty' if there are none, else 'numeric' if any value converts with float()
+                                   (bools excepted, numeric strings included), else 'text', else 'boolean'
+    min/max/avg/median_value       of the numeric values other than NaN (present if there are numeric values; NaN
+                                   if they are all NaN)
+    unique_values_sample           up to MAX_UNIQUE_TEXT_SAMPLE_SIZE distinct non-numeric values as text
+    boolean_counts                 {'true', 'false'} (present if there are bools)
+
+The generator used to walk every value of every record in Python (str() twice and a float() inside a try per
+value, every number collected in a list and sorted, unbounded sets of texts). The values are now split into
+typed columns once and summarized with NumPy/pandas: numbers as float64 arrays, bools by count_nonzero, and
+strings factorized, so '', '-', numeric strings and texts are told apart once per distinct string. Columns of
+an analytics_store dataset are summarized straight from its arrays, without building the records.
+
+The result equals the old generator's, with two differences where its output depended on the order of a set or
+a sort: the sample holds the first distinct values met (was an arbitrary subset), and NaNs (counted, but unordered
+in its sort) are left out of min/max/avg/median.
+"""
+import json
+import math
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List
+
+import numpy as np
+import pandas as pd
+
+from .analytics_store import STATE_VALUE, AnalyticsDataset, Column
+
+MAX_UNIQUE_TEXT_SAMPLE_SIZE = 10
+
+_EMPTY_TEXTS = ('', '-')
+
+
+def _as_text(value: Any) -> str:
+    """A non-numeric value as it appears in unique_values_sample."""
+    if isinstance(value, str):
+        return value
+    if isinstance(value, (list, dict)):
+        try:
+            return json.dumps(value)
+        except TypeError:
+            return str(value)
+    return str(value)
+
+
+class FieldAccumulator(ABC):
+    """
+    Splits the values of one field into numbers, bools and texts, fed column-wise (whole columns or chunks of
+    them). Subclasses summarize them: _FieldSummary exactly, analytics_metadata_sketches.FieldSketch in bounded
+    memory.
+    """
+
+    __slots__ = ('name', 'count')
+
+    def __init__(self, name: str):
+        self.name = name
+        self.count = 0
+
+    @abstractmethod
+    def add_numbers(self, numbers: np.ndarray) -> None:
+        """Numeric values (float64)."""
+
+    @abstractmethod
+    def add_booleans(self, true_count: int, false_count: int) -> None:
+        """Counts of True and False values."""
+
+    @abstractmethod
+    def add_texts(self, count: int, distinct_texts: List[str]) -> None:
+        """count non-numeric values, of which distinct_texts are the distinct ones (as text)."""
+
+    @abstractmethod
+    def to_metadata(self) -> Dict[str, Any]:
+        """The field's metadata entry (see the module docstring)."""
+
+    def add_strings(self, strings: List[str]) -> None:
+        """Strings: each distinct one is classified once (empty, numeric or text) and weighted by its count."""
+        if not strings:
+            return
+        codes, distinct = pd.factorize(np.array(strings, dtype=object))
+        counts = np.bincount(codes, minlength=len(distinct)).tolist()
+        numbers: List[float] = []
+        number_counts: List[int] = []
+        texts: List[str] = []
+        text_count = 0
+        for string, count in zip(distinct.tolist(), counts):
+            if string.strip() in _EMPTY_TEXTS:
+                continue
+            try:
+                numbers.append(float(string))
+                number_counts.append(count)
+            except ValueError:
+                texts.append(string)
+                text_count += count
+        if numbers:
+            self.add_numbers(np.repeat(np.array(numbers, dtype=np.float64), number_counts))
+        self.add_texts(text_count, texts)
+
+    def add_values(self, values: List[Any]) -> None:
+        """Values of any types (None excluded)."""
+        if not values:
+            return
+        types = set(map(type, values))
+        if types <= {int, float}:
+            self.add_numbers(np.array(values, dtype=np.float64))
+            return
+        if types == {str}:
+            self.add_strings(values)
+            return
+        if types == {bool}:
+            true_count = int(np.count_nonzero(np.array(values, dtype=bool)))
+            self.add_booleans(true_count, len(values) - true_count)
+            return
+
+        numbers: List[Any] = []
+        strings: List[str] = []
+        true_count = false_count = 0
+        others: List[Any] = []
+        for value in values:
+            value_type = type(value)
+            if value_type is float or value_type is int:
+                numbers.append(value)
+            elif value_type is str:
+                strings.append(value)
+            elif value_type is bool:
+                if value:
+                    true_count += 1
+                else:
+                    false_count += 1
+            else:
+                others.append(value)
+        # Anything else (Decimal, datetime, list, dict, ...) the way the per-value generator handled it
+        other_texts: List[str] = []
+        for value in others:
+            if str(value).strip() in _EMPTY_TEXTS:
+                continue
+            try:
+                numbers.append(float(value))
+            except (ValueError, TypeError):
+                other_texts.append(_as_text(value))
+        if numbers:
+            self.add_numbers(np.array(numbers, dtype=np.float64))
+        self.add_booleans(true_count, false_count)
+        self.add_strings(strings)
+        self.add_texts(len(other_texts), list(dict.fromkeys(other_texts)))
+
+    def add_column(self, column: Column) -> None:
+        """Values of an analytics_store column (or a row range of one)."""
+        if column.kind in ('float', 'int'):
+            self.add_numbers(column.values[column.state == STATE_VALUE].astype(np.float64))
+        elif column.kind == 'bool':
+            values = column.values[column.state == STATE_VALUE]
+            true_count = int(np.count_nonzero(values))
+            self.add_booleans(true_count, int(values.size) - true_count)
+        else:
+            self.add_values([value for value in column.values if value is not None])
+
+
+class _FieldSummary(FieldAccumulator):
+    """Exact summary of one field (all numbers kept for the median)."""
+
+    __slots__ = ('numbers', 'sample', 'has_text', 'true_count', 'false_count', 'has_boolean')
+
+    def __init__(self, name: str):
+        super().__init__(name)
+        self.numbers: List[np.ndarray] = []
+        self.sample: Dict[str, None] = {} # Distinct texts in the order met, up to MAX_UNIQUE_TEXT_SAMPLE_SIZE
+        self.has_text = False
+        self.true_count = 0
+        self.false_count = 0
+        self.has_boolean = False
+
+    def _add_to_sample(self, texts) -> None:
+        for text in texts:
+            if len(self.sample) >= MAX_UNIQUE_TEXT_SAMPLE_SIZE:
+                return
+            self.sample.setdefault(text, None)
+
+    def add_numbers(self, numbers: np.ndarray) -> None:
+        if numbers.size:
+            self.count += int(numbers.size)
+            self.numbers.append(numbers)
+
+    def add_booleans(self, true_count: int, false_count: int) -> None:
+        if true_count or false_count:
+            self.count += true_count + false_count
+            self.has_boolean = True
+            self.true_count += true_count
+            self.false_count += false_count
+            self._add_to_sample(text for text, count in (('True', true_count), ('False', false_count)) if count)
+
+    def add_texts(self, count: int, distinct_texts: List[str]) -> None:
+        if count:
+            self.count += count
+            self.has_text = True
+            self._add_to_sample(distinct_texts)
+
+    def to_metadata(self) -> Dict[str, Any]:
+        entry: Dict[str, Any] = {"name": self.name, "count": self.count}
+        if not self.count:
+            entry["type"] = "empty"
+            return entry
+        if self.numbers:
+            entry["type"] = "numeric"
+        elif self.has_text:
+            entry["type"] = "text"
+        elif self.has_boolean:
+            entry["type"] = "boolean"
+        else:
+            entry["type"] = "unknown"
+
+        if self.numbers:
+            numbers = np.concatenate(self.numbers)
+            numbers = np.sort(numbers[~np.isnan(numbers)])
+            size = numbers.size
+            if not size: # Only NaNs
+                entry["min_value"] = entry["max_value"] = entry["avg_value"] = entry["median_value"] = math.nan
+            else:
+                entry["min_value"] = numbers[0].item()
+                entry["max_value"] = numbers[-1].item()
+                # Python's sum over the sorted values, so the average matches the per-value generator to the last bit
+                entry["avg_value"] = sum(numbers.tolist()) / size
+                middle = size // 2
+                entry["median_value"] = numbers[middle].item() if size % 2 else (numbers[middle - 1].item() + numbers[middle].item()) / 2.0
+
+        entry["unique_values_sample"] = list(self.sample)
+        if self.has_boolean:
+            entry["boolean_counts"] = {"true": self.true_count, "false": self.false_count}
+        return entry
+
+
+def _metadata_from_summaries(summaries: Dict[str, FieldAccumulator]) -> Dict[str, Dict[str, Any]]:
+    return {name: summaries[name].to_metadata() for name in sorted(summaries)}
+
+
+def records_to_columns(records: List[Dict[str, Any]]) -> Dict[str, List[Any]]:
+    """Values of each field of the records that are not None (fields in order of first appearance, no 'ticker';
+       a field whose values are all None has an empty list)."""
+    columns: Dict[str, List[Any]] = {}
+    for record in records:
+        if not isinstance(record, dict):
+            continue
+        for key, value in record.items():
+            values = columns.get(key)
+            if values is None:
+                values = columns[key] = []
+            if value is not None:
+                values.append(value)
+    columns.pop('ticker', None)
+    return columns
+
+
+def field_metadata_from_records(records: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """Field metadata of a list of records (see the module docstring)."""
+    if not records:
+        return {}
+    columns = records_to_columns(records)
+    summaries: Dict[str, FieldAccumulator] = {}
+    for name in list(columns):
+        summary = summaries[name] = _FieldSummary(name)
+        summary.add_values(columns.pop(name)) # Release each column once summarized
+    return _metadata_from_summaries(summaries)
+
+
+def field_metadata_from_dataset(dataset: AnalyticsDataset) -> Dict[str, Dict[str, Any]]:
+    """Field metadata of an analytics_store dataset, from its columns (equal to that of its records)."""
+    if not dataset.row_count:
+        return {}
+    summaries: Dict[str, FieldAccumulator] = {}
+    for name in dataset.column_names:
+        if name == 'ticker':
+            continue
+        summary = summaries[name] = _FieldSummary(name)
+        summary.add_column(dataset.column(name))
+    return _metadata_from_summaries(summaries)
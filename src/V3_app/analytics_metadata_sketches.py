@@ -0,0 +1,381 @@
+"""
+Field metadata of the analytics dataset from bounded-memory, mergeable sketches (the streaming alternative to the
+exact generator in analytics_field_metadata).
+
+The exact generator keeps every number of a field to sort it for the median and looks at every distinct text, so
+its memory grows with the dataset. With ANALYTICS_METADATA_SKETCHES=1 the metadata is built chunk by chunk into
+per-field sketches of fixed size instead:
+
+    count, min, max, avg           exact (running count/min/max/sum)
+    median_value                   QuantileSketch: log-bucketed counts (DDSketch) - the value returned is within
+                                   a relative error of ANALYTICS_METADATA_QUANTILE_ACCURACY (default 1%) of the
+                                   exact one, using at most QUANTILE_MAX_BINS buckets
+    unique_values_sample           BottomKSample: the distinct texts with the smallest hashes, i.e. a uniform
+                                   sample of the distinct values (instead of the first ones met)
+    unique_values_count            distinct texts: exact up to the sample size, else a HyperLogLog estimate
+                                   (standard error 1.04 / sqrt(2 ** HLL_PRECISION), 1.6% with 4096 registers)
+    type, boolean_counts           exact
+
+Every sketch merges with another one of the same configuration (bucket counts add, HLL registers take the
+maximum, bottom-k samples union), so sketches of chunks, or of slices built in parallel, combine into the sketch
+of the whole dataset (MetadataSketches.merge). Values cannot be removed from a sketch, so a dataset whose rows
+were replaced is sketched again. NaNs are counted but left out of min/max/avg/median, as in the exact generator.
+"""
+import math
+import os
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from .analytics_field_metadata import MAX_UNIQUE_TEXT_SAMPLE_SIZE, FieldAccumulator, records_to_columns
+from .analytics_store import AnalyticsDataset
+
+SKETCHES_ENABLED_ENV_VAR = "ANALYTICS_METADATA_SKETCHES"
+QUANTILE_ACCURACY_ENV_VAR = "ANALYTICS_METADATA_QUANTILE_ACCURACY"
+DEFAULT_QUANTILE_ACCURACY = 0.01
+# Buckets per quantile sketch; beyond this the buckets of the smallest magnitudes are folded together (the bound
+# then no longer holds for the lowest quantiles, the median is unaffected unless the values span > 1e17)
+QUANTILE_MAX_BINS = 2048
+# HyperLogLog registers = 2 ** HLL_PRECISION (one byte each)
+HLL_PRECISION = 12
+# Records (or dataset rows) sketched at a time
+SKETCH_CHUNK_SIZE = 5000
+
+
+def sketches_enabled() -> bool:
+    return os.environ.get(SKETCHES_ENABLED_ENV_VAR, "0").strip().lower() in ("1", "true", "yes", "on")
+
+
+def quantile_accuracy() -> float:
+    try:
+        accuracy = float(os.environ.get(QUANTILE_ACCURACY_ENV_VAR, DEFAULT_QUANTILE_ACCURACY))
+    except ValueError:
+        return DEFAULT_QUANTILE_ACCURACY
+    return accuracy if 0 < accuracy < 1 else DEFAULT_QUANTILE_ACCURACY
+
+
+def hash_texts(texts: List[str]) -> np.ndarray:
+    """Stable 64-bit hashes of texts (the same in every process, so sketches of different workers merge)."""
+    return pd.util.hash_array(np.array(texts, dtype=object))
+
+
+class QuantileSketch:
+    """
+    Relative-error quantile sketch (DDSketch). A value x > 0 is counted in bucket ceil(log(x) / log(gamma)) with
+    gamma = (1 + a) / (1 - a); every value in a bucket is within a relative error a of the bucket's estimate.
+    Negative values are bucketed by magnitude, zeros and infinities counted apart.
+    """
+
+    def __init__(self, relative_accuracy: float = DEFAULT_QUANTILE_ACCURACY, max_bins: int = QUANTILE_MAX_BINS):
+        self.relative_accuracy = relative_accuracy
+        self.max_bins = max_bins
+        self._gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self._gamma)
+        self.positive: Dict[int, int] = {}
+        self.negative: Dict[int, int] = {}
+        self.zero_count = 0
+        self.negative_infinity_count = 0
+        self.positive_infinity_count = 0
+        self.count = 0 # Values counted (NaNs are not)
+
+    def _add_to_store(self, store: Dict[int, int], magnitudes: np.ndarray) -> None:
+        if not magnitudes.size:
+            return
+        keys, counts = np.unique(np.ceil(np.log(magnitudes) / self._log_gamma).astype(np.int64), return_counts=True)
+        for key, count in zip(keys.tolist(), counts.tolist()):
+            store[key] = store.get(key, 0) + count
+
+    def add(self, values: np.ndarray) -> None:
+        values = values[~np.isnan(values)]
+        if not values.size:
+            return
+        self.count += int(values.size)
+        finite = np.isfinite(values)
+        if not finite.all():
+            self.negative_infinity_count += int(np.count_nonzero(values == -np.inf))
+            self.positive_infinity_count += int(np.count_nonzero(values == np.inf))
+            values = values[finite]
+        self._add_to_store(self.positive, values[values > 0])
+        self._add_to_store(self.negative, -values[values < 0])
+        self.zero_count += int(np.count_nonzero(values == 0))
+        self._collapse()
+
+    def merge(self, other: "QuantileSketch") -> None:
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError("Quantile sketches of different accuracies cannot be merged.")
+        for store, other_store in ((self.positive, other.positive), (self.negative, other.negative)):
+            for key, count in other_store.items():
+                store[key] = store.get(key, 0) + count
+        self.zero_count += other.zero_count
+        self.negative_infinity_count += other.negative_infinity_count
+        self.positive_infinity_count += other.positive_infinity_count
+        self.count += other.count
+        self._collapse()
+
+    def _collapse(self) -> None:
+        """Folds the buckets of the smallest magnitudes of the larger store into one while there are too many."""
+        excess = len(self.positive) + len(self.negative) - self.max_bins
+        if excess <= 0:
+            return
+        store = self.positive if len(self.positive) >= len(self.negative) else self.negative
+        folded = sorted(store)[:excess + 1]
+        store[folded[-1]] += sum(store.pop(key) for key in folded[:-1])
+
+    def _bucket_value(self, key: int) -> float:
+        return 2 * math.exp(key * self._log_gamma) / (self._gamma + 1)
+
+    def values_at_ranks(self, ranks: List[int]) -> List[float]:
+        """Estimates of the values at 0-based ranks of the sorted values (ranks < count)."""
+        # Buckets in value order: -inf, negatives (largest magnitude first), 0, positives, +inf
+        values = [-math.inf]
+        counts = [self.negative_infinity_count]
+        for key in sorted(self.negative, reverse=True):
+            values.append(-self._bucket_value(key))
+            counts.append(self.negative[key])
+        values.append(0.0)
+        counts.append(self.zero_count)
+        for key in sorted(self.positive):
+            values.append(self._bucket_value(key))
+            counts.append(self.positive[key])
+        values.append(math.inf)
+        counts.append(self.positive_infinity_count)
+        cumulative = np.cumsum(counts)
+        return [values[int(index)] for index in np.searchsorted(cumulative, ranks, side='right')]
+
+
+class HyperLogLog:
+    """HyperLogLog distinct counter over 64-bit hashes (2 ** precision one-byte registers)."""
+
+    def __init__(self, precision: int = HLL_PRECISION):
+        self.precision = precision
+        self.registers = np.zeros(1 << precision, dtype=np.uint8)
+
+    def add_hashes(self, hashes: np.ndarray) -> None:
+        if not hashes.size:
+            return
+        hashes = hashes.astype(np.uint64, copy=False)
+        value_bits = 64 - self.precision
+        indexes = (hashes >> np.uint64(value_bits)).astype(np.int64)
+        remainder = hashes & np.uint64((1 << value_bits) - 1)
+        # Bit length of the remainder, by binary search on the shift (exact for 64-bit values)
+        bit_length = np.zeros(hashes.size, dtype=np.int64)
+        for shift in (32, 16, 8, 4, 2, 1):
+            high = remainder >= np.uint64(1 << shift)
+            bit_length[high] += shift
+            remainder = np.where(high, remainder >> np.uint64(shift), remainder)
+        bit_length += (remainder > 0)
+        ranks = (value_bits - bit_length + 1).astype(np.uint8) # Position of the first 1 bit
+        np.maximum.at(self.registers, indexes, ranks)
+
+    def merge(self, other: "HyperLogLog") -> None:
+        if other.precision != self.precision:
+            raise ValueError("HyperLogLogs of different precisions cannot be merged.")
+        np.maximum(self.registers, other.registers, out=self.registers)
+
+    def estimate(self) -> float:
+        registers = self.registers.size
+        alpha = 0.7213 / (1 + 1.079 / registers)
+        raw = alpha * registers * registers / float(np.sum(np.ldexp(1.0, -self.registers.astype(np.int64))))
+        empty = int(np.count_nonzero(self.registers == 0))
+        if raw <= 2.5 * registers and empty:
+            return registers * math.log(registers / empty) # Linear counting for small cardinalities
+        return raw
+
+
+class BottomKSample:
+    """The k distinct texts with the smallest hashes: a uniform sample of the distinct texts, mergeable."""
+
+    def __init__(self, size: int = MAX_UNIQUE_TEXT_SAMPLE_SIZE):
+        self.size = size
+        self.items: Dict[int, str] = {} # hash -> text
+        self.overflowed = False # True once a distinct text was left out (items then is not every distinct text)
+
+    def _keep_smallest(self) -> None:
+        if len(self.items) > self.size:
+            self.overflowed = True
+            self.items = dict(sorted(self.items.items())[:self.size])
+
+    def add(self, hashes: np.ndarray, texts: List[str]) -> None:
+        if len(texts) > self.size:
+            self.overflowed = True
+            candidates = np.argpartition(hashes, self.size)[:self.size]
+        else:
+            candidates = range(len(texts))
+        for index in candidates:
+            self.items.setdefault(int(hashes[index]), texts[index])
+        self._keep_smallest()
+
+    def merge(self, other: "BottomKSample") -> None:
+        self.overflowed = self.overflowed or other.overflowed
+        for key, text in other.items.items():
+            self.items.setdefault(key, text)
+        self._keep_smallest()
+
+    def values(self) -> List[str]:
+        return [self.items[key] for key in sorted(self.items)]
+
+
+class FieldSketch(FieldAccumulator):
+    """Bounded-memory summary of one field (see the module docstring)."""
+
+    __slots__ = ('has_number', 'number_count', 'number_sum', 'min_value', 'max_value', 'quantiles', 'distinct', 'sample',
+                 'has_text', 'true_count', 'false_count', 'has_boolean')
+
+    def __init__(self, name: str, relative_accuracy: float = DEFAULT_QUANTILE_ACCURACY):
+        super().__init__(name)
+        self.has_number = False
+        self.number_count = 0 # Numbers other than NaN
+        self.number_sum = 0.0
+        self.min_value = math.inf
+        self.max_value = -math.inf
+        self.quantiles = QuantileSketch(relative_accuracy)
+        self.distinct = HyperLogLog()
+        self.sample = BottomKSample()
+        self.has_text = False
+        self.true_count = 0
+        self.false_count = 0
+        self.has_boolean = False
+
+    def _add_distinct_texts(self, texts: List[str]) -> None:
+        hashes = hash_texts(texts)
+        self.distinct.add_hashes(hashes)
+        self.sample.add(hashes, texts)
+
+    def add_numbers(self, numbers: np.ndarray) -> None:
+        if not numbers.size:
+            return
+        self.count += int(numbers.size)
+        self.has_number = True
+        # NaN would make np.min/np.max/np.sum NaN, and min()/max() then ignore the whole chunk
+        numbers = numbers[~np.isnan(numbers)]
+        if not numbers.size:
+            return
+        self.number_count += int(numbers.size)
+        self.number_sum += float(np.sum(numbers))
+        self.min_value = min(self.min_value, float(np.min(numbers)))
+        self.max_value = max(self.max_value, float(np.max(numbers)))
+        self.quantiles.add(numbers)
+
+    def add_booleans(self, true_count: int, false_count: int) -> None:
+        if true_count or false_count:
+            self.count += true_count + false_count
+            self.has_boolean = True
+            self.true_count += true_count
+            self.false_count += false_count
+            self._add_distinct_texts([text for text, count in (('True', true_count), ('False', false_count)) if count])
+
+    def add_texts(self, count: int, distinct_texts: List[str]) -> None:
+        if count:
+            self.count += count
+            self.has_text = True
+            self._add_distinct_texts(distinct_texts)
+
+    def merge(self, other: "FieldSketch") -> None:
+        self.count += other.count
+        self.has_number = self.has_number or other.has_number
+        self.number_count += other.number_count
+        self.number_sum += other.number_sum
+        self.min_value = min(self.min_value, other.min_value)
+        self.max_value = max(self.max_value, other.max_value)
+        self.quantiles.merge(other.quantiles)
+        self.distinct.merge(other.distinct)
+        self.sample.merge(other.sample)
+        self.has_text = self.has_text or other.has_text
+        self.true_count += other.true_count
+        self.false_count += other.false_count
+        self.has_boolean = self.has_boolean or other.has_boolean
+
+    def _median(self) -> float:
+        size = self.quantiles.count
+        if not size:
+            return math.nan
+        middle = size // 2
+        ranks = [middle] if size % 2 else [middle - 1, middle]
+        estimates = [min(max(value, self.min_value), self.max_value) for value in self.quantiles.values_at_ranks(ranks)]
+        return estimates[0] if size % 2 else (estimates[0] + estimates[1]) / 2.0
+
+    def to_metadata(self) -> Dict[str, Any]:
+        entry: Dict[str, Any] = {"name": self.name, "count": self.count}
+        if not self.count:
+            entry["type"] = "empty"
+            return entry
+        if self.has_number:
+            entry["type"] = "numeric"
+        elif self.has_text:
+            entry["type"] = "text"
+        elif self.has_boolean:
+            entry["type"] = "boolean"
+        else:
+            entry["type"] = "unknown"
+
+        if self.number_count:
+            entry["min_value"] = self.min_value
+            entry["max_value"] = self.max_value
+            entry["avg_value"] = self.number_sum / self.number_count
+            entry["median_value"] = self._median()
+        elif self.has_number: # Only NaNs
+            entry["min_value"] = entry["max_value"] = entry["avg_value"] = entry["median_value"] = math.nan
+
+        sample = self.sample.values()
+        entry["unique_values_sample"] = sample
+        entry["unique_values_count"] = round(self.distinct.estimate()) if self.sample.overflowed else len(sample)
+        if self.has_boolean:
+            entry["boolean_counts"] = {"true": self.true_count, "false": self.false_count}
+        return entry
+
+
+class MetadataSketches:
+    """Field sketches of a dataset, updated chunk by chunk; sketches of parts of a dataset merge into its sketches."""
+
+    def __init__(self, relative_accuracy: Optional[float] = None):
+        self.relative_accuracy = relative_accuracy or quantile_accuracy()
+        self.fields: Dict[str, FieldSketch] = {}
+        self.record_count = 0
+
+    def _field(self, name: str) -> FieldSketch:
+        sketch = self.fields.get(name)
+        if sketch is None:
+            sketch = self.fields[name] = FieldSketch(name, self.relative_accuracy)
+        return sketch
+
+    def update_records(self, records: List[Dict[str, Any]]) -> None:
+        """Adds a chunk of records."""
+        self.record_count += len(records)
+        for name, values in records_to_columns(records).items():
+            self._field(name).add_values(values)
+
+    def update_dataset(self, dataset: AnalyticsDataset, chunk_size: int = SKETCH_CHUNK_SIZE) -> None:
+        """Adds the rows of an analytics_store dataset, chunk_size rows of each column at a time."""
+        self.record_count += dataset.row_count
+        names = [name for name in dataset.column_names if name != 'ticker']
+        for name in names:
+            self._field(name)
+        for start in range(0, dataset.row_count, chunk_size):
+            for name in names:
+                self.fields[name].add_column(dataset.column(name, start, start + chunk_size))
+
+    def merge(self, other: "MetadataSketches") -> None:
+        self.record_count += other.record_count
+        for name, sketch in other.fields.items():
+            self._field(name).merge(sketch)
+
+    def to_metadata(self) -> Dict[str, Dict[str, Any]]:
+        if not self.record_count:
+            return {}
+        return {name: self.fields[name].to_metadata() for name in sorted(self.fields)}
+
+
+def sketch_field_metadata_from_records(records: List[Dict[str, Any]], chunk_size: int = SKETCH_CHUNK_SIZE) -> Dict[str, Dict[str, Any]]:
+    """Field metadata of a list of records from sketches, chunk_size records at a time."""
+    sketches = MetadataSketches()
+    for start in range(0, len(records), chunk_size):
+        sketches.update_records(records[start:start + chunk_size])
+    return sketches.to_metadata()
+
+
+def sketch_field_metadata_from_dataset(dataset: AnalyticsDataset, chunk_size: int = SKETCH_CHUNK_SIZE) -> Dict[str, Dict[str, Any]]:
+    """Field metadata of an analytics_store dataset from sketches, chunk_size rows at a time."""
+    sketches = MetadataSketches()
+    sketches.update_dataset(dataset, chunk_size)
+    return sketches.to_metadata()
@@ -0,0 +1,461 @@
+"""
+Columnar store of the analytics dataset (the merged Finviz + Yahoo records of AnalyticsDataProcessor).
+
+The data cache used to be one JSON text row in cached_analytics_data, which every /api/v3/analytics/processed_data
+request parsed into a list of dicts and serialized again. The dataset is now written as a version directory:
+
+    <store dir>/<version>/manifest.json   row count and, per field, its kind and the location of its arrays
+    <store dir>/<version>/data.bin        the arrays, 8-byte aligned, memory-mapped on read
+
+Each field (fv_*, yf_tm_*, yf_item_*, ...) is a column with a state array (int8 per record: STATE_ABSENT when the
+record has no such key, STATE_NULL for None, STATE_VALUE) and typed values:
+    'float' float64, 'int' int64, 'bool' uint8    one value per record (0 where there is none)
+    'str'   UTF-8 bytes + int64 offsets (record i is bytes[offsets[i]:offsets[i + 1]])
+    'json'  like 'str', each value JSON-encoded (columns mixing types, e.g. numbers and 'N/A')
+Values that are not JSON types (datetimes from the database) are stored as str(value), as json.dumps(default=str)
+wrote them into the old blob. A column mixing ints and floats is 'float', so its ints come back as floats.
+
+An incremental refresh writes its version with write_patched_dataset: the unchanged rows of the current version
+are copied column by column (array slices, no records are built) and the rebuilt records are appended.
+
+cached_analytics_data.data_json then holds a pointer to the current version (store_pointer), written in the same
+transaction as its source state, so readers see either the old or the new version. The newest VERSIONS_KEPT
+versions are kept (a reader may still stream an older one). Rows whose data_json is a JSON list are the old
+format and are still read until the next refresh replaces them. Databases that are not files (in-memory) keep
+the JSON list.
+
+The store directory is ANALYTICS_STORE_DIR_ENV_VAR or an 'analytics_store' folder next to the database.
+"""
+import logging
+import mmap
+import os
+import shutil
+import time
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Union
+
+import numpy as np
+from sqlalchemy.engine import make_url
+
+from . import fastjson
+from .db_engine_registry import is_sqlite_file_url
+
+logger = logging.getLogger(__name__)
+
+STORE_FORMAT = "analytics_store"
+STORE_FORMAT_VERSION = 1
+ANALYTICS_STORE_DIR_ENV_VAR = "ANALYTICS_STORE_DIR"
+MANIFEST_FILE = "manifest.json"
+DATA_FILE = "data.bin"
+# Versions kept in the store directory (the current one and the ones before it)
+VERSIONS_KEPT = 3
+# Records materialized at a time when a dataset is read as dicts
+RECORD_CHUNK_SIZE = 1000
+
+STATE_ABSENT = 0
+STATE_NULL = 1
+STATE_VALUE = 2
+
+_ALIGNMENT = 8
+_INT64_MIN, _INT64_MAX = -2**63, 2**63 - 1
+_NUMPY_DTYPES = {'float': np.float64, 'int': np.int64, 'bool': np.uint8}
+
+
+def store_dir_for_url(database_url: str) -> Optional[str]:
+    """Store directory of a database, or None if the database is not a SQLite file."""
+    if not is_sqlite_file_url(database_url):
+        return None
+    db_path = make_url(database_url).database
+    return os.environ.get(ANALYTICS_STORE_DIR_ENV_VAR) or os.path.join(os.path.dirname(os.path.abspath(db_path)), "analytics_store")
+
+
+def store_pointer(version: str, row_count: int) -> str:
+    """data_json of cached_analytics_data for a store version."""
+    return fastjson.dumps({'format': STORE_FORMAT, 'version': version, 'row_count': row_count})
+
+
+def parse_store_pointer(data_json: Optional[str]) -> Optional[str]:
+    """Version named by a store_pointer, or None if data_json is a JSON list (old format) or empty."""
+    if not data_json or not data_json.lstrip().startswith('{'):
+        return None
+    pointer = fastjson.loads(data_json)
+    if isinstance(pointer, dict) and pointer.get('format') == STORE_FORMAT:
+        return pointer.get('version')
+    return None
+
+
+# --- Writing ---
+def _column_kind(values: List[Any]) -> str:
+    """Kind of a column from its non-null values (see the module docstring)."""
+    types = {type(value) for value in values}
+    if types <= {bool}:
+        return 'bool'
+    if types <= {int}:
+        return 'int' if all(_INT64_MIN <= value <= _INT64_MAX for value in values) else 'json'
+    if types <= {int, float}:
+        return 'float'
+    if types <= {str}:
+        return 'str'
+    return 'json'
+
+
+def _storable(value: Any) -> Any:
+    if value is None or isinstance(value, (bool, int, float, str, list, dict)):
+        return value
+    return str(value)
+
+
+def _encode_texts(texts: Sequence[bytes], rows: Sequence[int], row_count: int):
+    """Offsets (int64, row_count + 1) and concatenated bytes of texts at rows (other rows are empty)."""
+    lengths = np.zeros(row_count, dtype=np.int64)
+    lengths[list(rows)] = [len(text) for text in texts]
+    offsets = np.zeros(row_count + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    return offsets, np.frombuffer(b''.join(texts), dtype=np.uint8)
+
+
+def _build_column(name: str, rows: List[int], values: List[Any], row_count: int) -> Dict[str, Any]:
+    """Arrays of one column from its (row, value) pairs."""
+    state = np.zeros(row_count, dtype=np.int8)
+    state[rows] = STATE_NULL
+    value_rows = [row for row, value in zip(rows, values) if value is not None]
+    present = [value for value in values if value is not None]
+    state[value_rows] = STATE_VALUE
+
+    kind = _column_kind(present)
+    arrays = {'state': state}
+    if kind in _NUMPY_DTYPES:
+        column_values = np.zeros(row_count, dtype=_NUMPY_DTYPES[kind])
+        column_values[value_rows] = present
+        arrays['values'] = column_values
+    else:
+        if kind == 'str':
+            try:
+                texts = [value.encode('utf-8') for value in present]
+            except UnicodeEncodeError: # Lone surrogates; JSON escapes them
+                kind = 'json'
+        if kind == 'json':
+            texts = [fastjson.dumps_bytes(value, allow_nan=True) for value in present]
+        arrays['offsets'], arrays['values'] = _encode_texts(texts, value_rows, row_count)
+    return {'name': name, 'kind': kind, 'arrays': arrays}
+
+
+def _collect_columns(records: Sequence[Dict[str, Any]], first_row: int = 0):
+    """Per column of the records, the rows that have the key (from first_row on) and their storable values
+       (columns in order of first appearance)."""
+    column_rows: Dict[str, List[int]] = {}
+    column_values: Dict[str, List[Any]] = {}
+    for row, record in enumerate(records, start=first_row):
+        for key, value in record.items():
+            rows = column_rows.get(key)
+            if rows is None:
+                rows = column_rows[key] = []
+                column_values[key] = []
+            rows.append(row)
+            column_values[key].append(_storable(value))
+    return column_rows, column_values
+
+
+def _write_version(store_dir: str, row_count: int, columns: Iterator[Dict[str, Any]]) -> str:
+    """
+    Writes the columns (dicts from _build_column) as a new version of the store and returns the version name. The
+    version directory is written under a temporary name and renamed when complete, so a version that exists is
+    always whole.
+    """
+    version = f"{datetime.now().strftime('%Y%m%d%H%M%S%f')}-{uuid.uuid4().hex[:8]}" # Sorts by creation time
+    os.makedirs(store_dir, exist_ok=True)
+    temp_dir = os.path.join(store_dir, f".{version}.tmp")
+    os.makedirs(temp_dir)
+    try:
+        columns_manifest = []
+        with open(os.path.join(temp_dir, DATA_FILE), 'wb') as data_file:
+            for column in columns:
+                entry = {'name': column['name'], 'kind': column['kind']}
+                for part, array in column['arrays'].items():
+                    padding = -data_file.tell() % _ALIGNMENT
+                    data_file.write(b'\0' * padding)
+                    entry[part] = [data_file.tell(), int(array.size)]
+                    data_file.write(array.tobytes())
+                columns_manifest.append(entry)
+            data_file.flush()
+            os.fsync(data_file.fileno())
+        manifest = {
+            'format': STORE_FORMAT,
+            'format_version': STORE_FORMAT_VERSION,
+            'version': version,
+            'generated_at': datetime.now(),
+            'row_count': row_count,
+            'columns': columns_manifest
+        }
+        with open(os.path.join(temp_dir, MANIFEST_FILE), 'wb') as manifest_file:
+            manifest_file.write(fastjson.dumps_bytes(manifest))
+        os.replace(temp_dir, os.path.join(store_dir, version))
+    except Exception:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+        raise
+    return version
+
+
+def write_dataset(records: List[Dict[str, Any]], store_dir: str) -> str:
+    """Writes records as a new version of the store and returns the version name (see _write_version)."""
+    start = time.perf_counter()
+    row_count = len(records)
+    column_rows, column_values = _collect_columns(records)
+
+    def columns() -> Iterator[Dict[str, Any]]:
+        for name in column_rows:
+            column = _build_column(name, column_rows[name], column_values[name], row_count)
+            column_values[name] = None # Release the values as soon as they are written
+            yield column
+
+    version = _write_version(store_dir, row_count, columns())
+    logger.info(f"[Analytics Store] Wrote version {version}: {row_count} records, {len(column_rows)} columns, "
+                f"{os.path.getsize(os.path.join(store_dir, version, DATA_FILE)) / 1024**2:.1f} MB in {time.perf_counter() - start:.2f} s.")
+    return version
+
+
+def remove_old_versions(store_dir: str, current_version: str, keep: int = VERSIONS_KEPT) -> List[str]:
+    """Removes all but the newest `keep` versions (never current_version) and leftover temporary directories."""
+    if not os.path.isdir(store_dir):
+        return []
+    names = sorted(name for name in os.listdir(store_dir) if os.path.isdir(os.path.join(store_dir, name)))
+    versions = [name for name in names if not name.startswith('.')]
+    stale = [name for name in versions[:-keep] if name != current_version] if keep > 0 else []
+    stale += [name for name in names if name.startswith('.') and name.endswith('.tmp') and name != f".{current_version}.tmp"]
+    removed = []
+    for name in stale:
+        try:
+            shutil.rmtree(os.path.join(store_dir, name))
+            removed.append(name)
+        except OSError as e: # e.g. still memory-mapped by a reader on Windows; retried after the next refresh
+            logger.warning(f"[Analytics Store] Could not remove version {name}: {e}")
+    if removed:
+        logger.info(f"[Analytics Store] Removed {len(removed)} old version(s) from {store_dir}.")
+    return removed
+
+
+# --- Reading ---
+@dataclass
+class Column:
+    """One field of a dataset. values is a read-only ndarray for 'float'/'int'/'bool' columns and a list of the
+       decoded values (None where state is not STATE_VALUE) for 'str'/'json' columns."""
+    name: str
+    kind: str
+    state: np.ndarray
+    values: Union[np.ndarray, List[Any]]
+
+
+class AnalyticsDataset:
+    """A memory-mapped store version. Arrays are views of the mapping, so only the pages read are loaded."""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(os.path.join(path, MANIFEST_FILE), 'rb') as manifest_file:
+            manifest = fastjson.loads(manifest_file.read())
+        if manifest.get('format') != STORE_FORMAT or manifest.get('format_version') != STORE_FORMAT_VERSION:
+            raise ValueError(f"{path} is not an {STORE_FORMAT} version {STORE_FORMAT_VERSION} directory.")
+        self.version: str = manifest['version']
+        self.generated_at: Optional[str] = manifest.get('generated_at')
+        self.row_count: int = manifest['row_count']
+        self._columns: Dict[str, Dict[str, Any]] = {column['name']: column for column in manifest['columns']}
+        with open(os.path.join(path, DATA_FILE), 'rb') as data_file:
+            size = os.fstat(data_file.fileno()).st_size
+            # mmap cannot map an empty file (a dataset without records)
+            self._buffer = mmap.mmap(data_file.fileno(), 0, access=mmap.ACCESS_READ) if size else b''
+
+    @property
+    def column_names(self) -> List[str]:
+        return list(self._columns)
+
+    def _array(self, location: List[int], dtype) -> np.ndarray:
+        offset, count = location
+        return np.frombuffer(self._buffer, dtype=dtype, count=count, offset=offset) if count else np.zeros(0, dtype=dtype)
+
+    def _texts(self, column: Dict[str, Any], start: int, stop: int, state: np.ndarray) -> List[Any]:
+        """Decoded values of a 'str'/'json' column for rows start..stop (None where there is no value)."""
+        offsets = self._array(column['offsets'], np.int64)[start:stop + 1].tolist()
+        base = offsets[0]
+        data = self._array(column['values'], np.uint8)[base:offsets[-1]].tobytes()
+        decode = fastjson.loads if column['kind'] == 'json' else (lambda text: text.decode('utf-8'))
+        return [
+            decode(data[offsets[i] - base:offsets[i + 1] - base]) if row_state == STATE_VALUE else None
+            for i, row_state in enumerate(state.tolist())
+        ]
+
+    def column(self, name: str, start: int = 0, stop: Optional[int] = None) -> Column:
+        """A column, or its rows start..stop (KeyError if the dataset has no such field)."""
+        column = self._columns[name]
+        stop = self.row_count if stop is None else min(stop, self.row_count)
+        state = self._array(column['state'], np.int8)[start:stop]
+        if column['kind'] in _NUMPY_DTYPES:
+            values = self._array(column['values'], _NUMPY_DTYPES[column['kind']])[start:stop]
+        else:
+            values = self._texts(column, start, stop, state)
+        return Column(name, column['kind'], state, values)
+
+    def iter_record_chunks(self, fields: Optional[Sequence[str]] = None, chunk_size: int = RECORD_CHUNK_SIZE) -> Iterator[List[Dict[str, Any]]]:
+        """
+        Yields the records as lists of up to chunk_size dicts, equal to the records that were written (keys in
+        column order). fields limits the records to these keys ('ticker' is always included).
+        """
+        if fields is None:
+            columns = list(self._columns.values())
+        else:
+            wanted = set(fields) | {'ticker'}
+            columns = [column for name, column in self._columns.items() if name in wanted]
+        for start in range(0, self.row_count, chunk_size):
+            stop = min(start + chunk_size, self.row_count)
+            records: List[Dict[str, Any]] = [{} for _ in range(stop - start)]
+            for column in columns:
+                state = self._array(column['state'], np.int8)[start:stop]
+                present = np.flatnonzero(state)
+                if not present.size:
+                    continue
+                name = column['name']
+                if column['kind'] in _NUMPY_DTYPES:
+                    values = self._array(column['values'], _NUMPY_DTYPES[column['kind']])[start:stop].tolist()
+                    if column['kind'] == 'bool':
+                        values = [bool(value) for value in values]
+                    if (state[present] == STATE_NULL).any():
+                        values = [value if row_state == STATE_VALUE else None for value, row_state in zip(values, state.tolist())]
+                else:
+                    values = self._texts(column, start, stop, state)
+                for i in present.tolist():
+                    records[i][name] = values[i]
+            yield records
+
+    def to_records(self) -> List[Dict[str, Any]]:
+        return [record for chunk in self.iter_record_chunks() for record in chunk]
+
+
+# Open datasets by path, so requests share one mapping per version (older versions are dropped from here and
+# unmapped once their last reader is done)
+_open_datasets: Dict[str, AnalyticsDataset] = {}
+_OPEN_DATASETS_KEPT = 2
+
+
+def open_dataset(store_dir: str, version: str) -> AnalyticsDataset:
+    """The dataset of a version (FileNotFoundError if it does not exist)."""
+    path = os.path.join(store_dir, version)
+    dataset = _open_datasets.get(path)
+    if dataset is None:
+        dataset = AnalyticsDataset(path)
+        _open_datasets[path] = dataset
+        while len(_open_datasets) > _OPEN_DATASETS_KEPT:
+            _open_datasets.pop(next(iter(_open_datasets)))
+    return dataset
+
+
+# --- Patching ---
+@dataclass
+class DatasetPatch:
+    """
+    A new version described relative to an existing one: the rows keep_rows (ascending row numbers) of base,
+    followed by records. len() is the row count of the new version.
+    """
+    base: AnalyticsDataset
+    keep_rows: np.ndarray
+    records: List[Dict[str, Any]] = field(default_factory=list)
+
+    def __len__(self) -> int:
+        return int(self.keep_rows.size) + len(self.records)
+
+
+def _gather_texts(offsets: np.ndarray, data: np.ndarray, rows: np.ndarray):
+    """Offsets (len(rows) + 1) and bytes of the text values at rows (ascending), copied one run of consecutive
+       rows at a time (a patch keeps long runs, so this is a handful of slices)."""
+    lengths = offsets[rows + 1] - offsets[rows]
+    gathered_offsets = np.zeros(rows.size + 1, dtype=np.int64)
+    np.cumsum(lengths, out=gathered_offsets[1:])
+    if not rows.size:
+        return gathered_offsets, np.zeros(0, dtype=np.uint8)
+    breaks = np.flatnonzero(np.diff(rows) != 1)
+    run_starts = np.concatenate(([0], breaks + 1)).tolist()
+    run_ends = np.concatenate((breaks, [rows.size - 1])).tolist()
+    pieces = [data[offsets[rows[first]]:offsets[rows[last] + 1]] for first, last in zip(run_starts, run_ends)]
+    return gathered_offsets, np.concatenate(pieces)
+
+
+def _patch_column(base: AnalyticsDataset, name: str, keep_rows: np.ndarray, rows: List[int], values: List[Any],
+                  row_count: int) -> Dict[str, Any]:
+    """
+    Arrays of one column of a patched version: the kept base rows' arrays, sliced, then the appended records'
+    (row, value) pairs. Falls back to decoding the kept values and _build_column if the appended values do not
+    fit the base column's kind (e.g. text arriving in a numeric column).
+    """
+    base_column = base._columns[name]
+    kind = base_column['kind']
+    kept = int(keep_rows.size)
+    present = [value for value in values if value is not None]
+    value_rows = [row for row, value in zip(rows, values) if value is not None]
+    added_kind = _column_kind(present) if present else kind
+    if added_kind != kind and {added_kind, kind} == {'int', 'float'}:
+        added_kind = kind = 'float'
+    elif kind == 'json' and added_kind in ('str', 'json'): # A 'json' column holds any values
+        added_kind = 'json'
+    texts = None
+    if added_kind == kind and kind in ('str', 'json'):
+        try:
+            texts = [value.encode('utf-8') if kind == 'str' else fastjson.dumps_bytes(value, allow_nan=True) for value in present]
+        except UnicodeEncodeError: # Lone surrogates; only a 'json' column can hold them
+            added_kind = 'json'
+    if added_kind != kind:
+        base_values = base.column(name)
+        kept_state = base_values.state[keep_rows].tolist()
+        kept_values = base_values.values[keep_rows].tolist() if isinstance(base_values.values, np.ndarray) else [base_values.values[row] for row in keep_rows.tolist()]
+        if base_column['kind'] == 'bool':
+            kept_values = [bool(value) for value in kept_values]
+        merged_rows = [row for row, row_state in enumerate(kept_state) if row_state != STATE_ABSENT] + rows
+        merged_values = [value if row_state == STATE_VALUE else None for value, row_state in zip(kept_values, kept_state) if row_state != STATE_ABSENT] + values
+        return _build_column(name, merged_rows, merged_values, row_count)
+
+    state = np.zeros(row_count, dtype=np.int8)
+    state[:kept] = base._array(base_column['state'], np.int8)[keep_rows]
+    state[rows] = STATE_NULL
+    state[value_rows] = STATE_VALUE
+    arrays = {'state': state}
+    if kind in _NUMPY_DTYPES:
+        column_values = np.zeros(row_count, dtype=_NUMPY_DTYPES[kind])
+        column_values[:kept] = base._array(base_column['values'], _NUMPY_DTYPES[base_column['kind']])[keep_rows]
+        column_values[value_rows] = present
+        arrays['values'] = column_values
+    else:
+        kept_offsets, kept_data = _gather_texts(
+            base._array(base_column['offsets'], np.int64), base._array(base_column['values'], np.uint8), keep_rows
+        )
+        added_offsets, added_data = _encode_texts(texts, [row - kept for row in value_rows], row_count - kept)
+        arrays['offsets'] = np.concatenate((kept_offsets, kept_offsets[-1] + added_offsets[1:]))
+        arrays['values'] = np.concatenate((kept_data, added_data))
+    return {'name': name, 'kind': kind, 'arrays': arrays}
+
+
+def write_patched_dataset(patch: DatasetPatch, store_dir: str) -> str:
+    """
+    Writes a DatasetPatch as a new version of the store and returns the version name. Work and memory scale with
+    the appended records plus one array copy per column; the kept rows are never turned into records. Records
+    come back in the new row order (kept rows first), with the same values as write_dataset would store.
+    """
+    start = time.perf_counter()
+    base, keep_rows = patch.base, np.asarray(patch.keep_rows, dtype=np.int64)
+    kept = int(keep_rows.size)
+    row_count = len(patch)
+    column_rows, column_values = _collect_columns(patch.records, first_row=kept)
+    names = base.column_names + [name for name in column_rows if name not in base._columns]
+
+    def columns() -> Iterator[Dict[str, Any]]:
+        for name in names:
+            rows, values = column_rows.get(name, []), column_values.get(name, [])
+            if name in base._columns:
+                column = _patch_column(base, name, keep_rows, rows, values, row_count)
+            else:
+                column = _build_column(name, rows, values, row_count)
+            column_values[name] = None
+            if column['arrays']['state'].any(): # Columns only the dropped rows had are left out
+                yield column
+
+    version = _write_version(store_dir, row_count, columns())
+    logger.info(f"[Analytics Store] Wrote version {version} from {base.version}: {kept} rows kept, {len(patch.records)} records "
+                f"appended, {os.path.getsize(os.path.join(store_dir, version, DATA_FILE)) / 1024**2:.1f} MB in {time.perf_counter() - start:.2f} s.")
+    return version
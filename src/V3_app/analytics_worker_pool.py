@@ -0,0 +1,355 @@
+"""
+Persistent process pool for the analytics cache refresh jobs, with deduplication and progress relay.
+
+Each refresh used to create its own ProcessPoolExecutor(max_workers=1): every job paid for a new process that
+imported pandas, yfinance, SQLAlchemy and the app modules and built new database engines, and it ran without a
+progress callback, so the UI only learned about it from the logs. The analytics_worker_pool is started with
+the app instead:
+
+- ANALYTICS_WORKER_PROCESSES workers (default 1, so the heavy refreshes run one at a time) are spawned at
+  startup and import WARM_MODULES in their initializer. Each keeps one event loop for its lifetime
+  (run_job_coroutine), so the imported modules and the engine objects of the engine registry persist across
+  jobs. The engines use NullPool, so each job still opens its own SQLite connections.
+- Jobs wait in a FIFO queue. Submitting a job identical to one that is still waiting (same job type, worker
+  function and arguments) returns the waiting job instead of queueing another; a job that is already running
+  does not count, as it may have read its data before the request.
+- Workers report progress with report_progress (the progress_callback of the refresh) through a
+  multiprocessing queue; a relay thread hands the events to the event loop, which keeps the latest state of
+  each job (jobs(), job()) and publishes it to listeners (the WebSocket broadcast) and subscribers (the SSE
+  stream of /api/analytics/cache/jobs/events). Intermediate progress is throttled to one event per
+  PROGRESS_MIN_INTERVAL_SECONDS per job.
+- A job fails if its worker function raises (the message becomes the job's error) or returns False; the refresh
+  worker functions raise when the refresh reported an error.
+
+    job, queued = await analytics_worker_pool.submit("analytics_data_cache_refresh", worker_func, db_url, full)
+
+Events are dicts: {"event": "analytics_job", "job": <job state>, "progress": <payload of the refresh or None>}.
+"""
+import asyncio
+import importlib
+import inspect
+import itertools
+import logging
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+WORKER_PROCESSES_ENV_VAR = "ANALYTICS_WORKER_PROCESSES"
+DEFAULT_WORKER_PROCESSES = 1
+# Imported by each worker when it starts (the modules of the refresh jobs and, through them, pandas, yfinance and
+# SQLAlchemy), relative to this package
+WARM_MODULES = ("analytics_data_processor", "V3_backend_api")
+PROGRESS_MIN_INTERVAL_SECONDS = 0.5
+# Progress payloads with these statuses (or with a current/total count) are throttled; others are always relayed
+THROTTLED_PROGRESS_STATUSES = {"running", "processing"}
+# Finished jobs kept for jobs()/job()
+JOB_HISTORY_SIZE = 50
+SUBSCRIBER_QUEUE_SIZE = 1000
+
+EVENT_TYPE = "analytics_job"
+
+
+def worker_processes() -> int:
+    try:
+        return max(1, int(os.environ.get(WORKER_PROCESSES_ENV_VAR, DEFAULT_WORKER_PROCESSES)))
+    except ValueError:
+        return DEFAULT_WORKER_PROCESSES
+
+
+# --- Worker side (runs in the pool processes) ---
+_progress_queue = None
+_worker_loop: Optional[asyncio.AbstractEventLoop] = None
+_current_job_id: Optional[str] = None
+_last_progress_sent = 0.0
+
+
+def _initialize_worker(progress_queue, warm_modules: Tuple[str, ...]) -> None:
+    """Initializer of the pool processes: keeps the progress queue and imports the warm modules."""
+    global _progress_queue
+    _progress_queue = progress_queue
+    # Spawned processes do not inherit the app's logging configuration
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    start = time.perf_counter()
+    for module_name in warm_modules:
+        try:
+            importlib.import_module(module_name)
+        except Exception as e:
+            logger.warning(f"[Analytics Workers] Worker {os.getpid()} could not import {module_name}: {e}")
+    logger.info(f"[Analytics Workers] Worker {os.getpid()} ready ({time.perf_counter() - start:.2f} s to import {len(warm_modules)} module(s)).")
+
+
+def _ping() -> int:
+    return os.getpid()
+
+
+def run_job_coroutine(coroutine: Awaitable[Any]) -> Any:
+    """
+    Runs a coroutine of a job. In a pool worker it runs on the worker's event loop, which outlives the job so that
+    the engines created in it can be reused; elsewhere (a worker function called directly) with asyncio.run.
+    """
+    global _worker_loop
+    if _progress_queue is None:
+        return asyncio.run(coroutine)
+    if _worker_loop is None or _worker_loop.is_closed():
+        _worker_loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(_worker_loop)
+    return _worker_loop.run_until_complete(coroutine)
+
+
+def report_progress(payload: Dict[str, Any]) -> None:
+    """
+    progress_callback for the refresh jobs: relays the payload to the app (a no-op outside a pool job). Synchronous
+    and thread-safe, as the refreshes also report from threadpool threads.
+    """
+    global _last_progress_sent
+    if _progress_queue is None or _current_job_id is None or not isinstance(payload, dict):
+        return
+    now = time.monotonic()
+    if payload.get("status") in THROTTLED_PROGRESS_STATUSES or "current" in payload:
+        if now - _last_progress_sent < PROGRESS_MIN_INTERVAL_SECONDS:
+            return
+    _last_progress_sent = now
+    try:
+        _progress_queue.put({"job_id": _current_job_id, "payload": payload})
+    except Exception as e: # Progress is best effort, the job goes on
+        logger.debug(f"[Analytics Workers] Could not relay progress: {e}")
+
+
+def _run_job(job_id: str, worker_func: Callable[..., Any], args: Tuple[Any, ...]) -> Any:
+    """Runs a job in a pool worker, with report_progress attributing the job's progress to job_id."""
+    global _current_job_id, _last_progress_sent
+    _current_job_id, _last_progress_sent = job_id, 0.0
+    try:
+        return worker_func(*args)
+    finally:
+        _current_job_id = None
+
+
+# --- App side ---
+@dataclass
+class AnalyticsJob:
+    job_id: str
+    job_type: str
+    key: Tuple[Any, ...] = field(repr=False)
+    status: str = "queued" # queued -> running -> completed / failed
+    submitted_at: datetime = field(default_factory=datetime.now)
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    progress: Optional[Dict[str, Any]] = None # Latest progress payload of the job
+    error: Optional[str] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.job_id,
+            "job_type": self.job_type,
+            "status": self.status,
+            "submitted_at": self.submitted_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "progress": self.progress,
+            "error": self.error,
+        }
+
+
+class AnalyticsWorkerPool:
+    """The pool of the app (module-level analytics_worker_pool); see the module docstring."""
+
+    def __init__(self):
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._context = multiprocessing.get_context("spawn") # Workers do not inherit the app's engines and threads
+        self._progress_queue = None
+        self._relay_thread: Optional[threading.Thread] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._dispatchers: List[asyncio.Task] = []
+        self._warm_up_task: Optional[asyncio.Task] = None
+        self._pending: Dict[Tuple[Any, ...], AnalyticsJob] = {}
+        self._jobs: "OrderedDict[str, AnalyticsJob]" = OrderedDict()
+        self._listeners: List[Callable[[Dict[str, Any]], Any]] = []
+        self._subscribers: Set[asyncio.Queue] = set()
+        self._workers = 0
+
+    @property
+    def started(self) -> bool:
+        return self._executor is not None
+
+    def _new_executor(self) -> ProcessPoolExecutor:
+        warm_modules = tuple(f"{__package__}.{name}" if __package__ else name for name in WARM_MODULES)
+        return ProcessPoolExecutor(max_workers=self._workers, mp_context=self._context,
+                                   initializer=_initialize_worker, initargs=(self._progress_queue, warm_modules))
+
+    async def start(self, workers: Optional[int] = None) -> "AnalyticsWorkerPool":
+        """Starts the workers (in the background) and the job dispatchers. No-op if already started."""
+        if self.started:
+            return self
+        self._loop = asyncio.get_running_loop()
+        self._workers = workers or worker_processes()
+        self._progress_queue = self._context.Queue()
+        self._executor = self._new_executor()
+        self._queue = asyncio.Queue()
+        self._relay_thread = threading.Thread(target=self._relay_progress, name="analytics-progress-relay", daemon=True)
+        self._relay_thread.start()
+        self._dispatchers = [asyncio.create_task(self._dispatch(), name=f"analytics-job-dispatcher-{i}") for i in range(self._workers)]
+        self._warm_up_task = asyncio.create_task(self._warm_up())
+        logger.info(f"[Analytics Workers] Pool started with {self._workers} worker process(es).")
+        return self
+
+    async def _warm_up(self) -> None:
+        """Spawns every worker now (running the initializer) rather than on the first job."""
+        start = time.perf_counter()
+        try:
+            pids = await asyncio.gather(*(asyncio.wrap_future(self._executor.submit(_ping)) for _ in range(self._workers)))
+            logger.info(f"[Analytics Workers] Workers {sorted(set(pids))} warm after {time.perf_counter() - start:.2f} s.")
+        except Exception as e:
+            logger.warning(f"[Analytics Workers] Warm-up failed: {e}", exc_info=True)
+
+    async def stop(self) -> None:
+        """Stops the dispatchers and the workers (a running job is not waited for)."""
+        if not self.started:
+            return
+        for task in itertools.chain(self._dispatchers, [self._warm_up_task] if self._warm_up_task else []):
+            task.cancel()
+        await asyncio.gather(*self._dispatchers, return_exceptions=True)
+        self._dispatchers = []
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self._executor = None
+        self._progress_queue.put(None) # Ends the relay thread
+        await asyncio.to_thread(self._relay_thread.join, 5)
+        self._pending.clear()
+        logger.info("[Analytics Workers] Pool stopped.")
+
+    async def submit(self, job_type: str, worker_func: Callable[..., Any], *args: Any) -> Tuple[AnalyticsJob, bool]:
+        """
+        Queues worker_func(*args) (a top-level function, run in a worker) and returns (job, True), or (job, False)
+        with the identical job that is still waiting. Starts the pool if needed.
+        """
+        await self.start()
+        key = (job_type, worker_func.__module__, worker_func.__qualname__, repr(args))
+        pending = self._pending.get(key)
+        if pending is not None:
+            logger.info(f"[Analytics Workers] {job_type} job {pending.job_id} is already waiting; not queueing another.")
+            return pending, False
+        job = AnalyticsJob(job_id=uuid.uuid4().hex[:12], job_type=job_type, key=key)
+        self._pending[key] = job
+        self._remember(job)
+        await self._queue.put((job, worker_func, args))
+        logger.info(f"[Analytics Workers] Queued {job_type} job {job.job_id} ({self._queue.qsize()} waiting).")
+        self._publish(job)
+        return job, True
+
+    def _remember(self, job: AnalyticsJob) -> None:
+        self._jobs[job.job_id] = job
+        while len(self._jobs) > JOB_HISTORY_SIZE:
+            oldest_id = next((job_id for job_id, old in self._jobs.items() if old.finished_at), None)
+            if oldest_id is None:
+                break
+            del self._jobs[oldest_id]
+
+    async def _dispatch(self) -> None:
+        """Hands queued jobs to the workers, one at a time per dispatcher (one dispatcher per worker)."""
+        while True:
+            job, worker_func, args = await self._queue.get()
+            self._pending.pop(job.key, None)
+            job.status, job.started_at = "running", datetime.now()
+            self._publish(job)
+            executor = self._executor
+            try:
+                result = await asyncio.wrap_future(executor.submit(_run_job, job.job_id, worker_func, args))
+                job.status = "failed" if result is False else "completed"
+            except asyncio.CancelledError:
+                job.status, job.error = "failed", "Cancelled (pool stopped)"
+                raise
+            except BrokenProcessPool as e:
+                # A worker died (e.g. killed for memory); the executor cannot be used any more
+                job.status, job.error = "failed", f"Worker process died: {e}"
+                logger.error(f"[Analytics Workers] {job.job_type} job {job.job_id}: worker process died. Restarting the pool.")
+                if self._executor is executor: # Not yet replaced by another dispatcher
+                    executor.shutdown(wait=False, cancel_futures=True)
+                    self._executor = self._new_executor()
+            except Exception as e:
+                job.status, job.error = "failed", str(e)
+                logger.error(f"[Analytics Workers] {job.job_type} job {job.job_id} failed: {e}", exc_info=True)
+            finally:
+                job.finished_at = datetime.now()
+                if self._loop is not None and not self._loop.is_closed():
+                    self._publish(job)
+            logger.info(f"[Analytics Workers] {job.job_type} job {job.job_id} {job.status} in {(job.finished_at - job.started_at).total_seconds():.1f} s.")
+
+    def _relay_progress(self) -> None:
+        """Relay thread: moves worker progress events from the multiprocessing queue to the event loop."""
+        while True:
+            try:
+                event = self._progress_queue.get()
+            except (EOFError, OSError):
+                return
+            if event is None:
+                return
+            try:
+                self._loop.call_soon_threadsafe(self._on_progress, event)
+            except RuntimeError: # Loop closed
+                return
+
+    def _on_progress(self, event: Dict[str, Any]) -> None:
+        job = self._jobs.get(event.get("job_id"))
+        if job is None:
+            return
+        job.progress = event.get("payload")
+        self._publish(job, job.progress)
+
+    # --- Observers ---
+    def add_listener(self, listener: Callable[[Dict[str, Any]], Any]) -> None:
+        """Calls listener(event) for every event (coroutine functions are scheduled as tasks)."""
+        self._listeners.append(listener)
+
+    def subscribe(self) -> asyncio.Queue:
+        """Queue receiving every event from now on (the oldest events are dropped if it is not consumed)."""
+        queue: asyncio.Queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self._subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue) -> None:
+        self._subscribers.discard(queue)
+
+    def _publish(self, job: AnalyticsJob, progress: Optional[Dict[str, Any]] = None) -> None:
+        event = {"event": EVENT_TYPE, "job": job.to_dict(), "progress": progress}
+        for queue in list(self._subscribers):
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(event)
+        for listener in self._listeners:
+            try:
+                result = listener(event)
+                if inspect.isawaitable(result):
+                    asyncio.ensure_future(result)
+            except Exception as e:
+                logger.warning(f"[Analytics Workers] Event listener failed: {e}")
+
+    # --- State ---
+    def jobs(self) -> List[Dict[str, Any]]:
+        """Known jobs (waiting, running and the last finished ones), oldest first."""
+        return [job.to_dict() for job in self._jobs.values()]
+
+    def job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        job = self._jobs.get(job_id)
+        return job.to_dict() if job else None
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "started": self.started,
+            "workers": self._workers,
+            "waiting": len(self._pending),
+            "running": sum(1 for job in self._jobs.values() if job.status == "running"),
+        }
+
+
+analytics_worker_pool = AnalyticsWorkerPool()
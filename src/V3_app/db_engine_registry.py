@@ -0,0 +1,237 @@
+"""
+Process-wide registry of SQLAlchemy async engines and session factories.
+
+Repositories used to call create_async_engine on every construction, which meant a new
+engine (and connection pool) per request that was never disposed. The registry hands out
+one shared engine and session factory per database URL instead. It is attached to the app
+in the startup hook and disposed in the shutdown hook.
+
+Each SQLite file gets two connection profiles (CONNECTION_PROFILES), applied as PRAGMAs on connect:
+    - writer: WAL journal, synchronous=NORMAL, incremental auto-vacuum. get_engine()/get_session_factory(); used for writes.
+    - reader: query_only, large mmap, in-memory temp store, on a separate engine.
+      get_read_engine()/get_read_session_factory(); repository read methods use it.
+In WAL mode readers work from the last committed snapshot, so analytics scans are not blocked
+by a mass fetch committing (and do not block it). In-memory databases share one engine.
+
+Both engines use NullPool for aiosqlite files (a connection per checkout): pooled aiosqlite
+connections are bound to the event loop that opened them and keep a non-daemon worker thread alive
+until disposed, which would break the process-pool workers (a new loop per task) and hang scripts
+that exit without disposing. create_engine_for_url passes it explicitly, since SQLAlchemy's default
+pool class for SQLite files differs between releases. Memory-mapped pages are shared through the OS page cache.
+The reader profile therefore sets no cache_size: a private page cache would be dropped with its
+connection after every checkout and only add setup cost.
+"""
+import logging
+import os
+import threading
+from typing import Dict, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool
+
+logger = logging.getLogger(__name__)
+
+# PRAGMAs applied to every new SQLite connection of a profile (in this order)
+CONNECTION_PROFILES: Dict[str, Dict[str, object]] = {
+    'writer': {
+        # Only takes effect for a new file (before its first table) or at the next VACUUM; see db_optimizer
+        'auto_vacuum': 'INCREMENTAL',
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',  # Durable at checkpoints; safe against corruption in WAL mode
+        'busy_timeout': 30000,
+    },
+    'reader': {
+        'query_only': 'ON',
+        'busy_timeout': 30000,
+        'mmap_size': 268435456,  # 256 MB memory-mapped reads for large scans
+        'temp_store': 'MEMORY',  # Sorts/temp b-trees of GROUP BY and ORDER BY stay in memory
+    },
+}
+
+
+def is_sqlite_file_url(database_url: str) -> bool:
+    """True for SQLite URLs backed by a file (profiles and the separate read engine only apply to these)."""
+    url = make_url(database_url)
+    return url.get_backend_name() == 'sqlite' and url.database not in (None, '', ':memory:') and 'mode=memory' not in str(url)
+
+
+def create_engine_for_url(database_url: str) -> AsyncEngine:
+    """create_async_engine with NullPool for SQLite files (see the module docstring). Other URLs keep the
+       dialect's default pool; in-memory SQLite needs it to keep its single connection (and data).
+    """
+    if is_sqlite_file_url(database_url):
+        return create_async_engine(database_url, poolclass=NullPool)
+    return create_async_engine(database_url)
+
+
+def apply_connection_profile(engine: AsyncEngine, profile: str) -> AsyncEngine:
+    """Registers a connect hook that applies the profile's PRAGMAs to each new connection of the engine."""
+    pragmas = CONNECTION_PROFILES[profile]
+
+    @event.listens_for(engine.sync_engine, "connect")
+    def _apply_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas.items():
+                cursor.execute(f"PRAGMA {name}={value}")
+        finally:
+            cursor.close()
+    return engine
+
+
+class EngineRegistry:
+    def __init__(self):
+        """Initialize an empty registry for the current process."""
+        self._engines: Dict[str, AsyncEngine] = {}
+        self._session_factories: Dict[str, async_sessionmaker] = {}
+        self._read_engines: Dict[str, AsyncEngine] = {}
+        self._read_session_factories: Dict[str, async_sessionmaker] = {}
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+        logger.info("EngineRegistry initialized")
+
+    def _check_process(self) -> None:
+        """Drop engines inherited from a parent process (e.g. a forked process-pool worker).
+
+        Pooled connections belong to the parent's event loop and must not be reused here.
+        They are discarded without being disposed, since the parent still owns them.
+        """
+        current_pid = os.getpid()
+        if current_pid != self._pid:
+            logger.info(f"EngineRegistry: process changed ({self._pid} -> {current_pid}). Discarding inherited engines.")
+            self._engines = {}
+            self._session_factories = {}
+            self._read_engines = {}
+            self._read_session_factories = {}
+            self._pid = current_pid
+
+    def get_engine(self, database_url: str) -> AsyncEngine:
+        """
+        Get the shared async (writer profile) engine for a database URL, creating it on first use.
+
+        Args:
+            database_url: SQLAlchemy database URL (e.g. 'sqlite+aiosqlite:///path/to.db')
+
+        Returns:
+            The AsyncEngine shared by every repository using this URL
+        """
+        with self._lock:
+            self._check_process()
+            engine = self._engines.get(database_url)
+            if engine is None:
+                engine = create_engine_for_url(database_url)
+                if is_sqlite_file_url(database_url):
+                    apply_connection_profile(engine, 'writer')
+                self._engines[database_url] = engine
+                logger.info(f"EngineRegistry: created engine for {database_url}. Engines registered: {len(self._engines)}")
+            return engine
+
+    def get_session_factory(self, database_url: str) -> async_sessionmaker:
+        """
+        Get the shared session factory for a database URL.
+
+        Args:
+            database_url: SQLAlchemy database URL
+
+        Returns:
+            An async_sessionmaker bound to the shared engine (expire_on_commit=False)
+        """
+        engine = self.get_engine(database_url)
+        with self._lock:
+            factory = self._session_factories.get(database_url)
+            if factory is None:
+                factory = async_sessionmaker(
+                    bind=engine,
+                    expire_on_commit=False,
+                    class_=AsyncSession
+                )
+                self._session_factories[database_url] = factory
+            return factory
+
+    def get_read_engine(self, database_url: str) -> AsyncEngine:
+        """
+        Get the shared read-only (reader profile) engine for a database URL, creating it on first use.
+
+        Args:
+            database_url: SQLAlchemy database URL
+
+        Returns:
+            The reader AsyncEngine, or the writer engine for in-memory/non-SQLite databases
+        """
+        if not is_sqlite_file_url(database_url):
+            return self.get_engine(database_url)
+        with self._lock:
+            self._check_process()
+            engine = self._read_engines.get(database_url)
+            if engine is None:
+                engine = create_engine_for_url(database_url)
+                apply_connection_profile(engine, 'reader')
+                self._read_engines[database_url] = engine
+                logger.info(f"EngineRegistry: created read engine for {database_url}")
+            return engine
+
+    def get_read_session_factory(self, database_url: str) -> async_sessionmaker:
+        """
+        Get the shared session factory of the read engine. Sessions from it cannot write (query_only).
+
+        Args:
+            database_url: SQLAlchemy database URL
+
+        Returns:
+            An async_sessionmaker bound to the read engine (expire_on_commit=False)
+        """
+        engine = self.get_read_engine(database_url)
+        if engine is self.get_engine(database_url):
+            return self.get_session_factory(database_url)
+        with self._lock:
+            factory = self._read_session_factories.get(database_url)
+            if factory is None:
+                factory = async_sessionmaker(
+                    bind=engine,
+                    expire_on_commit=False,
+                    class_=AsyncSession
+                )
+                self._read_session_factories[database_url] = factory
+            return factory
+
+    async def dispose(self, database_url: Optional[str] = None) -> None:
+        """
+        Dispose registered engines and close their pooled connections.
+
+        Args:
+            database_url: Dispose only this URL's engine. If None, dispose all engines.
+        """
+        with self._lock:
+            self._check_process()
+            engines = []
+            for registry, factories in ((self._engines, self._session_factories), (self._read_engines, self._read_session_factories)):
+                if database_url is None:
+                    urls = list(registry.keys())
+                else:
+                    urls = [database_url] if database_url in registry else []
+                engines.extend((url, registry.pop(url)) for url in urls)
+                for url in urls:
+                    factories.pop(url, None)
+
+        for url, engine in engines:
+            try:
+                await engine.dispose()
+                logger.info(f"EngineRegistry: disposed engine for {url}")
+            except Exception as e:
+                logger.error(f"EngineRegistry: error disposing engine for {url}: {e}", exc_info=True)
+
+    def get_stats(self) -> Dict[str, int]:
+        """Get registry statistics."""
+        with self._lock:
+            return {
+                'engines': len(self._engines),
+                'session_factories': len(self._session_factories),
+                'read_engines': len(self._read_engines),
+                'read_session_factories': len(self._read_session_factories)
+            }
+
+
+# Create a singleton instance
+engine_registry = EngineRegistry()
@@ -1,17 +1,50 @@
 """
 Module for database maintenance tasks, such as cleaning up invalid records.
+
+One-off commands can be run from the project root, e.g.:
+    python -m src.V3_app.db_maintenance backfill-data-values
+    python -m src.V3_app.db_maintenance compress-payloads --codec zlib
+    python -m src.V3_app.db_maintenance migrate
+    python -m src.V3_app.db_maintenance verify-schema   (exit status 1 if it finds problems)
+    python -m src.V3_app.db_maintenance rebuild-field-catalog
+    python -m src.V3_app.db_maintenance scan-invalid-records --threshold 0.7 [--delete]
+    python -m src.V3_app.db_maintenance optimize [--time-budget 60]
+    python -m src.V3_app.db_maintenance enable-incremental-vacuum   (app stopped; rewrites the file once)
 """
+import argparse
+import asyncio
 import logging
-from typing import List, Dict, Any, Optional
+import multiprocessing
+import os
+import sys
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable, List, Dict, Any, Optional, Tuple
 import json
-from datetime import datetime
+from datetime import datetime, timedelta
 
-from .yahoo_repository import YahooDataRepository
+from .yahoo_repository import (
+    YahooDataRepository, DATA_VALUES_BACKFILL_BATCH_SIZE, PAYLOAD_MIGRATION_BATCH_SIZE, DATA_ITEMS_PAGE_SIZE, DELETE_CHUNK_SIZE
+)
+from . import fastjson
+from .payload_codec import PAYLOAD_CODECS, decode_payload, set_write_codec
+from .db_engine_registry import engine_registry
+from .db_migrations import apply_migrations
+from .db_optimizer import OPTIMIZE_TIME_BUDGET_SECONDS, enable_incremental_vacuum
+from .V3_database import SQLiteRepository
+from .yahoo_models import YahooTickerMasterModel
 
 logger = logging.getLogger(__name__)
 
 # --- CONFIGURATION ---
 INVALID_THRESHOLD_PERCENT = 0.70  # 70%
+# ticker_data_items rows per scan page. The scan holds at most two pages: the one being evaluated
+# in the worker process and the next one being read.
+INVALID_SCAN_PAGE_SIZE = DATA_ITEMS_PAGE_SIZE
+# Finished background scans (start_invalid_records_scan) kept with their results
+INVALID_SCAN_HISTORY_SIZE = 5
 
 def _is_value_empty(value: Any) -> bool:
     """Checks if a value is considered empty (None, empty string, etc.)."""
@@ -24,16 +57,120 @@ def _is_value_empty(value: Any) -> bool:
         return True
     return False
 
+def _evaluate_payload_emptiness(rows: List[Tuple[int, Any]], threshold: float) -> Dict[str, List[Any]]:
+    """
+    Worker-process half of the ticker_data_items scan: decodes each stored payload and applies the emptiness rule.
+
+    Args:
+        rows: (data_item_id, payload as stored) pairs, see YahooDataRepository.get_data_items_page(raw_payload=True).
+        threshold: Minimum share of empty payload fields for an item to be flagged.
+
+    Returns:
+        {'flagged': [(data_item_id, empty_fields, total_fields), ...], 'unparseable': [data_item_id, ...]}
+    """
+    flagged = []
+    unparseable = []
+    for data_item_id, stored_payload in rows:
+        try:
+            payload_str = decode_payload(stored_payload)
+            if not payload_str:
+                continue
+            payload_dict = fastjson.loads(payload_str)
+        except (json.JSONDecodeError, ValueError, RuntimeError):
+            unparseable.append(data_item_id)
+            continue
+        if not isinstance(payload_dict, dict) or not payload_dict:
+            continue  # Skip non-dict or empty dict payloads
+
+        total_fields = len(payload_dict)
+        empty_fields = sum(1 for value in payload_dict.values() if _is_value_empty(value))
+        if empty_fields / total_fields >= threshold:
+            flagged.append((data_item_id, empty_fields, total_fields))
+    return {'flagged': flagged, 'unparseable': unparseable}
+
+async def _scan_data_items(
+    repo: YahooDataRepository,
+    threshold: float,
+    key_date_from: Optional[datetime],
+    key_date_before: Optional[datetime],
+    invalid_items: List[Dict[str, Any]],
+    progress_callback: Optional[Callable[[Dict[str, Any]], None]],
+    page_size: int,
+    use_worker_process: bool
+) -> int:
+    """
+    Walks ticker_data_items in keyset pages (date range pushed into the query) and appends the flagged items to
+    invalid_items. Payloads are decoded and evaluated in a worker process while the next page is read, so the
+    event loop only moves bytes. The worker is spawned, not forked: the scan runs inside the app, whose
+    aiosqlite, write coordinator and scheduler threads a forked child would inherit mid-operation (the same
+    reason analytics_worker_pool spawns). Returns the number of rows scanned.
+    """
+    loop = asyncio.get_running_loop()
+    executor = ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) if use_worker_process else None
+    rows_scanned = 0
+
+    async def evaluate(page_rows):
+        pairs = [(row['data_item_id'], row.pop('item_data_payload')) for row in page_rows]
+        if executor is None:
+            return _evaluate_payload_emptiness(pairs, threshold)
+        return await loop.run_in_executor(executor, _evaluate_payload_emptiness, pairs, threshold)
+
+    try:
+        rows, cursor = await repo.get_data_items_page(None, page_size, key_date_from, key_date_before, raw_payload=True)
+        while rows:
+            evaluation = asyncio.ensure_future(evaluate(rows))
+            # Read the next page while the worker evaluates this one
+            next_rows, next_cursor = (await repo.get_data_items_page(cursor, page_size, key_date_from, key_date_before, raw_payload=True)
+                                      if cursor is not None else ([], None))
+            result = await evaluation
+
+            rows_by_id = {row['data_item_id']: row for row in rows}
+            for data_item_id, empty_fields, total_fields in result['flagged']:
+                record = rows_by_id[data_item_id]
+                invalid_items.append({
+                    "primary_key": data_item_id,
+                    "ticker": record.get("ticker"),
+                    "item_key_date": record.get("item_key_date"),
+                    "reason": f"{empty_fields / total_fields:.0%} of payload fields are empty ({empty_fields}/{total_fields}).",
+                    "details": record  # The item's columns for context (the payload is not echoed back)
+                })
+            for data_item_id in result['unparseable']:
+                logger.warning(f"Could not parse item_data_payload for data_item_id: {data_item_id}.")
+
+            rows_scanned += len(rows)
+            progress = {
+                "table": "ticker_data_items",
+                "rows_scanned": rows_scanned,
+                "invalid_found": len(invalid_items),
+                "last_data_item_id": rows[-1]['data_item_id']
+            }
+            logger.info(f"Scanned {rows_scanned} 'ticker_data_items' rows (up to data_item_id {progress['last_data_item_id']}), "
+                        f"{len(invalid_items)} invalid so far.")
+            if progress_callback:
+                progress_callback(progress)
+            rows, cursor = next_rows, next_cursor
+    finally:
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+    return rows_scanned
+
 async def find_invalid_records(
     repo: YahooDataRepository,
     threshold: float,
     start_date_str: Optional[str],
-    end_date_str: Optional[str]
+    end_date_str: Optional[str],
+    progress_callback: Optional[Callable[[Dict[str, Any]], None]] = None,
+    page_size: int = INVALID_SCAN_PAGE_SIZE,
+    use_worker_process: bool = True
 ) -> Dict[str, List[Dict[str, Any]]]:
     """
     Scans Yahoo DB tables for records that meet specific emptiness and date criteria.
     - For ticker_master, it checks the columns of the record itself based on the threshold.
     - For ticker_data_items, it checks fields within the payload and the item_key_date.
+    Both tables are streamed in keyset pages with short reads, so memory stays bounded by the page size
+    (plus the flagged records) and writers are not blocked. progress_callback, if given, is called once the
+    ticker_master scan is done with {'table', 'rows_scanned', 'invalid_found'} and after each ticker_data_items
+    page with {'table', 'rows_scanned', 'invalid_found', 'last_data_item_id'}.
     """
     logger.info(f"Starting scan for invalid records with threshold: {threshold}, start: {start_date_str}, end: {end_date_str}.")
     invalid_records_summary = {
@@ -44,12 +181,10 @@ async def find_invalid_records(
     # 1. Scan ticker_master table
     try:
         logger.info("Scanning 'ticker_master' table...")
-        all_master_records = await repo.get_ticker_masters_by_criteria(filters=None)
-        logger.info(f"Found {len(all_master_records)} records in 'ticker_master'. Analyzing...")
-
-        for record in all_master_records:
-            if not record or not isinstance(record, dict):
-                continue
+        # Streamed in keyset pages, so the table is never held in memory as a whole
+        records_scanned = 0
+        async for record in repo.iter_ticker_masters():
+            records_scanned += 1
 
             total_fields = len(record)
             empty_fields = sum(1 for value in record.values() if _is_value_empty(value))
@@ -64,7 +199,13 @@ async def find_invalid_records(
                         "details": record
                     })
 
-        logger.info(f"Finished scanning 'ticker_master'. Found {len(invalid_records_summary['ticker_master'])} invalid records.")
+        logger.info(f"Finished scanning {records_scanned} records in 'ticker_master'. Found {len(invalid_records_summary['ticker_master'])} invalid records.")
+        if progress_callback:
+            progress_callback({
+                "table": "ticker_master",
+                "rows_scanned": records_scanned,
+                "invalid_found": len(invalid_records_summary["ticker_master"])
+            })
 
     except Exception as e:
         logger.error(f"Error scanning 'ticker_master' table: {e}", exc_info=True)
@@ -77,73 +218,108 @@ async def find_invalid_records(
         start_date = datetime.strptime(start_date_str, "%Y-%m-%d") if start_date_str else None
         end_date = datetime.strptime(end_date_str, "%Y-%m-%d") if end_date_str else None
 
-        all_data_items = await repo.get_all_data_items()
-        logger.info(f"Found {len(all_data_items)} records in 'ticker_data_items'. Analyzing payload content and dates...")
+        # item_key_date is compared by its date part: on or after start_date and on or before end_date
+        rows_scanned = await _scan_data_items(
+            repo, threshold, start_date, end_date + timedelta(days=1) if end_date else None,
+            invalid_records_summary["ticker_data_items"], progress_callback, page_size, use_worker_process
+        )
 
-        for record in all_data_items:
-            if not record or not isinstance(record, dict):
-                continue
-            
-            # Date filtering
-            item_key_date_any = record.get("item_key_date")
-            if isinstance(item_key_date_any, str):
-                item_key_date = datetime.strptime(item_key_date_any.split('T')[0], "%Y-%m-%d")
-            elif isinstance(item_key_date_any, datetime):
-                item_key_date = item_key_date_any
-            else:
-                item_key_date = None
-
-            if start_date and (not item_key_date or item_key_date < start_date):
-                continue
-            if end_date and (not item_key_date or item_key_date > end_date):
-                continue
+        logger.info(f"Finished scanning {rows_scanned} rows in 'ticker_data_items'. Found {len(invalid_records_summary['ticker_data_items'])} invalid records.")
 
-            payload_str = record.get("item_data_payload")
-            if not payload_str or not isinstance(payload_str, str):
-                continue
+    except Exception as e:
+        logger.error(f"Error scanning 'ticker_data_items' table: {e}", exc_info=True)
+        invalid_records_summary["ticker_data_items"].append({"error": f"Failed to scan table: {e}"})
 
-            try:
-                payload_dict = json.loads(payload_str)
-                if not isinstance(payload_dict, dict) or not payload_dict:
-                    continue  # Skip non-dict or empty dict payloads
+    logger.info("Finished scanning all tables.")
+    return invalid_records_summary
 
-                total_fields = len(payload_dict)
-                if total_fields == 0:
-                    continue
+@dataclass
+class InvalidRecordsScan:
+    """A find_invalid_records run in the background of the app (see start_invalid_records_scan)."""
+    scan_id: str
+    parameters: Dict[str, Any]
+    status: str = "running" # running -> completed / failed
+    started_at: datetime = field(default_factory=datetime.now)
+    finished_at: Optional[datetime] = None
+    progress: Optional[Dict[str, Any]] = None # Latest progress_callback payload of find_invalid_records
+    result: Optional[Dict[str, List[Dict[str, Any]]]] = None
+    error: Optional[str] = None
+    task: Optional[asyncio.Task] = field(default=None, repr=False)
 
-                empty_fields = sum(1 for value in payload_dict.values() if _is_value_empty(value))
+    def to_dict(self, include_result: bool = True) -> Dict[str, Any]:
+        state = {
+            "scan_id": self.scan_id,
+            "parameters": self.parameters,
+            "status": self.status,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "progress": self.progress,
+            "error": self.error,
+        }
+        if include_result:
+            state["result"] = self.result
+        return state
 
-                empty_percentage = empty_fields / total_fields
-                if empty_percentage >= threshold:
-                    reason = f"{empty_percentage:.0%} of payload fields are empty ({empty_fields}/{total_fields})."
-                    invalid_records_summary["ticker_data_items"].append({
-                        "primary_key": record.get("data_item_id"),
-                        "ticker": record.get("ticker"),
-                        "item_key_date": record.get("item_key_date"),
-                        "reason": reason,
-                        "details": record  # Keep the full record for context
-                    })
-            except json.JSONDecodeError:
-                logger.warning(f"Could not parse item_data_payload for data_item_id: {record.get('data_item_id')}.")
-                continue
+_invalid_records_scans: "OrderedDict[str, InvalidRecordsScan]" = OrderedDict()
 
-        logger.info(f"Finished scanning 'ticker_data_items'. Found {len(invalid_records_summary['ticker_data_items'])} invalid records.")
+def start_invalid_records_scan(
+    repo: YahooDataRepository,
+    threshold: float,
+    start_date_str: Optional[str],
+    end_date_str: Optional[str]
+) -> Tuple[InvalidRecordsScan, bool]:
+    """
+    Starts find_invalid_records as a task on the running event loop, so an API request returns at once and the
+    caller polls get_invalid_records_scan for progress and the result. Returns (scan, True), or (scan, False)
+    with the scan that is still running (one scan at a time; each reads the whole ticker_data_items table).
+    """
+    running = next((scan for scan in _invalid_records_scans.values() if scan.status == "running"), None)
+    if running is not None:
+        return running, False
+    scan = InvalidRecordsScan(
+        scan_id=uuid.uuid4().hex[:12],
+        parameters={"threshold": threshold, "start_date": start_date_str, "end_date": end_date_str}
+    )
 
-    except Exception as e:
-        logger.error(f"Error scanning 'ticker_data_items' table: {e}", exc_info=True)
-        invalid_records_summary["ticker_data_items"].append({"error": f"Failed to scan table: {e}"})
+    def on_progress(progress: Dict[str, Any]) -> None:
+        scan.progress = progress
 
-    logger.info("Finished scanning all tables.")
-    return invalid_records_summary
+    async def run() -> None:
+        try:
+            scan.result = await find_invalid_records(repo, threshold, start_date_str, end_date_str, progress_callback=on_progress)
+            scan.status = "completed"
+        except Exception as e:
+            scan.status, scan.error = "failed", str(e)
+            logger.error(f"Invalid records scan {scan.scan_id} failed: {e}", exc_info=True)
+        finally:
+            scan.finished_at = datetime.now()
+
+    _invalid_records_scans[scan.scan_id] = scan
+    finished = [scan_id for scan_id, old in _invalid_records_scans.items() if old.finished_at]
+    for scan_id in finished[:max(0, len(finished) - INVALID_SCAN_HISTORY_SIZE)]:
+        del _invalid_records_scans[scan_id]
+    scan.task = asyncio.create_task(run(), name=f"invalid-records-scan-{scan.scan_id}")
+    logger.info(f"Started invalid records scan {scan.scan_id} with {scan.parameters}.")
+    return scan, True
+
+def get_invalid_records_scan(scan_id: str) -> Optional[InvalidRecordsScan]:
+    """A running or recently finished background scan, or None."""
+    return _invalid_records_scans.get(scan_id)
 
-async def delete_invalid_records(repo: YahooDataRepository, records_to_delete: Dict[str, List[Any]]) -> Dict[str, Any]:
+async def delete_invalid_records(
+    repo: YahooDataRepository,
+    records_to_delete: Dict[str, List[Any]],
+    chunk_size: int = DELETE_CHUNK_SIZE
+) -> Dict[str, Any]:
     """
-    Deletes a list of specified records from the database.
+    Deletes a list of specified records from the database, with one DELETE ... WHERE key IN (...) per chunk
+    of chunk_size keys (each chunk its own short write transaction).
 
     Args:
         repo: An instance of YahooDataRepository.
         records_to_delete: A dictionary specifying which records to delete.
                            Example: {"ticker_master": ["TICKER1", "TICKER2"], "ticker_data_items": [101, 102]}
+        chunk_size: Keys per DELETE statement.
 
     Returns:
         A summary of the deletion operation.
@@ -162,48 +338,205 @@ async def delete_invalid_records(repo: YahooDataRepository, records_to_delete: D
     # 1. Delete from ticker_master
     if master_keys_to_delete:
         logger.info(f"Deleting {len(master_keys_to_delete)} records from 'ticker_master'.")
-        for ticker in master_keys_to_delete:
-            try:
-                # This repo method will be created in the next step.
-                success = await repo.delete_yahoo_ticker_master(ticker)
-                if success:
-                    deletion_summary["deleted_master_count"] += 1
-                else:
+        try:
+            deleted_tickers = await repo.delete_yahoo_ticker_masters(master_keys_to_delete, chunk_size=chunk_size)
+            deletion_summary["deleted_master_count"] = len(deleted_tickers)
+            deleted_set = set(deleted_tickers)
+            for ticker in master_keys_to_delete:
+                if ticker not in deleted_set:
                     deletion_summary["errors"].append({
                         "table": "ticker_master",
                         "primary_key": ticker,
                         "error": "Deletion failed or record not found."
                     })
-            except Exception as e:
-                logger.error(f"Error deleting ticker '{ticker}' from master table: {e}", exc_info=True)
-                deletion_summary["errors"].append({
-                    "table": "ticker_master",
-                    "primary_key": ticker,
-                    "error": str(e)
-                })
+        except Exception as e:
+            logger.error(f"Error deleting records from master table: {e}", exc_info=True)
+            deletion_summary["errors"].append({
+                "table": "ticker_master",
+                "primary_key": None,
+                "error": str(e)
+            })
 
     # 2. Delete from ticker_data_items
     if item_ids_to_delete:
         logger.info(f"Deleting {len(item_ids_to_delete)} records from 'ticker_data_items'.")
-        for item_id in item_ids_to_delete:
-            try:
-                # This repo method will be created in the next step.
-                success = await repo.delete_ticker_data_item(item_id)
-                if success:
-                    deletion_summary["deleted_items_count"] += 1
-                else:
+        try:
+            deleted_ids = set(await repo.delete_ticker_data_items(item_ids_to_delete, chunk_size=chunk_size))
+            deletion_summary["deleted_items_count"] = len(deleted_ids)
+            for item_id in item_ids_to_delete:
+                if item_id not in deleted_ids:
                     deletion_summary["errors"].append({
                         "table": "ticker_data_items",
                         "primary_key": item_id,
                         "error": "Deletion failed or record not found."
                     })
-            except Exception as e:
-                logger.error(f"Error deleting data item ID '{item_id}': {e}", exc_info=True)
-                deletion_summary["errors"].append({
-                    "table": "ticker_data_items",
-                    "primary_key": item_id,
-                    "error": str(e)
-                })
+        except Exception as e:
+            logger.error(f"Error deleting data items: {e}", exc_info=True)
+            deletion_summary["errors"].append({
+                "table": "ticker_data_items",
+                "primary_key": None,
+                "error": str(e)
+            })
 
     logger.info(f"Deletion complete. Summary: {deletion_summary}")
-    return deletion_summary 
\ No newline at end of file
+    return deletion_summary 
+
+
+async def backfill_data_values(repo: YahooDataRepository, batch_size: int = DATA_VALUES_BACKFILL_BATCH_SIZE) -> Dict[str, int]:
+    """
+    Creates the ticker_data_values table if needed and populates it from the statement items
+    already stored in ticker_data_items. Safe to re-run.
+
+    Returns:
+        {'items_processed': int, 'values_written': int}
+    """
+    await repo.create_tables()
+    return await repo.backfill_ticker_data_values(batch_size=batch_size)
+
+async def compress_payloads(repo: YahooDataRepository, codec: Optional[str] = None, batch_size: int = PAYLOAD_MIGRATION_BATCH_SIZE) -> Dict[str, Any]:
+    """
+    Rewrites stored item_data_payload values with the given codec ('zlib', 'zstd' or 'none'; defaults to
+    $YAHOO_PAYLOAD_CODEC). Runs online in short batches and is safe to re-run.
+
+    Returns:
+        {'codec': str, 'items_rewritten': int, 'bytes_before': int, 'bytes_after': int}
+    """
+    if codec:
+        set_write_codec(codec)
+    return await repo.migrate_data_item_payload_encoding(batch_size=batch_size)
+
+async def migrate(repo: YahooDataRepository) -> List[str]:
+    """
+    Creates missing tables and applies the pending schema migrations (db_migrations.MIGRATIONS).
+    The app does the same on startup; this runs it without starting the app.
+
+    Returns:
+        The ids of the migrations applied.
+    """
+    async with repo.engine.begin() as conn:
+        await conn.run_sync(YahooTickerMasterModel.metadata.create_all)
+        return await conn.run_sync(apply_migrations)
+
+def _log_schema_report(report: Dict[str, Any]) -> None:
+    for entry in report['query_plans']:
+        status = "OK" if not entry['problems'] else f"PROBLEM: {'; '.join(entry['problems'])}"
+        logger.info(f"Query plan {entry['name']} ({entry['mirrors']}): {status}")
+        for line in entry['plan']:
+            logger.info(f"    {line}")
+    if report['pending_migrations']:
+        logger.warning(f"Pending migrations: {report['pending_migrations']} (run 'migrate').")
+    if report['missing_indexes']:
+        logger.warning(f"Missing indexes: {report['missing_indexes']}")
+    if report['obsolete_indexes']:
+        logger.warning(f"Obsolete indexes still present: {report['obsolete_indexes']}")
+
+async def _run_command(args: argparse.Namespace) -> int:
+    repo = YahooDataRepository(database_url=args.database_url)
+    try:
+        if args.command == "backfill-data-values":
+            summary = await backfill_data_values(repo, batch_size=args.batch_size or DATA_VALUES_BACKFILL_BATCH_SIZE)
+            logger.info(f"Backfill of ticker_data_values finished: {summary}")
+        elif args.command == "compress-payloads":
+            summary = await compress_payloads(repo, codec=args.codec, batch_size=args.batch_size or PAYLOAD_MIGRATION_BATCH_SIZE)
+            logger.info(f"Payload compression finished: {summary}")
+        elif args.command == "migrate":
+            applied = await migrate(repo)
+            logger.info(f"Schema migration finished. Applied: {applied or 'nothing (up to date)'}")
+        elif args.command == "scan-invalid-records":
+            invalid = await find_invalid_records(repo, args.threshold, args.start_date, args.end_date)
+            logger.info(f"Invalid records: {len(invalid['ticker_master'])} in ticker_master, {len(invalid['ticker_data_items'])} in ticker_data_items.")
+            if args.delete:
+                summary = await delete_invalid_records(repo, {
+                    "ticker_master": [rec["primary_key"] for rec in invalid["ticker_master"] if rec.get("primary_key")],
+                    "ticker_data_items": [rec["primary_key"] for rec in invalid["ticker_data_items"] if rec.get("primary_key")]
+                })
+                logger.info(f"Deleted {summary['deleted_master_count']} ticker_master records and {summary['deleted_items_count']} data items.")
+        elif args.command == "optimize":
+            await repo.create_tables()
+            report = await SQLiteRepository(args.database_url).optimize_database(
+                trigger="cli", time_budget_seconds=args.time_budget or OPTIMIZE_TIME_BUDGET_SECONDS
+            )
+            for step in report['steps']:
+                logger.info(f"Optimize step: {step}")
+            for note in report['notes']:
+                logger.warning(note)
+            logger.info(f"Optimize run {report['status']}: pages {report.get('before', {}).get('page_count')} -> "
+                        f"{report.get('after', {}).get('page_count')}, free pages {report.get('before', {}).get('freelist_count')} -> "
+                        f"{report.get('after', {}).get('freelist_count')}.")
+            return 0 if report['status'] != 'failed' else 1
+        elif args.command == "enable-incremental-vacuum":
+            await engine_registry.dispose()  # The VACUUM needs the file to itself
+            summary = await asyncio.to_thread(enable_incremental_vacuum, await SQLiteRepository(args.database_url).get_db_path())
+            logger.info(f"auto_vacuum switched: {summary}")
+        elif args.command == "rebuild-field-catalog":
+            summary = await repo.rebuild_field_catalog()
+            logger.info(f"Field catalog rebuild finished: {summary}")
+        elif args.command == "verify-schema":
+            report = await repo.verify_schema()
+            _log_schema_report(report)
+            logger.info(f"Schema verification {'passed' if report['ok'] else 'FAILED'}.")
+            return 0 if report['ok'] else 1
+        return 0
+    finally:
+        await engine_registry.dispose()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description="Yahoo database maintenance commands.",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter
+    )
+    parser.add_argument(
+        "command",
+        choices=["backfill-data-values", "compress-payloads", "migrate", "verify-schema", "rebuild-field-catalog", "scan-invalid-records",
+                 "optimize", "enable-incremental-vacuum"],
+        help="'backfill-data-values' populates the normalized ticker_data_values table from existing statement items. "
+             "'compress-payloads' rewrites stored payloads with the chosen codec. "
+             "'migrate' applies pending schema migrations (new columns and indexes). "
+             "'verify-schema' checks indexes and the query plans of the hot ticker_data_items queries. "
+             "'rebuild-field-catalog' re-seeds the analytics field catalog from the stored data (drops fields of pruned items). "
+             "'scan-invalid-records' reports (and with --delete removes) records whose fields are mostly empty. "
+             "'optimize' runs the online optimization (checkpoint, ANALYZE, incremental vacuum) like the db_optimize job. "
+             "'enable-incremental-vacuum' switches an existing file to auto_vacuum=INCREMENTAL with one full VACUUM (stop the app first)."
+    )
+    parser.add_argument(
+        "--database-url",
+        default=os.environ.get("DATABASE_URL", "sqlite+aiosqlite:///src/V3_app/V3_database.db"),
+        help="SQLAlchemy database URL (defaults to $DATABASE_URL or the app's default database)."
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=None,
+        help=f"Number of data items processed per transaction (default {DATA_VALUES_BACKFILL_BATCH_SIZE} for backfill-data-values, {PAYLOAD_MIGRATION_BATCH_SIZE} for compress-payloads)."
+    )
+    parser.add_argument(
+        "--codec",
+        choices=list(PAYLOAD_CODECS),
+        default=None,
+        help="Codec for compress-payloads (defaults to $YAHOO_PAYLOAD_CODEC, else none). 'none' stores payloads as TEXT again."
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=INVALID_THRESHOLD_PERCENT,
+        help="Share of empty fields from which scan-invalid-records flags a record."
+    )
+    parser.add_argument("--start-date", default=None, help="scan-invalid-records: only data items with item_key_date on or after this date (YYYY-MM-DD).")
+    parser.add_argument("--end-date", default=None, help="scan-invalid-records: only data items with item_key_date on or before this date (YYYY-MM-DD).")
+    parser.add_argument("--delete", action="store_true", help="scan-invalid-records: delete the records found.")
+    parser.add_argument(
+        "--time-budget",
+        type=float,
+        default=None,
+        help=f"optimize: time budget in seconds (default {OPTIMIZE_TIME_BUDGET_SECONDS:.0f})."
+    )
+    parser.add_argument(
+        "--log-level",
+        default="INFO",
+        choices=['DEBUG', 'INFO', 'WARNING', 'ERROR', 'CRITICAL'],
+        help="Set the logging level."
+    )
+    cli_args = parser.parse_args()
+    logging.basicConfig(level=getattr(logging, cli_args.log_level),
+                        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    sys.exit(asyncio.run(_run_command(cli_args)))
@@ -0,0 +1,279 @@
+"""
+Schema migrations for the Yahoo tables (ticker_master, ticker_data_items, ticker_data_values) and the
+analytics cache tables.
+
+create_all() creates missing tables together with their indexes, but never changes a table that already
+exists. Changes to existing tables are listed in MIGRATIONS: ordered steps, each applied once and recorded
+in yahoo_schema_state under 'migration:<id>'. Every step is idempotent (IF [NOT] EXISTS, column checks),
+so on a database created by create_all from the current models it only records its marker.
+
+SQLiteRepository.create_tables() (app startup) and YahooDataRepository.create_tables() apply pending migrations right after create_all.
+
+verify_schema() checks that the indexes defined on the models exist (and that dropped ones are gone) and
+runs EXPLAIN QUERY PLAN on the hot ticker_data_items queries (HOT_QUERIES), reporting any query that falls
+back to a full table scan or stops using its index. From the project root:
+    python -m src.V3_app.db_maintenance migrate
+    python -m src.V3_app.db_maintenance verify-schema
+"""
+import logging
+import re
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+from sqlalchemy import func, inspect, select
+from sqlalchemy.dialects import sqlite
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.engine import Connection
+from sqlalchemy.schema import CreateIndex
+from sqlalchemy.sql import Select
+
+from .V3_database import CachedAnalyticsDataModel
+from .yahoo_models import TickerDataItemsModel, YahooSchemaStateModel
+
+logger = logging.getLogger(__name__)
+
+MIGRATION_STATE_KEY_PREFIX = "migration:"
+
+# Indexes replaced by a migration; verify_schema reports them if they are still present
+DROPPED_INDEXES = {
+    TickerDataItemsModel.__tablename__: ("ix_ticker_data_items_ticker",),
+}
+
+
+@dataclass
+class Migration:
+    """One schema change. apply() runs on a sync connection inside the migration transaction and must be idempotent."""
+    migration_id: str
+    description: str
+    apply: Callable[[Connection], None]
+
+
+def _table_columns(sync_conn: Connection, table_name: str) -> set:
+    return {column['name'] for column in inspect(sync_conn).get_columns(table_name)}
+
+
+def _table_index_names(sync_conn: Connection, table_name: str) -> set:
+    rows = sync_conn.exec_driver_sql(
+        "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = ?", (table_name,)
+    )
+    return {row[0] for row in rows}
+
+
+def _add_payload_hash_column(sync_conn: Connection) -> None:
+    if 'payload_hash' not in _table_columns(sync_conn, TickerDataItemsModel.__tablename__):
+        sync_conn.exec_driver_sql("ALTER TABLE ticker_data_items ADD COLUMN payload_hash VARCHAR(32)")
+        logger.info("[DB Migrations] Added payload_hash column to ticker_data_items. Existing rows get their hash on their next write.")
+
+
+def _create_data_item_series_indexes(sync_conn: Connection) -> None:
+    for index in TickerDataItemsModel.__table__.indexes:
+        sync_conn.execute(CreateIndex(index, if_not_exists=True))
+    for index_name in DROPPED_INDEXES[TickerDataItemsModel.__tablename__]:
+        sync_conn.exec_driver_sql(f"DROP INDEX IF EXISTS {index_name}")
+    # Fresh statistics, so the planner weighs the new indexes against the unique constraint's
+    sync_conn.exec_driver_sql("ANALYZE ticker_data_items")
+
+
+def _create_data_item_fetched_index(sync_conn: Connection) -> None:
+    for index in TickerDataItemsModel.__table__.indexes:
+        if index.name == 'ix_ticker_data_items_fetched':
+            sync_conn.execute(CreateIndex(index, if_not_exists=True))
+
+
+def _add_cached_analytics_source_state_column(sync_conn: Connection) -> None:
+    # A database without the table gets it (with the column) from create_all
+    table_name = CachedAnalyticsDataModel.__tablename__
+    if not inspect(sync_conn).has_table(table_name):
+        return
+    if 'source_state_json' not in _table_columns(sync_conn, table_name):
+        sync_conn.exec_driver_sql(f"ALTER TABLE {table_name} ADD COLUMN source_state_json TEXT")
+        logger.info(f"[DB Migrations] Added source_state_json column to {table_name}. The next data cache refresh is a full one.")
+
+
+MIGRATIONS: List[Migration] = [
+    Migration(
+        "0001_data_items_payload_hash",
+        "Add ticker_data_items.payload_hash",
+        _add_payload_hash_column
+    ),
+    Migration(
+        "0002_data_items_series_indexes",
+        "Add the covering series index and the partial index on non-pruned rows to ticker_data_items; drop ix_ticker_data_items_ticker",
+        _create_data_item_series_indexes
+    ),
+    Migration(
+        "0003_data_items_fetched_index",
+        "Add ix_ticker_data_items_fetched (fetch_timestamp_utc, ticker) for the incremental analytics data cache refresh",
+        _create_data_item_fetched_index
+    ),
+    Migration(
+        "0004_cached_analytics_source_state",
+        "Add cached_analytics_data.source_state_json (source watermarks of the incremental data cache refresh)",
+        _add_cached_analytics_source_state_column
+    ),
+]
+
+
+def applied_migrations(sync_conn: Connection) -> Dict[str, str]:
+    """Migration ids recorded in yahoo_schema_state, with the time they were applied."""
+    rows = sync_conn.execute(
+        select(YahooSchemaStateModel.state_key, YahooSchemaStateModel.state_value)
+        .where(YahooSchemaStateModel.state_key.like(f"{MIGRATION_STATE_KEY_PREFIX}%"))
+    )
+    return {row.state_key[len(MIGRATION_STATE_KEY_PREFIX):]: row.state_value for row in rows}
+
+
+def apply_migrations(sync_conn: Connection) -> List[str]:
+    """
+    Applies the pending MIGRATIONS in order on a sync connection (e.g. via AsyncConnection.run_sync).
+    The tables must exist (create_all first).
+
+    Returns:
+        The ids of the migrations applied by this call.
+    """
+    already_applied = applied_migrations(sync_conn)
+    applied_now = []
+    for migration in MIGRATIONS:
+        if migration.migration_id in already_applied:
+            continue
+        logger.info(f"[DB Migrations] Applying {migration.migration_id}: {migration.description}")
+        migration.apply(sync_conn)
+        now = datetime.now()
+        sync_conn.execute(
+            sqlite_insert(YahooSchemaStateModel)
+            .values(state_key=f"{MIGRATION_STATE_KEY_PREFIX}{migration.migration_id}", state_value=now.isoformat(), updated_at=now)
+            .on_conflict_do_nothing(index_elements=['state_key'])
+        )
+        applied_now.append(migration.migration_id)
+    if applied_now:
+        logger.info(f"[DB Migrations] Applied {len(applied_now)} migration(s): {', '.join(applied_now)}")
+    return applied_now
+
+
+# --- Query plan checks ---
+@dataclass
+class HotQuery:
+    """A ticker_data_items query whose plan verify_schema checks.
+
+    expected_index: the plan must use this index (None: any index search on ticker_data_items is fine).
+    covering: the index must cover the query (no table lookups).
+    """
+    name: str
+    statement: Callable[[], Select]
+    expected_index: Optional[str] = None
+    covering: bool = False
+    mirrors: str = ""
+
+
+_T = TickerDataItemsModel
+
+HOT_QUERIES: List[HotQuery] = [
+    HotQuery(
+        "latest_item_payload",
+        lambda: select(_T.item_data_payload).where(
+            _T.ticker == 'AAPL', _T.item_type == 'INCOME_STATEMENT', _T.item_time_coverage == 'FYEAR'
+        ).order_by(_T.item_key_date.desc()).limit(1),
+        mirrors="YahooDataRepository.get_latest_item_payload"
+    ),
+    HotQuery(
+        "series_payload_hashes",
+        lambda: select(
+            _T.data_item_id, _T.ticker, _T.item_type, _T.item_time_coverage, _T.item_key_date, _T.payload_hash
+        ).where(_T.ticker.in_(['AAPL']), _T.item_type.in_(['INCOME_STATEMENT', 'BALANCE_SHEET'])),
+        expected_index="ix_ticker_data_items_series",
+        covering=True,
+        mirrors="YahooDataRepository._existing_item_hashes (write path)"
+    ),
+    HotQuery(
+        "latest_key_date",
+        lambda: select(func.max(_T.item_key_date)).where(
+            _T.ticker == 'AAPL', _T.item_type == 'INCOME_STATEMENT', _T.item_time_coverage == 'QUARTER'
+        ),
+        covering=True,
+        mirrors="latest item_key_date of a series"
+    ),
+    HotQuery(
+        "active_item_specs",
+        lambda: select(_T.item_type, _T.item_time_coverage).where(_T.prun == False).distinct(),
+        # A scan of the partial index (SQLite 3.40 does not count it as covering, since prun is not an index column)
+        expected_index="ix_ticker_data_items_active_spec",
+        mirrors="YahooDataRepository.get_all_yahoo_fields_for_analytics (distinct specs)"
+    ),
+    HotQuery(
+        "active_spec_sample",
+        lambda: select(_T).where(
+            _T.item_type == 'INCOME_STATEMENT', _T.item_time_coverage == 'FYEAR', _T.prun == False
+        ).limit(1),
+        expected_index="ix_ticker_data_items_active_spec",
+        mirrors="YahooDataRepository.get_all_yahoo_fields_for_analytics (payload sample per spec)"
+    ),
+    HotQuery(
+        "tickers_fetched_since",
+        lambda: select(_T.ticker).where(_T.fetch_timestamp_utc > datetime(2024, 1, 1)),
+        expected_index="ix_ticker_data_items_fetched",
+        covering=True,
+        mirrors="YahooDataRepository.get_tickers_with_data_items_fetched_since"
+    ),
+]
+
+_FULL_SCAN = re.compile(r"^SCAN ticker_data_items(?! USING)")
+
+
+def explain_query_plan(sync_conn: Connection, statement: Select) -> List[str]:
+    """EXPLAIN QUERY PLAN detail lines of a statement, compiled for SQLite with literal parameters."""
+    sql = str(statement.compile(dialect=sqlite.dialect(), compile_kwargs={"literal_binds": True}))
+    return [row[3] for row in sync_conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}")]
+
+
+def check_query_plan(query: HotQuery, plan: List[str]) -> List[str]:
+    """Problems found in a HotQuery's plan (empty if it is fine)."""
+    problems = []
+    table_lines = [line for line in plan if line.startswith(("SCAN ticker_data_items", "SEARCH ticker_data_items"))]
+    if any(_FULL_SCAN.match(line) for line in table_lines):
+        problems.append("full table scan of ticker_data_items")
+    if query.expected_index:
+        index_lines = [line for line in table_lines if re.search(rf"INDEX {re.escape(query.expected_index)}\b", line)]
+        if not index_lines:
+            problems.append(f"does not use {query.expected_index}")
+        elif query.covering and not any("COVERING INDEX" in line for line in index_lines):
+            problems.append(f"{query.expected_index} does not cover the query")
+    else:
+        if not any(line.startswith("SEARCH ticker_data_items") for line in table_lines):
+            problems.append("no index search on ticker_data_items")
+        elif query.covering and not any("COVERING INDEX" in line for line in table_lines):
+            problems.append("no covering index")
+    return problems
+
+
+def verify_schema(sync_conn: Connection) -> Dict[str, Any]:
+    """
+    Checks the migrated schema of ticker_data_items: pending migrations, missing or obsolete indexes, and
+    the query plans of HOT_QUERIES.
+
+    Returns:
+        Dict with 'ok', 'pending_migrations', 'missing_indexes', 'obsolete_indexes' and 'query_plans'
+        (per query: 'name', 'mirrors', 'plan', 'problems').
+    """
+    table_name = TickerDataItemsModel.__tablename__
+    applied = applied_migrations(sync_conn)
+    present = _table_index_names(sync_conn, table_name)
+    report = {
+        'pending_migrations': [m.migration_id for m in MIGRATIONS if m.migration_id not in applied],
+        'missing_indexes': sorted(index.name for index in TickerDataItemsModel.__table__.indexes if index.name not in present),
+        'obsolete_indexes': sorted(name for name in DROPPED_INDEXES[table_name] if name in present),
+        'query_plans': []
+    }
+    for query in HOT_QUERIES:
+        plan = explain_query_plan(sync_conn, query.statement())
+        report['query_plans'].append({
+            'name': query.name,
+            'mirrors': query.mirrors,
+            'plan': plan,
+            'problems': check_query_plan(query, plan)
+        })
+    report['ok'] = not (
+        report['pending_migrations'] or report['missing_indexes'] or report['obsolete_indexes']
+        or any(entry['problems'] for entry in report['query_plans'])
+    )
+    return report
@@ -0,0 +1,276 @@
+"""
+Online optimization of the SQLite database: planner statistics, free-page reclaim and WAL checkpoints.
+
+The mass loads delete and re-insert large parts of ticker_master and ticker_data_items, which leaves free
+pages and scattered b-tree pages in the file, stale planner statistics, and (in WAL mode) a WAL file that
+only shrinks at a checkpoint. SQLiteRepository.optimize_database() works through these in small steps,
+each its own short write block (through the write coordinator when it runs), so a mass fetch keeps
+committing in between:
+
+    1. WAL checkpoint, PASSIVE (never waits for readers or the writer)
+    2. ANALYZE of each table whose statistics are missing or stale (row count drifted by more than
+       ANALYZE_DRIFT_RATIO since the last ANALYZE), with PRAGMA analysis_limit bounding the rows sampled
+    3. PRAGMA incremental_vacuum, VACUUM_PAGES_PER_STEP pages per write block, while the time budget lasts
+       (only if auto_vacuum is INCREMENTAL, see below)
+    4. PRAGMA optimize, then a final checkpoint (TRUNCATE once the WAL is fully checkpointed, so the file shrinks)
+
+Every run records collect_db_stats() before and after (page count, freelist size, WAL size, planner
+statistics) and the hot query plans of db_migrations.verify_schema. Only the 'before' stats of a run are
+detailed: the stale-statistics check counts the rows of every table and the per-table fill and out-of-order
+pages come from dbstat (at most DBSTAT_MAX_PAGES pages), both full scans of a large file. The reports are
+stored in db_optimize_runs; the scheduler job 'db_optimize' (V3_web) runs it and /api/v3/database/optimize
+serves the cheap PRAGMA stats plus the stored reports.
+
+New database files get auto_vacuum=INCREMENTAL from the writer connection profile. Existing files keep
+auto_vacuum=NONE until rebuilt once by VACUUM, which needs exclusive access and is therefore left to
+    python -m src.V3_app.db_maintenance enable-incremental-vacuum
+(with the app stopped). Until then step 3 is skipped and the report says so.
+"""
+import logging
+import os
+import sqlite3
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy.engine import Connection
+from sqlalchemy.exc import DBAPIError
+
+logger = logging.getLogger(__name__)
+
+# Wall-clock budget of one run; no new step is started once it is used up (the rest waits for the next run)
+OPTIMIZE_TIME_BUDGET_SECONDS = 60.0
+# Free pages released per incremental_vacuum write block
+VACUUM_PAGES_PER_STEP = 500
+# PRAGMA analysis_limit: approximate rows sampled per index by ANALYZE (0 = no limit)
+ANALYZE_ANALYSIS_LIMIT = 1000
+# A table is re-analyzed when its row count differs by more than this share from the count at its last ANALYZE
+# (with analysis_limit that count is an estimate, so a large table may be re-analyzed at each run; that is cheap)
+ANALYZE_DRIFT_RATIO = 0.25
+# Tables with fewer rows are not analyzed (their plans do not depend on statistics)
+ANALYZE_MIN_ROWS = 1000
+# Pause between steps, so queued writes get the write connection in between
+OPTIMIZE_STEP_PAUSE_SECONDS = 0.05
+# Busy timeout of the TRUNCATE checkpoint (it waits for readers of the WAL to finish)
+CHECKPOINT_TRUNCATE_TIMEOUT_SECONDS = 2.0
+# Tables and indexes smaller than this are left out of the per-object telemetry
+STATS_MIN_OBJECT_PAGES = 16
+# dbstat pages read for the per-object telemetry of a run (objects past the cap are left out)
+DBSTAT_MAX_PAGES = 250000
+# Optimize reports kept in db_optimize_runs
+OPTIMIZE_RUNS_KEPT = 50
+
+AUTO_VACUUM_MODES = {0: 'none', 1: 'full', 2: 'incremental'}
+
+
+# --- Telemetry ---
+def _pragma_value(sync_conn: Connection, pragma: str) -> Any:
+    return sync_conn.exec_driver_sql(f"PRAGMA {pragma}").scalar()
+
+
+def database_file_path(sync_conn: Connection) -> Optional[str]:
+    """File of the main database ('' or None for in-memory databases)."""
+    for _, name, path in sync_conn.exec_driver_sql("PRAGMA database_list"):
+        if name == 'main':
+            return path or None
+    return None
+
+
+def user_tables(sync_conn: Connection) -> List[str]:
+    rows = sync_conn.exec_driver_sql(
+        "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%' ORDER BY name"
+    )
+    return [row[0] for row in rows]
+
+
+def analyzed_row_counts(sync_conn: Connection) -> Dict[str, int]:
+    """Row count of each table at its last ANALYZE (first number of its sqlite_stat1 entries)."""
+    has_stat1 = sync_conn.exec_driver_sql(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'sqlite_stat1'"
+    ).first()
+    if not has_stat1:
+        return {}  # Created by the first ANALYZE
+    counts: Dict[str, int] = {}
+    for table_name, _, stat in sync_conn.exec_driver_sql("SELECT tbl, idx, stat FROM sqlite_stat1"):
+        try:
+            counts[table_name] = max(counts.get(table_name, 0), int(str(stat).split()[0]))
+        except (ValueError, IndexError):
+            continue
+    return counts
+
+
+def tables_needing_analyze(sync_conn: Connection, drift_ratio: float = ANALYZE_DRIFT_RATIO) -> List[Dict[str, Any]]:
+    """
+    Tables without statistics, or whose row count drifted by more than drift_ratio since their last ANALYZE.
+    Tables under ANALYZE_MIN_ROWS rows are skipped. Sorted by current row count, largest first.
+    """
+    analyzed = analyzed_row_counts(sync_conn)
+    stale = []
+    for table_name in user_tables(sync_conn):
+        current_rows = sync_conn.exec_driver_sql(f'SELECT COUNT(*) FROM "{table_name}"').scalar() or 0
+        analyzed_rows = analyzed.get(table_name)
+        if current_rows < ANALYZE_MIN_ROWS:
+            continue
+        if analyzed_rows is None or abs(current_rows - analyzed_rows) > drift_ratio * max(analyzed_rows, 1):
+            stale.append({'table': table_name, 'analyzed_rows': analyzed_rows, 'current_rows': current_rows})
+    stale.sort(key=lambda entry: entry['current_rows'], reverse=True)
+    return stale
+
+
+def _object_fragmentation(sync_conn: Connection, max_pages: int = DBSTAT_MAX_PAGES) -> Optional[List[Dict[str, Any]]]:
+    """
+    Per table/index (from the dbstat virtual table): pages, fill (share of page bytes in use) and out-of-order
+    pages (b-tree pages not stored right after their predecessor, i.e. scattered by deletes and re-inserts).
+    Reads at most max_pages dbstat rows; the object the cap falls into is marked 'truncated'.
+    None if SQLite was built without dbstat.
+    """
+    try:
+        rows = sync_conn.exec_driver_sql("SELECT name, pageno, pgsize, unused FROM dbstat LIMIT ?", (int(max_pages),)).all()
+    except DBAPIError:
+        return None
+    objects: Dict[str, Dict[str, Any]] = {}
+    for name, pageno, page_bytes, unused_bytes in rows:
+        entry = objects.setdefault(name, {'pages': 0, 'bytes': 0, 'unused': 0, 'out_of_order': 0, 'last_page': None})
+        entry['pages'] += 1
+        entry['bytes'] += page_bytes
+        entry['unused'] += unused_bytes
+        if entry['last_page'] is not None and pageno != entry['last_page'] + 1:
+            entry['out_of_order'] += 1
+        entry['last_page'] = pageno
+    result = [{
+        'name': name,
+        'pages': entry['pages'],
+        'fill_pct': round(100.0 * (entry['bytes'] - entry['unused']) / entry['bytes'], 1) if entry['bytes'] else None,
+        'out_of_order_pct': round(100.0 * entry['out_of_order'] / max(entry['pages'] - 1, 1), 1),
+        'truncated': len(rows) >= max_pages and name == rows[-1][0]
+    } for name, entry in objects.items() if entry['pages'] >= STATS_MIN_OBJECT_PAGES]
+    result.sort(key=lambda entry: entry['pages'], reverse=True)
+    return result
+
+
+def collect_db_stats(sync_conn: Connection, detailed: bool = False) -> Dict[str, Any]:
+    """
+    Size and fragmentation telemetry of the database (read-only; runs on the read engine). Without detailed
+    only PRAGMAs, sqlite_stat1 and file sizes are read, which is cheap on any file size.
+
+    Returns:
+        Dict with 'collected_at', 'page_size', 'page_count', 'freelist_count', 'free_pct', 'file_bytes',
+        'wal_bytes', 'auto_vacuum', 'journal_mode', 'analyzed_tables' and, if detailed, 'stale_stat_tables'
+        (see tables_needing_analyze) and 'objects' (see _object_fragmentation; None without dbstat).
+    """
+    page_size = _pragma_value(sync_conn, "page_size")
+    page_count = _pragma_value(sync_conn, "page_count")
+    freelist_count = _pragma_value(sync_conn, "freelist_count")
+    path = database_file_path(sync_conn)
+    wal_path = f"{path}-wal" if path else None
+    stats = {
+        'collected_at': datetime.now().isoformat(),
+        'page_size': page_size,
+        'page_count': page_count,
+        'freelist_count': freelist_count,
+        'free_pct': round(100.0 * freelist_count / page_count, 2) if page_count else 0.0,
+        'file_bytes': os.path.getsize(path) if path and os.path.exists(path) else None,
+        'wal_bytes': os.path.getsize(wal_path) if wal_path and os.path.exists(wal_path) else 0,
+        'auto_vacuum': AUTO_VACUUM_MODES.get(_pragma_value(sync_conn, "auto_vacuum"), 'unknown'),
+        'journal_mode': _pragma_value(sync_conn, "journal_mode"),
+        'analyzed_tables': len(analyzed_row_counts(sync_conn)),
+    }
+    if detailed:
+        stats['stale_stat_tables'] = tables_needing_analyze(sync_conn)
+        stats['objects'] = _object_fragmentation(sync_conn)
+    return stats
+
+
+def query_plan_summary(sync_conn: Connection) -> Dict[str, Any]:
+    """The hot ticker_data_items query plans of db_migrations.verify_schema, condensed for the optimize report."""
+    # Imported here: db_migrations imports the Yahoo models, which import Base from V3_database (which imports this module)
+    from .db_migrations import verify_schema
+    report = verify_schema(sync_conn)
+    return {
+        'ok': report['ok'],
+        'missing_indexes': report['missing_indexes'],
+        'queries': {entry['name']: {'plan': entry['plan'], 'problems': entry['problems']} for entry in report['query_plans']},
+    }
+
+
+# --- Steps ---
+def analyze_table(sync_conn: Connection, table_name: str, analysis_limit: int = ANALYZE_ANALYSIS_LIMIT) -> None:
+    """ANALYZE of one table, sampling about analysis_limit rows per index (runs in a write block)."""
+    sync_conn.exec_driver_sql(f"PRAGMA analysis_limit={int(analysis_limit)}")
+    try:
+        sync_conn.exec_driver_sql(f'ANALYZE "{table_name}"')
+    finally:
+        sync_conn.exec_driver_sql("PRAGMA analysis_limit=0")  # The write connection is shared
+
+
+def incremental_vacuum_step(sync_conn: Connection, max_pages: int = VACUUM_PAGES_PER_STEP) -> int:
+    """Releases up to max_pages free pages at the end of the file (runs in a write block). Returns the pages released."""
+    freelist_before = _pragma_value(sync_conn, "freelist_count")
+    # Python's sqlite3 steps a PRAGMA only once and each step of incremental_vacuum releases one page,
+    # so the pragma is executed once per page
+    for _ in range(min(max_pages, freelist_before)):
+        sync_conn.exec_driver_sql("PRAGMA incremental_vacuum(1)")
+    return freelist_before - _pragma_value(sync_conn, "freelist_count")
+
+
+def optimize_pragma(sync_conn: Connection, analysis_limit: int = ANALYZE_ANALYSIS_LIMIT) -> None:
+    """PRAGMA optimize with a bounded analysis (runs in a write block)."""
+    sync_conn.exec_driver_sql(f"PRAGMA analysis_limit={int(analysis_limit)}")
+    try:
+        sync_conn.exec_driver_sql("PRAGMA optimize")
+    finally:
+        sync_conn.exec_driver_sql("PRAGMA analysis_limit=0")
+
+
+def wal_checkpoint(db_path: str, mode: str = "PASSIVE", timeout_seconds: float = CHECKPOINT_TRUNCATE_TIMEOUT_SECONDS) -> Dict[str, Any]:
+    """
+    Runs PRAGMA wal_checkpoint(mode) on its own sqlite3 connection (a checkpoint cannot run inside the write
+    coordinator's open transaction). Blocking; call it through asyncio.to_thread.
+
+    Returns:
+        {'step': 'checkpoint', 'mode', 'busy', 'wal_frames', 'checkpointed_frames', 'duration_ms'};
+        the frame counts are -1 if the database is not in WAL mode.
+    """
+    start = time.perf_counter()
+    connection = sqlite3.connect(db_path, timeout=timeout_seconds, isolation_level=None)
+    try:
+        busy, wal_frames, checkpointed_frames = connection.execute(f"PRAGMA wal_checkpoint({mode})").fetchone()
+    finally:
+        connection.close()
+    return {
+        'step': 'checkpoint',
+        'mode': mode,
+        'busy': bool(busy),
+        'wal_frames': wal_frames,
+        'checkpointed_frames': checkpointed_frames,
+        'duration_ms': round((time.perf_counter() - start) * 1000, 1)
+    }
+
+
+def enable_incremental_vacuum(db_path: str) -> Dict[str, Any]:
+    """
+    Switches an existing database file to auto_vacuum=INCREMENTAL. The switch only takes effect through a full
+    VACUUM, which rewrites the file and needs exclusive access: run it with the app stopped.
+
+    Returns:
+        {'auto_vacuum_before', 'auto_vacuum_after', 'bytes_before', 'bytes_after', 'duration_s'}
+    """
+    start = time.perf_counter()
+    bytes_before = os.path.getsize(db_path)
+    connection = sqlite3.connect(db_path, isolation_level=None)
+    try:
+        mode_before = AUTO_VACUUM_MODES.get(connection.execute("PRAGMA auto_vacuum").fetchone()[0], 'unknown')
+        connection.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        if mode_before != 'incremental':
+            connection.execute("VACUUM")
+        connection.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        mode_after = AUTO_VACUUM_MODES.get(connection.execute("PRAGMA auto_vacuum").fetchone()[0], 'unknown')
+    finally:
+        connection.close()
+    return {
+        'auto_vacuum_before': mode_before,
+        'auto_vacuum_after': mode_after,
+        'bytes_before': bytes_before,
+        'bytes_after': os.path.getsize(db_path),
+        'duration_s': round(time.perf_counter() - start, 2)
+    }
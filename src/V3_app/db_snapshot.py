@@ -0,0 +1,118 @@
+"""
+Point-in-time snapshots of the SQLite database for long read-only jobs.
+
+A full rebuild of the analytics cache runs in a process-pool worker and reads every ticker from the
+database for minutes. On the live file that scan is one long read transaction: in WAL mode it does not block writers,
+but checkpoints cannot copy frames past its snapshot, so the WAL keeps growing and the mass fetch's
+commits get slower until the scan ends. Instead, the worker takes a snapshot with SQLite's online backup
+API (a single backup step: one short read transaction on the live file, consistent even while the writer
+commits), reads from the copy, and publishes its results to the live database. The copy costs a read of the
+whole file, so it is only taken when a job is about to scan the source data (AnalyticsDataProcessor's full
+rebuilds); incremental refreshes run short indexed per-ticker queries on the live database.
+
+    with database_snapshot(db_path) as snapshot_path:
+        ... read from f"sqlite+aiosqlite:///{snapshot_path}" ...
+
+Snapshots are written to SNAPSHOT_DIR_ENV_VAR (default: a 'snapshots' folder next to the database) and
+removed when the block exits; leftovers of a crashed worker are removed by the next snapshot once they are
+older than STALE_SNAPSHOT_SECONDS. Set ANALYTICS_DB_SNAPSHOT=0 to make the analytics workers read the live
+database again.
+"""
+import logging
+import os
+import sqlite3
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_DIR_ENV_VAR = "DB_SNAPSHOT_DIR"
+SNAPSHOT_ENABLED_ENV_VAR = "ANALYTICS_DB_SNAPSHOT"
+SNAPSHOT_SUFFIX = ".snapshot.db"
+# Snapshot files older than this are treated as leftovers of a crashed worker
+STALE_SNAPSHOT_SECONDS = 6 * 3600
+# Busy timeout of the backup's read on the live database
+SNAPSHOT_BUSY_TIMEOUT_SECONDS = 30.0
+
+
+def snapshots_enabled() -> bool:
+    return os.environ.get(SNAPSHOT_ENABLED_ENV_VAR, "1").strip().lower() not in ("0", "false", "no", "off")
+
+
+def snapshot_dir_for(db_path: str) -> str:
+    return os.environ.get(SNAPSHOT_DIR_ENV_VAR) or os.path.join(os.path.dirname(os.path.abspath(db_path)), "snapshots")
+
+
+def _remove_snapshot_files(snapshot_path: str) -> None:
+    for path in (snapshot_path, f"{snapshot_path}-wal", f"{snapshot_path}-shm", f"{snapshot_path}-journal"):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def remove_stale_snapshots(snapshot_dir: str, max_age_seconds: float = STALE_SNAPSHOT_SECONDS) -> int:
+    """Removes snapshot files older than max_age_seconds. Returns the number removed."""
+    if not os.path.isdir(snapshot_dir):
+        return 0
+    removed = 0
+    now = time.time()
+    for name in os.listdir(snapshot_dir):
+        path = os.path.join(snapshot_dir, name)
+        if name.endswith(SNAPSHOT_SUFFIX) and now - os.path.getmtime(path) > max_age_seconds:
+            _remove_snapshot_files(path)
+            removed += 1
+    if removed:
+        logger.info(f"[DB Snapshot] Removed {removed} stale snapshot(s) from {snapshot_dir}.")
+    return removed
+
+
+def create_snapshot(db_path: str, snapshot_dir: Optional[str] = None) -> str:
+    """
+    Copies the database to a new snapshot file with the online backup API and returns its path.
+
+    The copy is made in one backup step, i.e. inside a single read transaction on the live database, so it is
+    the state of the last commit before the step started (a multi-step backup would restart whenever another
+    connection commits). The snapshot is switched to a rollback journal, so it is one self-contained file.
+    """
+    snapshot_dir = snapshot_dir or snapshot_dir_for(db_path)
+    os.makedirs(snapshot_dir, exist_ok=True)
+    remove_stale_snapshots(snapshot_dir)
+    base_name = os.path.splitext(os.path.basename(db_path))[0]
+    snapshot_path = os.path.join(snapshot_dir, f"{base_name}-{time.strftime('%Y%m%d%H%M%S')}-{uuid.uuid4().hex[:8]}{SNAPSHOT_SUFFIX}")
+
+    start = time.perf_counter()
+    source = sqlite3.connect(db_path, timeout=SNAPSHOT_BUSY_TIMEOUT_SECONDS)
+    try:
+        target = sqlite3.connect(snapshot_path)
+        try:
+            source.backup(target, pages=-1)
+            target.execute("PRAGMA journal_mode=DELETE")
+        finally:
+            target.close()
+    except Exception:
+        _remove_snapshot_files(snapshot_path)
+        raise
+    finally:
+        source.close()
+    logger.info(f"[DB Snapshot] Snapshot of {db_path} written to {snapshot_path} "
+                f"({os.path.getsize(snapshot_path) / 1024**2:.1f} MB in {time.perf_counter() - start:.2f} s).")
+    return snapshot_path
+
+
+def remove_snapshot(snapshot_path: str) -> None:
+    """Removes a snapshot written by create_snapshot."""
+    _remove_snapshot_files(snapshot_path)
+    logger.info(f"[DB Snapshot] Removed snapshot {snapshot_path}.")
+
+
+@contextmanager
+def database_snapshot(db_path: str, snapshot_dir: Optional[str] = None) -> Iterator[str]:
+    """Snapshot of the database for the duration of the block (see create_snapshot); removed afterwards."""
+    snapshot_path = create_snapshot(db_path, snapshot_dir)
+    try:
+        yield snapshot_path
+    finally:
+        remove_snapshot(snapshot_path)
@@ -0,0 +1,520 @@
+"""
+Single-writer group-commit coordinator for the SQLite database.
+
+The Yahoo and Finviz mass fetches, the IBKR position sync, the snapshot job and the analytics
+cache refresh used to write through separate engines and raw sqlite3 connections at the same
+time, so concurrent jobs stalled on "database is locked" retries. With a coordinator running,
+every write for a database goes through one writer task that owns the only write connection:
+
+    - Callers submit typed write commands (StatementWrite, DriverSQLWrite, OperationWrite) and get
+      a future that resolves once the command's transaction has been committed.
+    - Repository code keeps its `async with ... as conn:` blocks: begin_write() returns
+      coordinator.begin(), which queues a slot and runs the block on the writer's connection when
+      the slot comes up. ORM code uses write_session(), a session bound to that connection.
+    - Consecutive commands are group-committed: the writer keeps one transaction open while commands
+      are queued (up to WRITE_BATCH_MAX_COMMANDS / WRITE_BATCH_MAX_SECONDS) and commits them together.
+      Each command runs in its own SAVEPOINT, so a failing command only rolls back itself.
+    - A begin() block is never part of a batch: the commands before it are committed first and the
+      block gets a transaction of its own, since the writer has to wait for whatever the block awaits.
+      The rule for blocks is therefore: only database work on the block's connection. Do not await
+      network calls, other tasks that write through the coordinator (that deadlocks: the writer is
+      waiting for the block) or anything else slow. A block still open after its timeout
+      (WRITE_BLOCK_TIMEOUT_SECONDS by default) is cancelled, rolled back and raises WriteBlockTimeoutError.
+    - Queue depth, batch sizes and commit latency are exposed through metrics().
+
+Without a running coordinator (CLI tools, process-pool workers, tests), begin_write() falls back to
+engine.begin() and the sync helpers keep using sqlite3 directly.
+"""
+import asyncio
+import logging
+import os
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Awaitable, Callable, Deque, Dict, List, Optional, Sequence, Union
+
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine, AsyncSession
+from sqlalchemy.sql import Executable
+
+from .db_engine_registry import apply_connection_profile, create_engine_for_url, is_sqlite_file_url
+
+logger = logging.getLogger(__name__)
+
+# A batch is committed when the queue is empty, or once it holds this many commands
+# or has been open this long (bounds the commit latency of the first command in a batch).
+WRITE_BATCH_MAX_COMMANDS = 200
+WRITE_BATCH_MAX_SECONDS = 0.5
+# A begin() block holds the only write connection, so every other writer waits for it; see the module docstring
+WRITE_BLOCK_TIMEOUT_SECONDS = 60.0
+# Recent batches/commands kept for the latency percentiles in metrics()
+METRICS_WINDOW = 500
+
+# Connection of the write block the current task is in, so nested writes join it instead of queueing
+_active_write_connection: ContextVar[Optional[AsyncConnection]] = ContextVar("_active_write_connection", default=None)
+
+
+class WriteBlockTimeoutError(TimeoutError):
+    """A begin() block kept the write connection past its timeout; it was cancelled and rolled back."""
+
+
+# --- Write Commands ---
+@dataclass
+class WriteCommand:
+    """Base class for commands executed by the writer task. apply() runs inside the command's SAVEPOINT."""
+    description: str
+
+    async def apply(self, conn: AsyncConnection) -> Any:
+        raise NotImplementedError
+
+
+@dataclass
+class StatementWrite(WriteCommand):
+    """Executes a SQLAlchemy statement (executemany if parameters is a list). Resolves to the rowcount."""
+    statement: Executable = None
+    parameters: Optional[Union[Dict[str, Any], List[Dict[str, Any]]]] = None
+
+    async def apply(self, conn: AsyncConnection) -> int:
+        result = await conn.execute(self.statement, self.parameters)
+        return result.rowcount
+
+
+@dataclass
+class DriverSQLWrite(WriteCommand):
+    """Executes raw SQL with DBAPI (qmark) parameters, for code ported from sqlite3. Resolves to the rowcount."""
+    sql: str = ""
+    parameters: Union[tuple, List[tuple]] = ()
+
+    async def apply(self, conn: AsyncConnection) -> int:
+        result = await conn.exec_driver_sql(self.sql, self.parameters)
+        return result.rowcount
+
+
+@dataclass
+class OperationWrite(WriteCommand):
+    """Runs an async callable with the write connection. Resolves to its return value."""
+    operation: Callable[[AsyncConnection], Awaitable[Any]] = None
+
+    async def apply(self, conn: AsyncConnection) -> Any:
+        return await self.operation(conn)
+
+
+class _TransactionSlot(WriteCommand):
+    """Hands the write connection to a caller's begin() block and waits until the block exits (at most timeout
+       seconds; then the caller's task is cancelled and the block rolled back)."""
+
+    def __init__(self, description: str, loop: asyncio.AbstractEventLoop, owner: asyncio.Task, timeout: Optional[float]):
+        super().__init__(description)
+        self.connection_ready: asyncio.Future = loop.create_future()
+        self.block_done: asyncio.Future = loop.create_future()
+        self.owner = owner
+        self.timeout = timeout
+        self.timed_out = False
+
+    async def apply(self, conn: AsyncConnection) -> None:
+        if self.connection_ready.cancelled():
+            return  # Caller gave up while queued; nothing ran
+        self.connection_ready.set_result(conn)
+        try:
+            error = await asyncio.wait_for(asyncio.shield(self.block_done), self.timeout)
+        except asyncio.TimeoutError:
+            logger.error(f"[DB Write Coordinator] Write block '{self.description}' still open after {self.timeout} s. Cancelling it.")
+            self.timed_out = True
+            self.owner.cancel()
+            await self.block_done  # The block leaves the connection before it is rolled back
+            raise WriteBlockTimeoutError(f"Write block '{self.description}' exceeded {self.timeout} s and was rolled back")
+        if error is not None:
+            raise error
+# --- End Write Commands ---
+
+
+@dataclass
+class _QueuedWrite:
+    command: WriteCommand
+    future: asyncio.Future
+    submitted_at: float = field(default_factory=time.perf_counter)
+
+
+def _percentile(values: Sequence[float], fraction: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class WriteCoordinator:
+    """Owns the write connection for one database URL and group-commits the commands submitted to it."""
+
+    def __init__(self, database_url: str, max_batch_commands: int = WRITE_BATCH_MAX_COMMANDS,
+                 max_batch_seconds: float = WRITE_BATCH_MAX_SECONDS):
+        self.database_url = database_url
+        self.max_batch_commands = max_batch_commands
+        self.max_batch_seconds = max_batch_seconds
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self._engine: Optional[AsyncEngine] = None
+        self._conn: Optional[AsyncConnection] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._held_over: Optional[_QueuedWrite] = None  # Write block taken from the queue to start the next batch
+        self._task: Optional[asyncio.Task] = None
+        self._writer_thread_id: Optional[int] = None
+        # Metrics
+        self._commands_submitted = 0
+        self._commands_committed = 0
+        self._commands_failed = 0
+        self._batches_committed = 0
+        self._batches_failed = 0
+        self._max_queue_depth = 0
+        self._batch_sizes: Deque[int] = deque(maxlen=METRICS_WINDOW)
+        self._commit_ms: Deque[float] = deque(maxlen=METRICS_WINDOW)
+        self._queue_wait_ms: Deque[float] = deque(maxlen=METRICS_WINDOW)
+        self._command_latency_ms: Deque[float] = deque(maxlen=METRICS_WINDOW)
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def _create_engine(self) -> AsyncEngine:
+        engine = create_engine_for_url(self.database_url)
+        # pysqlite/aiosqlite defer BEGIN until the first DML statement and treat SAVEPOINT as autocommit,
+        # which breaks per-command savepoints inside a batch. Disable the driver's transaction handling
+        # and emit BEGIN ourselves (the SQLAlchemy-documented recipe for SQLite savepoints).
+        @event.listens_for(engine.sync_engine, "connect")
+        def _disable_driver_transactions(dbapi_connection, connection_record):
+            dbapi_connection.isolation_level = None
+
+        @event.listens_for(engine.sync_engine, "begin")
+        def _emit_begin(conn):
+            conn.exec_driver_sql("BEGIN")
+
+        if is_sqlite_file_url(self.database_url):
+            apply_connection_profile(engine, 'writer')  # Same WAL/synchronous settings as the registry's writer engine
+        return engine
+
+    async def start(self) -> None:
+        """Starts the writer task on the running event loop."""
+        if self.running:
+            return
+        self.loop = asyncio.get_running_loop()
+        self._writer_thread_id = threading.get_ident()
+        self._queue = asyncio.Queue()
+        self._engine = self._create_engine()
+        self._task = asyncio.create_task(self._run(), name=f"db-writer:{self.database_url}")
+        logger.info(f"[DB Write Coordinator] Writer started for {self.database_url}")
+
+    async def stop(self) -> None:
+        """Commits the queued commands, then stops the writer task and closes the write connection."""
+        if self._task is None:
+            return
+        if self.running:
+            await self._queue.put(None)  # Stop marker, after everything already queued
+            await self._task
+        self._task = None
+        if self._conn is not None:
+            await self._conn.close()
+            self._conn = None
+        if self._engine is not None:
+            await self._engine.dispose()
+            self._engine = None
+        logger.info(f"[DB Write Coordinator] Writer stopped for {self.database_url}. Metrics: {self.metrics()}")
+
+    # --- Submission ---
+    def submit(self, command: WriteCommand) -> asyncio.Future:
+        """Queues a command. Returns a future resolving to its result once committed (or to its exception)."""
+        if not self.running:
+            raise RuntimeError(f"Write coordinator for {self.database_url} is not running")
+        future = self.loop.create_future()
+        self._queue.put_nowait(_QueuedWrite(command, future))
+        self._commands_submitted += 1
+        self._max_queue_depth = max(self._max_queue_depth, self._queue.qsize())
+        return future
+
+    async def execute(self, command: WriteCommand) -> Any:
+        """Submits a command and waits for it to be committed."""
+        return await self.submit(command)
+
+    def execute_threadsafe(self, command: WriteCommand, timeout: Optional[float] = None) -> Any:
+        """Submits a command from a worker thread (e.g. a synchronous scheduler job) and blocks until committed."""
+        if threading.get_ident() == self._writer_thread_id:
+            raise RuntimeError("execute_threadsafe() called from the event loop thread; use execute() instead")
+        return asyncio.run_coroutine_threadsafe(self.execute(command), self.loop).result(timeout)
+
+    @asynccontextmanager
+    async def begin(self, description: str = "write block",
+                    timeout: Optional[float] = WRITE_BLOCK_TIMEOUT_SECONDS) -> AsyncIterator[AsyncConnection]:
+        """
+        Runs the block on the write connection, in a transaction of its own (not batched with other commands).
+        Returns after it has been committed; an exception in the block rolls it back. Nested begin() calls in
+        the same task join the outer block through a nested SAVEPOINT. The block must only do database work
+        (see the module docstring); after timeout seconds (None: no limit) it is cancelled and rolled back,
+        and WriteBlockTimeoutError is raised.
+        """
+        active_conn = _active_write_connection.get()
+        if active_conn is not None:
+            async with active_conn.begin_nested():
+                yield active_conn
+            return
+
+        slot = _TransactionSlot(description, self.loop, asyncio.current_task(), timeout)
+        committed = self.submit(slot)
+        try:
+            await asyncio.wait({slot.connection_ready, committed}, return_when=asyncio.FIRST_COMPLETED)
+        except asyncio.CancelledError:
+            if not slot.connection_ready.cancel():
+                # The writer already handed over the connection; release the slot without running the block
+                slot.block_done.set_result(RuntimeError(f"Write block '{description}' cancelled before it started"))
+            raise
+        if not slot.connection_ready.done():
+            committed.result()  # The writer failed before the block could start; raise its error
+
+        token = _active_write_connection.set(slot.connection_ready.result())
+        try:
+            yield slot.connection_ready.result()
+        except BaseException as error:
+            # Cancellation of the caller only fails this block, not the writer's batch
+            slot.block_done.set_result(error if isinstance(error, Exception) else RuntimeError(f"Write block '{description}' interrupted: {error!r}"))
+            try:
+                await committed
+            except BaseException:
+                pass  # The block's own error is re-raised below
+            if slot.timed_out and isinstance(error, asyncio.CancelledError):
+                self._raise_block_timeout(slot)
+            raise
+        else:
+            slot.block_done.set_result(None)
+            try:
+                await committed
+            except asyncio.CancelledError:
+                if not slot.timed_out: # The timeout fired as the block finished
+                    raise
+                self._raise_block_timeout(slot)
+        finally:
+            _active_write_connection.reset(token)
+
+    @staticmethod
+    def _raise_block_timeout(slot: _TransactionSlot) -> None:
+        """Turns the cancellation the writer sent to a timed-out block back into WriteBlockTimeoutError."""
+        task = asyncio.current_task()
+        if hasattr(task, 'uncancel'): # Python 3.11+: clear the cancellation request the writer made
+            task.uncancel()
+        raise WriteBlockTimeoutError(f"Write block '{slot.description}' exceeded {slot.timeout} s and was rolled back")
+    # --- End Submission ---
+
+    # --- Writer Task ---
+    async def _connection(self) -> AsyncConnection:
+        if self._conn is None or self._conn.closed:
+            self._conn = await self._engine.connect()
+        return self._conn
+
+    async def _run(self) -> None:
+        while True:
+            queued, self._held_over = self._held_over, None
+            if queued is None:
+                queued = await self._queue.get()
+            if queued is None:
+                break
+            stop_requested = await self._process_batch(queued)
+            if stop_requested:
+                break
+
+    async def _process_batch(self, first: _QueuedWrite) -> bool:
+        """Runs commands in one transaction until the queue is empty or the batch is full, then commits."""
+        outcomes = []  # (queued, result, error)
+        stop_requested = False
+        batch_started = time.perf_counter()
+        try:
+            conn = await self._connection()
+            transaction = await conn.begin()
+        except Exception as e:
+            logger.error(f"[DB Write Coordinator] Could not open a write transaction: {e}", exc_info=True)
+            self._fail(first, e)
+            self._batches_failed += 1
+            await self._discard_connection()
+            return False
+
+        queued = first
+        in_flight: Optional[_QueuedWrite] = None  # Taken from the queue but without an outcome yet
+        try:
+            while True:
+                in_flight = queued
+                self._queue_wait_ms.append((time.perf_counter() - queued.submitted_at) * 1000)
+                token = _active_write_connection.set(conn)
+                try:
+                    async with conn.begin_nested():
+                        result = await queued.command.apply(conn)
+                    outcomes.append((queued, result, None))
+                except Exception as e:
+                    logger.warning(f"[DB Write Coordinator] Command '{queued.command.description}' failed and was rolled back: {e}")
+                    outcomes.append((queued, None, e))
+                finally:
+                    _active_write_connection.reset(token)
+                in_flight = None
+
+                if isinstance(queued.command, _TransactionSlot): # A write block is a batch of its own
+                    break
+                if len(outcomes) >= self.max_batch_commands or time.perf_counter() - batch_started >= self.max_batch_seconds:
+                    break
+                try:
+                    queued = self._queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    break
+                if queued is None:
+                    stop_requested = True
+                    break
+                if isinstance(queued.command, _TransactionSlot):
+                    self._held_over = queued # Commit this batch first; the block starts the next one
+                    break
+
+            commit_started = time.perf_counter()
+            await transaction.commit()
+            self._commit_ms.append((time.perf_counter() - commit_started) * 1000)
+        except BaseException as e:
+            # The transaction itself failed (commit error, broken connection, cancellation): nothing in it was kept
+            logger.error(f"[DB Write Coordinator] Batch of {len(outcomes)} commands failed and was rolled back: {e}", exc_info=True)
+            self._batches_failed += 1
+            failed = [item[0] for item in outcomes]
+            if in_flight is not None:
+                failed.append(in_flight)
+            for item in failed:
+                self._fail(item, e if isinstance(e, Exception) else RuntimeError(f"Write batch aborted: {e!r}"))
+            await self._discard_connection()
+            if not isinstance(e, Exception):
+                raise
+            return stop_requested
+
+        self._batches_committed += 1
+        self._batch_sizes.append(len(outcomes))
+        now = time.perf_counter()
+        for item, result, error in outcomes:
+            self._command_latency_ms.append((now - item.submitted_at) * 1000)
+            if error is None:
+                self._commands_committed += 1
+                if not item.future.done():
+                    item.future.set_result(result)
+            else:
+                self._fail(item, error)
+        return stop_requested
+
+    def _fail(self, queued: _QueuedWrite, error: BaseException) -> None:
+        self._commands_failed += 1
+        if not queued.future.done():
+            queued.future.set_exception(error)
+        if isinstance(queued.command, _TransactionSlot) and not queued.command.connection_ready.done():
+            queued.command.connection_ready.cancel()
+
+    async def _discard_connection(self) -> None:
+        if self._conn is not None:
+            try:
+                await self._conn.close()
+            except Exception:
+                pass
+            self._conn = None
+    # --- End Writer Task ---
+
+    def metrics(self) -> Dict[str, Any]:
+        """Queue depth, throughput and latency figures (latencies in milliseconds over the recent window)."""
+        batch_sizes = list(self._batch_sizes)
+        commit_ms = list(self._commit_ms)
+        return {
+            'database_url': self.database_url,
+            'running': self.running,
+            'queue_depth': self._queue.qsize() if self._queue is not None else 0,
+            'max_queue_depth': self._max_queue_depth,
+            'commands_submitted': self._commands_submitted,
+            'commands_committed': self._commands_committed,
+            'commands_failed': self._commands_failed,
+            'batches_committed': self._batches_committed,
+            'batches_failed': self._batches_failed,
+            'avg_batch_size': round(sum(batch_sizes) / len(batch_sizes), 2) if batch_sizes else None,
+            'max_batch_size': max(batch_sizes) if batch_sizes else None,
+            'commit_ms_avg': round(sum(commit_ms) / len(commit_ms), 3) if commit_ms else None,
+            'commit_ms_p95': _percentile(commit_ms, 0.95),
+            'queue_wait_ms_p50': _percentile(self._queue_wait_ms, 0.5),
+            'queue_wait_ms_p95': _percentile(self._queue_wait_ms, 0.95),
+            'command_latency_ms_p50': _percentile(self._command_latency_ms, 0.5),
+            'command_latency_ms_p95': _percentile(self._command_latency_ms, 0.95),
+        }
+
+
+class WriteCoordinatorRegistry:
+    """Running coordinators by database URL. Started in the app's startup hook, stopped in shutdown."""
+
+    def __init__(self):
+        self._coordinators: Dict[str, WriteCoordinator] = {}
+        self._lock = threading.Lock()
+
+    async def start(self, database_url: str) -> WriteCoordinator:
+        with self._lock:
+            coordinator = self._coordinators.get(database_url)
+            if coordinator is None:
+                coordinator = WriteCoordinator(database_url)
+                self._coordinators[database_url] = coordinator
+        await coordinator.start()
+        return coordinator
+
+    async def stop_all(self) -> None:
+        with self._lock:
+            coordinators = list(self._coordinators.values())
+            self._coordinators = {}
+        for coordinator in coordinators:
+            try:
+                await coordinator.stop()
+            except Exception as e:
+                logger.error(f"[DB Write Coordinator] Error stopping writer for {coordinator.database_url}: {e}", exc_info=True)
+
+    def get(self, database_url: str) -> Optional[WriteCoordinator]:
+        """The running coordinator for a URL, or None."""
+        with self._lock:
+            coordinator = self._coordinators.get(database_url)
+        return coordinator if coordinator is not None and coordinator.running else None
+
+    def get_for_sqlite_path(self, db_path: str) -> Optional[WriteCoordinator]:
+        """The running coordinator whose SQLite database file is db_path (for the sqlite3-based sync helpers)."""
+        target = os.path.abspath(db_path)
+        with self._lock:
+            coordinators = list(self._coordinators.values())
+        for coordinator in coordinators:
+            database = make_url(coordinator.database_url).database
+            if database and os.path.abspath(database) == target and coordinator.running:
+                return coordinator
+        return None
+
+    def metrics(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            coordinators = list(self._coordinators.values())
+        return [coordinator.metrics() for coordinator in coordinators]
+
+
+# Create a singleton instance
+write_coordinators = WriteCoordinatorRegistry()
+
+
+def begin_write(engine: AsyncEngine, database_url: str, description: str = "write block"):
+    """
+    Write transaction for repository code: `async with begin_write(self.engine, self.database_url) as conn:`.
+    Goes through the database's write coordinator when one is running on this event loop,
+    otherwise it is engine.begin().
+    """
+    coordinator = write_coordinators.get(database_url)
+    if coordinator is not None:
+        try:
+            same_loop = asyncio.get_running_loop() is coordinator.loop
+        except RuntimeError:
+            same_loop = False
+        if same_loop:
+            return coordinator.begin(description)
+    return engine.begin()
+
+
+@asynccontextmanager
+async def write_session(engine: AsyncEngine, database_url: str, description: str = "write block") -> AsyncIterator[AsyncSession]:
+    """
+    AsyncSession bound to a begin_write() connection, for ORM-style writers. session.begin()/commit()
+    inside it only end the session's own unit of work; the write block commits when it exits.
+    """
+    async with begin_write(engine, database_url, description) as conn:
+        async with AsyncSession(bind=conn, expire_on_commit=False) as session:
+            yield session
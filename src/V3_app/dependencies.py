@@ -5,14 +5,21 @@ from typing import AsyncGenerator
 from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi import Request, HTTPException
 import logging
+import threading
 
 # Assuming SQLiteRepository is accessible via a direct or adjusted relative import
 # This path needs to be correct based on your project structure.
 # If V3_database is in the same directory as dependencies.py (e.g. both in V3_app)
 from .V3_database import SQLiteRepository 
+from .yahoo_repository import YahooDataRepository
+from .yahoo_data_query_srv import YahooDataQueryService
+from .yahoo_data_query_pro import YahooDataQueryProService
 
 logger = logging.getLogger(__name__)
 
+# Guards lazy creation of the app-scoped service graph
+_service_graph_lock = threading.Lock()
+
 async def get_db(request: Request) -> AsyncGenerator[AsyncSession, None]:
     """
     Dependency that provides a SQLAlchemy AsyncSession.
@@ -53,4 +60,43 @@ def get_repository(request: Request) -> SQLiteRepository:
         raise HTTPException(status_code=500, detail="Internal server error: Repository not initialized.")
     return request.app.state.repository
 
+def get_yahoo_repository(request: Request) -> YahooDataRepository:
+    """Dependency function to get the shared YahooDataRepository instance from app state."""
+    yahoo_repo = getattr(request.app.state, 'yahoo_repository', None)
+    if yahoo_repo is not None:
+        return yahoo_repo
+    repository = get_repository(request)
+    # Fallback for apps that did not set one up; the engine itself is shared via the registry.
+    return YahooDataRepository(database_url=repository.database_url)
+
+def build_yahoo_service_graph(app_state, yahoo_repo: YahooDataRepository) -> None:
+    """Creates the long-lived Yahoo query services on app state.
+
+    YahooDataQueryService and YahooDataQueryProService hold no request-scoped state and
+    create their sub-services lazily, so one instance of each serves every request.
+    """
+    with _service_graph_lock:
+        if getattr(app_state, 'yahoo_query_service', None) is None:
+            app_state.yahoo_query_service = YahooDataQueryService(db_repo=yahoo_repo)
+        if getattr(app_state, 'yahoo_query_pro_service', None) is None:
+            app_state.yahoo_query_pro_service = YahooDataQueryProService(
+                db_repo=yahoo_repo, base_query_srv=app_state.yahoo_query_service
+            )
+
+def get_yahoo_query_service(request: Request) -> YahooDataQueryService:
+    """Dependency function to get the shared YahooDataQueryService instance."""
+    service = getattr(request.app.state, 'yahoo_query_service', None)
+    if service is None:
+        build_yahoo_service_graph(request.app.state, get_yahoo_repository(request))
+        service = request.app.state.yahoo_query_service
+    return service
+
+def get_yahoo_query_pro_service(request: Request) -> YahooDataQueryProService:
+    """Dependency function to get the shared YahooDataQueryProService instance."""
+    service = getattr(request.app.state, 'yahoo_query_pro_service', None)
+    if service is None:
+        build_yahoo_service_graph(request.app.state, get_yahoo_repository(request))
+        service = request.app.state.yahoo_query_pro_service
+    return service
+
 # You can add other shared dependencies here in the future 
\ No newline at end of file
@@ -0,0 +1,168 @@
+"""
+Fast JSON encoding/decoding used across V3_app (repository payloads, analytics caches, API responses, SSE).
+
+Uses orjson when it is installed and falls back to the stdlib json module otherwise; both backends
+produce equivalent output. Compared to plain json.dumps:
+    - datetime/date/time are written as ISO 8601 strings, numpy scalars and arrays as plain numbers/lists,
+      Decimal as float and sets as lists.
+    - Non-finite floats (NaN, Infinity) are written as null by default, which is what browsers and
+      JSONResponse accept. Pass allow_nan=True where values must round-trip through storage (payloads,
+      caches): they are then written as NaN/Infinity literals, exactly like json.dumps.
+    - If a default callable is given it is used like json.dumps(default=...), including for datetimes.
+
+loads() accepts str or bytes and reads the NaN/Infinity literals json.dumps writes. Decode errors are
+json.JSONDecodeError (orjson's error type subclasses it), so existing except clauses keep working.
+With orjson, integers beyond 64 bits decode as float.
+"""
+import json
+import logging
+import math
+from datetime import date, datetime, time
+from decimal import Decimal
+from typing import Any, Callable, Optional, Union
+
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+logger = logging.getLogger(__name__)
+
+JSONDecodeError = json.JSONDecodeError
+
+BACKEND = "orjson" if orjson is not None else "json"
+
+if orjson is not None:
+    _ORJSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+# json.dumps spells non-finite floats as these literals; orjson.loads rejects them
+_NON_FINITE_LITERALS = ("NaN", "Infinity")
+_NON_FINITE_LITERALS_BYTES = (b"NaN", b"Infinity")
+
+
+def _convert_numpy(obj: Any) -> Any:
+    """numpy scalar/array -> Python value, or the object unchanged if it is not a numpy type."""
+    if np is not None:
+        if isinstance(obj, np.generic):
+            return obj.item()
+        if isinstance(obj, np.ndarray):
+            return obj.tolist()
+    return obj
+
+
+def _default(obj: Any) -> Any:
+    """Serializer for the types neither backend handles natively."""
+    if isinstance(obj, (datetime, date, time)):
+        return obj.isoformat()
+    converted = _convert_numpy(obj)
+    if converted is not obj:
+        return converted
+    if isinstance(obj, Decimal):
+        return float(obj)
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def _chain_default(default: Optional[Callable[[Any], Any]]) -> Callable[[Any], Any]:
+    if default is None:
+        return _default
+
+    def chained(obj: Any) -> Any:
+        # numpy is serialized natively by orjson, so the stdlib path converts it before the caller's default
+        converted = _convert_numpy(obj)
+        if converted is not obj:
+            return converted
+        return default(obj)
+    return chained
+
+
+def _contains_non_finite(obj: Any) -> bool:
+    """True if any float (or numpy float) nested in dicts/lists/tuples is NaN or infinite."""
+    if isinstance(obj, float):
+        return not math.isfinite(obj)
+    if isinstance(obj, dict):
+        return any(_contains_non_finite(value) for value in obj.values())
+    if isinstance(obj, (list, tuple)):
+        return any(_contains_non_finite(value) for value in obj)
+    if np is not None:
+        if isinstance(obj, np.floating):
+            return not np.isfinite(obj)
+        if isinstance(obj, np.ndarray) and obj.dtype.kind in "fc":
+            return not np.isfinite(obj).all()
+    return False
+
+
+def _replace_non_finite(obj: Any) -> Any:
+    """Copy of obj with NaN/Infinity floats replaced by None (stdlib path of the null-by-default behavior)."""
+    if isinstance(obj, float):
+        return obj if math.isfinite(obj) else None
+    if isinstance(obj, dict):
+        return {key: _replace_non_finite(value) for key, value in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [_replace_non_finite(value) for value in obj]
+    if np is not None and isinstance(obj, (np.floating, np.ndarray)):
+        return _replace_non_finite(_convert_numpy(obj))
+    return obj
+
+
+def dumps_bytes(obj: Any, *, default: Optional[Callable[[Any], Any]] = None, allow_nan: bool = False) -> bytes:
+    """
+    Serializes obj to UTF-8 JSON bytes.
+
+    Args:
+        obj: The object to serialize.
+        default: Called for objects the backend cannot serialize (and for datetimes), like json.dumps(default=...).
+        allow_nan: Write NaN/Infinity literals instead of null, so the values survive a round-trip through loads().
+    """
+    if orjson is not None and not (allow_nan and _contains_non_finite(obj)):
+        option = _ORJSON_OPTIONS
+        if default is not None:
+            option |= orjson.OPT_PASSTHROUGH_DATETIME
+        try:
+            return orjson.dumps(obj, default=_chain_default(default), option=option)
+        except TypeError:
+            # orjson.JSONEncodeError subclasses TypeError (e.g. integers beyond 64 bits); let the stdlib decide
+            pass
+    if not allow_nan:
+        obj = _replace_non_finite(obj)
+    return json.dumps(obj, default=_chain_default(default), separators=(",", ":")).encode("utf-8")
+
+
+def dumps(obj: Any, *, default: Optional[Callable[[Any], Any]] = None, allow_nan: bool = False) -> str:
+    """Serializes obj to a JSON string. See dumps_bytes for the arguments."""
+    return dumps_bytes(obj, default=default, allow_nan=allow_nan).decode("utf-8")
+
+
+def loads(data: Union[str, bytes, bytearray, memoryview]) -> Any:
+    """
+    Deserializes JSON text or UTF-8 bytes, including the NaN/Infinity literals written by json.dumps.
+
+    Raises:
+        json.JSONDecodeError: If data is not valid JSON.
+    """
+    if orjson is not None:
+        literals = _NON_FINITE_LITERALS if isinstance(data, str) else _NON_FINITE_LITERALS_BYTES
+        if not any(literal in data for literal in literals):
+            try:
+                return orjson.loads(data)
+            except orjson.JSONDecodeError:
+                # Valid for the stdlib but not orjson (e.g. escaped lone surrogates)
+                pass
+    if not isinstance(data, str):
+        data = bytes(data).decode("utf-8")
+    return json.loads(data)
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with fastjson: NaN/Infinity become null instead of failing the request."""
+
+    def render(self, content: Any) -> bytes:
+        return dumps_bytes(content)
@@ -0,0 +1,259 @@
+"""
+Storage codec for ticker_data_items.item_data_payload.
+
+Payloads are JSON text. They are stored as TEXT by default; with compression enabled they are
+stored as BLOBs starting with a one-byte format marker. Both kinds coexist in the same column and
+are told apart by their storage type: str is JSON text, bytes carry a marker.
+
+    0x03  raw deflate (zlib) with the STATEMENT_PAYLOAD_DICTIONARY_V2 preset dictionary
+    0x04  zstd with STATEMENT_PAYLOAD_DICTIONARY_V2 as a raw-content dictionary (needs 'zstandard')
+    0x01  as 0x03, with STATEMENT_PAYLOAD_DICTIONARY_V1 (read only)
+    0x02  as 0x04, with STATEMENT_PAYLOAD_DICTIONARY_V1 (read only)
+
+The V1 dictionary was shaped like json.dumps output ('"<key>": null, '), but payloads are written
+compactly by fastjson ('"<key>":null,'), so the matcher only found the bare key names. V2 holds the
+same keys in the compact form: with zlib, 25.3 MB of statement payloads are stored in 4.7 MB instead
+of 6.5 MB (about 5.4x instead of 3.9x; benchmarks/bench_payload_codec.py, 12,000 payloads of 60
+fields). Writes use V2; 'db_maintenance compress-payloads' rewrites V1 rows along with TEXT ones.
+
+The dictionaries are part of the on-disk format: never edit the key list or how a dictionary is
+built from it; add a new marker instead. The codec used for writes comes from the
+YAHOO_PAYLOAD_CODEC environment variable ('none' (default), 'zlib' or 'zstd').
+
+Compression is opt-in because it trades read speed for size. SQL-side JSON functions only see TEXT
+rows, so the json_extract field projection of the repository (_json_field_projection) falls back
+to transferring and decoding the whole payload of a compressed row in Python. Measure both sides
+with benchmarks/bench_payload_codec.py before enabling it; 'db_maintenance compress-payloads'
+rewrites the stored rows to the chosen codec (or back to TEXT with 'none').
+
+CompressedPayloadText applies the codec on the column, so every ORM read and write of
+item_data_payload is transparent.
+
+payload_hash() is the content hash kept next to the payload (ticker_data_items.payload_hash). It is
+taken over the uncompressed JSON text, so it does not change with the codec.
+"""
+import hashlib
+import logging
+import os
+import threading
+import zlib
+from typing import Optional, Union
+
+from sqlalchemy.types import Text, TypeDecorator
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+PAYLOAD_FORMAT_ZLIB_V1 = b"\x01"
+PAYLOAD_FORMAT_ZSTD_V1 = b"\x02"
+PAYLOAD_FORMAT_ZLIB_V2 = b"\x03"
+PAYLOAD_FORMAT_ZSTD_V2 = b"\x04"
+PAYLOAD_CODECS = ("zlib", "zstd", "none")
+# Marker written by each codec
+PAYLOAD_CODEC_MARKERS = {"zlib": PAYLOAD_FORMAT_ZLIB_V2, "zstd": PAYLOAD_FORMAT_ZSTD_V2}
+
+ZLIB_LEVEL = 6
+ZSTD_LEVEL = 9
+
+# Field names of yfinance statements (income statement, balance sheet, cash flow), which make up
+# most of every statement payload. Frozen: see the module docstring.
+STATEMENT_PAYLOAD_KEYS_V1 = (
+    # Income statement
+    "Tax Effect Of Unusual Items", "Tax Rate For Calcs", "Normalized EBITDA", "Total Unusual Items",
+    "Total Unusual Items Excluding Goodwill", "Net Income From Continuing Operation Net Minority Interest",
+    "Reconciled Depreciation", "Reconciled Cost Of Revenue", "EBITDA", "EBIT", "Net Interest Income",
+    "Interest Expense", "Interest Income", "Normalized Income",
+    "Net Income From Continuing And Discontinued Operation", "Total Expenses",
+    "Total Operating Income As Reported", "Diluted Average Shares", "Basic Average Shares", "Diluted EPS",
+    "Basic EPS", "Diluted NI Availto Com Stockholders", "Net Income Common Stockholders", "Net Income",
+    "Net Income Including Noncontrolling Interests", "Net Income Continuous Operations", "Tax Provision",
+    "Pretax Income", "Other Income Expense", "Other Non Operating Income Expenses", "Special Income Charges",
+    "Write Off", "Gain On Sale Of Security", "Net Non Operating Interest Income Expense",
+    "Interest Expense Non Operating", "Interest Income Non Operating", "Operating Income",
+    "Operating Expense", "Research And Development", "Selling General And Administration",
+    "Selling And Marketing Expense", "General And Administrative Expense", "Other Gand A", "Gross Profit",
+    "Cost Of Revenue", "Total Revenue", "Operating Revenue",
+    # Balance sheet
+    "Ordinary Shares Number", "Share Issued", "Net Debt", "Total Debt", "Tangible Book Value",
+    "Invested Capital", "Working Capital", "Net Tangible Assets", "Capital Lease Obligations",
+    "Common Stock Equity", "Total Capitalization", "Total Equity Gross Minority Interest",
+    "Stockholders Equity", "Gains Losses Not Affecting Retained Earnings", "Other Equity Adjustments",
+    "Retained Earnings", "Capital Stock", "Common Stock", "Total Liabilities Net Minority Interest",
+    "Total Non Current Liabilities Net Minority Interest", "Other Non Current Liabilities",
+    "Tradeand Other Payables Non Current", "Non Current Deferred Liabilities", "Non Current Deferred Revenue",
+    "Non Current Deferred Taxes Liabilities", "Long Term Debt And Capital Lease Obligation",
+    "Long Term Capital Lease Obligation", "Long Term Debt", "Current Liabilities",
+    "Other Current Liabilities", "Current Deferred Liabilities", "Current Deferred Revenue",
+    "Current Debt And Capital Lease Obligation", "Current Debt", "Other Current Borrowings",
+    "Commercial Paper", "Pensionand Other Post Retirement Benefit Plans Current",
+    "Payables And Accrued Expenses", "Payables", "Total Tax Payable", "Income Tax Payable",
+    "Accounts Payable", "Total Assets", "Total Non Current Assets", "Other Non Current Assets",
+    "Financial Assets", "Investments And Advances", "Investmentin Financial Assets",
+    "Available For Sale Securities", "Long Term Equity Investment", "Goodwill And Other Intangible Assets",
+    "Other Intangible Assets", "Goodwill", "Net PPE", "Accumulated Depreciation", "Gross PPE", "Leases",
+    "Other Properties", "Machinery Furniture Equipment", "Buildings And Improvements",
+    "Land And Improvements", "Properties", "Current Assets", "Other Current Assets", "Hedging Assets Current",
+    "Inventory", "Finished Goods", "Work In Process", "Raw Materials", "Receivables", "Accounts Receivable",
+    "Allowance For Doubtful Accounts Receivable", "Gross Accounts Receivable",
+    "Cash Cash Equivalents And Short Term Investments", "Other Short Term Investments",
+    "Cash And Cash Equivalents", "Cash Equivalents", "Cash Financial",
+    # Cash flow statement
+    "Free Cash Flow", "Repurchase Of Capital Stock", "Repayment Of Debt", "Issuance Of Debt",
+    "Issuance Of Capital Stock", "Capital Expenditure", "End Cash Position", "Beginning Cash Position",
+    "Effect Of Exchange Rate Changes", "Changes In Cash", "Financing Cash Flow",
+    "Cash Flow From Continuing Financing Activities", "Net Other Financing Charges", "Cash Dividends Paid",
+    "Common Stock Dividend Paid", "Net Common Stock Issuance", "Common Stock Payments",
+    "Common Stock Issuance", "Net Issuance Payments Of Debt", "Net Short Term Debt Issuance",
+    "Short Term Debt Payments", "Short Term Debt Issuance", "Net Long Term Debt Issuance",
+    "Long Term Debt Payments", "Long Term Debt Issuance", "Investing Cash Flow",
+    "Cash Flow From Continuing Investing Activities", "Net Other Investing Changes",
+    "Net Investment Purchase And Sale", "Sale Of Investment", "Purchase Of Investment",
+    "Net Business Purchase And Sale", "Purchase Of Business", "Net PPE Purchase And Sale", "Purchase Of PPE",
+    "Operating Cash Flow", "Cash Flow From Continuing Operating Activities", "Change In Working Capital",
+    "Change In Other Working Capital", "Change In Other Current Liabilities",
+    "Change In Other Current Assets", "Change In Payables And Accrued Expense", "Change In Payable",
+    "Change In Account Payable", "Change In Tax Payable", "Change In Income Tax Payable",
+    "Change In Inventory", "Change In Receivables", "Changes In Account Receivables",
+    "Stock Based Compensation", "Unrealized Gain Loss On Investment Securities", "Asset Impairment Charge",
+    "Deferred Tax", "Deferred Income Tax", "Depreciation Amortization Depletion",
+    "Depreciation And Amortization", "Depreciation", "Operating Gains Losses",
+    "Gain Loss On Investment Securities", "Net Income From Continuing Operations",
+)
+
+# Shaped like json.dumps output ('"<key>": null, '). Read only: see the module docstring.
+STATEMENT_PAYLOAD_DICTIONARY_V1 = ("{" + ", ".join(f'"{key}": null' for key in STATEMENT_PAYLOAD_KEYS_V1) + "}").encode("utf-8")
+# Shaped like fastjson.dumps output so the matcher finds whole '"<key>":' runs. At ~6 KB the whole
+# dictionary stays inside deflate's 32 KB window.
+STATEMENT_PAYLOAD_DICTIONARY_V2 = ("{" + ",".join(f'"{key}":null' for key in STATEMENT_PAYLOAD_KEYS_V1) + "}").encode("utf-8")
+
+_DICTIONARIES = {
+    PAYLOAD_FORMAT_ZLIB_V1: STATEMENT_PAYLOAD_DICTIONARY_V1,
+    PAYLOAD_FORMAT_ZSTD_V1: STATEMENT_PAYLOAD_DICTIONARY_V1,
+    PAYLOAD_FORMAT_ZLIB_V2: STATEMENT_PAYLOAD_DICTIONARY_V2,
+    PAYLOAD_FORMAT_ZSTD_V2: STATEMENT_PAYLOAD_DICTIONARY_V2,
+}
+
+_thread_state = threading.local()
+
+
+def _resolve_codec(codec: Optional[str]) -> str:
+    """Validates a codec name, falling back to 'none' for unknown names and to zlib for a missing zstandard."""
+    codec = (codec or "none").strip().lower()
+    if codec not in PAYLOAD_CODECS:
+        logger.warning(f"[Payload Codec] Unknown payload codec '{codec}'. Using 'none'.")
+        return "none"
+    if codec == "zstd" and zstandard is None:
+        logger.warning("[Payload Codec] 'zstd' requested but the zstandard package is not installed. Using 'zlib'.")
+        return "zlib"
+    return codec
+
+
+_write_codec = _resolve_codec(os.environ.get("YAHOO_PAYLOAD_CODEC"))
+
+
+def get_write_codec() -> str:
+    """Codec applied to payloads on write ('zlib', 'zstd' or 'none')."""
+    return _write_codec
+
+
+def set_write_codec(codec: str) -> str:
+    """Overrides the write codec for this process (e.g. from a maintenance command). Returns the codec in effect."""
+    global _write_codec
+    _write_codec = _resolve_codec(codec)
+    return _write_codec
+
+
+def _zstd_dictionary(marker: bytes) -> "zstandard.ZstdCompressionDict":
+    dictionaries = _thread_state.__dict__.setdefault("zstd_dictionaries", {})
+    dictionary = dictionaries.get(marker)
+    if dictionary is None:
+        dictionary = zstandard.ZstdCompressionDict(_DICTIONARIES[marker], dict_type=zstandard.DICT_TYPE_RAWCONTENT)
+        dictionaries[marker] = dictionary
+    return dictionary
+
+
+def _zstd_compressor() -> "zstandard.ZstdCompressor":
+    # zstandard compressor/decompressor objects must not be shared between threads
+    compressor = getattr(_thread_state, "zstd_compressor", None)
+    if compressor is None:
+        compressor = zstandard.ZstdCompressor(level=ZSTD_LEVEL, dict_data=_zstd_dictionary(PAYLOAD_FORMAT_ZSTD_V2))
+        _thread_state.zstd_compressor = compressor
+    return compressor
+
+
+def _zstd_decompressor(marker: bytes) -> "zstandard.ZstdDecompressor":
+    decompressors = _thread_state.__dict__.setdefault("zstd_decompressors", {})
+    decompressor = decompressors.get(marker)
+    if decompressor is None:
+        decompressor = zstandard.ZstdDecompressor(dict_data=_zstd_dictionary(marker))
+        decompressors[marker] = decompressor
+    return decompressor
+
+
+def encode_payload(text: str, codec: Optional[str] = None) -> Union[str, bytes]:
+    """
+    Encodes a JSON payload string for storage.
+
+    Args:
+        text: The JSON text to store.
+        codec: 'zlib', 'zstd' or 'none'. Defaults to the configured write codec.
+
+    Returns:
+        The marker-prefixed compressed bytes, or text unchanged for 'none'.
+    """
+    codec = _write_codec if codec is None else _resolve_codec(codec)
+    if codec == "none":
+        return text
+    raw = text.encode("utf-8")
+    if codec == "zstd":
+        return PAYLOAD_FORMAT_ZSTD_V2 + _zstd_compressor().compress(raw)
+    compressor = zlib.compressobj(ZLIB_LEVEL, zlib.DEFLATED, -zlib.MAX_WBITS, zdict=STATEMENT_PAYLOAD_DICTIONARY_V2)
+    return PAYLOAD_FORMAT_ZLIB_V2 + compressor.compress(raw) + compressor.flush()
+
+
+def decode_payload(stored: Union[str, bytes, memoryview, None]) -> Optional[str]:
+    """
+    Decodes a stored payload back to JSON text. Legacy TEXT rows (str) are returned unchanged.
+
+    Raises:
+        ValueError: If the stored bytes carry an unknown format marker.
+        RuntimeError: If the row is zstd-compressed and zstandard is not installed.
+    """
+    if stored is None or isinstance(stored, str):
+        return stored
+    stored = bytes(stored)
+    marker, body = stored[:1], stored[1:]
+    if marker in (PAYLOAD_FORMAT_ZLIB_V2, PAYLOAD_FORMAT_ZLIB_V1):
+        decompressor = zlib.decompressobj(-zlib.MAX_WBITS, zdict=_DICTIONARIES[marker])
+        return (decompressor.decompress(body) + decompressor.flush()).decode("utf-8")
+    if marker in (PAYLOAD_FORMAT_ZSTD_V2, PAYLOAD_FORMAT_ZSTD_V1):
+        if zstandard is None:
+            raise RuntimeError("Payload is zstd-compressed but the zstandard package is not installed.")
+        return _zstd_decompressor(marker).decompress(body).decode("utf-8")
+    raise ValueError(f"Unknown payload format marker {marker!r}.")
+
+
+def payload_hash(text: str) -> str:
+    """
+    Content hash of a JSON payload string (128-bit BLAKE2b, hex). Writers compare it with the stored
+    hash to skip rewriting payloads that have not changed.
+    """
+    return hashlib.blake2b(text.encode("utf-8", "surrogatepass"), digest_size=16).hexdigest()
+
+
+class CompressedPayloadText(TypeDecorator):
+    """Text column whose values are encoded with encode_payload on write and decode_payload on read."""
+    impl = Text
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if isinstance(value, str):
+            return encode_payload(value)
+        return value
+
+    def process_result_value(self, value, dialect):
+        return decode_payload(value)
@@ -9,9 +9,8 @@ from typing import List, Dict, Any, Optional
 # Adjust the import path as per your project structure
 from ..V3_yahoo_fetch import get_latest_atr 
 from ..yahoo_data_query_srv import YahooDataQueryService
-from ..dependencies import get_repository
+from ..dependencies import get_yahoo_repository, get_yahoo_query_service
 from ..yahoo_repository import YahooDataRepository
-from ..V3_database import SQLiteRepository
 
 # --- LLM Analytics Imports ---
 from ..services.llm_service import LLMService
@@ -24,13 +23,6 @@ router = APIRouter(
     tags=["Utilities"]
 )
 
-# --- LOCAL DEPENDENCIES FOR THIS ROUTER ---
-async def get_yahoo_repository(repo: SQLiteRepository = Depends(get_repository)) -> YahooDataRepository:
-    return YahooDataRepository(database_url=repo.database_url)
-
-async def get_yahoo_query_service(db_repo: YahooDataRepository = Depends(get_yahoo_repository)) -> YahooDataQueryService:
-    return YahooDataQueryService(db_repo=db_repo)
-# --- END LOCAL DEPENDENCIES ---
 
 # --- JSON SERIALIZATION HELPERS ---
 def clean_float_value(value):
@@ -333,28 +325,44 @@ async def get_tickers_by_industry(
         raise HTTPException(status_code=500, detail=f"Failed to fetch ticker list for industry: {industry}")
 
 @router.post("/scan-invalid-records",
-             summary="Scan DB for invalid records with filters",
-             response_model=Dict[str, List[Dict[str, Any]]],
+             summary="Start a background scan of the DB for invalid records with filters",
+             response_model=Dict[str, Any],
+             status_code=202,
              tags=["Database Utilities"])
 async def scan_for_invalid_records(
     request_data: ScanInvalidRecordsRequest,
     repo: YahooDataRepository = Depends(get_yahoo_repository),
 ):
     """
-    Scans the Yahoo ticker_master and ticker_data_items tables for records
-    that meet the specified emptiness and date criteria.
+    Starts a background scan of the Yahoo ticker_master and ticker_data_items tables for records
+    that meet the specified emptiness and date criteria. Returns the scan (its scan_id) at once, or the
+    scan already running; poll GET /scan-invalid-records/{scan_id} for progress and the result.
     """
     try:
-        invalid_records = await db_maintenance.find_invalid_records(
+        scan, started = db_maintenance.start_invalid_records_scan(
             repo=repo,
             threshold=request_data.threshold,
             start_date_str=request_data.start_date,
             end_date_str=request_data.end_date
         )
-        return invalid_records
+        return {**scan.to_dict(include_result=False), "started": started}
     except Exception as e:
-        logger.error(f"Error during invalid record scan: {e}", exc_info=True)
-        raise HTTPException(status_code=500, detail=f"An unexpected error occurred during the scan: {e}")
+        logger.error(f"Error starting invalid record scan: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"An unexpected error occurred starting the scan: {e}")
+
+@router.get("/scan-invalid-records/{scan_id}",
+            summary="Get the progress and result of an invalid records scan",
+            response_model=Dict[str, Any],
+            tags=["Database Utilities"])
+async def get_invalid_records_scan(scan_id: str):
+    """
+    Status ('running', 'completed' or 'failed') and latest progress of a scan started with
+    POST /scan-invalid-records; 'result' holds the invalid records once it has completed.
+    """
+    scan = db_maintenance.get_invalid_records_scan(scan_id)
+    if scan is None:
+        raise HTTPException(status_code=404, detail=f"Scan {scan_id} not found.")
+    return scan.to_dict()
 
 @router.post("/delete-invalid-records",
              summary="Delete specified invalid records",
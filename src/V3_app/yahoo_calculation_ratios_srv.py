@@ -7,7 +7,8 @@ import asyncio
 from concurrent.futures import ThreadPoolExecutor
 import pandas as pd  # Add pandas import
 
-from .yahoo_repository import YahooDataRepository
+from .yahoo_repository import YahooDataRepository, DATA_VALUE_ITEM_TYPES
+from . import fastjson
 from .currency_utils import get_current_exchange_rate
 from .price_cache import price_cache  # Add this import at the top with other imports
 import yfinance as yf  # Add this import at the top
@@ -48,6 +49,22 @@ class YahooCalculationRatiosService:
         self.db_repo = db_repo
         logger.info("YahooCalculationRatiosService initialized")
 
+    async def _prefetch_ticker_profiles(
+        self,
+        tickers: List[str],
+        ticker_profiles_cache: Dict[str, Dict[str, Any]]
+    ) -> None:
+        """
+        Seeds ticker_profiles_cache with the master records of all tickers not yet cached,
+        using chunked IN queries, so _get_conversion_info_for_ticker does not hit the DB per ticker.
+        """
+        missing_tickers = [ticker for ticker in tickers if ticker not in ticker_profiles_cache]
+        if not missing_tickers:
+            return
+        profiles = await self.db_repo.get_ticker_masters_for_tickers(missing_tickers)
+        ticker_profiles_cache.update(profiles)
+        logger.debug(f"[RatiosSrv._prefetch_ticker_profiles] Cached {len(profiles)} of {len(missing_tickers)} missing profiles.")
+
     async def _get_conversion_info_for_ticker(
         self, 
         ticker_symbol: str, 
@@ -246,7 +263,7 @@ class YahooCalculationRatiosService:
             # Original JSON parsing logic (might be redundant if repo ensures dict, but safe)
             if isinstance(payload, str): 
                 try:
-                    return json.loads(payload)
+                    return fastjson.loads(payload)
                 except json.JSONDecodeError:
                     logger.error(f"Failed to decode JSON payload for {ticker}, {db_item_type}, {item_time_coverage} AFTER potential conversion attempt")
                     return None
@@ -369,24 +386,47 @@ class YahooCalculationRatiosService:
             except ValueError:
                 logger.warning(f"Invalid end_date format: {end_date_str}. Proceeding without end_date filter.")
         
+        # Fetch the items for all tickers up front in a few chunked queries instead of one query per ticker
+        await self._prefetch_ticker_profiles(tickers_list, ticker_profiles_cache)
+        spec_key = (db_item_type.upper(), db_item_coverage.upper())
+        if spec_key[0] in DATA_VALUE_ITEM_TYPES and await self.db_repo.is_ticker_data_values_ready():
+            # Statement fields are read from the normalized ticker_data_values table (index range scan,
+            # no payload decoding).
+            logger.debug(f"Calling db_repo.get_field_values_for_tickers for {len(tickers_list)} tickers with item_type: {db_item_type}, item_time_coverage: {db_item_coverage}, field: {actual_payload_lookup_key}, start_date: {start_date_obj}, end_date: {end_date_obj}")
+            field_values_by_ticker = await self.db_repo.get_field_values_for_tickers(
+                tickers_list,
+                db_item_type,
+                db_item_coverage,
+                actual_payload_lookup_key,
+                start_date=start_date_obj,
+                end_date=end_date_obj
+            )
+        else:
+            # Only the requested key leaves the database (json_extract), streamed as (ticker, date, value)
+            logger.debug(f"Calling db_repo.iter_field_values_for_tickers for {len(tickers_list)} tickers with item_type: {db_item_type}, item_time_coverage: {db_item_coverage}, field: {actual_payload_lookup_key}, start_date: {start_date_obj}, end_date: {end_date_obj}")
+            field_values_by_ticker = {ticker: [] for ticker in tickers_list}
+            async for value_ticker, item_key_date, value in self.db_repo.iter_field_values_for_tickers(
+                tickers_list,
+                db_item_type,
+                db_item_coverage,
+                actual_payload_lookup_key,
+                start_date=start_date_obj,
+                end_date=end_date_obj
+            ):
+                field_values_by_ticker.setdefault(value_ticker, []).append({'item_key_date': item_key_date, 'value': value})
+        # Each point is wrapped as a single-field item for the loop below
+        data_items_by_ticker = {
+            ticker: {spec_key: [
+                {'item_key_date': point['item_key_date'], 'item_data_payload': {actual_payload_lookup_key: point['value']}}
+                for point in points
+            ]}
+            for ticker, points in field_values_by_ticker.items()
+        }
+
         for ticker_symbol in tickers_list:
             current_ticker_series: List[Dict[str, Any]] = []
             try:
-                logger.debug(f"Calling db_repo.get_data_items_by_criteria for {ticker_symbol} with:")
-                logger.debug(f"  item_type: {db_item_type}")
-                logger.debug(f"  item_time_coverage: {db_item_coverage}")
-                logger.debug(f"  start_date: {start_date_obj}")
-                logger.debug(f"  end_date: {end_date_obj}")
-                logger.debug(f"  order_by_key_date_desc: False")
-
-                data_items = await self.db_repo.get_data_items_by_criteria(
-                    ticker=ticker_symbol,
-                    item_type=db_item_type, # Use parsed DB item type
-                    item_time_coverage=db_item_coverage, # Use parsed DB coverage
-                    start_date=start_date_obj,
-                    end_date=end_date_obj,
-                    order_by_key_date_desc=False # Fetch in ascending order for timeseries
-                )
+                data_items = data_items_by_ticker.get(ticker_symbol, {}).get(spec_key, [])
                 logger.debug(f"Found {len(data_items)} data items from DB for {ticker_symbol}, type {db_item_type}, coverage {db_item_coverage}.")
                 # Log raw items for debugging ONE ticker and ONE field_id
                 if tickers_list.index(ticker_symbol) == 0 : # Log only for the first ticker in list
@@ -447,7 +487,7 @@ class YahooCalculationRatiosService:
                         if isinstance(payload_data, str):
                             logger.warning(f"Payload for {ticker_symbol}, item_id={item.get('id')} on {item_key_date_iso_str} is a string. Attempting to parse as JSON.")
                             try:
-                                payload_data = json.loads(payload_data)
+                                payload_data = fastjson.loads(payload_data)
                             except json.JSONDecodeError:
                                 logger.error(f"Failed to parse JSON string payload for item_id={item.get('id')}. Payload: {str(payload_data)[:200]}. Skipping.")
                                 continue
@@ -652,41 +692,47 @@ class YahooCalculationRatiosService:
 
             results_by_ticker: Dict[str, List[Dict[str, Any]]] = {}
 
+            # Load statements, shares and profiles for all tickers up front in a few batched queries
+            quarterly_lookback_start_obj = user_start_date_obj - timedelta(days=(365 * 1 + 30 * 9))
+            annual_lookback_start_obj = user_start_date_obj - timedelta(days=(365 * 2 + 30 * 3))
+            ticker_profiles_cache: Dict[str, Dict[str, Any]] = {}
+            await self._prefetch_ticker_profiles(tickers, ticker_profiles_cache)
+            quarterly_statements_by_ticker = await self.db_repo.get_data_items_for_tickers(
+                tickers=tickers,
+                item_specs=[("CASH_FLOW_STATEMENT", "QUARTER")],
+                start_date=quarterly_lookback_start_obj,
+                end_date=user_end_date_obj,
+                order_by_key_date_desc=False,
+                field_keys=["Operating Cash Flow"]
+            )
+            annual_statements_by_ticker = await self.db_repo.get_data_items_for_tickers(
+                tickers=tickers,
+                item_specs=[("CASH_FLOW_STATEMENT", "FYEAR")],
+                start_date=annual_lookback_start_obj,
+                end_date=user_end_date_obj,
+                order_by_key_date_desc=False,
+                field_keys=["Operating Cash Flow"]
+            )
+            quarterly_shares_by_ticker = await self._get_quarterly_shares_series_for_tickers(
+                tickers,
+                quarterly_lookback_start_obj.strftime('%Y-%m-%d'),
+                user_end_date_obj.strftime('%Y-%m-%d')
+            )
+            annual_shares_by_ticker = await self._get_annual_shares_series_for_tickers(
+                tickers,
+                annual_lookback_start_obj.strftime('%Y-%m-%d'),
+                user_end_date_obj.strftime('%Y-%m-%d')
+            )
+
             for ticker_symbol in tickers:
                 try:
-                    # 1. Fetch quarterly cash flow statements
-                    quarterly_lookback_start_obj = user_start_date_obj - timedelta(days=(365 * 1 + 30 * 9))
-                    quarterly_cash_flow_statements = await self.db_repo.get_data_items_by_criteria(
-                        ticker=ticker_symbol,
-                        item_type="CASH_FLOW_STATEMENT",
-                        item_time_coverage="QUARTER",
-                        start_date=quarterly_lookback_start_obj,
-                        end_date=user_end_date_obj,
-                        order_by_key_date_desc=False
-                    )
+                    # 1-2. Quarterly and annual cash flow statements
+                    quarterly_cash_flow_statements = quarterly_statements_by_ticker.get(ticker_symbol, {}).get(("CASH_FLOW_STATEMENT", "QUARTER"), [])
+                    annual_cash_flow_statements = annual_statements_by_ticker.get(ticker_symbol, {}).get(("CASH_FLOW_STATEMENT", "FYEAR"), [])
 
-                    # 2. Fetch annual cash flow statements
-                    annual_lookback_start_obj = user_start_date_obj - timedelta(days=(365 * 2 + 30 * 3))
-                    annual_cash_flow_statements = await self.db_repo.get_data_items_by_criteria(
-                        ticker=ticker_symbol,
-                        item_type="CASH_FLOW_STATEMENT",
-                        item_time_coverage="FYEAR",
-                        start_date=annual_lookback_start_obj,
-                        end_date=user_end_date_obj,
-                        order_by_key_date_desc=False
-                    )
-
-                    # 3. Get shares data using existing helpers
-                    quarterly_shares_data = await self._get_quarterly_shares_series(
-                        ticker_symbol,
-                        quarterly_lookback_start_obj.strftime('%Y-%m-%d'),
-                        user_end_date_obj.strftime('%Y-%m-%d')
-                    )
-                    annual_shares_data = await self._get_annual_shares_series(
-                        ticker_symbol,
-                        annual_lookback_start_obj.strftime('%Y-%m-%d'),
-                        user_end_date_obj.strftime('%Y-%m-%d')
-                    )
+                    # 3. Shares data
+                    quarterly_shares_data = quarterly_shares_by_ticker.get(ticker_symbol, [])
+                    annual_shares_data = annual_shares_by_ticker.get(ticker_symbol, [])
 
                     # 4. Process quarterly data points
                     quarterly_cf_points: List[Dict[str, Any]] = []
@@ -697,7 +743,7 @@ class YahooCalculationRatiosService:
                             continue
 
                         # Apply currency conversion if needed
-                        conversion_info = await self._get_conversion_info_for_ticker(ticker_symbol, {})
+                        conversion_info = await self._get_conversion_info_for_ticker(ticker_symbol, ticker_profiles_cache)
                         rate_to_apply, original_fin_curr, target_trade_curr = (conversion_info[2], conversion_info[1], conversion_info[0]) if conversion_info else (None, None, None)
                         current_payload = payload
                         if rate_to_apply:
@@ -737,7 +783,7 @@ class YahooCalculationRatiosService:
                             continue
 
                         # Apply currency conversion if needed
-                        conversion_info = await self._get_conversion_info_for_ticker(ticker_symbol, {})
+                        conversion_info = await self._get_conversion_info_for_ticker(ticker_symbol, ticker_profiles_cache)
                         rate_to_apply, original_fin_curr, target_trade_curr = (conversion_info[2], conversion_info[1], conversion_info[0]) if conversion_info else (None, None, None)
                         current_payload = payload
                         if rate_to_apply:
@@ -941,41 +987,47 @@ class YahooCalculationRatiosService:
 
             results_by_ticker: Dict[str, List[Dict[str, Any]]] = {}
 
+            # Load statements, shares and profiles for all tickers up front in a few batched queries
+            quarterly_lookback_start_obj = user_start_date_obj - timedelta(days=(365 * 1 + 30 * 9))
+            annual_lookback_start_obj = user_start_date_obj - timedelta(days=(365 * 2 + 30 * 3))
+            ticker_profiles_cache: Dict[str, Dict[str, Any]] = {}
+            await self._prefetch_ticker_profiles(tickers, ticker_profiles_cache)
+            quarterly_statements_by_ticker = await self.db_repo.get_data_items_for_tickers(
+                tickers=tickers,
+                item_specs=[("CASH_FLOW_STATEMENT", "QUARTER")],
+                start_date=quarterly_lookback_start_obj,
+                end_date=user_end_date_obj,
+                order_by_key_date_desc=False,
+                field_keys=["Free Cash Flow"]
+            )
+            annual_statements_by_ticker = await self.db_repo.get_data_items_for_tickers(
+                tickers=tickers,
+                item_specs=[("CASH_FLOW_STATEMENT", "FYEAR")],
+                start_date=annual_lookback_start_obj,
+                end_date=user_end_date_obj,
+                order_by_key_date_desc=False,
+                field_keys=["Free Cash Flow"]
+            )
+            quarterly_shares_by_ticker = await self._get_quarterly_shares_series_for_tickers(
+                tickers,
+                quarterly_lookback_start_obj.strftime('%Y-%m-%d'),
+                user_end_date_obj.strftime('%Y-%m-%d')
+            )
+            annual_shares_by_ticker = await self._get_annual_shares_series_for_tickers(
+                tickers,
+                annual_lookback_start_obj.strftime('%Y-%m-%d'),
+                user_end_date_obj.strftime('%Y-%m-%d')
+            )
+
             for ticker_symbol in tickers:
                 try:
-                    # 1. Fetch quarterly cash flow statements
-                    quarterly_lookback_start_obj = user_start_date_obj - timedelta(days=(365 * 1 + 30 * 9))
-                    quarterly_cash_flow_statements = await self.db_repo.get_data_items_by_criteria(
-                        ticker=ticker_symbol,
-                        item_type="CASH_FLOW_STATEMENT",
-                        item_time_coverage="QUARTER",
-                        start_date=quarterly_lookback_start_obj,
-                        end_date=user_end_date_obj,
-                        order_by_key_date_desc=False
-                    )
-
-                    # 2. Fetch annual cash flow statements
-                    annual_lookback_start_obj = user_start_date_obj - timedelta(days=(365 * 2 + 30 * 3))
-                    annual_cash_flow_statements = await self.db_repo.get_data_items_by_criteria(
-                        ticker=ticker_symbol,
-                        item_type="CASH_FLOW_STATEMENT",
-                        item_time_coverage="FYEAR",
-                        start_date=annual_lookback_start_obj,
-                        end_date=user_end_date_obj,
-                        order_by_key_date_desc=False
-                    )
+                    # 1-2. Quarterly and annual cash flow statements
+                    quarterly_cash_flow_statements = quarterly_statements_by_ticker.get(ticker_symbol, {}).get(("CASH_FLOW_STATEMENT", "QUARTER"), [])
+                    annual_cash_flow_statements = annual_statements_by_ticker.get(ticker_symbol, {}).get(("CASH_FLOW_STATEMENT", "FYEAR"), [])
 
-                    # 3. Get shares data using existing helpers
-                    quarterly_shares_data = await self._get_quarterly_shares_series(
-                        ticker_symbol,
-                        quarterly_lookback_start_obj.strftime('%Y-%m-%d'),
-                        user_end_date_obj.strftime('%Y-%m-%d')
-                    )
-                    annual_shares_data = await self._get_annual_shares_series(
-                        ticker_symbol,
-                        annual_lookback_start_obj.strftime('%Y-%m-%d'),
-                        user_end_date_obj.strftime('%Y-%m-%d')
-                    )
+                    # 3. Shares data
+                    quarterly_shares_data = quarterly_shares_by_ticker.get(ticker_symbol, [])
+                    annual_shares_data = annual_shares_by_ticker.get(ticker_symbol, [])
 
                     # 4. Process quarterly data points
                     quarterly_fcf_points: List[Dict[str, Any]] = []
@@ -986,7 +1038,7 @@ class YahooCalculationRatiosService:
                             continue
 
                         # Apply currency conversion if needed
-                        conversion_info = await self._get_conversion_info_for_ticker(ticker_symbol, {})
+                        conversion_info = await self._get_conversion_info_for_ticker(ticker_symbol, ticker_profiles_cache)
                         rate_to_apply, original_fin_curr, target_trade_curr = (conversion_info[2], conversion_info[1], conversion_info[0]) if conversion_info else (None, None, None)
                         current_payload = payload
                         if rate_to_apply:
@@ -1026,7 +1078,7 @@ class YahooCalculationRatiosService:
                             continue
 
                         # Apply currency conversion if needed
-                        conversion_info = await self._get_conversion_info_for_ticker(ticker_symbol, {})
+                        conversion_info = await self._get_conversion_info_for_ticker(ticker_symbol, ticker_profiles_cache)
                         rate_to_apply, original_fin_curr, target_trade_curr = (conversion_info[2], conversion_info[1], conversion_info[0]) if conversion_info else (None, None, None)
                         current_payload = payload
                         if rate_to_apply:
@@ -1203,22 +1255,42 @@ class YahooCalculationRatiosService:
         target_net_income_key = "Diluted NI Availto Com Stockholders"
         target_shares_key = "Diluted Average Shares"
 
+        # The lookback windows do not depend on the ticker, so statements, shares and profiles
+        # for all tickers are loaded up front in a few batched queries.
+        quarterly_lookback_start_obj = user_start_date_obj - timedelta(days=(365 * 1 + 30 * 9)) # Approx 1 year 9 months before user start
+        annual_lookback_start_obj = user_start_date_obj - timedelta(days=(365 * 2 + 30 * 3))
+        await self._prefetch_ticker_profiles(tickers, ticker_profiles_cache)
+
+        logger.debug(f"EPS_TTM: Querying QUARTERLY income statements from {quarterly_lookback_start_obj.strftime('%Y-%m-%d')} to {user_end_date_obj.strftime('%Y-%m-%d')}")
+        quarterly_statements_by_ticker = await self.db_repo.get_data_items_for_tickers(
+            tickers=tickers,
+            item_specs=[("INCOME_STATEMENT", "QUARTER")],
+            start_date=quarterly_lookback_start_obj,
+            end_date=user_end_date_obj,
+            order_by_key_date_desc=False, # Fetch ascending for easier processing
+            field_keys=[target_net_income_key, "Net Income", "NetIncome"]
+        )
+        logger.debug(f"EPS_TTM: Querying ANNUAL income statements from {annual_lookback_start_obj.strftime('%Y-%m-%d')} to {user_end_date_obj.strftime('%Y-%m-%d')}")
+        annual_statements_by_ticker = await self.db_repo.get_data_items_for_tickers(
+            tickers=tickers,
+            item_specs=[("INCOME_STATEMENT", "FYEAR")],
+            start_date=annual_lookback_start_obj,
+            end_date=user_end_date_obj,
+            order_by_key_date_desc=False, # Fetch ascending
+            field_keys=[target_net_income_key, "Net Income", "NetIncome", target_shares_key]
+        )
+        quarterly_shares_by_ticker = await self._get_quarterly_shares_series_for_tickers(
+            tickers,
+            quarterly_lookback_start_obj.strftime('%Y-%m-%d'),
+            user_end_date_obj.strftime('%Y-%m-%d')
+        )
+
         for ticker_symbol in tickers:
             try:
                 logger.info(f"EPS_TTM: Processing ticker: {ticker_symbol}")
 
-                # 1. Data Fetching and Preparation (Quarterly)
-                quarterly_lookback_start_obj = user_start_date_obj - timedelta(days=(365 * 1 + 30 * 9)) # Approx 1 year 9 months before user start
-                logger.debug(f"EPS_TTM: Querying QUARTERLY income statements for {ticker_symbol} from {quarterly_lookback_start_obj.strftime('%Y-%m-%d')} to {user_end_date_obj.strftime('%Y-%m-%d')}")
-                
-                quarterly_income_statements = await self.db_repo.get_data_items_by_criteria(
-                    ticker=ticker_symbol,
-                    item_type="INCOME_STATEMENT",
-                    item_time_coverage="QUARTER",
-                    start_date=quarterly_lookback_start_obj,
-                    end_date=user_end_date_obj,
-                    order_by_key_date_desc=False # Fetch ascending for easier processing
-                )
+                # 1. Data Preparation (Quarterly)
+                quarterly_income_statements = quarterly_statements_by_ticker.get(ticker_symbol, {}).get(("INCOME_STATEMENT", "QUARTER"), [])
                 quarterly_eps_points: List[Dict[str, Any]] = []
                 
                 # Fetch shares data using the helper for quarterly calculations
@@ -1228,12 +1300,11 @@ class YahooCalculationRatiosService:
                     max_q_date = max(self._parse_date_flex(qis.get('item_key_date')) for qis in quarterly_income_statements if self._parse_date_flex(qis.get('item_key_date'))) if quarterly_income_statements else user_end_date_obj
                     
                     if min_q_date and max_q_date:
-                        logger.debug(f"EPS_TTM [{ticker_symbol}]: Fetching quarterly shares series via helper from {min_q_date.strftime('%Y-%m-%d')} to {max_q_date.strftime('%Y-%m-%d')}")
-                        quarterly_shares_data_from_helper = await self._get_quarterly_shares_series(
-                            ticker_symbol,
-                            min_q_date.strftime('%Y-%m-%d'),
-                            max_q_date.strftime('%Y-%m-%d')
-                        )
+                        logger.debug(f"EPS_TTM [{ticker_symbol}]: Selecting quarterly shares series from {min_q_date.strftime('%Y-%m-%d')} to {max_q_date.strftime('%Y-%m-%d')}")
+                        quarterly_shares_data_from_helper = [
+                            shares_point for shares_point in quarterly_shares_by_ticker.get(ticker_symbol, [])
+                            if min_q_date.date() <= shares_point['date_obj'].date() <= max_q_date.date()
+                        ]
                         logger.debug(f"EPS_TTM [{ticker_symbol}]: Helper returned {len(quarterly_shares_data_from_helper)} shares points.")
 
                 if quarterly_income_statements:
@@ -1286,17 +1357,8 @@ class YahooCalculationRatiosService:
                 else:
                     logger.info(f"EPS_TTM: No QUARTERLY income statements found for {ticker_symbol} in lookback period.")
 
-                # 2. Data Fetching and Preparation (Annual)
-                annual_lookback_start_obj = user_start_date_obj - timedelta(days=(365 * 2 + 30 * 3))
-                logger.debug(f"EPS_TTM: Querying ANNUAL income statements for {ticker_symbol} from {annual_lookback_start_obj.strftime('%Y-%m-%d')} to {user_end_date_obj.strftime('%Y-%m-%d')}")
-                annual_income_statements = await self.db_repo.get_data_items_by_criteria(
-                    ticker=ticker_symbol,
-                    item_type="INCOME_STATEMENT",
-                    item_time_coverage="FYEAR",
-                    start_date=annual_lookback_start_obj,
-                    end_date=user_end_date_obj,
-                    order_by_key_date_desc=False # Fetch ascending
-                )
+                # 2. Data Preparation (Annual)
+                annual_income_statements = annual_statements_by_ticker.get(ticker_symbol, {}).get(("INCOME_STATEMENT", "FYEAR"), [])
                 annual_eps_points: List[Dict[str, Any]] = []
                 if annual_income_statements:
                     logger.info(f"EPS_TTM: Found {len(annual_income_statements)} ANNUAL statements for {ticker_symbol}.")
@@ -1384,56 +1446,66 @@ class YahooCalculationRatiosService:
         Fetches, processes, and combines quarterly shares data from primary and fallback sources.
         Returns a chronologically sorted list of shares data points.
         """
-        logger.debug(f"SHARES_HELPER [{ticker_symbol}]: Fetching shares between {fundamental_query_start_date_str} and {fundamental_query_end_date_str}")
+        shares_by_ticker = await self._get_quarterly_shares_series_for_tickers(
+            [ticker_symbol], fundamental_query_start_date_str, fundamental_query_end_date_str
+        )
+        return shares_by_ticker.get(ticker_symbol, [])
+
+    async def _get_quarterly_shares_series_for_tickers(
+        self, 
+        tickers: List[str], 
+        fundamental_query_start_date_str: str, 
+        fundamental_query_end_date_str: str
+    ) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        Multi-ticker version of _get_quarterly_shares_series: fetches the primary and fallback
+        shares fields once for all tickers and returns {ticker: sorted shares points}.
+        """
+        logger.debug(f"SHARES_HELPER: Fetching shares for {len(tickers)} tickers between {fundamental_query_start_date_str} and {fundamental_query_end_date_str}")
         
         primary_shares_field_id = "yf_item_income_statement_quarterly_DilutedAverageShares"
         fallback_shares_field_id = "yf_item_balance_sheet_quarterly_ShareIssued"
-        
-        quarterly_shares_points: List[Dict[str, Any]] = []
 
-        # 1. Fetch and Process Primary Shares Data
-        logger.debug(f"SHARES_HELPER [{ticker_symbol}]: Fetching primary shares data ({primary_shares_field_id})")
         shares_data_primary_raw = await self.get_specific_field_timeseries(
             field_identifier=primary_shares_field_id,
-            tickers=[ticker_symbol],
+            tickers=tickers,
             start_date_str=fundamental_query_start_date_str,
             end_date_str=fundamental_query_end_date_str
         )
-        logger.debug(f"SHARES_HELPER [{ticker_symbol}]: Raw primary shares data: {shares_data_primary_raw.get(ticker_symbol)}")
-        
-        if shares_data_primary_raw.get(ticker_symbol):
-            for item in shares_data_primary_raw[ticker_symbol]:
-                date_obj = self._parse_date_flex(item.get('date'))
-                value = item.get('value')
-                if date_obj and value is not None:
-                    try:
-                        float_value = float(value)
-                        if float_value != 0:
-                            quarterly_shares_points.append({'date_obj': date_obj, 'value': float_value, 'source': 'primary'})
-                    except (ValueError, TypeError):
-                        logger.warning(f"SHARES_HELPER [{ticker_symbol}]: Could not parse primary shares value '{value}' for date '{item.get('date')}'")
-            logger.info(f"SHARES_HELPER [{ticker_symbol}]: Parsed {len(quarterly_shares_points)} primary quarterly shares points.")
-            logger.debug(f"SHARES_HELPER [{ticker_symbol}]: Parsed primary shares points: {quarterly_shares_points[:5]}...")
-
-        # 2. Fetch and Process Fallback Shares Data
-        logger.debug(f"SHARES_HELPER [{ticker_symbol}]: Fetching fallback shares data ({fallback_shares_field_id})")
         shares_data_fallback_raw = await self.get_specific_field_timeseries(
             field_identifier=fallback_shares_field_id,
-            tickers=[ticker_symbol],
+            tickers=tickers,
             start_date_str=fundamental_query_start_date_str,
             end_date_str=fundamental_query_end_date_str
         )
-        logger.debug(f"SHARES_HELPER [{ticker_symbol}]: Raw fallback shares data: {shares_data_fallback_raw.get(ticker_symbol)}")
-        
-        fallback_shares_added_count = 0
-        if shares_data_fallback_raw.get(ticker_symbol):
-            for item in shares_data_fallback_raw[ticker_symbol]:
-                date_obj = self._parse_date_flex(item.get('date'))
-                value = item.get('value')
-                if date_obj and value is not None:
-                    # Check if a point with the same date already exists from the primary source
-                    is_duplicate_date = any(sp['date_obj'] == date_obj for sp in quarterly_shares_points)
-                    if not is_duplicate_date:
+
+        shares_by_ticker: Dict[str, List[Dict[str, Any]]] = {}
+        for ticker_symbol in tickers:
+            quarterly_shares_points: List[Dict[str, Any]] = []
+
+            # 1. Process Primary Shares Data
+            if shares_data_primary_raw.get(ticker_symbol):
+                for item in shares_data_primary_raw[ticker_symbol]:
+                    date_obj = self._parse_date_flex(item.get('date'))
+                    value = item.get('value')
+                    if date_obj and value is not None:
+                        try:
+                            float_value = float(value)
+                            if float_value != 0:
+                                quarterly_shares_points.append({'date_obj': date_obj, 'value': float_value, 'source': 'primary'})
+                        except (ValueError, TypeError):
+                            logger.warning(f"SHARES_HELPER [{ticker_symbol}]: Could not parse primary shares value '{value}' for date '{item.get('date')}'")
+                logger.info(f"SHARES_HELPER [{ticker_symbol}]: Parsed {len(quarterly_shares_points)} primary quarterly shares points.")
+
+            # 2. Process Fallback Shares Data
+            fallback_shares_added_count = 0
+            if shares_data_fallback_raw.get(ticker_symbol):
+                primary_dates = {sp['date_obj'] for sp in quarterly_shares_points}
+                for item in shares_data_fallback_raw[ticker_symbol]:
+                    date_obj = self._parse_date_flex(item.get('date'))
+                    value = item.get('value')
+                    # Skip dates already covered by the primary source
+                    if date_obj and value is not None and date_obj not in primary_dates:
                         try:
                             float_value = float(value)
                             if float_value != 0:
@@ -1441,13 +1513,14 @@ class YahooCalculationRatiosService:
                                 fallback_shares_added_count +=1
                         except (ValueError, TypeError):
                             logger.warning(f"SHARES_HELPER [{ticker_symbol}]: Could not parse fallback shares value '{value}' for date '{item.get('date')}'")
-            logger.info(f"SHARES_HELPER [{ticker_symbol}]: Added {fallback_shares_added_count} fallback quarterly shares points.")
-        
-        # 3. Sort Data
-        quarterly_shares_points.sort(key=lambda x: x['date_obj'])
-        logger.debug(f"SHARES_HELPER [{ticker_symbol}]: Combined and sorted shares points ({len(quarterly_shares_points)} total): {quarterly_shares_points[:5]}...")
+                logger.info(f"SHARES_HELPER [{ticker_symbol}]: Added {fallback_shares_added_count} fallback quarterly shares points.")
+            
+            # 3. Sort Data
+            quarterly_shares_points.sort(key=lambda x: x['date_obj'])
+            logger.debug(f"SHARES_HELPER [{ticker_symbol}]: Combined and sorted shares points ({len(quarterly_shares_points)} total): {quarterly_shares_points[:5]}...")
+            shares_by_ticker[ticker_symbol] = quarterly_shares_points
         
-        return quarterly_shares_points
+        return shares_by_ticker
 
     async def _calculate_cash_per_share_for_tickers(
         self,
@@ -1471,15 +1544,23 @@ class YahooCalculationRatiosService:
         cash_field_id = "yf_item_balance_sheet_quarterly_CashAndCashEquivalents"
         # REMOVED: primary_shares_field_id and fallback_shares_field_id definitions here
 
+        # Fetch the field series for all tickers up front (batched) rather than once per ticker
+        cash_data_raw = await self.get_specific_field_timeseries(
+            field_identifier=cash_field_id,
+            tickers=tickers,
+            start_date_str=fundamental_query_start_date_str,
+            end_date_str=fundamental_query_end_date_str
+        )
+
+        # Shares series for all tickers in one batched fetch
+        quarterly_shares_points_by_ticker = await self._get_quarterly_shares_series_for_tickers(
+            tickers,
+            fundamental_query_start_date_str,
+            fundamental_query_end_date_str
+        )
+
         for ticker_symbol in tickers:
             try:
-                logger.debug(f"CASH_PER_SHARE [{ticker_symbol}]: Fetching cash data ({cash_field_id}) between {fundamental_query_start_date_str} and {fundamental_query_end_date_str}")
-                cash_data_raw = await self.get_specific_field_timeseries(
-                    field_identifier=cash_field_id,
-                    tickers=[ticker_symbol],
-                    start_date_str=fundamental_query_start_date_str,
-                    end_date_str=fundamental_query_end_date_str
-                )
                 logger.debug(f"CASH_PER_SHARE [{ticker_symbol}]: Raw cash data: {cash_data_raw.get(ticker_symbol)}")
                 
                 quarterly_cash_points: List[Dict[str, Any]] = []
@@ -1500,11 +1581,7 @@ class YahooCalculationRatiosService:
 
                 # NEW: Call the helper function to get shares data
                 logger.debug(f"CASH_PER_SHARE [{ticker_symbol}]: Calling _get_quarterly_shares_series helper.")
-                quarterly_shares_points = await self._get_quarterly_shares_series(
-                    ticker_symbol,
-                    fundamental_query_start_date_str,
-                    fundamental_query_end_date_str
-                )
+                quarterly_shares_points = quarterly_shares_points_by_ticker.get(ticker_symbol, [])
                 # REMOVED: Old shares fetching and processing logic that was here
                 
                 if not quarterly_cash_points:
@@ -1612,15 +1689,23 @@ class YahooCalculationRatiosService:
         cash_field_id = "yf_item_balance_sheet_quarterly_CashCashEquivalentsAndShortTermInvestments"
         # REMOVED: primary_shares_field_id and fallback_shares_field_id definitions here
 
+        # Fetch the field series for all tickers up front (batched) rather than once per ticker
+        cash_data_raw = await self.get_specific_field_timeseries(
+            field_identifier=cash_field_id,
+            tickers=tickers,
+            start_date_str=fundamental_query_start_date_str,
+            end_date_str=fundamental_query_end_date_str
+        )
+
+        # Shares series for all tickers in one batched fetch
+        quarterly_shares_points_by_ticker = await self._get_quarterly_shares_series_for_tickers(
+            tickers,
+            fundamental_query_start_date_str,
+            fundamental_query_end_date_str
+        )
+
         for ticker_symbol in tickers:
             try:
-                logger.debug(f"CASH_PLUS_ST_INV_PER_SHARE [{ticker_symbol}]: Fetching cash+ST data ({cash_field_id}) between {fundamental_query_start_date_str} and {fundamental_query_end_date_str}")
-                cash_data_raw = await self.get_specific_field_timeseries(
-                    field_identifier=cash_field_id,
-                    tickers=[ticker_symbol],
-                    start_date_str=fundamental_query_start_date_str,
-                    end_date_str=fundamental_query_end_date_str
-                )
                 logger.debug(f"CASH_PLUS_ST_INV_PER_SHARE [{ticker_symbol}]: Raw cash+ST data: {cash_data_raw.get(ticker_symbol)}")
                 
                 quarterly_cash_points: List[Dict[str, Any]] = []
@@ -1641,11 +1726,7 @@ class YahooCalculationRatiosService:
                 # Shares fetching logic (identical to Cash/Share)
                 # NEW: Call the helper function to get shares data
                 logger.debug(f"CASH_PLUS_ST_INV_PER_SHARE [{ticker_symbol}]: Calling _get_quarterly_shares_series helper.")
-                quarterly_shares_points = await self._get_quarterly_shares_series(
-                    ticker_symbol,
-                    fundamental_query_start_date_str,
-                    fundamental_query_end_date_str
-                )
+                quarterly_shares_points = quarterly_shares_points_by_ticker.get(ticker_symbol, [])
                 # REMOVED: Old shares fetching and processing logic that was here
                 
                 if not quarterly_cash_points:
@@ -1729,17 +1810,32 @@ class YahooCalculationRatiosService:
         cse_quarterly_field_id = "yf_item_balance_sheet_quarterly_CommonStockEquity"
         cse_annual_field_id = "yf_item_balance_sheet_annual_CommonStockEquity"
 
+        # Fetch the field series for all tickers up front (batched) rather than once per ticker
+        # 1. Fetch Common Stock Equity (CSE) Data
+        # Fetch Quarterly CSE
+        cse_q_raw = await self.get_specific_field_timeseries(
+            field_identifier=cse_quarterly_field_id,
+            tickers=tickers,
+            start_date_str=fundamental_query_start_date_str,
+            end_date_str=fundamental_query_end_date_str
+        )
+        # Fetch Annual CSE
+        cse_a_raw = await self.get_specific_field_timeseries(
+            field_identifier=cse_annual_field_id,
+            tickers=tickers,
+            start_date_str=fundamental_query_start_date_str, # Use same extended range
+            end_date_str=fundamental_query_end_date_str
+        )
+
+        # Shares series for all tickers in one batched fetch
+        quarterly_shares_points_by_ticker = await self._get_quarterly_shares_series_for_tickers(
+            tickers,
+            fundamental_query_start_date_str,
+            fundamental_query_end_date_str
+        )
+
         for ticker_symbol in tickers:
             try:
-                # 1. Fetch Common Stock Equity (CSE) Data
-                # Fetch Quarterly CSE
-                logger.debug(f"BOOK_VALUE_PER_SHARE [{ticker_symbol}]: Fetching Q CSE ({cse_quarterly_field_id})")
-                cse_q_raw = await self.get_specific_field_timeseries(
-                    field_identifier=cse_quarterly_field_id,
-                    tickers=[ticker_symbol],
-                    start_date_str=fundamental_query_start_date_str,
-                    end_date_str=fundamental_query_end_date_str
-                )
                 quarterly_cse_points: List[Dict[str, Any]] = []
                 if cse_q_raw.get(ticker_symbol):
                     for item in cse_q_raw[ticker_symbol]:
@@ -1750,14 +1846,6 @@ class YahooCalculationRatiosService:
                             except (ValueError, TypeError): pass
                 logger.info(f"BOOK_VALUE_PER_SHARE [{ticker_symbol}]: Parsed {len(quarterly_cse_points)} quarterly CSE points.")
 
-                # Fetch Annual CSE
-                logger.debug(f"BOOK_VALUE_PER_SHARE [{ticker_symbol}]: Fetching A CSE ({cse_annual_field_id})")
-                cse_a_raw = await self.get_specific_field_timeseries(
-                    field_identifier=cse_annual_field_id,
-                    tickers=[ticker_symbol],
-                    start_date_str=fundamental_query_start_date_str, # Use same extended range
-                    end_date_str=fundamental_query_end_date_str
-                )
                 annual_cse_points: List[Dict[str, Any]] = []
                 if cse_a_raw.get(ticker_symbol):
                     for item in cse_a_raw[ticker_symbol]:
@@ -1785,11 +1873,7 @@ class YahooCalculationRatiosService:
 
                 # 2. Fetch Shares Data using Helper
                 logger.debug(f"BOOK_VALUE_PER_SHARE [{ticker_symbol}]: Calling _get_quarterly_shares_series helper.")
-                quarterly_shares_points = await self._get_quarterly_shares_series(
-                    ticker_symbol,
-                    fundamental_query_start_date_str,
-                    fundamental_query_end_date_str
-                )
+                quarterly_shares_points = quarterly_shares_points_by_ticker.get(ticker_symbol, [])
                 if not quarterly_shares_points:
                     logger.warning(f"BOOK_VALUE_PER_SHARE [{ticker_symbol}]: No shares data from helper. Skipping.")
                     results_by_ticker[ticker_symbol] = []
@@ -2177,9 +2261,21 @@ class YahooCalculationRatiosService:
         Fetches and processes annual diluted average shares data from income statements.
         Returns a chronologically sorted list of shares data points.
         """
-        logger.debug(f"ANNUAL_SHARES_HELPER [{ticker_symbol}]: Fetching annual shares between {start_date_str} and {end_date_str}")
+        shares_by_ticker = await self._get_annual_shares_series_for_tickers([ticker_symbol], start_date_str, end_date_str)
+        return shares_by_ticker.get(ticker_symbol, [])
+
+    async def _get_annual_shares_series_for_tickers(
+        self, 
+        tickers: List[str], 
+        start_date_str: str, 
+        end_date_str: str
+    ) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        Multi-ticker version of _get_annual_shares_series: loads the annual income statements of
+        all tickers in one batched query and returns {ticker: sorted shares points}.
+        """
+        logger.debug(f"ANNUAL_SHARES_HELPER: Fetching annual shares for {len(tickers)} tickers between {start_date_str} and {end_date_str}")
         
-        annual_shares_points: List[Dict[str, Any]] = []
         # yfinance key for diluted average shares from the income statement
         target_shares_key = "Diluted Average Shares" 
 
@@ -2187,21 +2283,20 @@ class YahooCalculationRatiosService:
         parsed_start_date = self._parse_date_flex(start_date_str)
         parsed_end_date = self._parse_date_flex(end_date_str)
 
-        annual_income_statements = await self.db_repo.get_data_items_by_criteria(
-            ticker=ticker_symbol,
-            item_type="INCOME_STATEMENT", # Shares are from Income Statement
-            item_time_coverage="FYEAR",
+        statements_by_ticker = await self.db_repo.get_data_items_for_tickers(
+            tickers=tickers,
+            item_specs=[("INCOME_STATEMENT", "FYEAR")], # Shares are from Income Statement
             start_date=parsed_start_date,
             end_date=parsed_end_date,
-            order_by_key_date_desc=False # Fetch ascending for easier processing
+            order_by_key_date_desc=False, # Fetch ascending for easier processing
+            field_keys=[target_shares_key]
         )
 
-        if annual_income_statements:
-            # Currency conversion is not applied to shares, but fetching info might be needed if other fields were involved.
-            # For shares alone, it's not critical.
-            # conversion_info = await self._get_conversion_info_for_ticker(ticker_symbol, {}) 
-            
-            for item in annual_income_statements:
+        shares_by_ticker: Dict[str, List[Dict[str, Any]]] = {}
+        for ticker_symbol in tickers:
+            annual_shares_points: List[Dict[str, Any]] = []
+            # Currency conversion is not applied to shares.
+            for item in statements_by_ticker.get(ticker_symbol, {}).get(("INCOME_STATEMENT", "FYEAR"), []):
                 payload = item.get('item_data_payload')
                 key_date_from_db = item.get('item_key_date')
                 
@@ -2227,10 +2322,11 @@ class YahooCalculationRatiosService:
                         logger.warning(f"ANNUAL_SHARES_HELPER [{ticker_symbol}]: Could not parse annual shares value '{shares_value}' for date '{date_obj.strftime('%Y-%m-%d')}'")
                 else:
                     logger.debug(f"ANNUAL_SHARES_HELPER [{ticker_symbol}]: '{target_shares_key}' not found in payload for date '{date_obj.strftime('%Y-%m-%d')}'")
-        
-        annual_shares_points.sort(key=lambda x: x['date_obj']) # Ensure sorted by date
-        logger.info(f"ANNUAL_SHARES_HELPER [{ticker_symbol}]: Prepared {len(annual_shares_points)} annual shares points.")
-        return annual_shares_points
+            
+            annual_shares_points.sort(key=lambda x: x['date_obj']) # Ensure sorted by date
+            logger.info(f"ANNUAL_SHARES_HELPER [{ticker_symbol}]: Prepared {len(annual_shares_points)} annual shares points.")
+            shares_by_ticker[ticker_symbol] = annual_shares_points
+        return shares_by_ticker
     # --- END: _get_annual_shares_series helper ---
 
     # --- NEW: Generic TTM Calculation Helper ---
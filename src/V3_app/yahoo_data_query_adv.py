@@ -64,15 +64,19 @@ class YahooDataQueryAdvService:
         fundamental_query_start_date_str = fundamental_query_start_date_obj.strftime("%Y-%m-%d")
         fundamental_query_end_date_str = user_end_date_obj.strftime("%Y-%m-%d")
 
+        # Load the statements of all tickers in one batched query instead of one query per ticker and statement
+        statements_by_ticker = await self.base_query_srv.db_repo.get_data_items_for_tickers(
+            tickers=tickers, item_specs=[("CASH_FLOW_STATEMENT", "QUARTER"), ("CASH_FLOW_STATEMENT", "FYEAR"), ("INCOME_STATEMENT", "QUARTER"), ("INCOME_STATEMENT", "FYEAR")],
+            start_date=fundamental_query_start_date_obj, end_date=user_end_date_obj, order_by_key_date_desc=False,
+            field_keys=["Free Cash Flow", "Total Revenue"]
+        )
+
         for ticker_symbol in tickers:
             try:
                 logger.debug(f"[AdvQuerySrv.FCF_MARGIN] Processing Ticker: {ticker_symbol}")
 
                 # Fetch Quarterly FCF components
-                quarterly_cf_statements_raw = await self.base_query_srv.db_repo.get_data_items_by_criteria(
-                    ticker=ticker_symbol, item_type="CASH_FLOW_STATEMENT", item_time_coverage="QUARTER",
-                    start_date=fundamental_query_start_date_obj, end_date=user_end_date_obj, order_by_key_date_desc=False
-                )
+                quarterly_cf_statements_raw = statements_by_ticker.get(ticker_symbol, {}).get(("CASH_FLOW_STATEMENT", "QUARTER"), [])
                 quarterly_fcf_points: List[Dict[str, Any]] = []
                 for idx, item_data in enumerate(quarterly_cf_statements_raw):
                     payload = item_data.get('item_data_payload')
@@ -117,10 +121,7 @@ class YahooDataQueryAdvService:
                     logger.warning(f"[AdvQuerySrv.FCF_MARGIN_DEBUG_POP_Q_FCF] Ticker: {ticker_symbol}, No quarterly FCF points populated.")
 
                 # Fetch Annual FCF components (for fallback)
-                annual_cf_statements_raw = await self.base_query_srv.db_repo.get_data_items_by_criteria(
-                    ticker=ticker_symbol, item_type="CASH_FLOW_STATEMENT", item_time_coverage="FYEAR",
-                    start_date=fundamental_query_start_date_obj, end_date=user_end_date_obj, order_by_key_date_desc=False
-                )
+                annual_cf_statements_raw = statements_by_ticker.get(ticker_symbol, {}).get(("CASH_FLOW_STATEMENT", "FYEAR"), [])
                 annual_fcf_points: List[Dict[str, Any]] = []
                 for item_data in annual_cf_statements_raw:
                     payload = item_data.get('item_data_payload')
@@ -151,10 +152,7 @@ class YahooDataQueryAdvService:
                     logger.warning(f"[AdvQuerySrv.FCF_MARGIN_DEBUG_POP_A_FCF] Ticker: {ticker_symbol}, No annual FCF points populated.")
                 
                 # Fetch Quarterly Revenue
-                quarterly_is_statements_raw = await self.base_query_srv.db_repo.get_data_items_by_criteria(
-                    ticker=ticker_symbol, item_type="INCOME_STATEMENT", item_time_coverage="QUARTER",
-                    start_date=fundamental_query_start_date_obj, end_date=user_end_date_obj, order_by_key_date_desc=False
-                )
+                quarterly_is_statements_raw = statements_by_ticker.get(ticker_symbol, {}).get(("INCOME_STATEMENT", "QUARTER"), [])
                 quarterly_revenue_points: List[Dict[str, Any]] = []
                 for idx, item_data in enumerate(quarterly_is_statements_raw):
                     payload = item_data.get('item_data_payload')
@@ -196,10 +194,7 @@ class YahooDataQueryAdvService:
                     logger.warning(f"[AdvQuerySrv.FCF_MARGIN_DEBUG_POP_Q_REV] Ticker: {ticker_symbol}, No quarterly Revenue points populated.")
 
                 # Fetch Annual Revenue (for fallback)
-                annual_is_statements_raw = await self.base_query_srv.db_repo.get_data_items_by_criteria(
-                    ticker=ticker_symbol, item_type="INCOME_STATEMENT", item_time_coverage="FYEAR",
-                    start_date=fundamental_query_start_date_obj, end_date=user_end_date_obj, order_by_key_date_desc=False
-                )
+                annual_is_statements_raw = statements_by_ticker.get(ticker_symbol, {}).get(("INCOME_STATEMENT", "FYEAR"), [])
                 annual_revenue_points: List[Dict[str, Any]] = []
                 for item_data in annual_is_statements_raw:
                     payload = item_data.get('item_data_payload')
@@ -319,19 +314,19 @@ class YahooDataQueryAdvService:
         # fundamental_query_start_date_str = fundamental_query_start_date_obj.strftime("%Y-%m-%d") # Not directly used by get_data_items_by_criteria
         # fundamental_query_end_date_str = user_end_date_obj.strftime("%Y-%m-%d") # Not directly used
 
+        # Load the statements of all tickers in one batched query instead of one query per ticker and statement
+        statements_by_ticker = await self.base_query_srv.db_repo.get_data_items_for_tickers(
+            tickers=tickers, item_specs=[("INCOME_STATEMENT", "QUARTER"), ("INCOME_STATEMENT", "FYEAR")],
+            start_date=fundamental_query_start_date_obj, end_date=user_end_date_obj, order_by_key_date_desc=False,
+            field_keys=["Gross Profit", "Total Revenue"]
+        )
+
         for ticker_symbol in tickers:
             try:
                 logger.debug(f"[AdvQuerySrv.GROSS_MARGIN] Processing Ticker: {ticker_symbol}")
 
                 # Fetch Quarterly Gross Profit and Total Revenue (from Income Statement)
-                quarterly_is_statements_raw = await self.base_query_srv.db_repo.get_data_items_by_criteria(
-                    ticker=ticker_symbol, # Ensure this uses singular ticker
-                    item_type="INCOME_STATEMENT", 
-                    item_time_coverage="QUARTER",
-                    start_date=fundamental_query_start_date_obj, 
-                    end_date=user_end_date_obj, 
-                    order_by_key_date_desc=False
-                )
+                quarterly_is_statements_raw = statements_by_ticker.get(ticker_symbol, {}).get(("INCOME_STATEMENT", "QUARTER"), [])
                 quarterly_gross_profit_points: List[Dict[str, Any]] = []
                 quarterly_total_revenue_points: List[Dict[str, Any]] = []
 
@@ -359,14 +354,7 @@ class YahooDataQueryAdvService:
 
 
                 # Fetch Annual Gross Profit and Total Revenue (from Income Statement)
-                annual_is_statements_raw = await self.base_query_srv.db_repo.get_data_items_by_criteria(
-                    ticker=ticker_symbol, # Ensure this uses singular ticker
-                    item_type="INCOME_STATEMENT", 
-                    item_time_coverage="FYEAR",
-                    start_date=fundamental_query_start_date_obj, 
-                    end_date=user_end_date_obj, 
-                    order_by_key_date_desc=False
-                )
+                annual_is_statements_raw = statements_by_ticker.get(ticker_symbol, {}).get(("INCOME_STATEMENT", "FYEAR"), [])
                 annual_gross_profit_points: List[Dict[str, Any]] = []
                 annual_total_revenue_points: List[Dict[str, Any]] = []
 
@@ -458,19 +446,19 @@ class YahooDataQueryAdvService:
 
         fundamental_query_start_date_obj = user_start_date_obj - timedelta(days=5*365)
 
+        # Load the statements of all tickers in one batched query instead of one query per ticker and statement
+        statements_by_ticker = await self.base_query_srv.db_repo.get_data_items_for_tickers(
+            tickers=tickers, item_specs=[("INCOME_STATEMENT", "QUARTER"), ("INCOME_STATEMENT", "FYEAR")],
+            start_date=fundamental_query_start_date_obj, end_date=user_end_date_obj, order_by_key_date_desc=False,
+            field_keys=["Operating Income", "Total Revenue"]
+        )
+
         for ticker_symbol in tickers:
             try:
                 logger.debug(f"[AdvQuerySrv.OPERATING_MARGIN] Processing Ticker: {ticker_symbol}")
 
                 # Fetch Quarterly Operating Income and Total Revenue (from Income Statement)
-                quarterly_is_statements_raw = await self.base_query_srv.db_repo.get_data_items_by_criteria(
-                    ticker=ticker_symbol, # Ensure this uses singular ticker
-                    item_type="INCOME_STATEMENT", 
-                    item_time_coverage="QUARTER",
-                    start_date=fundamental_query_start_date_obj, 
-                    end_date=user_end_date_obj, 
-                    order_by_key_date_desc=False
-                )
+                quarterly_is_statements_raw = statements_by_ticker.get(ticker_symbol, {}).get(("INCOME_STATEMENT", "QUARTER"), [])
                 quarterly_operating_income_points: List[Dict[str, Any]] = []
                 quarterly_total_revenue_points: List[Dict[str, Any]] = [] # Reusing from gross margin, can be defined once if refactored
 
@@ -497,14 +485,7 @@ class YahooDataQueryAdvService:
                 logger.debug(f"[AdvQuerySrv.OPERATING_MARGIN_DEBUG_POP_Q_REV] Ticker: {ticker_symbol}, First 2 Q_REV points: {quarterly_total_revenue_points[:2]}")
 
                 # Fetch Annual Operating Income and Total Revenue (from Income Statement)
-                annual_is_statements_raw = await self.base_query_srv.db_repo.get_data_items_by_criteria(
-                    ticker=ticker_symbol, # Ensure this uses singular ticker
-                    item_type="INCOME_STATEMENT", 
-                    item_time_coverage="FYEAR",
-                    start_date=fundamental_query_start_date_obj, 
-                    end_date=user_end_date_obj, 
-                    order_by_key_date_desc=False
-                )
+                annual_is_statements_raw = statements_by_ticker.get(ticker_symbol, {}).get(("INCOME_STATEMENT", "FYEAR"), [])
                 annual_operating_income_points: List[Dict[str, Any]] = []
                 annual_total_revenue_points: List[Dict[str, Any]] = [] # Reusing
 
@@ -595,19 +576,19 @@ class YahooDataQueryAdvService:
 
         fundamental_query_start_date_obj = user_start_date_obj - timedelta(days=5*365)
 
+        # Load the statements of all tickers in one batched query instead of one query per ticker and statement
+        statements_by_ticker = await self.base_query_srv.db_repo.get_data_items_for_tickers(
+            tickers=tickers, item_specs=[("INCOME_STATEMENT", "QUARTER"), ("INCOME_STATEMENT", "FYEAR")],
+            start_date=fundamental_query_start_date_obj, end_date=user_end_date_obj, order_by_key_date_desc=False,
+            field_keys=["Net Income", "NetIncome", "Total Revenue"]
+        )
+
         for ticker_symbol in tickers:
             try:
                 logger.debug(f"[AdvQuerySrv.NET_PROFIT_MARGIN] Processing Ticker: {ticker_symbol}")
 
                 # Fetch Quarterly Net Income and Total Revenue (from Income Statement)
-                quarterly_is_statements_raw = await self.base_query_srv.db_repo.get_data_items_by_criteria(
-                    ticker=ticker_symbol, 
-                    item_type="INCOME_STATEMENT", 
-                    item_time_coverage="QUARTER",
-                    start_date=fundamental_query_start_date_obj, 
-                    end_date=user_end_date_obj, 
-                    order_by_key_date_desc=False
-                )
+                quarterly_is_statements_raw = statements_by_ticker.get(ticker_symbol, {}).get(("INCOME_STATEMENT", "QUARTER"), [])
                 quarterly_net_income_points: List[Dict[str, Any]] = []
                 quarterly_total_revenue_points: List[Dict[str, Any]] = []
 
@@ -638,14 +619,7 @@ class YahooDataQueryAdvService:
                 logger.debug(f"[AdvQuerySrv.NET_PROFIT_MARGIN_DEBUG_POP_Q_REV] Ticker: {ticker_symbol}, First 2 Q_REV points: {quarterly_total_revenue_points[:2]}")
 
                 # Fetch Annual Net Income and Total Revenue (from Income Statement)
-                annual_is_statements_raw = await self.base_query_srv.db_repo.get_data_items_by_criteria(
-                    ticker=ticker_symbol, 
-                    item_type="INCOME_STATEMENT", 
-                    item_time_coverage="FYEAR",
-                    start_date=fundamental_query_start_date_obj, 
-                    end_date=user_end_date_obj, 
-                    order_by_key_date_desc=False
-                )
+                annual_is_statements_raw = statements_by_ticker.get(ticker_symbol, {}).get(("INCOME_STATEMENT", "FYEAR"), [])
                 annual_net_income_points: List[Dict[str, Any]] = []
                 annual_total_revenue_points: List[Dict[str, Any]] = []
 
@@ -798,18 +772,38 @@ class YahooDataQueryAdvService:
         # Look back further for fundamental data
         fundamental_query_start_date_obj = user_start_date_obj - timedelta(days=5*365)
 
+        # Fetch the field series for all tickers up front (batched) rather than once per ticker
+        # 1. Fetch Total Revenue components (Quarterly and Annual)
+        quarterly_revenue_data_raw = await self.base_query_srv.get_specific_field_timeseries(
+            field_identifier="yf_item_income_statement_quarterly_TotalRevenue",
+            tickers=tickers, 
+            start_date_str=fundamental_query_start_date_obj.strftime("%Y-%m-%d"),
+            end_date_str=user_end_date_obj.strftime("%Y-%m-%d")
+        )
+        annual_revenue_data_raw = await self.base_query_srv.get_specific_field_timeseries(
+            field_identifier="yf_item_income_statement_annual_TotalRevenue",
+            tickers=tickers,
+            start_date_str=fundamental_query_start_date_obj.strftime("%Y-%m-%d"),
+            end_date_str=user_end_date_obj.strftime("%Y-%m-%d")
+        )
+
+        # Shares series for all tickers in one batched fetch
+        q_shares_series_by_ticker = await self.base_query_srv._get_quarterly_shares_series_for_tickers(
+            tickers,
+            fundamental_query_start_date_obj.strftime("%Y-%m-%d"),
+            user_end_date_obj.strftime("%Y-%m-%d")
+        )
+        a_shares_series_by_ticker = await self.base_query_srv._get_annual_shares_series_for_tickers(
+            tickers,
+            fundamental_query_start_date_obj.strftime("%Y-%m-%d"),
+            user_end_date_obj.strftime("%Y-%m-%d")
+        )
+
         for ticker_symbol in tickers:
             try:
                 # logger.debug(f"[AdvQuerySrv.PRICE_SALES_TTM] Processing Ticker: {ticker_symbol}")
                 final_ratio_series: List[Dict[str, Any]] = []
 
-                # 1. Fetch Total Revenue components (Quarterly and Annual)
-                quarterly_revenue_data_raw = await self.base_query_srv.get_specific_field_timeseries(
-                    field_identifier="yf_item_income_statement_quarterly_TotalRevenue",
-                    tickers=[ticker_symbol], 
-                    start_date_str=fundamental_query_start_date_obj.strftime("%Y-%m-%d"),
-                    end_date_str=user_end_date_obj.strftime("%Y-%m-%d")
-                )
                 quarterly_total_revenue_points: List[Dict[str, Any]] = []
                 if quarterly_revenue_data_raw.get(ticker_symbol):
                     for item in quarterly_revenue_data_raw[ticker_symbol]:
@@ -822,12 +816,6 @@ class YahooDataQueryAdvService:
                 quarterly_total_revenue_points.sort(key=lambda x: x['date_obj'])
                 # logger.debug(f"[AdvQuerySrv.PRICE_SALES_TTM_DEBUG] Ticker: {ticker_symbol}, Fetched {len(quarterly_total_revenue_points)} quarterly revenue points via get_specific_field_timeseries. First 2: {quarterly_total_revenue_points[:2]}")
 
-                annual_revenue_data_raw = await self.base_query_srv.get_specific_field_timeseries(
-                    field_identifier="yf_item_income_statement_annual_TotalRevenue",
-                    tickers=[ticker_symbol],
-                    start_date_str=fundamental_query_start_date_obj.strftime("%Y-%m-%d"),
-                    end_date_str=user_end_date_obj.strftime("%Y-%m-%d")
-                )
                 annual_total_revenue_points: List[Dict[str, Any]] = []
                 if annual_revenue_data_raw.get(ticker_symbol):
                     for item in annual_revenue_data_raw[ticker_symbol]:
@@ -856,16 +844,8 @@ class YahooDataQueryAdvService:
                 # logger.debug(f"[AdvQuerySrv.PRICE_SALES_TTM] Received {len(price_data)} price points for {ticker_symbol}.")
 
                 # 3. Fetch Shares Outstanding Series
-                q_shares_series = await self.base_query_srv._get_quarterly_shares_series(
-                    ticker_symbol, 
-                    fundamental_query_start_date_obj.strftime("%Y-%m-%d"), 
-                    user_end_date_obj.strftime("%Y-%m-%d")
-                )
-                a_shares_series = await self.base_query_srv._get_annual_shares_series(
-                    ticker_symbol, 
-                    fundamental_query_start_date_obj.strftime("%Y-%m-%d"), 
-                    user_end_date_obj.strftime("%Y-%m-%d")
-                )
+                q_shares_series = q_shares_series_by_ticker.get(ticker_symbol, [])
+                a_shares_series = a_shares_series_by_ticker.get(ticker_symbol, [])
 
                 # 4. Process each price point - MODIFIED to match P/E pattern
                 debug_log_count = 0
@@ -953,17 +933,40 @@ class YahooDataQueryAdvService:
         equity_quarterly_field_id = "yf_item_balance_sheet_quarterly_CommonStockEquity"
         equity_annual_field_id = "yf_item_balance_sheet_annual_CommonStockEquity"
 
+        # Fetch the field series for all tickers up front (batched) rather than once per ticker
+        # 1. Fetch Total Debt Data
+        # Fetch Quarterly Debt
+        debt_q_raw = await self.base_query_srv.get_specific_field_timeseries(
+            field_identifier=debt_quarterly_field_id,
+            tickers=tickers,
+            start_date_str=fundamental_query_start_date_str,
+            end_date_str=fundamental_query_end_date_str
+        )
+        # Fetch Annual Debt
+        debt_a_raw = await self.base_query_srv.get_specific_field_timeseries(
+            field_identifier=debt_annual_field_id,
+            tickers=tickers,
+            start_date_str=fundamental_query_start_date_str,
+            end_date_str=fundamental_query_end_date_str
+        )
+        # 2. Fetch Stockholders Equity Data
+        # Fetch Quarterly Equity
+        equity_q_raw = await self.base_query_srv.get_specific_field_timeseries(
+            field_identifier=equity_quarterly_field_id,
+            tickers=tickers,
+            start_date_str=fundamental_query_start_date_str,
+            end_date_str=fundamental_query_end_date_str
+        )
+        # Fetch Annual Equity
+        equity_a_raw = await self.base_query_srv.get_specific_field_timeseries(
+            field_identifier=equity_annual_field_id,
+            tickers=tickers,
+            start_date_str=fundamental_query_start_date_str,
+            end_date_str=fundamental_query_end_date_str
+        )
+
         for ticker_symbol in tickers:
             try:
-                # 1. Fetch Total Debt Data
-                # Fetch Quarterly Debt
-                logger.debug(f"DEBT_TO_EQUITY [{ticker_symbol}]: Fetching Q Debt ({debt_quarterly_field_id})")
-                debt_q_raw = await self.base_query_srv.get_specific_field_timeseries(
-                    field_identifier=debt_quarterly_field_id,
-                    tickers=[ticker_symbol],
-                    start_date_str=fundamental_query_start_date_str,
-                    end_date_str=fundamental_query_end_date_str
-                )
                 quarterly_debt_points: List[Dict[str, Any]] = []
                 if debt_q_raw.get(ticker_symbol):
                     for item in debt_q_raw[ticker_symbol]:
@@ -974,14 +977,6 @@ class YahooDataQueryAdvService:
                             except (ValueError, TypeError): pass
                 logger.info(f"DEBT_TO_EQUITY [{ticker_symbol}]: Parsed {len(quarterly_debt_points)} quarterly debt points.")
 
-                # Fetch Annual Debt
-                logger.debug(f"DEBT_TO_EQUITY [{ticker_symbol}]: Fetching A Debt ({debt_annual_field_id})")
-                debt_a_raw = await self.base_query_srv.get_specific_field_timeseries(
-                    field_identifier=debt_annual_field_id,
-                    tickers=[ticker_symbol],
-                    start_date_str=fundamental_query_start_date_str,
-                    end_date_str=fundamental_query_end_date_str
-                )
                 annual_debt_points: List[Dict[str, Any]] = []
                 if debt_a_raw.get(ticker_symbol):
                     for item in debt_a_raw[ticker_symbol]:
@@ -992,15 +987,6 @@ class YahooDataQueryAdvService:
                             except (ValueError, TypeError): pass
                 logger.info(f"DEBT_TO_EQUITY [{ticker_symbol}]: Parsed {len(annual_debt_points)} annual debt points.")
 
-                # 2. Fetch Stockholders Equity Data
-                # Fetch Quarterly Equity
-                logger.debug(f"DEBT_TO_EQUITY [{ticker_symbol}]: Fetching Q Equity ({equity_quarterly_field_id})")
-                equity_q_raw = await self.base_query_srv.get_specific_field_timeseries(
-                    field_identifier=equity_quarterly_field_id,
-                    tickers=[ticker_symbol],
-                    start_date_str=fundamental_query_start_date_str,
-                    end_date_str=fundamental_query_end_date_str
-                )
                 quarterly_equity_points: List[Dict[str, Any]] = []
                 if equity_q_raw.get(ticker_symbol):
                     for item in equity_q_raw[ticker_symbol]:
@@ -1011,14 +997,6 @@ class YahooDataQueryAdvService:
                             except (ValueError, TypeError): pass
                 logger.info(f"DEBT_TO_EQUITY [{ticker_symbol}]: Parsed {len(quarterly_equity_points)} quarterly equity points.")
 
-                # Fetch Annual Equity
-                logger.debug(f"DEBT_TO_EQUITY [{ticker_symbol}]: Fetching A Equity ({equity_annual_field_id})")
-                equity_a_raw = await self.base_query_srv.get_specific_field_timeseries(
-                    field_identifier=equity_annual_field_id,
-                    tickers=[ticker_symbol],
-                    start_date_str=fundamental_query_start_date_str,
-                    end_date_str=fundamental_query_end_date_str
-                )
                 annual_equity_points: List[Dict[str, Any]] = []
                 if equity_a_raw.get(ticker_symbol):
                     for item in equity_a_raw[ticker_symbol]:
@@ -1447,36 +1425,36 @@ class YahooDataQueryAdvService:
         user_start_date = self.base_query_srv._parse_date_flex(start_date_str) if start_date_str else datetime.now() - timedelta(days=5*365)
         user_end_date = self.base_query_srv._parse_date_flex(end_date_str) if end_date_str else datetime.now()
 
+        # Fetch the field series for all tickers up front (batched) rather than once per ticker
+        # Fetch Total Debt data (both quarterly and annual)
+        total_debt_quarterly = await self.base_query_srv.get_specific_field_timeseries(
+            field_identifier="yf_item_balance_sheet_quarterly_TotalDebt",
+            tickers=tickers,
+            start_date_str=start_date_str,
+            end_date_str=end_date_str
+        )
+        total_debt_annual = await self.base_query_srv.get_specific_field_timeseries(
+            field_identifier="yf_item_balance_sheet_annual_TotalDebt",
+            tickers=tickers,
+            start_date_str=start_date_str,
+            end_date_str=end_date_str
+        )
+        # Fetch Total Assets data (both quarterly and annual)
+        total_assets_quarterly = await self.base_query_srv.get_specific_field_timeseries(
+            field_identifier="yf_item_balance_sheet_quarterly_TotalAssets",
+            tickers=tickers,
+            start_date_str=start_date_str,
+            end_date_str=end_date_str
+        )
+        total_assets_annual = await self.base_query_srv.get_specific_field_timeseries(
+            field_identifier="yf_item_balance_sheet_annual_TotalAssets",
+            tickers=tickers,
+            start_date_str=start_date_str,
+            end_date_str=end_date_str
+        )
+
         for ticker in tickers:
             try:
-                # Fetch Total Debt data (both quarterly and annual)
-                total_debt_quarterly = await self.base_query_srv.get_specific_field_timeseries(
-                    field_identifier="yf_item_balance_sheet_quarterly_TotalDebt",
-                    tickers=ticker,
-                    start_date_str=start_date_str,
-                    end_date_str=end_date_str
-                )
-                total_debt_annual = await self.base_query_srv.get_specific_field_timeseries(
-                    field_identifier="yf_item_balance_sheet_annual_TotalDebt",
-                    tickers=ticker,
-                    start_date_str=start_date_str,
-                    end_date_str=end_date_str
-                )
-
-                # Fetch Total Assets data (both quarterly and annual)
-                total_assets_quarterly = await self.base_query_srv.get_specific_field_timeseries(
-                    field_identifier="yf_item_balance_sheet_quarterly_TotalAssets",
-                    tickers=ticker,
-                    start_date_str=start_date_str,
-                    end_date_str=end_date_str
-                )
-                total_assets_annual = await self.base_query_srv.get_specific_field_timeseries(
-                    field_identifier="yf_item_balance_sheet_annual_TotalAssets",
-                    tickers=ticker,
-                    start_date_str=start_date_str,
-                    end_date_str=end_date_str
-                )
-
                 # Process the data points
                 debt_points = []
                 assets_points = []
@@ -1594,40 +1572,38 @@ class YahooDataQueryAdvService:
             # Look back further for fundamental data to ensure enough history for TTM calculation
             fundamental_query_start_date = user_start_date - timedelta(days=5*365)
 
+            # Fetch the field series for all tickers up front (batched) rather than once per ticker
+            # 1. Fetch Net Income data (quarterly and annual)
+            net_income_quarterly = await self.base_query_srv.get_specific_field_timeseries(
+                field_identifier="yf_item_income_statement_quarterly_NetIncome",
+                tickers=tickers,
+                start_date_str=fundamental_query_start_date.strftime("%Y-%m-%d"),
+                end_date_str=user_end_date.strftime("%Y-%m-%d")
+            )
+            net_income_annual = await self.base_query_srv.get_specific_field_timeseries(
+                field_identifier="yf_item_income_statement_annual_NetIncome",
+                tickers=tickers,
+                start_date_str=fundamental_query_start_date.strftime("%Y-%m-%d"),
+                end_date_str=user_end_date.strftime("%Y-%m-%d")
+            )
+            # 2. Fetch Total Assets data (quarterly and annual)
+            total_assets_quarterly = await self.base_query_srv.get_specific_field_timeseries(
+                field_identifier="yf_item_balance_sheet_quarterly_TotalAssets",
+                tickers=tickers,
+                start_date_str=fundamental_query_start_date.strftime("%Y-%m-%d"),
+                end_date_str=user_end_date.strftime("%Y-%m-%d")
+            )
+            total_assets_annual = await self.base_query_srv.get_specific_field_timeseries(
+                field_identifier="yf_item_balance_sheet_annual_TotalAssets",
+                tickers=tickers,
+                start_date_str=fundamental_query_start_date.strftime("%Y-%m-%d"),
+                end_date_str=user_end_date.strftime("%Y-%m-%d")
+            )
+
             for ticker in tickers:
                 try:
                     logger.info(f"Processing Asset Turnover (TTM) for {ticker}")
 
-                    # 1. Fetch Net Income data (quarterly and annual)
-                    net_income_quarterly = await self.base_query_srv.get_specific_field_timeseries(
-                        field_identifier="yf_item_income_statement_quarterly_NetIncome",
-                        tickers=[ticker],
-                        start_date_str=fundamental_query_start_date.strftime("%Y-%m-%d"),
-                        end_date_str=user_end_date.strftime("%Y-%m-%d")
-                    )
-                    
-                    net_income_annual = await self.base_query_srv.get_specific_field_timeseries(
-                        field_identifier="yf_item_income_statement_annual_NetIncome",
-                        tickers=[ticker],
-                        start_date_str=fundamental_query_start_date.strftime("%Y-%m-%d"),
-                        end_date_str=user_end_date.strftime("%Y-%m-%d")
-                    )
-
-                    # 2. Fetch Total Assets data (quarterly and annual)
-                    total_assets_quarterly = await self.base_query_srv.get_specific_field_timeseries(
-                        field_identifier="yf_item_balance_sheet_quarterly_TotalAssets",
-                        tickers=[ticker],
-                        start_date_str=fundamental_query_start_date.strftime("%Y-%m-%d"),
-                        end_date_str=user_end_date.strftime("%Y-%m-%d")
-                    )
-                    
-                    total_assets_annual = await self.base_query_srv.get_specific_field_timeseries(
-                        field_identifier="yf_item_balance_sheet_annual_TotalAssets",
-                        tickers=[ticker],
-                        start_date_str=fundamental_query_start_date.strftime("%Y-%m-%d"),
-                        end_date_str=user_end_date.strftime("%Y-%m-%d")
-                    )
-
                     # Process Net Income data points
                     quarterly_net_income_points: List[Dict[str, Any]] = []
                     if ticker in net_income_quarterly:
@@ -1771,40 +1747,38 @@ class YahooDataQueryAdvService:
             # Look back further for fundamental data to ensure enough history for TTM calculation
             fundamental_query_start_date = user_start_date - timedelta(days=5*365)
 
+            # Fetch the field series for all tickers up front (batched) rather than once per ticker
+            # 1. Fetch Cost of Revenue data (quarterly and annual)
+            cost_of_revenue_quarterly = await self.base_query_srv.get_specific_field_timeseries(
+                field_identifier="yf_item_income_statement_quarterly_CostOfRevenue",
+                tickers=tickers,
+                start_date_str=fundamental_query_start_date.strftime("%Y-%m-%d"),
+                end_date_str=user_end_date.strftime("%Y-%m-%d")
+            )
+            cost_of_revenue_annual = await self.base_query_srv.get_specific_field_timeseries(
+                field_identifier="yf_item_income_statement_annual_CostOfRevenue",
+                tickers=tickers,
+                start_date_str=fundamental_query_start_date.strftime("%Y-%m-%d"),
+                end_date_str=user_end_date.strftime("%Y-%m-%d")
+            )
+            # 2. Fetch Inventory data (quarterly and annual)
+            inventory_quarterly = await self.base_query_srv.get_specific_field_timeseries(
+                field_identifier="yf_item_balance_sheet_quarterly_Inventory",
+                tickers=tickers,
+                start_date_str=fundamental_query_start_date.strftime("%Y-%m-%d"),
+                end_date_str=user_end_date.strftime("%Y-%m-%d")
+            )
+            inventory_annual = await self.base_query_srv.get_specific_field_timeseries(
+                field_identifier="yf_item_balance_sheet_annual_Inventory",
+                tickers=tickers,
+                start_date_str=fundamental_query_start_date.strftime("%Y-%m-%d"),
+                end_date_str=user_end_date.strftime("%Y-%m-%d")
+            )
+
             for ticker in tickers:
                 try:
                     logger.info(f"Processing Inventory Turnover (TTM) for {ticker}")
 
-                    # 1. Fetch Cost of Revenue data (quarterly and annual)
-                    cost_of_revenue_quarterly = await self.base_query_srv.get_specific_field_timeseries(
-                        field_identifier="yf_item_income_statement_quarterly_CostOfRevenue",
-                        tickers=[ticker],
-                        start_date_str=fundamental_query_start_date.strftime("%Y-%m-%d"),
-                        end_date_str=user_end_date.strftime("%Y-%m-%d")
-                    )
-                    
-                    cost_of_revenue_annual = await self.base_query_srv.get_specific_field_timeseries(
-                        field_identifier="yf_item_income_statement_annual_CostOfRevenue",
-                        tickers=[ticker],
-                        start_date_str=fundamental_query_start_date.strftime("%Y-%m-%d"),
-                        end_date_str=user_end_date.strftime("%Y-%m-%d")
-                    )
-
-                    # 2. Fetch Inventory data (quarterly and annual)
-                    inventory_quarterly = await self.base_query_srv.get_specific_field_timeseries(
-                        field_identifier="yf_item_balance_sheet_quarterly_Inventory",
-                        tickers=[ticker],
-                        start_date_str=fundamental_query_start_date.strftime("%Y-%m-%d"),
-                        end_date_str=user_end_date.strftime("%Y-%m-%d")
-                    )
-                    
-                    inventory_annual = await self.base_query_srv.get_specific_field_timeseries(
-                        field_identifier="yf_item_balance_sheet_annual_Inventory",
-                        tickers=[ticker],
-                        start_date_str=fundamental_query_start_date.strftime("%Y-%m-%d"),
-                        end_date_str=user_end_date.strftime("%Y-%m-%d")
-                    )
-
                     # Process Cost of Revenue data points
                     quarterly_cost_of_revenue_points: List[Dict[str, Any]] = []
                     if ticker in cost_of_revenue_quarterly:
@@ -1947,55 +1921,51 @@ class YahooDataQueryAdvService:
             # Look back further for fundamental data to ensure enough history for TTM calculation
             fundamental_query_start_date = user_start_date - timedelta(days=5*365)
 
+            # Fetch the field series for all tickers up front (batched) rather than once per ticker
+            # 1. Fetch Interest Expense data (quarterly and annual)
+            interest_expense_quarterly = await self.base_query_srv.get_specific_field_timeseries(
+                field_identifier="yf_item_income_statement_quarterly_InterestExpense",
+                tickers=tickers,
+                start_date_str=fundamental_query_start_date.strftime("%Y-%m-%d"),
+                end_date_str=user_end_date.strftime("%Y-%m-%d")
+            )
+            interest_expense_annual = await self.base_query_srv.get_specific_field_timeseries(
+                field_identifier="yf_item_income_statement_annual_InterestExpense",
+                tickers=tickers,
+                start_date_str=fundamental_query_start_date.strftime("%Y-%m-%d"),
+                end_date_str=user_end_date.strftime("%Y-%m-%d")
+            )
+            # 2. Fetch EBIT data (quarterly and annual)
+            ebit_quarterly = await self.base_query_srv.get_specific_field_timeseries(
+                field_identifier="yf_item_income_statement_quarterly_EBIT",
+                tickers=tickers,
+                start_date_str=fundamental_query_start_date.strftime("%Y-%m-%d"),
+                end_date_str=user_end_date.strftime("%Y-%m-%d")
+            )
+            ebit_annual = await self.base_query_srv.get_specific_field_timeseries(
+                field_identifier="yf_item_income_statement_annual_EBIT",
+                tickers=tickers,
+                start_date_str=fundamental_query_start_date.strftime("%Y-%m-%d"),
+                end_date_str=user_end_date.strftime("%Y-%m-%d")
+            )
+            # 3. Fetch Operating Income data as fallback (quarterly and annual)
+            operating_income_quarterly = await self.base_query_srv.get_specific_field_timeseries(
+                field_identifier="yf_item_income_statement_quarterly_OperatingIncome",
+                tickers=tickers,
+                start_date_str=fundamental_query_start_date.strftime("%Y-%m-%d"),
+                end_date_str=user_end_date.strftime("%Y-%m-%d")
+            )
+            operating_income_annual = await self.base_query_srv.get_specific_field_timeseries(
+                field_identifier="yf_item_income_statement_annual_OperatingIncome",
+                tickers=tickers,
+                start_date_str=fundamental_query_start_date.strftime("%Y-%m-%d"),
+                end_date_str=user_end_date.strftime("%Y-%m-%d")
+            )
+
             for ticker in tickers:
                 try:
                     logger.info(f"Processing Interest/Income (TTM) for {ticker}")
 
-                    # 1. Fetch Interest Expense data (quarterly and annual)
-                    interest_expense_quarterly = await self.base_query_srv.get_specific_field_timeseries(
-                        field_identifier="yf_item_income_statement_quarterly_InterestExpense",
-                        tickers=[ticker],
-                        start_date_str=fundamental_query_start_date.strftime("%Y-%m-%d"),
-                        end_date_str=user_end_date.strftime("%Y-%m-%d")
-                    )
-                    
-                    interest_expense_annual = await self.base_query_srv.get_specific_field_timeseries(
-                        field_identifier="yf_item_income_statement_annual_InterestExpense",
-                        tickers=[ticker],
-                        start_date_str=fundamental_query_start_date.strftime("%Y-%m-%d"),
-                        end_date_str=user_end_date.strftime("%Y-%m-%d")
-                    )
-
-                    # 2. Fetch EBIT data (quarterly and annual)
-                    ebit_quarterly = await self.base_query_srv.get_specific_field_timeseries(
-                        field_identifier="yf_item_income_statement_quarterly_EBIT",
-                        tickers=[ticker],
-                        start_date_str=fundamental_query_start_date.strftime("%Y-%m-%d"),
-                        end_date_str=user_end_date.strftime("%Y-%m-%d")
-                    )
-                    
-                    ebit_annual = await self.base_query_srv.get_specific_field_timeseries(
-                        field_identifier="yf_item_income_statement_annual_EBIT",
-                        tickers=[ticker],
-                        start_date_str=fundamental_query_start_date.strftime("%Y-%m-%d"),
-                        end_date_str=user_end_date.strftime("%Y-%m-%d")
-                    )
-
-                    # 3. Fetch Operating Income data as fallback (quarterly and annual)
-                    operating_income_quarterly = await self.base_query_srv.get_specific_field_timeseries(
-                        field_identifier="yf_item_income_statement_quarterly_OperatingIncome",
-                        tickers=[ticker],
-                        start_date_str=fundamental_query_start_date.strftime("%Y-%m-%d"),
-                        end_date_str=user_end_date.strftime("%Y-%m-%d")
-                    )
-                    
-                    operating_income_annual = await self.base_query_srv.get_specific_field_timeseries(
-                        field_identifier="yf_item_income_statement_annual_OperatingIncome",
-                        tickers=[ticker],
-                        start_date_str=fundamental_query_start_date.strftime("%Y-%m-%d"),
-                        end_date_str=user_end_date.strftime("%Y-%m-%d")
-                    )
-
                     # Process Interest Expense data points
                     quarterly_interest_points: List[Dict[str, Any]] = []
                     if ticker in interest_expense_quarterly:
@@ -2179,40 +2149,38 @@ class YahooDataQueryAdvService:
             # Look back further for fundamental data to ensure enough history for TTM calculation
             fundamental_query_start_date = user_start_date - timedelta(days=5*365)
 
+            # Fetch the field series for all tickers up front (batched) rather than once per ticker
+            # 1. Fetch Net Income data (quarterly and annual)
+            net_income_quarterly = await self.base_query_srv.get_specific_field_timeseries(
+                field_identifier="yf_item_income_statement_quarterly_NetIncome",
+                tickers=tickers,
+                start_date_str=fundamental_query_start_date.strftime("%Y-%m-%d"),
+                end_date_str=user_end_date.strftime("%Y-%m-%d")
+            )
+            net_income_annual = await self.base_query_srv.get_specific_field_timeseries(
+                field_identifier="yf_item_income_statement_annual_NetIncome",
+                tickers=tickers,
+                start_date_str=fundamental_query_start_date.strftime("%Y-%m-%d"),
+                end_date_str=user_end_date.strftime("%Y-%m-%d")
+            )
+            # 2. Fetch Total Assets data (quarterly and annual)
+            total_assets_quarterly = await self.base_query_srv.get_specific_field_timeseries(
+                field_identifier="yf_item_balance_sheet_quarterly_TotalAssets",
+                tickers=tickers,
+                start_date_str=fundamental_query_start_date.strftime("%Y-%m-%d"),
+                end_date_str=user_end_date.strftime("%Y-%m-%d")
+            )
+            total_assets_annual = await self.base_query_srv.get_specific_field_timeseries(
+                field_identifier="yf_item_balance_sheet_annual_TotalAssets",
+                tickers=tickers,
+                start_date_str=fundamental_query_start_date.strftime("%Y-%m-%d"),
+                end_date_str=user_end_date.strftime("%Y-%m-%d")
+            )
+
             for ticker in tickers:
                 try:
                     logger.info(f"Processing ROA (TTM) for {ticker}")
 
-                    # 1. Fetch Net Income data (quarterly and annual)
-                    net_income_quarterly = await self.base_query_srv.get_specific_field_timeseries(
-                        field_identifier="yf_item_income_statement_quarterly_NetIncome",
-                        tickers=[ticker],
-                        start_date_str=fundamental_query_start_date.strftime("%Y-%m-%d"),
-                        end_date_str=user_end_date.strftime("%Y-%m-%d")
-                    )
-                    
-                    net_income_annual = await self.base_query_srv.get_specific_field_timeseries(
-                        field_identifier="yf_item_income_statement_annual_NetIncome",
-                        tickers=[ticker],
-                        start_date_str=fundamental_query_start_date.strftime("%Y-%m-%d"),
-                        end_date_str=user_end_date.strftime("%Y-%m-%d")
-                    )
-
-                    # 2. Fetch Total Assets data (quarterly and annual)
-                    total_assets_quarterly = await self.base_query_srv.get_specific_field_timeseries(
-                        field_identifier="yf_item_balance_sheet_quarterly_TotalAssets",
-                        tickers=[ticker],
-                        start_date_str=fundamental_query_start_date.strftime("%Y-%m-%d"),
-                        end_date_str=user_end_date.strftime("%Y-%m-%d")
-                    )
-                    
-                    total_assets_annual = await self.base_query_srv.get_specific_field_timeseries(
-                        field_identifier="yf_item_balance_sheet_annual_TotalAssets",
-                        tickers=[ticker],
-                        start_date_str=fundamental_query_start_date.strftime("%Y-%m-%d"),
-                        end_date_str=user_end_date.strftime("%Y-%m-%d")
-                    )
-
                     # Process Net Income data points
                     quarterly_net_income_points: List[Dict[str, Any]] = []
                     if ticker in net_income_quarterly:
@@ -2358,40 +2326,38 @@ class YahooDataQueryAdvService:
             # Look back further for fundamental data to ensure enough history for TTM calculation
             fundamental_query_start_date = user_start_date - timedelta(days=5*365)
 
+            # Fetch the field series for all tickers up front (batched) rather than once per ticker
+            # 1. Fetch Net Income data (quarterly and annual)
+            net_income_quarterly = await self.base_query_srv.get_specific_field_timeseries(
+                field_identifier="yf_item_income_statement_quarterly_NetIncome",
+                tickers=tickers,
+                start_date_str=fundamental_query_start_date.strftime("%Y-%m-%d"),
+                end_date_str=user_end_date.strftime("%Y-%m-%d")
+            )
+            net_income_annual = await self.base_query_srv.get_specific_field_timeseries(
+                field_identifier="yf_item_income_statement_annual_NetIncome",
+                tickers=tickers,
+                start_date_str=fundamental_query_start_date.strftime("%Y-%m-%d"),
+                end_date_str=user_end_date.strftime("%Y-%m-%d")
+            )
+            # 2. Fetch Common Stock Equity data (quarterly and annual)
+            equity_quarterly = await self.base_query_srv.get_specific_field_timeseries(
+                field_identifier="yf_item_balance_sheet_quarterly_CommonStockEquity",
+                tickers=tickers,
+                start_date_str=fundamental_query_start_date.strftime("%Y-%m-%d"),
+                end_date_str=user_end_date.strftime("%Y-%m-%d")
+            )
+            equity_annual = await self.base_query_srv.get_specific_field_timeseries(
+                field_identifier="yf_item_balance_sheet_annual_CommonStockEquity",
+                tickers=tickers,
+                start_date_str=fundamental_query_start_date.strftime("%Y-%m-%d"),
+                end_date_str=user_end_date.strftime("%Y-%m-%d")
+            )
+
             for ticker in tickers:
                 try:
                     logger.info(f"Processing ROE (TTM) for {ticker}")
 
-                    # 1. Fetch Net Income data (quarterly and annual)
-                    net_income_quarterly = await self.base_query_srv.get_specific_field_timeseries(
-                        field_identifier="yf_item_income_statement_quarterly_NetIncome",
-                        tickers=[ticker],
-                        start_date_str=fundamental_query_start_date.strftime("%Y-%m-%d"),
-                        end_date_str=user_end_date.strftime("%Y-%m-%d")
-                    )
-                    
-                    net_income_annual = await self.base_query_srv.get_specific_field_timeseries(
-                        field_identifier="yf_item_income_statement_annual_NetIncome",
-                        tickers=[ticker],
-                        start_date_str=fundamental_query_start_date.strftime("%Y-%m-%d"),
-                        end_date_str=user_end_date.strftime("%Y-%m-%d")
-                    )
-
-                    # 2. Fetch Common Stock Equity data (quarterly and annual)
-                    equity_quarterly = await self.base_query_srv.get_specific_field_timeseries(
-                        field_identifier="yf_item_balance_sheet_quarterly_CommonStockEquity",
-                        tickers=[ticker],
-                        start_date_str=fundamental_query_start_date.strftime("%Y-%m-%d"),
-                        end_date_str=user_end_date.strftime("%Y-%m-%d")
-                    )
-                    
-                    equity_annual = await self.base_query_srv.get_specific_field_timeseries(
-                        field_identifier="yf_item_balance_sheet_annual_CommonStockEquity",
-                        tickers=[ticker],
-                        start_date_str=fundamental_query_start_date.strftime("%Y-%m-%d"),
-                        end_date_str=user_end_date.strftime("%Y-%m-%d")
-                    )
-
                     # Process Net Income data points
                     quarterly_net_income_points: List[Dict[str, Any]] = []
                     if ticker in net_income_quarterly:
@@ -2539,70 +2505,64 @@ class YahooDataQueryAdvService:
             # Look back further for fundamental data to ensure enough history for TTM calculation
             fundamental_query_start_date = user_start_date - timedelta(days=5*365)
 
+            # Fetch the field series for all tickers up front (batched) rather than once per ticker
+            # 1. Fetch EBIT data (quarterly and annual)
+            ebit_quarterly = await self.base_query_srv.get_specific_field_timeseries(
+                field_identifier="yf_item_income_statement_quarterly_EBIT",
+                tickers=tickers,
+                start_date_str=fundamental_query_start_date.strftime("%Y-%m-%d"),
+                end_date_str=user_end_date.strftime("%Y-%m-%d")
+            )
+            ebit_annual = await self.base_query_srv.get_specific_field_timeseries(
+                field_identifier="yf_item_income_statement_annual_EBIT",
+                tickers=tickers,
+                start_date_str=fundamental_query_start_date.strftime("%Y-%m-%d"),
+                end_date_str=user_end_date.strftime("%Y-%m-%d")
+            )
+            # 2. Fetch Operating Income data as fallback (quarterly and annual)
+            operating_income_quarterly = await self.base_query_srv.get_specific_field_timeseries(
+                field_identifier="yf_item_income_statement_quarterly_OperatingIncome",
+                tickers=tickers,
+                start_date_str=fundamental_query_start_date.strftime("%Y-%m-%d"),
+                end_date_str=user_end_date.strftime("%Y-%m-%d")
+            )
+            operating_income_annual = await self.base_query_srv.get_specific_field_timeseries(
+                field_identifier="yf_item_income_statement_annual_OperatingIncome",
+                tickers=tickers,
+                start_date_str=fundamental_query_start_date.strftime("%Y-%m-%d"),
+                end_date_str=user_end_date.strftime("%Y-%m-%d")
+            )
+            # 3. Fetch Tax Rate For Calcs data (quarterly and annual)
+            tax_rate_quarterly = await self.base_query_srv.get_specific_field_timeseries(
+                field_identifier="yf_item_income_statement_quarterly_TaxRateForCalcs",
+                tickers=tickers,
+                start_date_str=fundamental_query_start_date.strftime("%Y-%m-%d"),
+                end_date_str=user_end_date.strftime("%Y-%m-%d")
+            )
+            tax_rate_annual = await self.base_query_srv.get_specific_field_timeseries(
+                field_identifier="yf_item_income_statement_annual_TaxRateForCalcs",
+                tickers=tickers,
+                start_date_str=fundamental_query_start_date.strftime("%Y-%m-%d"),
+                end_date_str=user_end_date.strftime("%Y-%m-%d")
+            )
+            # 4. Fetch Invested Capital data (quarterly and annual)
+            invested_capital_quarterly = await self.base_query_srv.get_specific_field_timeseries(
+                field_identifier="yf_item_balance_sheet_quarterly_InvestedCapital",
+                tickers=tickers,
+                start_date_str=fundamental_query_start_date.strftime("%Y-%m-%d"),
+                end_date_str=user_end_date.strftime("%Y-%m-%d")
+            )
+            invested_capital_annual = await self.base_query_srv.get_specific_field_timeseries(
+                field_identifier="yf_item_balance_sheet_annual_InvestedCapital",
+                tickers=tickers,
+                start_date_str=fundamental_query_start_date.strftime("%Y-%m-%d"),
+                end_date_str=user_end_date.strftime("%Y-%m-%d")
+            )
+
             for ticker in tickers:
                 try:
                     logger.info(f"Processing ROIC (TTM) for {ticker}")
 
-                    # 1. Fetch EBIT data (quarterly and annual)
-                    ebit_quarterly = await self.base_query_srv.get_specific_field_timeseries(
-                        field_identifier="yf_item_income_statement_quarterly_EBIT",
-                        tickers=[ticker],
-                        start_date_str=fundamental_query_start_date.strftime("%Y-%m-%d"),
-                        end_date_str=user_end_date.strftime("%Y-%m-%d")
-                    )
-                    
-                    ebit_annual = await self.base_query_srv.get_specific_field_timeseries(
-                        field_identifier="yf_item_income_statement_annual_EBIT",
-                        tickers=[ticker],
-                        start_date_str=fundamental_query_start_date.strftime("%Y-%m-%d"),
-                        end_date_str=user_end_date.strftime("%Y-%m-%d")
-                    )
-
-                    # 2. Fetch Operating Income data as fallback (quarterly and annual)
-                    operating_income_quarterly = await self.base_query_srv.get_specific_field_timeseries(
-                        field_identifier="yf_item_income_statement_quarterly_OperatingIncome",
-                        tickers=[ticker],
-                        start_date_str=fundamental_query_start_date.strftime("%Y-%m-%d"),
-                        end_date_str=user_end_date.strftime("%Y-%m-%d")
-                    )
-                    
-                    operating_income_annual = await self.base_query_srv.get_specific_field_timeseries(
-                        field_identifier="yf_item_income_statement_annual_OperatingIncome",
-                        tickers=[ticker],
-                        start_date_str=fundamental_query_start_date.strftime("%Y-%m-%d"),
-                        end_date_str=user_end_date.strftime("%Y-%m-%d")
-                    )
-
-                    # 3. Fetch Tax Rate For Calcs data (quarterly and annual)
-                    tax_rate_quarterly = await self.base_query_srv.get_specific_field_timeseries(
-                        field_identifier="yf_item_income_statement_quarterly_TaxRateForCalcs",
-                        tickers=[ticker],
-                        start_date_str=fundamental_query_start_date.strftime("%Y-%m-%d"),
-                        end_date_str=user_end_date.strftime("%Y-%m-%d")
-                    )
-                    
-                    tax_rate_annual = await self.base_query_srv.get_specific_field_timeseries(
-                        field_identifier="yf_item_income_statement_annual_TaxRateForCalcs",
-                        tickers=[ticker],
-                        start_date_str=fundamental_query_start_date.strftime("%Y-%m-%d"),
-                        end_date_str=user_end_date.strftime("%Y-%m-%d")
-                    )
-
-                    # 4. Fetch Invested Capital data (quarterly and annual)
-                    invested_capital_quarterly = await self.base_query_srv.get_specific_field_timeseries(
-                        field_identifier="yf_item_balance_sheet_quarterly_InvestedCapital",
-                        tickers=[ticker],
-                        start_date_str=fundamental_query_start_date.strftime("%Y-%m-%d"),
-                        end_date_str=user_end_date.strftime("%Y-%m-%d")
-                    )
-                    
-                    invested_capital_annual = await self.base_query_srv.get_specific_field_timeseries(
-                        field_identifier="yf_item_balance_sheet_annual_InvestedCapital",
-                        tickers=[ticker],
-                        start_date_str=fundamental_query_start_date.strftime("%Y-%m-%d"),
-                        end_date_str=user_end_date.strftime("%Y-%m-%d")
-                    )
-
                     # Process EBIT data points
                     quarterly_ebit_points: List[Dict[str, Any]] = []
                     if ticker in ebit_quarterly:
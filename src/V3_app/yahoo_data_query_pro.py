@@ -64,6 +64,35 @@ class YahooDataQueryProService:
         a_lookback_start_date_obj = start_date_obj - timedelta(days=365*3)
         a_lookback_start_iso = a_lookback_start_date_obj.strftime("%Y-%m-%d")
 
+        # Shares series for all tickers in one batched fetch
+        shares_series_by_ticker = await base_helpers._get_quarterly_shares_series_for_tickers(
+            tickers,
+            q_lookback_start_iso,
+            user_end_date_iso
+        )
+
+        # Balance sheet fields and statements for all tickers in batched fetches
+        bs_fields_by_name: Dict[str, Dict[str, List[Dict[str, Any]]]] = {}
+        for field_name_camel_case in ("TotalDebt", "MinorityInterest", "PreferredStock", "CashCashEquivalentsAndShortTermInvestments"):
+            bs_fields_by_name[field_name_camel_case] = await base_helpers.get_specific_field_timeseries(
+                field_identifier=f"yf_item_balance_sheet_quarterly_{field_name_camel_case}",
+                tickers=tickers,
+                start_date_str=q_lookback_start_iso,
+                end_date_str=user_end_date_iso
+            )
+        quarterly_statements_by_ticker = await self.db_repo.get_data_items_for_tickers(
+            tickers, [("CASH_FLOW_STATEMENT", "QUARTER")],
+            start_date=q_lookback_start_date_obj, end_date=end_date_obj, order_by_key_date_desc=False,
+            field_keys=["Free Cash Flow"]
+        )
+        annual_statements_by_ticker = await self.db_repo.get_data_items_for_tickers(
+            tickers, [("CASH_FLOW_STATEMENT", "FYEAR")],
+            start_date=a_lookback_start_date_obj, end_date=end_date_obj, order_by_key_date_desc=False,
+            field_keys=["Free Cash Flow"]
+        )
+        ticker_profiles_cache: Dict[str, Any] = {}
+        await base_helpers._prefetch_ticker_profiles(tickers, ticker_profiles_cache)
+
         for ticker in tickers:
             logger.info(f"[EV_FCF_TTM] Processing ticker: {ticker} from {user_start_date_iso} to {user_end_date_iso}")
             current_ticker_results: List[Dict[str, Any]] = []
@@ -83,22 +112,13 @@ class YahooDataQueryProService:
                     continue # Skip to the next ticker in the outer loop
                 
                 # 4. Fetch shares series (quarterly, fallback logic inside helper) for expanded window
-                shares_series = await base_helpers._get_quarterly_shares_series(
-                    ticker,
-                    q_lookback_start_iso, 
-                    user_end_date_iso
-                )
+                shares_series = shares_series_by_ticker.get(ticker, [])
                 shares_points = sorted([s for s in shares_series if s.get('date_obj') and s.get('value') is not None], key=lambda x: x['date_obj'])
 
                 # 5. Fetch balance sheet fields (quarterly) for expanded window
-                async def fetch_bs_field(field_name_camel_case: str):
+                def fetch_bs_field(field_name_camel_case: str):
                     field_id = f"yf_item_balance_sheet_quarterly_{field_name_camel_case}"
-                    data = await base_helpers.get_specific_field_timeseries(
-                        field_identifier=field_id,
-                        tickers=[ticker],
-                        start_date_str=q_lookback_start_iso,
-                        end_date_str=user_end_date_iso
-                    )
+                    data = bs_fields_by_name.get(field_name_camel_case, {})
                     arr = data.get(ticker, []) if data and ticker in data else []
                     field_map = {}
                     for d_item in arr:
@@ -111,22 +131,16 @@ class YahooDataQueryProService:
                             continue
                     return field_map
 
-                debt_map = await fetch_bs_field("TotalDebt")
-                minint_map = await fetch_bs_field("MinorityInterest")
-                pref_map = await fetch_bs_field("PreferredStock") 
-                cash_map = await fetch_bs_field("CashCashEquivalentsAndShortTermInvestments")
+                debt_map = fetch_bs_field("TotalDebt")
+                minint_map = fetch_bs_field("MinorityInterest")
+                pref_map = fetch_bs_field("PreferredStock") 
+                cash_map = fetch_bs_field("CashCashEquivalentsAndShortTermInvestments")
 
                 # 6. Fetch FCF (quarterly and annual) for TTM, using expanded window
-                quarterly_cf_items_raw = await self.db_repo.get_data_items_by_criteria(
-                    ticker=ticker, item_type="CASH_FLOW_STATEMENT", item_time_coverage="QUARTER",
-                    start_date=q_lookback_start_date_obj, end_date=end_date_obj, order_by_key_date_desc=False
-                )
-                annual_cf_items_raw = await self.db_repo.get_data_items_by_criteria(
-                    ticker=ticker, item_type="CASH_FLOW_STATEMENT", item_time_coverage="FYEAR",
-                    start_date=a_lookback_start_date_obj, end_date=end_date_obj, order_by_key_date_desc=False
-                )
+                quarterly_cf_items_raw = quarterly_statements_by_ticker.get(ticker, {}).get(("CASH_FLOW_STATEMENT", "QUARTER"), [])
+                annual_cf_items_raw = annual_statements_by_ticker.get(ticker, {}).get(("CASH_FLOW_STATEMENT", "FYEAR"), [])
 
-                conversion_info_fcf = await base_helpers._get_conversion_info_for_ticker(ticker, {})
+                conversion_info_fcf = await base_helpers._get_conversion_info_for_ticker(ticker, ticker_profiles_cache)
                 rate_fcf, orig_curr_fcf, target_curr_fcf = (conversion_info_fcf[2], conversion_info_fcf[1], conversion_info_fcf[0]) if conversion_info_fcf else (None, None, None)
 
                 async def to_fcf_points(items_raw):
@@ -293,6 +307,35 @@ class YahooDataQueryProService:
         a_lookback_start_date_obj = start_date_obj - timedelta(days=365*3) # Adjusted for potentially longer TTM needs
         a_lookback_start_iso = a_lookback_start_date_obj.strftime("%Y-%m-%d")
 
+        # Shares series for all tickers in one batched fetch
+        shares_series_by_ticker = await base_helpers._get_quarterly_shares_series_for_tickers(
+            tickers,
+            q_lookback_start_iso,
+            user_end_date_iso
+        )
+
+        # Balance sheet fields and statements for all tickers in batched fetches
+        bs_fields_by_name: Dict[str, Dict[str, List[Dict[str, Any]]]] = {}
+        for field_name_camel_case in ("TotalDebt", "MinorityInterest", "PreferredStock", "CashCashEquivalentsAndShortTermInvestments"):
+            bs_fields_by_name[field_name_camel_case] = await base_helpers.get_specific_field_timeseries(
+                field_identifier=f"yf_item_balance_sheet_quarterly_{field_name_camel_case}",
+                tickers=tickers,
+                start_date_str=q_lookback_start_iso,
+                end_date_str=user_end_date_iso
+            )
+        quarterly_statements_by_ticker = await self.db_repo.get_data_items_for_tickers(
+            tickers, [("INCOME_STATEMENT", "QUARTER")],
+            start_date=q_lookback_start_date_obj, end_date=end_date_obj, order_by_key_date_desc=False,
+            field_keys=["Total Revenue"]
+        )
+        annual_statements_by_ticker = await self.db_repo.get_data_items_for_tickers(
+            tickers, [("INCOME_STATEMENT", "FYEAR")],
+            start_date=a_lookback_start_date_obj, end_date=end_date_obj, order_by_key_date_desc=False,
+            field_keys=["Total Revenue"]
+        )
+        ticker_profiles_cache: Dict[str, Any] = {}
+        await base_helpers._prefetch_ticker_profiles(tickers, ticker_profiles_cache)
+
         for ticker in tickers:
             logger.info(f"[EV_SALES_TTM] Processing ticker: {ticker} from {user_start_date_iso} to {user_end_date_iso}")
             current_ticker_results: List[Dict[str, Any]] = []
@@ -312,22 +355,13 @@ class YahooDataQueryProService:
                     continue 
 
                 # 4. Fetch shares series (quarterly, fallback logic inside helper) for expanded window
-                shares_series = await base_helpers._get_quarterly_shares_series(
-                    ticker,
-                    q_lookback_start_iso, 
-                    user_end_date_iso
-                )
+                shares_series = shares_series_by_ticker.get(ticker, [])
                 shares_points = sorted([s for s in shares_series if s.get('date_obj') and s.get('value') is not None], key=lambda x: x['date_obj'])
 
                 # 5. Fetch balance sheet fields (quarterly) for expanded window
-                async def fetch_bs_field(field_name_camel_case: str):
+                def fetch_bs_field(field_name_camel_case: str):
                     field_id = f"yf_item_balance_sheet_quarterly_{field_name_camel_case}"
-                    data = await base_helpers.get_specific_field_timeseries(
-                        field_identifier=field_id,
-                        tickers=[ticker],
-                        start_date_str=q_lookback_start_iso,
-                        end_date_str=user_end_date_iso
-                    )
+                    data = bs_fields_by_name.get(field_name_camel_case, {})
                     arr = data.get(ticker, []) if data and ticker in data else []
                     field_map = {}
                     for d_item in arr:
@@ -340,23 +374,17 @@ class YahooDataQueryProService:
                             continue
                     return field_map
 
-                debt_map = await fetch_bs_field("TotalDebt")
-                minint_map = await fetch_bs_field("MinorityInterest")
+                debt_map = fetch_bs_field("TotalDebt")
+                minint_map = fetch_bs_field("MinorityInterest")
                 # Corrected field name for preferred stock based on previous discussion
-                pref_map = await fetch_bs_field("PreferredStock") 
-                cash_map = await fetch_bs_field("CashCashEquivalentsAndShortTermInvestments")
+                pref_map = fetch_bs_field("PreferredStock") 
+                cash_map = fetch_bs_field("CashCashEquivalentsAndShortTermInvestments")
 
                 # 6. Fetch Sales ("Total Revenue") (quarterly and annual) for TTM, using expanded window
-                quarterly_is_items_raw = await self.db_repo.get_data_items_by_criteria(
-                    ticker=ticker, item_type="INCOME_STATEMENT", item_time_coverage="QUARTER",
-                    start_date=q_lookback_start_date_obj, end_date=end_date_obj, order_by_key_date_desc=False
-                )
-                annual_is_items_raw = await self.db_repo.get_data_items_by_criteria(
-                    ticker=ticker, item_type="INCOME_STATEMENT", item_time_coverage="FYEAR",
-                    start_date=a_lookback_start_date_obj, end_date=end_date_obj, order_by_key_date_desc=False
-                )
+                quarterly_is_items_raw = quarterly_statements_by_ticker.get(ticker, {}).get(("INCOME_STATEMENT", "QUARTER"), [])
+                annual_is_items_raw = annual_statements_by_ticker.get(ticker, {}).get(("INCOME_STATEMENT", "FYEAR"), [])
 
-                conversion_info_sales = await base_helpers._get_conversion_info_for_ticker(ticker, {})
+                conversion_info_sales = await base_helpers._get_conversion_info_for_ticker(ticker, ticker_profiles_cache)
                 rate_sales, orig_curr_sales, target_curr_sales = (conversion_info_sales[2], conversion_info_sales[1], conversion_info_sales[0]) if conversion_info_sales else (None, None, None)
 
                 async def to_sales_points(items_raw):
@@ -522,6 +550,35 @@ class YahooDataQueryProService:
         a_lookback_start_date_obj = start_date_obj - timedelta(days=365*3) 
         a_lookback_start_iso = a_lookback_start_date_obj.strftime("%Y-%m-%d")
 
+        # Shares series for all tickers in one batched fetch
+        shares_series_by_ticker = await base_helpers._get_quarterly_shares_series_for_tickers(
+            tickers,
+            q_lookback_start_iso,
+            user_end_date_iso
+        )
+
+        # Balance sheet fields and statements for all tickers in batched fetches
+        bs_fields_by_name: Dict[str, Dict[str, List[Dict[str, Any]]]] = {}
+        for field_name_camel_case in ("TotalDebt", "MinorityInterest", "PreferredStock", "CashCashEquivalentsAndShortTermInvestments"):
+            bs_fields_by_name[field_name_camel_case] = await base_helpers.get_specific_field_timeseries(
+                field_identifier=f"yf_item_balance_sheet_quarterly_{field_name_camel_case}",
+                tickers=tickers,
+                start_date_str=q_lookback_start_iso,
+                end_date_str=user_end_date_iso
+            )
+        quarterly_statements_by_ticker = await self.db_repo.get_data_items_for_tickers(
+            tickers, [("INCOME_STATEMENT", "QUARTER")],
+            start_date=q_lookback_start_date_obj, end_date=end_date_obj, order_by_key_date_desc=False,
+            field_keys=["EBITDA"]
+        )
+        annual_statements_by_ticker = await self.db_repo.get_data_items_for_tickers(
+            tickers, [("INCOME_STATEMENT", "FYEAR")],
+            start_date=a_lookback_start_date_obj, end_date=end_date_obj, order_by_key_date_desc=False,
+            field_keys=["EBITDA"]
+        )
+        ticker_profiles_cache: Dict[str, Any] = {}
+        await base_helpers._prefetch_ticker_profiles(tickers, ticker_profiles_cache)
+
         for ticker in tickers:
             logger.info(f"[EV_EBITDA_TTM] Processing ticker: {ticker} from {user_start_date_iso} to {user_end_date_iso}")
             current_ticker_results: List[Dict[str, Any]] = []
@@ -541,22 +598,13 @@ class YahooDataQueryProService:
                     continue 
 
                 # 4. Fetch shares series (quarterly, fallback logic inside helper) for expanded window
-                shares_series = await base_helpers._get_quarterly_shares_series(
-                    ticker,
-                    q_lookback_start_iso, 
-                    user_end_date_iso
-                )
+                shares_series = shares_series_by_ticker.get(ticker, [])
                 shares_points = sorted([s for s in shares_series if s.get('date_obj') and s.get('value') is not None], key=lambda x: x['date_obj'])
 
                 # 5. Fetch balance sheet fields (quarterly) for expanded window
-                async def fetch_bs_field(field_name_camel_case: str):
+                def fetch_bs_field(field_name_camel_case: str):
                     field_id = f"yf_item_balance_sheet_quarterly_{field_name_camel_case}"
-                    data = await base_helpers.get_specific_field_timeseries(
-                        field_identifier=field_id,
-                        tickers=[ticker],
-                        start_date_str=q_lookback_start_iso,
-                        end_date_str=user_end_date_iso
-                    )
+                    data = bs_fields_by_name.get(field_name_camel_case, {})
                     arr = data.get(ticker, []) if data and ticker in data else []
                     field_map = {}
                     for d_item in arr:
@@ -569,22 +617,16 @@ class YahooDataQueryProService:
                             continue
                     return field_map
 
-                debt_map = await fetch_bs_field("TotalDebt")
-                minint_map = await fetch_bs_field("MinorityInterest")
-                pref_map = await fetch_bs_field("PreferredStock") 
-                cash_map = await fetch_bs_field("CashCashEquivalentsAndShortTermInvestments")
+                debt_map = fetch_bs_field("TotalDebt")
+                minint_map = fetch_bs_field("MinorityInterest")
+                pref_map = fetch_bs_field("PreferredStock") 
+                cash_map = fetch_bs_field("CashCashEquivalentsAndShortTermInvestments")
 
                 # 6. Fetch EBITDA (quarterly and annual) for TTM, using expanded window
-                quarterly_is_items_raw = await self.db_repo.get_data_items_by_criteria(
-                    ticker=ticker, item_type="INCOME_STATEMENT", item_time_coverage="QUARTER",
-                    start_date=q_lookback_start_date_obj, end_date=end_date_obj, order_by_key_date_desc=False
-                )
-                annual_is_items_raw = await self.db_repo.get_data_items_by_criteria(
-                    ticker=ticker, item_type="INCOME_STATEMENT", item_time_coverage="FYEAR",
-                    start_date=a_lookback_start_date_obj, end_date=end_date_obj, order_by_key_date_desc=False
-                )
+                quarterly_is_items_raw = quarterly_statements_by_ticker.get(ticker, {}).get(("INCOME_STATEMENT", "QUARTER"), [])
+                annual_is_items_raw = annual_statements_by_ticker.get(ticker, {}).get(("INCOME_STATEMENT", "FYEAR"), [])
 
-                conversion_info_ebitda = await base_helpers._get_conversion_info_for_ticker(ticker, {})
+                conversion_info_ebitda = await base_helpers._get_conversion_info_for_ticker(ticker, ticker_profiles_cache)
                 rate_ebitda, orig_curr_ebitda, target_curr_ebitda = (conversion_info_ebitda[2], conversion_info_ebitda[1], conversion_info_ebitda[0]) if conversion_info_ebitda else (None, None, None)
 
                 async def to_ebitda_points(items_raw):
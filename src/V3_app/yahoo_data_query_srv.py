@@ -1,13 +1,15 @@
 # src/V3_app/yahoo_data_query_srv.py
 from datetime import datetime, timedelta, date # Ensure date is imported
-from typing import Dict, Any, List, Optional, Union, Tuple, Callable
+from typing import Dict, Any, List, Optional, Union, Tuple, Callable, AsyncIterator
 import json
 import httpx
 import asyncio
+import threading
 from concurrent.futures import ThreadPoolExecutor
 import pandas as pd  # Add pandas import
 
-from .yahoo_repository import YahooDataRepository
+from .yahoo_repository import YahooDataRepository, DATA_VALUE_ITEM_TYPES
+from . import fastjson
 from .currency_utils import get_current_exchange_rate
 from .price_cache import price_cache  # Add this import at the top with other imports
 # NEW: Import YahooCalculationRatiosService and FrontendRatioProvider
@@ -68,63 +70,132 @@ OUTPUT_KEY_TO_DB_MAPPING = {
 # Removed old KNOWN_COVERAGES_IN_IDENTIFIER, COVERAGE_LOGICAL_TO_DB, LOGICAL_ITEM_TYPE_TO_DB
 # as they are superseded by the direct OUTPUT_KEY_TO_DB_MAPPING.
 
+# Dispatch table for synthetic fundamentals.
+# Format: 'FUNDAMENTAL_NAME': (owner, method_name) where owner is one of
+#   'base'   -> method on YahooDataQueryService itself (expects ticker_profiles_cache)
+#   'adv'    -> method on YahooDataQueryAdvService (expects ticker_profiles_cache)
+#   'ratios' -> method on FrontendRatioProvider (does NOT expect ticker_profiles_cache)
+# Built once at import time; bound handlers are resolved lazily per service instance.
+SYNTHETIC_FUNDAMENTAL_DISPATCH: Dict[str, Tuple[str, str]] = {
+    # Existing ratios from base service
+    "EPS_TTM": ("base", "_calculate_eps_ttm_for_tickers"),
+    "CASH_PER_SHARE": ("base", "_calculate_cash_per_share_for_tickers"),
+    "CASH_PLUS_ST_INV_PER_SHARE": ("base", "_calculate_cash_plus_st_inv_per_share_for_tickers"),
+    "BOOK_VALUE_PER_SHARE": ("base", "_calculate_book_value_per_share_for_tickers"),
+    "PRICE_TO_BOOK_VALUE": ("base", "_calculate_price_to_book_value_for_tickers"),
+    "PRICE_TO_CASH_PLUS_ST_INV": ("base", "_calculate_price_to_cash_plus_st_inv_for_tickers"),
+
+    # Ratios from advanced service
+    "DEBT_TO_EQUITY": ("adv", "calculate_debt_to_equity_for_tickers"),
+    "TOTAL_LIABILITIES_TO_EQUITY": ("adv", "calculate_total_liabilities_to_equity_for_tickers"),
+    "TOTAL_LIABILITIES_TO_ASSETS": ("adv", "calculate_total_liabilities_to_assets_for_tickers"),
+    "DEBT_TO_ASSETS": ("adv", "calculate_debt_to_assets_for_tickers"),
+    "ASSET_TURNOVER_TTM": ("adv", "calculate_asset_turnover_ttm"),
+    "INVENTORY_TURNOVER_TTM": ("adv", "calculate_inventory_turnover_ttm"),
+    "INTEREST_TO_INCOME_TTM": ("adv", "calculate_interest_to_income_ttm"),
+    "ROA_TTM": ("adv", "calculate_roa_ttm"),
+    "ROE_TTM": ("adv", "calculate_roe_ttm"),
+    "ROIC_TTM": ("adv", "calculate_roic_ttm"),
+
+    # Ratios from FrontendRatioProvider
+    "PE_TTM": ("ratios", "get_pe_ttm"),
+    "EARNINGS_YIELD_TTM": ("ratios", "get_earnings_yield_ttm"),
+    "OPERATING_CF_PER_SHARE_TTM": ("ratios", "get_operating_cf_per_share_ttm"),
+    "FCF_PER_SHARE_TTM": ("ratios", "get_fcf_per_share_ttm"),
+    "P_OPER_CF_TTM": ("ratios", "get_p_oper_cf_ttm"),
+    "P_FCF_TTM": ("ratios", "get_p_fcf_ttm"),
+}
+
 class YahooDataQueryService:
     def __init__(self, db_repo: YahooDataRepository):
-        """Initialize the service with a repository instance."""
+        """Initialize the service with a repository instance.
+
+        The service holds no request-scoped state, so a single instance is shared for the
+        lifetime of the app. Sub-services (advanced, calculation ratios, frontend ratio provider)
+        are created lazily on first use, guarded by a lock.
+        """
         self.db_repo = db_repo
-        # Initialize the advanced service with self as the base service
-        from .yahoo_data_query_adv import YahooDataQueryAdvService
-        self.adv_service = YahooDataQueryAdvService(db_repo=db_repo, base_query_srv=self)
-
-        # Initialize self.supported_fundamentals with base and advanced service methods
-        self.supported_fundamentals: Dict[str, Callable] = { 
-            # Existing ratios from base service (methods of YahooDataQueryService itself)
-            "EPS_TTM": self._calculate_eps_ttm_for_tickers,
-            "CASH_PER_SHARE": self._calculate_cash_per_share_for_tickers,
-            "CASH_PLUS_ST_INV_PER_SHARE": self._calculate_cash_plus_st_inv_per_share_for_tickers,
-            "BOOK_VALUE_PER_SHARE": self._calculate_book_value_per_share_for_tickers,
-            "PRICE_TO_BOOK_VALUE": self._calculate_price_to_book_value_for_tickers,
-            "PRICE_TO_CASH_PLUS_ST_INV": self._calculate_price_to_cash_plus_st_inv_for_tickers,
-            
-            # Ratios from advanced service
-            "DEBT_TO_EQUITY": self.adv_service.calculate_debt_to_equity_for_tickers,
-            "TOTAL_LIABILITIES_TO_EQUITY": self.adv_service.calculate_total_liabilities_to_equity_for_tickers,
-            "TOTAL_LIABILITIES_TO_ASSETS": self.adv_service.calculate_total_liabilities_to_assets_for_tickers,
-            "DEBT_TO_ASSETS": self.adv_service.calculate_debt_to_assets_for_tickers,
-            "ASSET_TURNOVER_TTM": self.adv_service.calculate_asset_turnover_ttm,
-            "INVENTORY_TURNOVER_TTM": self.adv_service.calculate_inventory_turnover_ttm,
-            "INTEREST_TO_INCOME_TTM": self.adv_service.calculate_interest_to_income_ttm,
-            "ROA_TTM": self.adv_service.calculate_roa_ttm,
-            "ROE_TTM": self.adv_service.calculate_roe_ttm,
-            "ROIC_TTM": self.adv_service.calculate_roic_ttm,
-        }
-        logger.info(f"Initialized base supported_fundamentals with {len(self.supported_fundamentals)} items.")
+        self._adv_service = None
+        self._calculation_ratios_service = None
+        self._ratios_provider = None
+        self._ratios_provider_failed = False
+        self._supported_fundamentals: Optional[Dict[str, Callable]] = None
+        self._init_lock = threading.Lock()
+        logger.info("YahooDataQueryService initialized")
 
-        # NEW: Initialize YahooCalculationRatiosService and FrontendRatioProvider
-        try:
-            self.calculation_ratios_service = YahooCalculationRatiosService(db_repo=self.db_repo)
-            self.ratios_provider = FrontendRatioProvider(data_query_service=self.calculation_ratios_service)
-            logger.info("FrontendRatioProvider initialized successfully.")
-
-            # Update self.supported_fundamentals with methods from ratios_provider
-            if self.ratios_provider: # Check if ratios_provider was successfully initialized
-                new_ratios = {
-                    "PE_TTM": self.ratios_provider.get_pe_ttm,
-                    "EARNINGS_YIELD_TTM": self.ratios_provider.get_earnings_yield_ttm,
-                    "OPERATING_CF_PER_SHARE_TTM": self.ratios_provider.get_operating_cf_per_share_ttm,
-                    "FCF_PER_SHARE_TTM": self.ratios_provider.get_fcf_per_share_ttm,
-                    "P_OPER_CF_TTM": self.ratios_provider.get_p_oper_cf_ttm,
-                    "P_FCF_TTM": self.ratios_provider.get_p_fcf_ttm,
-                }
-                self.supported_fundamentals.update(new_ratios)
-                logger.info(f"Updated supported_fundamentals with {len(new_ratios)} new ratios from FrontendRatioProvider.")
-            
-        except Exception as e:
-            logger.error(f"Failed to initialize FrontendRatioProvider or update supported_fundamentals: {e}", exc_info=True)
-            self.ratios_provider = None # Ensure it's defined, even if None
-            # self.calculation_ratios_service might also be None or partially initialized
+    @property
+    def adv_service(self):
+        """Advanced query service (YahooDataQueryAdvService), created on first access."""
+        if self._adv_service is None:
+            with self._init_lock:
+                if self._adv_service is None:
+                    from .yahoo_data_query_adv import YahooDataQueryAdvService
+                    self._adv_service = YahooDataQueryAdvService(db_repo=self.db_repo, base_query_srv=self)
+        return self._adv_service
+
+    @property
+    def calculation_ratios_service(self) -> Optional[YahooCalculationRatiosService]:
+        """YahooCalculationRatiosService, created on first access together with the ratios provider."""
+        self._ensure_ratios_provider()
+        return self._calculation_ratios_service
+
+    @property
+    def ratios_provider(self) -> Optional[FrontendRatioProvider]:
+        """FrontendRatioProvider, created on first access. None if initialization failed."""
+        self._ensure_ratios_provider()
+        return self._ratios_provider
+
+    def _ensure_ratios_provider(self) -> None:
+        if self._ratios_provider is not None or self._ratios_provider_failed:
+            return
+        with self._init_lock:
+            if self._ratios_provider is not None or self._ratios_provider_failed:
+                return
+            try:
+                self._calculation_ratios_service = YahooCalculationRatiosService(db_repo=self.db_repo)
+                self._ratios_provider = FrontendRatioProvider(data_query_service=self._calculation_ratios_service)
+                logger.info("FrontendRatioProvider initialized successfully.")
+            except Exception as e:
+                logger.error(f"Failed to initialize FrontendRatioProvider: {e}", exc_info=True)
+                self._ratios_provider_failed = True
+
+    def _resolve_fundamental_owner(self, owner: str) -> Any:
+        if owner == "base":
+            return self
+        if owner == "adv":
+            return self.adv_service
+        if owner == "ratios":
+            return self.ratios_provider
+        return None
 
-        logger.info("YahooDataQueryService initialized")
+    @property
+    def supported_fundamentals(self) -> Dict[str, Callable]:
+        """Bound handlers for every synthetic fundamental, resolved from SYNTHETIC_FUNDAMENTAL_DISPATCH."""
+        if self._supported_fundamentals is None:
+            handlers: Dict[str, Callable] = {}
+            for name, (owner, method_name) in SYNTHETIC_FUNDAMENTAL_DISPATCH.items():
+                owner_instance = self._resolve_fundamental_owner(owner)
+                if owner_instance is not None:
+                    handlers[name] = getattr(owner_instance, method_name)
+            self._supported_fundamentals = handlers
+            logger.info(f"Resolved supported_fundamentals with {len(handlers)} items.")
+        return self._supported_fundamentals
+
+    async def _prefetch_ticker_profiles(
+        self,
+        tickers: List[str],
+        ticker_profiles_cache: Dict[str, Dict[str, Any]]
+    ) -> None:
+        """
+        Seeds ticker_profiles_cache with the master records of all tickers not yet cached,
+        using chunked IN queries, so _get_conversion_info_for_ticker does not hit the DB per ticker.
+        """
+        missing_tickers = [ticker for ticker in tickers if ticker not in ticker_profiles_cache]
+        if not missing_tickers:
+            return
+        profiles = await self.db_repo.get_ticker_masters_for_tickers(missing_tickers)
+        ticker_profiles_cache.update(profiles)
+        logger.debug(f"[QuerySrv._prefetch_ticker_profiles] Cached {len(profiles)} of {len(missing_tickers)} missing profiles.")
 
     async def _get_conversion_info_for_ticker(
         self, 
@@ -344,7 +415,7 @@ class YahooDataQueryService:
             # Original JSON parsing logic (might be redundant if repo ensures dict, but safe)
             if isinstance(payload, str): 
                 try:
-                    return json.loads(payload)
+                    return fastjson.loads(payload)
                 except json.JSONDecodeError:
                     logger.error(f"Failed to decode JSON payload for {ticker}, {db_item_type}, {item_time_coverage} AFTER potential conversion attempt")
                     return None
@@ -355,6 +426,52 @@ class YahooDataQueryService:
                 return None
         return None
 
+    async def iter_latest_data_item_payloads(
+        self,
+        tickers: List[str],
+        target_item_types: List[Tuple[str, str, str]],
+        ticker_profiles_cache: Optional[Dict[str, Dict[str, Any]]] = None
+    ) -> AsyncIterator[Tuple[str, str, Dict[str, Any]]]:
+        """
+        Bulk counterpart of get_latest_data_item_payload for many tickers and item types.
+        Streams (ticker, output_key, payload) tuples from the repository's windowed query,
+        applying the same currency conversion as the single-item path.
+
+        target_item_types holds (item_type, item_time_coverage, output_key) tuples, with item_type
+        in the lowercase form used by TARGET_ITEM_TYPES. Tickers are returned as passed in.
+        ticker_profiles_cache may be pre-seeded with master rows (e.g. get_master_data_for_analytics)
+        so no per-ticker ticker_master lookups are needed to resolve currencies.
+        """
+        if ticker_profiles_cache is None:
+            ticker_profiles_cache = {}
+        output_keys = {
+            (item_type.upper(), item_coverage.upper()): output_key
+            for item_type, item_coverage, output_key in target_item_types
+        }
+        requested_tickers = {ticker.upper(): ticker for ticker in tickers}
+        conversion_by_ticker: Dict[str, Optional[Tuple[str, str, float]]] = {}
+
+        async for row in self.db_repo.iter_latest_data_item_payloads(
+            item_specs=list(output_keys.keys()),
+            tickers=tickers
+        ):
+            db_item_type = row['item_type'].upper()
+            output_key = output_keys.get((db_item_type, row['item_time_coverage'].upper()))
+            ticker = requested_tickers.get(row['ticker'].upper(), row['ticker'])
+            payload = row['item_data_payload']
+            if output_key is None or not isinstance(payload, dict):
+                continue
+
+            if ticker not in conversion_by_ticker:
+                conversion_by_ticker[ticker] = await self._get_conversion_info_for_ticker(ticker, ticker_profiles_cache)
+            conversion_info = conversion_by_ticker[ticker]
+            if conversion_info:
+                trade_curr, fin_curr, rate = conversion_info
+                payload = await self._apply_currency_conversion_to_payload(
+                    payload, rate, fin_curr, trade_curr, db_item_type
+                )
+            yield ticker, output_key, payload
+
     async def get_latest_analyst_price_targets(self, ticker: str) -> Optional[Dict[str, Any]]:
         return await self.get_latest_data_item_payload(ticker, "ANALYST_PRICE_TARGETS", "CUMULATIVE_SNAPSHOT")
 
@@ -486,24 +603,47 @@ class YahooDataQueryService:
         # If end_date_str was provided but failed to parse, end_date_obj is None, is_future_looking remains False (conservative)
         logger.debug(f"Projection check: is_future_looking = {is_future_looking} (today: {today_date}, end_date_obj: {end_date_obj.date() if end_date_obj else 'N/A'})")
         
+        # Fetch the items for all tickers up front in a few chunked queries instead of one query per ticker
+        await self._prefetch_ticker_profiles(tickers_list, ticker_profiles_cache)
+        spec_key = (db_item_type.upper(), db_item_coverage.upper())
+        if spec_key[0] in DATA_VALUE_ITEM_TYPES and await self.db_repo.is_ticker_data_values_ready():
+            # Statement fields are read from the normalized ticker_data_values table (index range scan,
+            # no payload decoding).
+            logger.debug(f"Calling db_repo.get_field_values_for_tickers for {len(tickers_list)} tickers with item_type: {db_item_type}, item_time_coverage: {db_item_coverage}, field: {actual_payload_lookup_key}, start_date: {start_date_obj}, end_date: {end_date_obj}")
+            field_values_by_ticker = await self.db_repo.get_field_values_for_tickers(
+                tickers_list,
+                db_item_type,
+                db_item_coverage,
+                actual_payload_lookup_key,
+                start_date=start_date_obj,
+                end_date=end_date_obj
+            )
+        else:
+            # Only the requested key leaves the database (json_extract), streamed as (ticker, date, value)
+            logger.debug(f"Calling db_repo.iter_field_values_for_tickers for {len(tickers_list)} tickers with item_type: {db_item_type}, item_time_coverage: {db_item_coverage}, field: {actual_payload_lookup_key}, start_date: {start_date_obj}, end_date: {end_date_obj}")
+            field_values_by_ticker = {ticker: [] for ticker in tickers_list}
+            async for value_ticker, item_key_date, value in self.db_repo.iter_field_values_for_tickers(
+                tickers_list,
+                db_item_type,
+                db_item_coverage,
+                actual_payload_lookup_key,
+                start_date=start_date_obj,
+                end_date=end_date_obj
+            ):
+                field_values_by_ticker.setdefault(value_ticker, []).append({'item_key_date': item_key_date, 'value': value})
+        # Each point is wrapped as a single-field item for the loop below
+        data_items_by_ticker = {
+            ticker: {spec_key: [
+                {'item_key_date': point['item_key_date'], 'item_data_payload': {actual_payload_lookup_key: point['value']}}
+                for point in points
+            ]}
+            for ticker, points in field_values_by_ticker.items()
+        }
+
         for ticker_symbol in tickers_list:
             current_ticker_series: List[Dict[str, Any]] = []
             try:
-                logger.debug(f"Calling db_repo.get_data_items_by_criteria for {ticker_symbol} with:")
-                logger.debug(f"  item_type: {db_item_type}")
-                logger.debug(f"  item_time_coverage: {db_item_coverage}")
-                logger.debug(f"  start_date: {start_date_obj}")
-                logger.debug(f"  end_date: {end_date_obj}")
-                logger.debug(f"  order_by_key_date_desc: False")
-
-                data_items = await self.db_repo.get_data_items_by_criteria(
-                    ticker=ticker_symbol,
-                    item_type=db_item_type, # Use parsed DB item type
-                    item_time_coverage=db_item_coverage, # Use parsed DB coverage
-                    start_date=start_date_obj,
-                    end_date=end_date_obj,
-                    order_by_key_date_desc=False # Fetch in ascending order for timeseries
-                )
+                data_items = data_items_by_ticker.get(ticker_symbol, {}).get(spec_key, [])
                 logger.debug(f"Found {len(data_items)} data items from DB for {ticker_symbol}, type {db_item_type}, coverage {db_item_coverage}.")
                 # Log raw items for debugging ONE ticker and ONE field_id
                 if tickers_list.index(ticker_symbol) == 0 : # Log only for the first ticker in list
@@ -564,7 +704,7 @@ class YahooDataQueryService:
                         if isinstance(payload_data, str):
                             logger.warning(f"Payload for {ticker_symbol}, item_id={item.get('id')} on {item_key_date_iso_str} is a string. Attempting to parse as JSON.")
                             try:
-                                payload_data = json.loads(payload_data)
+                                payload_data = fastjson.loads(payload_data)
                             except json.JSONDecodeError:
                                 logger.error(f"Failed to parse JSON string payload for item_id={item.get('id')}. Payload: {str(payload_data)[:200]}. Skipping.")
                                 continue
@@ -675,47 +815,39 @@ class YahooDataQueryService:
         
         upper_fundamental_name = fundamental_name.upper()
 
-        if upper_fundamental_name in self.supported_fundamentals:
-            handler_method = self.supported_fundamentals[upper_fundamental_name]
-            
-            # Check if the handler is a method of FrontendRatioProvider
-            if hasattr(handler_method, '__self__') and handler_method.__self__ is self.ratios_provider:
-                logger.debug(f"Routing '{upper_fundamental_name}' to FrontendRatioProvider.")
-                # FrontendRatioProvider methods do NOT expect ticker_profiles_cache
-                return await handler_method(
-                    tickers=tickers, 
-                    start_date_str=start_date_str, 
-                    end_date_str=end_date_str
-                )
-            # Check if the handler is a method of YahooDataQueryService (self) or YahooDataQueryAdvService (self.adv_service)
-            elif hasattr(handler_method, '__self__') and (handler_method.__self__ is self or handler_method.__self__ is self.adv_service):
-                owner_name = "YahooDataQueryService" if handler_method.__self__ is self else "YahooDataQueryAdvService"
-                logger.debug(f"Routing '{upper_fundamental_name}' to {owner_name}.")
-                # These methods DO expect ticker_profiles_cache
-                # Initialize ticker_profiles_cache if it's None, as these handlers expect it.
-                current_cache = ticker_profiles_cache if ticker_profiles_cache is not None else {}
-                return await handler_method(
-                    tickers=tickers, 
-                    start_date_str=start_date_str, 
-                    end_date_str=end_date_str,
-                    ticker_profiles_cache=current_cache # Pass the initialized or provided cache
-                )
-            else:
-                # This might happen if a function (not a bound method) was somehow added to supported_fundamentals,
-                # or if __self__ is not present, or if ratios_provider is None and the handler was from it.
-                if self.ratios_provider is None and upper_fundamental_name in [
-                    "PE_TTM", "EARNINGS_YIELD_TTM", "OPERATING_CF_PER_SHARE_TTM", 
-                    "FCF_PER_SHARE_TTM", "P_OPER_CF_TTM", "P_FCF_TTM"
-                ]:
-                    logger.error(f"Handler for '{upper_fundamental_name}' was expected to be from FrontendRatioProvider, but ratios_provider is None.")
-                else:
-                    logger.error(f"Handler for '{upper_fundamental_name}' found but its owner or type is unexpected. Handler: {handler_method}. Cannot dispatch.")
-                return {ticker: [] for ticker in tickers}
-        else:
+        dispatch_entry = SYNTHETIC_FUNDAMENTAL_DISPATCH.get(upper_fundamental_name)
+        if dispatch_entry is None:
             # If the fundamental_name is not recognized by any handler
             logger.warning(f"Unsupported fundamental_name '{fundamental_name}' (normalized to '{upper_fundamental_name}') in YahooDataQueryService.calculate_synthetic_fundamental_timeseries. Not found in supported_fundamentals.")
             return {ticker: [] for ticker in tickers}
 
+        owner, method_name = dispatch_entry
+        owner_instance = self._resolve_fundamental_owner(owner)
+        if owner_instance is None:
+            logger.error(f"Handler for '{upper_fundamental_name}' was expected to be from '{owner}', but that service is unavailable. Cannot dispatch.")
+            return {ticker: [] for ticker in tickers}
+        handler_method = getattr(owner_instance, method_name)
+
+        if owner == "ratios":
+            logger.debug(f"Routing '{upper_fundamental_name}' to FrontendRatioProvider.")
+            # FrontendRatioProvider methods do NOT expect ticker_profiles_cache
+            return await handler_method(
+                tickers=tickers, 
+                start_date_str=start_date_str, 
+                end_date_str=end_date_str
+            )
+
+        owner_name = "YahooDataQueryService" if owner == "base" else "YahooDataQueryAdvService"
+        logger.debug(f"Routing '{upper_fundamental_name}' to {owner_name}.")
+        # These methods DO expect ticker_profiles_cache (request-scoped, never stored on the service)
+        current_cache = ticker_profiles_cache if ticker_profiles_cache is not None else {}
+        return await handler_method(
+            tickers=tickers, 
+            start_date_str=start_date_str, 
+            end_date_str=end_date_str,
+            ticker_profiles_cache=current_cache
+        )
+
     async def _calculate_eps_ttm_for_tickers(
         self, 
         tickers: List[str], 
@@ -746,22 +878,42 @@ class YahooDataQueryService:
         target_net_income_key = "Diluted NI Availto Com Stockholders"
         target_shares_key = "Diluted Average Shares"
 
+        # The lookback windows do not depend on the ticker, so statements, shares and profiles
+        # for all tickers are loaded up front in a few batched queries.
+        quarterly_lookback_start_obj = user_start_date_obj - timedelta(days=(365 * 1 + 30 * 9)) # Approx 1 year 9 months before user start
+        annual_lookback_start_obj = user_start_date_obj - timedelta(days=(365 * 2 + 30 * 3))
+        await self._prefetch_ticker_profiles(tickers, ticker_profiles_cache)
+
+        logger.debug(f"EPS_TTM: Querying QUARTERLY income statements from {quarterly_lookback_start_obj.strftime('%Y-%m-%d')} to {user_end_date_obj.strftime('%Y-%m-%d')}")
+        quarterly_statements_by_ticker = await self.db_repo.get_data_items_for_tickers(
+            tickers=tickers,
+            item_specs=[("INCOME_STATEMENT", "QUARTER")],
+            start_date=quarterly_lookback_start_obj,
+            end_date=user_end_date_obj,
+            order_by_key_date_desc=False, # Fetch ascending for easier processing
+            field_keys=[target_net_income_key, "Net Income", "NetIncome"]
+        )
+        logger.debug(f"EPS_TTM: Querying ANNUAL income statements from {annual_lookback_start_obj.strftime('%Y-%m-%d')} to {user_end_date_obj.strftime('%Y-%m-%d')}")
+        annual_statements_by_ticker = await self.db_repo.get_data_items_for_tickers(
+            tickers=tickers,
+            item_specs=[("INCOME_STATEMENT", "FYEAR")],
+            start_date=annual_lookback_start_obj,
+            end_date=user_end_date_obj,
+            order_by_key_date_desc=False, # Fetch ascending
+            field_keys=[target_net_income_key, "Net Income", "NetIncome", target_shares_key]
+        )
+        quarterly_shares_by_ticker = await self._get_quarterly_shares_series_for_tickers(
+            tickers,
+            quarterly_lookback_start_obj.strftime('%Y-%m-%d'),
+            user_end_date_obj.strftime('%Y-%m-%d')
+        )
+
         for ticker_symbol in tickers:
             try:
                 logger.info(f"EPS_TTM: Processing ticker: {ticker_symbol}")
 
-                # 1. Data Fetching and Preparation (Quarterly)
-                quarterly_lookback_start_obj = user_start_date_obj - timedelta(days=(365 * 1 + 30 * 9)) # Approx 1 year 9 months before user start
-                logger.debug(f"EPS_TTM: Querying QUARTERLY income statements for {ticker_symbol} from {quarterly_lookback_start_obj.strftime('%Y-%m-%d')} to {user_end_date_obj.strftime('%Y-%m-%d')}")
-                
-                quarterly_income_statements = await self.db_repo.get_data_items_by_criteria(
-                    ticker=ticker_symbol,
-                    item_type="INCOME_STATEMENT",
-                    item_time_coverage="QUARTER",
-                    start_date=quarterly_lookback_start_obj,
-                    end_date=user_end_date_obj,
-                    order_by_key_date_desc=False # Fetch ascending for easier processing
-                )
+                # 1. Data Preparation (Quarterly)
+                quarterly_income_statements = quarterly_statements_by_ticker.get(ticker_symbol, {}).get(("INCOME_STATEMENT", "QUARTER"), [])
                 quarterly_eps_points: List[Dict[str, Any]] = []
                 
                 # Fetch shares data using the helper for quarterly calculations
@@ -771,12 +923,11 @@ class YahooDataQueryService:
                     max_q_date = max(self._parse_date_flex(qis.get('item_key_date')) for qis in quarterly_income_statements if self._parse_date_flex(qis.get('item_key_date'))) if quarterly_income_statements else user_end_date_obj
                     
                     if min_q_date and max_q_date:
-                        logger.debug(f"EPS_TTM [{ticker_symbol}]: Fetching quarterly shares series via helper from {min_q_date.strftime('%Y-%m-%d')} to {max_q_date.strftime('%Y-%m-%d')}")
-                        quarterly_shares_data_from_helper = await self._get_quarterly_shares_series(
-                            ticker_symbol,
-                            min_q_date.strftime('%Y-%m-%d'),
-                            max_q_date.strftime('%Y-%m-%d')
-                        )
+                        logger.debug(f"EPS_TTM [{ticker_symbol}]: Selecting quarterly shares series from {min_q_date.strftime('%Y-%m-%d')} to {max_q_date.strftime('%Y-%m-%d')}")
+                        quarterly_shares_data_from_helper = [
+                            shares_point for shares_point in quarterly_shares_by_ticker.get(ticker_symbol, [])
+                            if min_q_date.date() <= shares_point['date_obj'].date() <= max_q_date.date()
+                        ]
                         logger.debug(f"EPS_TTM [{ticker_symbol}]: Helper returned {len(quarterly_shares_data_from_helper)} shares points.")
 
                 if quarterly_income_statements:
@@ -829,17 +980,8 @@ class YahooDataQueryService:
                 else:
                     logger.info(f"EPS_TTM: No QUARTERLY income statements found for {ticker_symbol} in lookback period.")
 
-                # 2. Data Fetching and Preparation (Annual)
-                annual_lookback_start_obj = user_start_date_obj - timedelta(days=(365 * 2 + 30 * 3))
-                logger.debug(f"EPS_TTM: Querying ANNUAL income statements for {ticker_symbol} from {annual_lookback_start_obj.strftime('%Y-%m-%d')} to {user_end_date_obj.strftime('%Y-%m-%d')}")
-                annual_income_statements = await self.db_repo.get_data_items_by_criteria(
-                    ticker=ticker_symbol,
-                    item_type="INCOME_STATEMENT",
-                    item_time_coverage="FYEAR",
-                    start_date=annual_lookback_start_obj,
-                    end_date=user_end_date_obj,
-                    order_by_key_date_desc=False # Fetch ascending
-                )
+                # 2. Data Preparation (Annual)
+                annual_income_statements = annual_statements_by_ticker.get(ticker_symbol, {}).get(("INCOME_STATEMENT", "FYEAR"), [])
                 annual_eps_points: List[Dict[str, Any]] = []
                 if annual_income_statements:
                     logger.info(f"EPS_TTM: Found {len(annual_income_statements)} ANNUAL statements for {ticker_symbol}.")
@@ -929,56 +1071,66 @@ class YahooDataQueryService:
         Fetches, processes, and combines quarterly shares data from primary and fallback sources.
         Returns a chronologically sorted list of shares data points.
         """
-        logger.debug(f"SHARES_HELPER [{ticker_symbol}]: Fetching shares between {fundamental_query_start_date_str} and {fundamental_query_end_date_str}")
+        shares_by_ticker = await self._get_quarterly_shares_series_for_tickers(
+            [ticker_symbol], fundamental_query_start_date_str, fundamental_query_end_date_str
+        )
+        return shares_by_ticker.get(ticker_symbol, [])
+
+    async def _get_quarterly_shares_series_for_tickers(
+        self, 
+        tickers: List[str], 
+        fundamental_query_start_date_str: str, 
+        fundamental_query_end_date_str: str
+    ) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        Multi-ticker version of _get_quarterly_shares_series: fetches the primary and fallback
+        shares fields once for all tickers and returns {ticker: sorted shares points}.
+        """
+        logger.debug(f"SHARES_HELPER: Fetching shares for {len(tickers)} tickers between {fundamental_query_start_date_str} and {fundamental_query_end_date_str}")
         
         primary_shares_field_id = "yf_item_income_statement_quarterly_DilutedAverageShares"
         fallback_shares_field_id = "yf_item_balance_sheet_quarterly_ShareIssued"
-        
-        quarterly_shares_points: List[Dict[str, Any]] = []
 
-        # 1. Fetch and Process Primary Shares Data
-        logger.debug(f"SHARES_HELPER [{ticker_symbol}]: Fetching primary shares data ({primary_shares_field_id})")
         shares_data_primary_raw = await self.get_specific_field_timeseries(
             field_identifier=primary_shares_field_id,
-            tickers=[ticker_symbol],
+            tickers=tickers,
             start_date_str=fundamental_query_start_date_str,
             end_date_str=fundamental_query_end_date_str
         )
-        logger.debug(f"SHARES_HELPER [{ticker_symbol}]: Raw primary shares data: {shares_data_primary_raw.get(ticker_symbol)}")
-        
-        if shares_data_primary_raw.get(ticker_symbol):
-            for item in shares_data_primary_raw[ticker_symbol]:
-                date_obj = self._parse_date_flex(item.get('date'))
-                value = item.get('value')
-                if date_obj and value is not None:
-                    try:
-                        float_value = float(value)
-                        if float_value != 0:
-                            quarterly_shares_points.append({'date_obj': date_obj, 'value': float_value, 'source': 'primary'})
-                    except (ValueError, TypeError):
-                        logger.warning(f"SHARES_HELPER [{ticker_symbol}]: Could not parse primary shares value '{value}' for date '{item.get('date')}'")
-            logger.info(f"SHARES_HELPER [{ticker_symbol}]: Parsed {len(quarterly_shares_points)} primary quarterly shares points.")
-            logger.debug(f"SHARES_HELPER [{ticker_symbol}]: Parsed primary shares points: {quarterly_shares_points[:5]}...")
-
-        # 2. Fetch and Process Fallback Shares Data
-        logger.debug(f"SHARES_HELPER [{ticker_symbol}]: Fetching fallback shares data ({fallback_shares_field_id})")
         shares_data_fallback_raw = await self.get_specific_field_timeseries(
             field_identifier=fallback_shares_field_id,
-            tickers=[ticker_symbol],
+            tickers=tickers,
             start_date_str=fundamental_query_start_date_str,
             end_date_str=fundamental_query_end_date_str
         )
-        logger.debug(f"SHARES_HELPER [{ticker_symbol}]: Raw fallback shares data: {shares_data_fallback_raw.get(ticker_symbol)}")
-        
-        fallback_shares_added_count = 0
-        if shares_data_fallback_raw.get(ticker_symbol):
-            for item in shares_data_fallback_raw[ticker_symbol]:
-                date_obj = self._parse_date_flex(item.get('date'))
-                value = item.get('value')
-                if date_obj and value is not None:
-                    # Check if a point with the same date already exists from the primary source
-                    is_duplicate_date = any(sp['date_obj'] == date_obj for sp in quarterly_shares_points)
-                    if not is_duplicate_date:
+
+        shares_by_ticker: Dict[str, List[Dict[str, Any]]] = {}
+        for ticker_symbol in tickers:
+            quarterly_shares_points: List[Dict[str, Any]] = []
+
+            # 1. Process Primary Shares Data
+            if shares_data_primary_raw.get(ticker_symbol):
+                for item in shares_data_primary_raw[ticker_symbol]:
+                    date_obj = self._parse_date_flex(item.get('date'))
+                    value = item.get('value')
+                    if date_obj and value is not None:
+                        try:
+                            float_value = float(value)
+                            if float_value != 0:
+                                quarterly_shares_points.append({'date_obj': date_obj, 'value': float_value, 'source': 'primary'})
+                        except (ValueError, TypeError):
+                            logger.warning(f"SHARES_HELPER [{ticker_symbol}]: Could not parse primary shares value '{value}' for date '{item.get('date')}'")
+                logger.info(f"SHARES_HELPER [{ticker_symbol}]: Parsed {len(quarterly_shares_points)} primary quarterly shares points.")
+
+            # 2. Process Fallback Shares Data
+            fallback_shares_added_count = 0
+            if shares_data_fallback_raw.get(ticker_symbol):
+                primary_dates = {sp['date_obj'] for sp in quarterly_shares_points}
+                for item in shares_data_fallback_raw[ticker_symbol]:
+                    date_obj = self._parse_date_flex(item.get('date'))
+                    value = item.get('value')
+                    # Skip dates already covered by the primary source
+                    if date_obj and value is not None and date_obj not in primary_dates:
                         try:
                             float_value = float(value)
                             if float_value != 0:
@@ -986,13 +1138,14 @@ class YahooDataQueryService:
                                 fallback_shares_added_count +=1
                         except (ValueError, TypeError):
                             logger.warning(f"SHARES_HELPER [{ticker_symbol}]: Could not parse fallback shares value '{value}' for date '{item.get('date')}'")
-            logger.info(f"SHARES_HELPER [{ticker_symbol}]: Added {fallback_shares_added_count} fallback quarterly shares points.")
-        
-        # 3. Sort Data
-        quarterly_shares_points.sort(key=lambda x: x['date_obj'])
-        logger.debug(f"SHARES_HELPER [{ticker_symbol}]: Combined and sorted shares points ({len(quarterly_shares_points)} total): {quarterly_shares_points[:5]}...")
+                logger.info(f"SHARES_HELPER [{ticker_symbol}]: Added {fallback_shares_added_count} fallback quarterly shares points.")
+            
+            # 3. Sort Data
+            quarterly_shares_points.sort(key=lambda x: x['date_obj'])
+            logger.debug(f"SHARES_HELPER [{ticker_symbol}]: Combined and sorted shares points ({len(quarterly_shares_points)} total): {quarterly_shares_points[:5]}...")
+            shares_by_ticker[ticker_symbol] = quarterly_shares_points
         
-        return quarterly_shares_points
+        return shares_by_ticker
 
     async def _calculate_cash_per_share_for_tickers(
         self,
@@ -1016,15 +1169,23 @@ class YahooDataQueryService:
         cash_field_id = "yf_item_balance_sheet_quarterly_CashAndCashEquivalents"
         # REMOVED: primary_shares_field_id and fallback_shares_field_id definitions here
 
+        # Fetch the field series for all tickers up front (batched) rather than once per ticker
+        cash_data_raw = await self.get_specific_field_timeseries(
+            field_identifier=cash_field_id,
+            tickers=tickers,
+            start_date_str=fundamental_query_start_date_str,
+            end_date_str=fundamental_query_end_date_str
+        )
+
+        # Shares series for all tickers in one batched fetch
+        quarterly_shares_points_by_ticker = await self._get_quarterly_shares_series_for_tickers(
+            tickers,
+            fundamental_query_start_date_str,
+            fundamental_query_end_date_str
+        )
+
         for ticker_symbol in tickers:
             try:
-                logger.debug(f"CASH_PER_SHARE [{ticker_symbol}]: Fetching cash data ({cash_field_id}) between {fundamental_query_start_date_str} and {fundamental_query_end_date_str}")
-                cash_data_raw = await self.get_specific_field_timeseries(
-                    field_identifier=cash_field_id,
-                    tickers=[ticker_symbol],
-                    start_date_str=fundamental_query_start_date_str,
-                    end_date_str=fundamental_query_end_date_str
-                )
                 logger.debug(f"CASH_PER_SHARE [{ticker_symbol}]: Raw cash data: {cash_data_raw.get(ticker_symbol)}")
                 
                 quarterly_cash_points: List[Dict[str, Any]] = []
@@ -1045,11 +1206,7 @@ class YahooDataQueryService:
 
                 # NEW: Call the helper function to get shares data
                 logger.debug(f"CASH_PER_SHARE [{ticker_symbol}]: Calling _get_quarterly_shares_series helper.")
-                quarterly_shares_points = await self._get_quarterly_shares_series(
-                    ticker_symbol,
-                    fundamental_query_start_date_str,
-                    fundamental_query_end_date_str
-                )
+                quarterly_shares_points = quarterly_shares_points_by_ticker.get(ticker_symbol, [])
                 # REMOVED: Old shares fetching and processing logic that was here
                 
                 if not quarterly_cash_points:
@@ -1157,15 +1314,23 @@ class YahooDataQueryService:
         cash_field_id = "yf_item_balance_sheet_quarterly_CashCashEquivalentsAndShortTermInvestments"
         # REMOVED: primary_shares_field_id and fallback_shares_field_id definitions here
 
+        # Fetch the field series for all tickers up front (batched) rather than once per ticker
+        cash_data_raw = await self.get_specific_field_timeseries(
+            field_identifier=cash_field_id,
+            tickers=tickers,
+            start_date_str=fundamental_query_start_date_str,
+            end_date_str=fundamental_query_end_date_str
+        )
+
+        # Shares series for all tickers in one batched fetch
+        quarterly_shares_points_by_ticker = await self._get_quarterly_shares_series_for_tickers(
+            tickers,
+            fundamental_query_start_date_str,
+            fundamental_query_end_date_str
+        )
+
         for ticker_symbol in tickers:
             try:
-                logger.debug(f"CASH_PLUS_ST_INV_PER_SHARE [{ticker_symbol}]: Fetching cash+ST data ({cash_field_id}) between {fundamental_query_start_date_str} and {fundamental_query_end_date_str}")
-                cash_data_raw = await self.get_specific_field_timeseries(
-                    field_identifier=cash_field_id,
-                    tickers=[ticker_symbol],
-                    start_date_str=fundamental_query_start_date_str,
-                    end_date_str=fundamental_query_end_date_str
-                )
                 logger.debug(f"CASH_PLUS_ST_INV_PER_SHARE [{ticker_symbol}]: Raw cash+ST data: {cash_data_raw.get(ticker_symbol)}")
                 
                 quarterly_cash_points: List[Dict[str, Any]] = []
@@ -1186,11 +1351,7 @@ class YahooDataQueryService:
                 # Shares fetching logic (identical to Cash/Share)
                 # NEW: Call the helper function to get shares data
                 logger.debug(f"CASH_PLUS_ST_INV_PER_SHARE [{ticker_symbol}]: Calling _get_quarterly_shares_series helper.")
-                quarterly_shares_points = await self._get_quarterly_shares_series(
-                    ticker_symbol,
-                    fundamental_query_start_date_str,
-                    fundamental_query_end_date_str
-                )
+                quarterly_shares_points = quarterly_shares_points_by_ticker.get(ticker_symbol, [])
                 # REMOVED: Old shares fetching and processing logic that was here
                 
                 if not quarterly_cash_points:
@@ -1274,17 +1435,32 @@ class YahooDataQueryService:
         cse_quarterly_field_id = "yf_item_balance_sheet_quarterly_CommonStockEquity"
         cse_annual_field_id = "yf_item_balance_sheet_annual_CommonStockEquity"
 
+        # Fetch the field series for all tickers up front (batched) rather than once per ticker
+        # 1. Fetch Common Stock Equity (CSE) Data
+        # Fetch Quarterly CSE
+        cse_q_raw = await self.get_specific_field_timeseries(
+            field_identifier=cse_quarterly_field_id,
+            tickers=tickers,
+            start_date_str=fundamental_query_start_date_str,
+            end_date_str=fundamental_query_end_date_str
+        )
+        # Fetch Annual CSE
+        cse_a_raw = await self.get_specific_field_timeseries(
+            field_identifier=cse_annual_field_id,
+            tickers=tickers,
+            start_date_str=fundamental_query_start_date_str, # Use same extended range
+            end_date_str=fundamental_query_end_date_str
+        )
+
+        # Shares series for all tickers in one batched fetch
+        quarterly_shares_points_by_ticker = await self._get_quarterly_shares_series_for_tickers(
+            tickers,
+            fundamental_query_start_date_str,
+            fundamental_query_end_date_str
+        )
+
         for ticker_symbol in tickers:
             try:
-                # 1. Fetch Common Stock Equity (CSE) Data
-                # Fetch Quarterly CSE
-                logger.debug(f"BOOK_VALUE_PER_SHARE [{ticker_symbol}]: Fetching Q CSE ({cse_quarterly_field_id})")
-                cse_q_raw = await self.get_specific_field_timeseries(
-                    field_identifier=cse_quarterly_field_id,
-                    tickers=[ticker_symbol],
-                    start_date_str=fundamental_query_start_date_str,
-                    end_date_str=fundamental_query_end_date_str
-                )
                 quarterly_cse_points: List[Dict[str, Any]] = []
                 if cse_q_raw.get(ticker_symbol):
                     for item in cse_q_raw[ticker_symbol]:
@@ -1295,14 +1471,6 @@ class YahooDataQueryService:
                             except (ValueError, TypeError): pass
                 logger.info(f"BOOK_VALUE_PER_SHARE [{ticker_symbol}]: Parsed {len(quarterly_cse_points)} quarterly CSE points.")
 
-                # Fetch Annual CSE
-                logger.debug(f"BOOK_VALUE_PER_SHARE [{ticker_symbol}]: Fetching A CSE ({cse_annual_field_id})")
-                cse_a_raw = await self.get_specific_field_timeseries(
-                    field_identifier=cse_annual_field_id,
-                    tickers=[ticker_symbol],
-                    start_date_str=fundamental_query_start_date_str, # Use same extended range
-                    end_date_str=fundamental_query_end_date_str
-                )
                 annual_cse_points: List[Dict[str, Any]] = []
                 if cse_a_raw.get(ticker_symbol):
                     for item in cse_a_raw[ticker_symbol]:
@@ -1330,11 +1498,7 @@ class YahooDataQueryService:
 
                 # 2. Fetch Shares Data using Helper
                 logger.debug(f"BOOK_VALUE_PER_SHARE [{ticker_symbol}]: Calling _get_quarterly_shares_series helper.")
-                quarterly_shares_points = await self._get_quarterly_shares_series(
-                    ticker_symbol,
-                    fundamental_query_start_date_str,
-                    fundamental_query_end_date_str
-                )
+                quarterly_shares_points = quarterly_shares_points_by_ticker.get(ticker_symbol, [])
                 if not quarterly_shares_points:
                     logger.warning(f"BOOK_VALUE_PER_SHARE [{ticker_symbol}]: No shares data from helper. Skipping.")
                     results_by_ticker[ticker_symbol] = []
@@ -1723,9 +1887,21 @@ class YahooDataQueryService:
         Fetches and processes annual diluted average shares data from income statements.
         Returns a chronologically sorted list of shares data points.
         """
-        logger.debug(f"ANNUAL_SHARES_HELPER [{ticker_symbol}]: Fetching annual shares between {start_date_str} and {end_date_str}")
+        shares_by_ticker = await self._get_annual_shares_series_for_tickers([ticker_symbol], start_date_str, end_date_str)
+        return shares_by_ticker.get(ticker_symbol, [])
+
+    async def _get_annual_shares_series_for_tickers(
+        self, 
+        tickers: List[str], 
+        start_date_str: str, 
+        end_date_str: str
+    ) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        Multi-ticker version of _get_annual_shares_series: loads the annual income statements of
+        all tickers in one batched query and returns {ticker: sorted shares points}.
+        """
+        logger.debug(f"ANNUAL_SHARES_HELPER: Fetching annual shares for {len(tickers)} tickers between {start_date_str} and {end_date_str}")
         
-        annual_shares_points: List[Dict[str, Any]] = []
         # yfinance key for diluted average shares from the income statement
         target_shares_key = "Diluted Average Shares" 
 
@@ -1733,21 +1909,20 @@ class YahooDataQueryService:
         parsed_start_date = self._parse_date_flex(start_date_str)
         parsed_end_date = self._parse_date_flex(end_date_str)
 
-        annual_income_statements = await self.db_repo.get_data_items_by_criteria(
-            ticker=ticker_symbol,
-            item_type="INCOME_STATEMENT", # Shares are from Income Statement
-            item_time_coverage="FYEAR",
+        statements_by_ticker = await self.db_repo.get_data_items_for_tickers(
+            tickers=tickers,
+            item_specs=[("INCOME_STATEMENT", "FYEAR")], # Shares are from Income Statement
             start_date=parsed_start_date,
             end_date=parsed_end_date,
-            order_by_key_date_desc=False # Fetch ascending for easier processing
+            order_by_key_date_desc=False, # Fetch ascending for easier processing
+            field_keys=[target_shares_key]
         )
 
-        if annual_income_statements:
-            # Currency conversion is not applied to shares, but fetching info might be needed if other fields were involved.
-            # For shares alone, it's not critical.
-            # conversion_info = await self._get_conversion_info_for_ticker(ticker_symbol, {}) 
-            
-            for item in annual_income_statements:
+        shares_by_ticker: Dict[str, List[Dict[str, Any]]] = {}
+        for ticker_symbol in tickers:
+            annual_shares_points: List[Dict[str, Any]] = []
+            # Currency conversion is not applied to shares.
+            for item in statements_by_ticker.get(ticker_symbol, {}).get(("INCOME_STATEMENT", "FYEAR"), []):
                 payload = item.get('item_data_payload')
                 key_date_from_db = item.get('item_key_date')
                 
@@ -1773,10 +1948,11 @@ class YahooDataQueryService:
                         logger.warning(f"ANNUAL_SHARES_HELPER [{ticker_symbol}]: Could not parse annual shares value '{shares_value}' for date '{date_obj.strftime('%Y-%m-%d')}'")
                 else:
                     logger.debug(f"ANNUAL_SHARES_HELPER [{ticker_symbol}]: '{target_shares_key}' not found in payload for date '{date_obj.strftime('%Y-%m-%d')}'")
-        
-        annual_shares_points.sort(key=lambda x: x['date_obj']) # Ensure sorted by date
-        logger.info(f"ANNUAL_SHARES_HELPER [{ticker_symbol}]: Prepared {len(annual_shares_points)} annual shares points.")
-        return annual_shares_points
+            
+            annual_shares_points.sort(key=lambda x: x['date_obj']) # Ensure sorted by date
+            logger.info(f"ANNUAL_SHARES_HELPER [{ticker_symbol}]: Prepared {len(annual_shares_points)} annual shares points.")
+            shares_by_ticker[ticker_symbol] = annual_shares_points
+        return shares_by_ticker
     # --- END: _get_annual_shares_series helper ---
 
     # --- NEW: Generic TTM Calculation Helper ---
@@ -1,6 +1,5 @@
 import asyncio
 import logging
-import json
 from datetime import datetime
 from typing import Dict, Any, List, Optional, Callable
 
@@ -13,6 +12,7 @@ from .V3_database import SQLiteRepository
 from .V3_models import TickerListPayload, JobDetailsResponse # Using the new models file
 from .V3_yahoo_fetch import mass_load_yahoo_data_from_file # <-- IMPORT THE REAL FUNCTION
 from .yahoo_repository import YahooDataRepository # <-- IMPORT YahooDataRepository
+from . import fastjson
 from .services.notification_service import dispatch_notification
 
 logger = logging.getLogger(__name__)
@@ -292,7 +292,7 @@ async def get_job_details_internal(job_id: str, repository: SQLiteRepository) ->
     async with _job_status_lock:
         lock_acquired_time = datetime.now().isoformat()
         # Deep copy for logging, to avoid issues if _job_status changes immediately after lock release by another task (though unlikely here)
-        in_memory_status_at_lock_time = json.loads(json.dumps(dict(_job_status))) if _job_status else {}
+        in_memory_status_at_lock_time = fastjson.loads(fastjson.dumps(dict(_job_status))) if _job_status else {}
         
         logger.info(f"[GET_DETAILS_LOCK_ACQUIRED @ {lock_acquired_time}] For job_id: {job_id}. Current _job_status snapshot: {in_memory_status_at_lock_time}")
         
@@ -1,9 +1,11 @@
 """SQLAlchemy models for Yahoo Finance specific data."""
 
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Text, UniqueConstraint, Boolean
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, UniqueConstraint, Boolean, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 
+from .payload_codec import CompressedPayloadText
+
 # Import Base from the main database module where it's defined
 # This assumes Base = declarative_base() is in V3_database.py
 try:
@@ -128,14 +130,16 @@ class TickerDataItemsModel(Base):
     data_item_id = Column(Integer, primary_key=True, autoincrement=True)
     
     # Foreign Key to ticker_master table using the primary key column name
-    ticker = Column(String(collation='NOCASE'), ForeignKey('ticker_master.ticker'), nullable=False, index=True)
+    # (ticker lookups use the unique constraint's index and ix_ticker_data_items_series, which both start with it)
+    ticker = Column(String(collation='NOCASE'), ForeignKey('ticker_master.ticker'), nullable=False)
     
     item_type = Column(String(collation='NOCASE'), nullable=False, index=True)
     item_time_coverage = Column(String(collation='NOCASE'), nullable=False) 
     item_key_date = Column(DateTime, nullable=False, index=True)
     fetch_timestamp_utc = Column(DateTime, nullable=False, default=datetime.now)
     item_source = Column(String, nullable=True) 
-    item_data_payload = Column(Text, nullable=False) # Use Text for potentially large JSON
+    item_data_payload = Column(CompressedPayloadText, nullable=False) # JSON text; stored compressed if a codec is enabled (see payload_codec)
+    payload_hash = Column(String(32), nullable=True) # payload_codec.payload_hash of the JSON text; NULL for rows written before it existed
     prun = Column(Boolean, nullable=False, default=False) # Flag for pruning status
 
     # Relationship back to YahooTickerMasterModel
@@ -143,4 +147,99 @@ class TickerDataItemsModel(Base):
 
     def __repr__(self):
         return f"<TickerDataItemsModel(item_id={self.data_item_id}, ticker='{self.ticker}', type='{self.item_type}', date='{self.item_key_date}')>"
-# --- END Ticker Data Items Model --- 
\ No newline at end of file
+
+# Covering index for the per-series lookups: latest item_key_date of a (ticker, item_type, item_time_coverage)
+# and the payload_hash comparison of the write path are answered from the index alone.
+Index(
+    'ix_ticker_data_items_series',
+    TickerDataItemsModel.ticker,
+    TickerDataItemsModel.item_type,
+    TickerDataItemsModel.item_time_coverage,
+    TickerDataItemsModel.item_key_date.desc(),
+    TickerDataItemsModel.payload_hash
+)
+# Partial index over non-pruned rows, for the (item_type, item_time_coverage) scans of the analytics field list
+Index(
+    'ix_ticker_data_items_active_spec',
+    TickerDataItemsModel.item_type,
+    TickerDataItemsModel.item_time_coverage,
+    TickerDataItemsModel.ticker,
+    sqlite_where=TickerDataItemsModel.prun == False
+)
+# Tickers whose items were written after a point in time, for the incremental analytics data cache refresh
+# (fetch_timestamp_utc is only rewritten when a payload changes, see _data_item_upsert_statement)
+Index(
+    'ix_ticker_data_items_fetched',
+    TickerDataItemsModel.fetch_timestamp_utc,
+    TickerDataItemsModel.ticker
+)
+# Existing databases get these indexes from db_migrations (create_all does not change existing tables)
+# --- END Ticker Data Items Model --- 
+
+
+# --- Ticker Data Values Model (normalized statement fields) ---
+class TickerDataValuesModel(Base):
+    """One row per numeric field of a statement item in ticker_data_items (long format).
+
+    Kept in sync by YahooDataRepository's insert/upsert/delete methods so single fields can be
+    read with an index range scan instead of loading and decoding whole payloads.
+    """
+    __tablename__ = 'ticker_data_values'
+    __table_args__ = (
+        Index('ix_ticker_data_values_lookup', 'ticker', 'item_type', 'item_time_coverage', 'field_key', 'item_key_date'),
+        {'extend_existing': True}
+    )
+
+    data_item_id = Column(Integer, ForeignKey('ticker_data_items.data_item_id'), primary_key=True)
+    field_key = Column(String, primary_key=True) # Payload key as stored, e.g. "Total Assets"
+
+    # Denormalized from the parent item so lookups never touch ticker_data_items
+    ticker = Column(String(collation='NOCASE'), nullable=False)
+    item_type = Column(String(collation='NOCASE'), nullable=False)
+    item_time_coverage = Column(String(collation='NOCASE'), nullable=False)
+    item_key_date = Column(DateTime, nullable=False)
+    value = Column(Float, nullable=True) # NULL stores a NaN payload value
+
+    def __repr__(self):
+        return f"<TickerDataValuesModel(item_id={self.data_item_id}, ticker='{self.ticker}', field='{self.field_key}', value={self.value})>"
+# --- END Ticker Data Values Model ---
+
+
+# --- Yahoo Field Catalog Model (analytics field list) ---
+class YahooFieldCatalogModel(Base):
+    """One row per Yahoo field offered for analytics configuration (/api/analytics/fields).
+
+    Maintained by YahooDataRepository's write methods: payload keys are added when an item type/coverage
+    or key first appears, ticker_master columns get an example once a non-null value is written.
+    """
+    __tablename__ = 'yahoo_field_catalog'
+    __table_args__ = {'extend_existing': True}
+
+    field_name = Column(String, primary_key=True) # e.g. "yf_tm_trailing_pe", "yf_balance_sheet_fyear_Total Assets"
+    source = Column(String, nullable=False) # 'ticker_master' or 'data_item'
+    item_type = Column(String, nullable=True) # Lowercase, as in field_name; NULL for ticker_master columns
+    item_time_coverage = Column(String, nullable=True)
+    field_key = Column(String, nullable=False) # Column name or payload key as stored
+    field_position = Column(Integer, nullable=False, default=0) # Column/payload key position, for a stable order
+    field_type = Column(String, nullable=False) # 'numeric', 'text', 'boolean', 'date', 'unknown', ...
+    example_value = Column(String, nullable=True) # JSON text of a sample value; NULL until a non-null value is seen
+    updated_at = Column(DateTime, nullable=False, default=datetime.now)
+
+    def __repr__(self):
+        return f"<YahooFieldCatalogModel(field='{self.field_name}', type='{self.field_type}')>"
+# --- END Yahoo Field Catalog Model ---
+
+
+# --- Yahoo Schema State Model ---
+class YahooSchemaStateModel(Base):
+    """Key/value markers for one-off Yahoo data migrations (e.g. the ticker_data_values backfill)."""
+    __tablename__ = 'yahoo_schema_state'
+    __table_args__ = {'extend_existing': True}
+
+    state_key = Column(String, primary_key=True)
+    state_value = Column(String, nullable=True)
+    updated_at = Column(DateTime, nullable=False, default=datetime.now)
+
+    def __repr__(self):
+        return f"<YahooSchemaStateModel(key='{self.state_key}', value='{self.state_value}')>"
+# --- END Yahoo Schema State Model ---
@@ -1,49 +1,126 @@
 """Repository specifically for handling Yahoo Finance related database operations."""
 
+import contextlib
+import functools
 import logging
 from datetime import datetime
-from typing import Dict, Any, List, Optional
-from sqlalchemy import delete, update, insert, select
+from typing import Dict, Any, List, Optional, Tuple, AsyncIterator
+from sqlalchemy import delete, update, insert, select, func, and_, or_, case, null
 from sqlalchemy.exc import SQLAlchemyError, IntegrityError
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 import json
+import math
 import sqlalchemy
-from sqlalchemy import inspect
 
 # Import the models specific to Yahoo
-from .yahoo_models import YahooTickerMasterModel, TickerDataItemsModel
+from .yahoo_models import YahooTickerMasterModel, TickerDataItemsModel, TickerDataValuesModel, YahooSchemaStateModel, YahooFieldCatalogModel
+from .db_engine_registry import engine_registry
+from .db_write_coordinator import begin_write, write_session
+from .db_migrations import apply_migrations, verify_schema
+from . import fastjson
+from .payload_codec import PAYLOAD_CODEC_MARKERS, decode_payload, encode_payload, get_write_codec, payload_hash
 
 # Configure logging for this repository
 logger = logging.getLogger(__name__)
 
+# Tickers per query in the multi-ticker readers (iter_latest_data_item_payloads,
+# get_data_items_for_tickers). Keeps each IN list and sort small while still replacing
+# thousands of per-ticker SELECTs with a handful.
+LATEST_PAYLOAD_TICKER_CHUNK_SIZE = 500
+
+# Rows per keyset page of get_ticker_masters_page / iter_ticker_masters
+TICKER_MASTER_PAGE_SIZE = 5000
+# Rows per keyset page of get_data_items_page, and ids per DELETE of the bulk delete methods
+DATA_ITEMS_PAGE_SIZE = 2000
+DELETE_CHUNK_SIZE = 500
+
+# Statement item types whose numeric payload fields are mirrored into ticker_data_values
+DATA_VALUE_ITEM_TYPES = ("BALANCE_SHEET", "INCOME_STATEMENT", "CASH_FLOW_STATEMENT")
+# yahoo_schema_state key set once the ticker_data_values backfill has completed. Until then readers
+# fall back to decoding item_data_payload, since older items have no value rows yet.
+DATA_VALUES_BACKFILL_STATE_KEY = "ticker_data_values_backfilled"
+DATA_VALUES_BACKFILL_BATCH_SIZE = 1000
+
+# Rows rewritten per transaction by migrate_data_item_payload_encoding.
+PAYLOAD_MIGRATION_BATCH_SIZE = 1000
+
+# yahoo_schema_state key set once yahoo_field_catalog has been seeded from the stored data. From then on
+# the write methods keep it current and get_all_yahoo_fields_for_analytics only reads the catalog.
+FIELD_CATALOG_STATE_KEY = "yahoo_field_catalog_built"
+# Per process and database URL: field_name -> field_type of its catalog row, or None while the row has no
+# example value. Lets the write methods skip payload keys the catalog already has without a query per write.
+_field_catalog_known: Dict[str, Dict[str, Optional[str]]] = {}
+
+
+# Key under which _serialize_item_payload keeps the parsed payload in a prepared item, so the value-row and
+# catalog helpers do not decode the JSON text again. Not a column: executemany ignores it, .values() must not get it.
+PARSED_PAYLOAD_KEY = '_parsed_payload'
+
+
+def _canonical_payload_hash(payload_text: Optional[str]) -> Optional[str]:
+    """payload_hash of JSON text that was not necessarily written by fastjson.dumps (rows stored before
+       payload_hash existed, payload strings passed in by callers). The text is re-serialized first, so a
+       formatting difference alone never counts as a change. Returns None if the text is not valid JSON.
+    """
+    if payload_text is None:
+        return None
+    try:
+        return payload_hash(fastjson.dumps(fastjson.loads(payload_text), allow_nan=True))
+    except (json.JSONDecodeError, TypeError, ValueError):
+        return None
+
+
 class YahooDataRepository:
     """Repository for accessing ticker_master and ticker_data_items tables."""
     
     def __init__(self, database_url: str):
         """Initialize the repository with a database URL."""
         self.database_url = database_url
-        # Consider sharing the engine if multiple repositories are used frequently
-        # For now, create a separate one for isolation.
-        self.engine = create_async_engine(database_url)
-        self.async_session_factory = sessionmaker(
-            self.engine, expire_on_commit=False, class_=AsyncSession
-        )
-        logger.info(f"[Yahoo Repo] Initialized with DB URL: {database_url}")
+        # Engine and session factory are shared per database URL via the process-wide registry
+        self.engine = engine_registry.get_engine(database_url)
+        self.async_session_factory = engine_registry.get_session_factory(database_url)
+        # Read-only engine (WAL snapshot reads); read methods use it so they never wait on writers
+        self.read_engine = engine_registry.get_read_engine(database_url)
+        self.read_session_factory = engine_registry.get_read_session_factory(database_url)
+        # Only a positive result is cached: once backfilled, every write keeps the table in sync
+        self._data_values_ready = False
+        self._field_catalog_ready = False
+        logger.debug(f"[Yahoo Repo] Initialized with DB URL: {database_url}")
+
+    def _begin_write(self, description: str = "write block"):
+        """Write transaction; goes through the database's write coordinator when one is running."""
+        return begin_write(self.engine, self.database_url, description)
+
+    def _write_session(self, description: str = "write block"):
+        """AsyncSession on a _begin_write() connection, for the session-based writers."""
+        return write_session(self.engine, self.database_url, description)
 
     async def create_tables(self) -> None:
-        """Creates only the Yahoo-specific tables (ticker_master, ticker_data_items)."""
-        logger.info("[DB Yahoo Repo] Creating Yahoo-specific tables (ticker_master, ticker_data_items).")
+        """Creates the Yahoo-specific tables (ticker_master, ticker_data_items, ticker_data_values, yahoo_schema_state)."""
+        logger.info("[DB Yahoo Repo] Creating Yahoo-specific tables (ticker_master, ticker_data_items, ticker_data_values, yahoo_schema_state).")
         try:
             async with self.engine.begin() as conn:
                 # Use the metadata associated with the specific models
                 await conn.run_sync(YahooTickerMasterModel.metadata.create_all)
+                # create_all does not change existing tables; columns and indexes added later come from db_migrations
+                await conn.run_sync(apply_migrations)
             logger.info("[DB Yahoo Repo] Yahoo-specific tables checked/created successfully.")
         except Exception as e:
             logger.error(f"[DB Yahoo Repo] Error during Yahoo table creation: {e}", exc_info=True)
             raise
 
+    async def verify_schema(self) -> Dict[str, Any]:
+        """Runs db_migrations.verify_schema (pending migrations, missing indexes, EXPLAIN QUERY PLAN of the
+           hot ticker_data_items queries) on the read engine. See db_migrations for the report layout."""
+        async with self.read_engine.connect() as conn:
+            report = await conn.run_sync(verify_schema)
+        if not report['ok']:
+            logger.warning(f"[DB Yahoo Repo] Schema verification found problems: pending migrations {report['pending_migrations']}, "
+                           f"missing indexes {report['missing_indexes']}, obsolete indexes {report['obsolete_indexes']}, "
+                           f"queries {[entry['name'] for entry in report['query_plans'] if entry['problems']]}")
+        return report
+
     # --- Methods moved from SQLiteRepository will be added here in the next step ---
     # upsert_yahoo_ticker_master
     # update_ticker_master_fields
@@ -66,7 +143,7 @@ class YahooDataRepository:
         logger.info(f"[DB Yahoo Master Upsert - Yahoo Repo] Upserting data for ticker: {ticker_symbol}")
 
         try:
-            async with self.engine.begin() as conn:
+            async with self._field_catalog_updates() as catalog_recorded, self._begin_write() as conn:
                 ticker_data['update_last_full'] = datetime.now()
 
                 stmt = sqlite_insert(YahooTickerMasterModel).values(**ticker_data)
@@ -83,6 +160,7 @@ class YahooDataRepository:
                 )
                 
                 await conn.execute(upsert_stmt)
+                await self._record_field_catalog(conn, catalog_recorded, master_records=[ticker_data])
             logger.info(f"[DB Yahoo Master Upsert - Yahoo Repo] Successfully upserted data for ticker: {ticker_symbol}")
         except SQLAlchemyError as e:
             logger.error(f"[DB Yahoo Master Upsert - Yahoo Repo] SQLAlchemyError upserting data for {ticker_symbol}: {e}", exc_info=True)
@@ -92,6 +170,61 @@ class YahooDataRepository:
             raise
     # --- End Upsert Yahoo Ticker Master Data ---
 
+    # --- Bulk Upsert Yahoo Ticker Master Data ---
+    async def bulk_upsert_yahoo_ticker_master(self, records: List[Dict[str, Any]]) -> int:
+        """
+        Upserts many ticker_master records in a single transaction.
+        Same semantics as upsert_yahoo_ticker_master for each record, but the rows are written with one
+        INSERT ... ON CONFLICT DO UPDATE executemany per set of columns instead of one transaction per ticker.
+
+        Args:
+            records: Dictionaries whose keys match YahooTickerMasterModel column names. Records without
+                     a 'ticker' are skipped. The dictionaries are not modified.
+
+        Returns:
+            The number of records written.
+        """
+        valid_records = [record for record in records if record and record.get('ticker')]
+        if len(valid_records) != len(records):
+            logger.error(f"[DB Yahoo Master Bulk Upsert] Skipping {len(records) - len(valid_records)} records that are empty or missing 'ticker'.")
+        if not valid_records:
+            return 0
+
+        now = datetime.now()
+        # executemany needs the same columns in every parameter set, so records are grouped by their keys
+        records_by_columns: Dict[Tuple[str, ...], List[Dict[str, Any]]] = {}
+        for record in valid_records:
+            row = dict(record)
+            row['update_last_full'] = now
+            records_by_columns.setdefault(tuple(sorted(row)), []).append(row)
+
+        try:
+            async with self._field_catalog_updates() as catalog_recorded, self._begin_write() as conn:
+                for rows in records_by_columns.values():
+                    stmt = sqlite_insert(YahooTickerMasterModel)
+                    update_dict = {
+                        c.name: getattr(stmt.excluded, c.name)
+                        for c in YahooTickerMasterModel.__table__.columns
+                        if not c.primary_key
+                    }
+                    upsert_stmt = stmt.on_conflict_do_update(
+                        index_elements=['ticker'],
+                        set_=update_dict
+                    )
+                    await conn.execute(upsert_stmt, rows)
+                await self._record_field_catalog(
+                    conn, catalog_recorded, master_records=[row for rows in records_by_columns.values() for row in rows]
+                )
+            logger.info(f"[DB Yahoo Master Bulk Upsert] Upserted {len(valid_records)} ticker master records.")
+            return len(valid_records)
+        except SQLAlchemyError as e:
+            logger.error(f"[DB Yahoo Master Bulk Upsert] SQLAlchemyError upserting {len(valid_records)} records: {e}", exc_info=True)
+            raise
+        except Exception as e:
+            logger.error(f"[DB Yahoo Master Bulk Upsert] Unexpected error upserting {len(valid_records)} records: {e}", exc_info=True)
+            raise
+    # --- End Bulk Upsert Yahoo Ticker Master Data ---
+
     # --- Update Specific Yahoo Ticker Master Fields ---
     async def update_ticker_master_fields(self, ticker_symbol: str, updates: Dict[str, Any]) -> bool:
         """Updates specific fields for a given ticker in the ticker_master table.
@@ -115,7 +248,7 @@ class YahooDataRepository:
         logger.debug(f"[DB Yahoo Master Update Fields - Yahoo Repo] Update data: {updates}")
 
         try:
-            async with self.engine.begin() as conn:
+            async with self._field_catalog_updates() as catalog_recorded, self._begin_write() as conn:
                 stmt = (
                     update(YahooTickerMasterModel)
                     .where(YahooTickerMasterModel.ticker == ticker_symbol)
@@ -124,6 +257,7 @@ class YahooDataRepository:
                 result = await conn.execute(stmt)
                 
                 if result.rowcount > 0:
+                    await self._record_field_catalog(conn, catalog_recorded, master_records=[updates])
                     logger.info(f"[DB Yahoo Master Update Fields - Yahoo Repo] Successfully updated {len(updates)} fields for {ticker_symbol} ({result.rowcount} row(s) affected).")
                     return True
                 else:
@@ -137,6 +271,370 @@ class YahooDataRepository:
             raise
     # --- End Update Specific Yahoo Ticker Master Fields ---
 
+    # --- Ticker Data Values Sync Helpers ---
+    @staticmethod
+    def _build_data_value_rows(data_item_id: Optional[int], item_data: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Builds the ticker_data_values rows for the numeric fields of a statement item's payload.
+           Returns an empty list for non-statement items or payloads that are not JSON objects.
+        """
+        item_type = item_data.get('item_type')
+        if data_item_id is None or not item_type or item_type.upper() not in DATA_VALUE_ITEM_TYPES:
+            return []
+        if not all(item_data.get(key) for key in ('ticker', 'item_time_coverage', 'item_key_date')):
+            return []
+
+        payload = YahooDataRepository._item_payload(item_data)
+        if not isinstance(payload, dict):
+            if isinstance(item_data.get('item_data_payload'), str):
+                logger.warning(f"[DB DataValues Sync] Could not parse payload for data_item_id {data_item_id}. No values stored.")
+            return []
+
+        rows = []
+        for field_key, value in payload.items():
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                continue
+            value = float(value)
+            rows.append({
+                'data_item_id': data_item_id,
+                'field_key': field_key,
+                'ticker': item_data['ticker'],
+                'item_type': item_type,
+                'item_time_coverage': item_data['item_time_coverage'],
+                'item_key_date': item_data['item_key_date'],
+                'value': None if math.isnan(value) else value
+            })
+        return rows
+
+    @staticmethod
+    async def _insert_data_value_rows(session: AsyncSession, value_rows: List[Dict[str, Any]]) -> None:
+        """Inserts ticker_data_values rows inside the caller's transaction."""
+        if value_rows:
+            await session.execute(insert(TickerDataValuesModel), value_rows)
+    # --- End Ticker Data Values Sync Helpers ---
+
+    # --- Field Catalog Sync Helpers ---
+    @staticmethod
+    def _infer_payload_field_type(value: Any) -> str:
+        """Analytics field type of a payload value: 'numeric', 'text', 'boolean', 'unknown' (None) or the Python type name."""
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            return "numeric"
+        if isinstance(value, str):
+            return "text"
+        if isinstance(value, bool):
+            return "boolean"
+        if value is None:
+            return "unknown"
+        return type(value).__name__
+
+    @staticmethod
+    def _field_catalog_row(field_name: str, source: str, field_key: str, position: int, field_type: str, value: Any,
+                           item_type: Optional[str] = None, item_time_coverage: Optional[str] = None) -> Dict[str, Any]:
+        if isinstance(value, datetime):
+            value = value.isoformat()
+        return {
+            'field_name': field_name,
+            'source': source,
+            'item_type': item_type,
+            'item_time_coverage': item_time_coverage,
+            'field_key': field_key,
+            'field_position': position,
+            'field_type': field_type,
+            'example_value': None if value is None else fastjson.dumps(value, allow_nan=True),
+            'updated_at': datetime.now()
+        }
+
+    @contextlib.asynccontextmanager
+    async def _field_catalog_updates(self):
+        """Wraps a write transaction that records catalog rows with _record_field_catalog. The rows are added to
+           the process cache only if the block exits without an exception, i.e. after the transaction committed.
+        """
+        recorded: Dict[str, Optional[str]] = {}
+        yield recorded
+        if recorded:
+            _field_catalog_known.setdefault(self.database_url, {}).update(recorded)
+
+    async def _record_field_catalog(
+        self,
+        session_or_conn,
+        recorded: Dict[str, Optional[str]],
+        items: Optional[List[Dict[str, Any]]] = None,
+        master_records: Optional[List[Dict[str, Any]]] = None
+    ) -> None:
+        """Adds yahoo_field_catalog rows for payload keys of the items, and examples for the ticker_master columns
+           of the records, that the catalog does not have yet. Runs inside the caller's transaction; a row without
+           an example gets one once a non-null value is written, and a payload field whose written value has a
+           different type than its row (e.g. 'N/A' first, numbers later) takes the new type and example.
+           recorded is the dict of _field_catalog_updates.
+        """
+        known = _field_catalog_known.get(self.database_url)
+        if known is None:
+            result = await session_or_conn.execute(
+                select(YahooFieldCatalogModel.field_name, YahooFieldCatalogModel.field_type, YahooFieldCatalogModel.example_value.isnot(None))
+            )
+            known = _field_catalog_known.setdefault(
+                self.database_url, {name: field_type if has_example else None for name, field_type, has_example in result.all()}
+            )
+
+        rows: Dict[str, Dict[str, Any]] = {}
+
+        def is_new(field_name: str, field_type: str, has_example: bool) -> bool:
+            # Not in the catalog yet, there without an example and this value can provide one, or of another type
+            pending = rows.get(field_name)
+            if pending is not None:
+                return has_example and pending['example_value'] is None
+            seen = recorded if field_name in recorded else known
+            if field_name not in seen:
+                return True
+            return has_example and seen[field_name] != field_type
+
+        for item in items or []:
+            payload = self._item_payload(item)
+            if not isinstance(payload, dict):
+                continue
+            item_type = item['item_type'].lower()
+            item_time_coverage = item['item_time_coverage'].lower()
+            prefix = f"yf_{item_type}_{item_time_coverage}_"
+            for position, (key, value) in enumerate(payload.items()):
+                field_name = prefix + key
+                field_type = self._infer_payload_field_type(value)
+                if is_new(field_name, field_type, value is not None):
+                    rows[field_name] = self._field_catalog_row(
+                        field_name, 'data_item', key, position, field_type, value, item_type, item_time_coverage
+                    )
+
+        if master_records:
+            for position, column in enumerate(YahooTickerMasterModel.__table__.columns):
+                field_name = f"yf_tm_{column.name}"
+                field_type = self._normalize_db_type(str(column.type))
+                if column.primary_key or not is_new(field_name, field_type, True):
+                    continue
+                value = next((record[column.name] for record in master_records if record.get(column.name) is not None), None)
+                if value is not None:
+                    rows[field_name] = self._field_catalog_row(
+                        field_name, 'ticker_master', column.name, position, field_type, value
+                    )
+
+        if not rows:
+            return
+        stmt = sqlite_insert(YahooFieldCatalogModel)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['field_name'],
+            set_={'field_type': stmt.excluded.field_type, 'example_value': stmt.excluded.example_value, 'updated_at': stmt.excluded.updated_at},
+            where=and_(
+                stmt.excluded.example_value.isnot(None),
+                or_(YahooFieldCatalogModel.example_value.is_(None), YahooFieldCatalogModel.field_type != stmt.excluded.field_type)
+            )
+        )
+        await session_or_conn.execute(stmt, list(rows.values()))
+        recorded.update(
+            (field_name, row['field_type'] if row['example_value'] is not None else None) for field_name, row in rows.items()
+        )
+        logger.debug(f"[DB Field Catalog] Recorded {len(rows)} new, completed or retyped catalog fields.")
+    # --- End Field Catalog Sync Helpers ---
+
+    # --- Data Item Insert Preparation ---
+    @staticmethod
+    def _serialize_item_payload(item_data: Dict[str, Any]) -> None:
+        """Serializes item_data['item_data_payload'] to JSON text (unless it already is a string) and sets
+           item_data['payload_hash'] and item_data[PARSED_PAYLOAD_KEY] (the payload as an object; missing if
+           the string is not valid JSON). Raises TypeError if the payload cannot be serialized.
+        """
+        payload = item_data.get('item_data_payload')
+        if isinstance(payload, str):
+            try:
+                parsed = fastjson.loads(payload)
+            except json.JSONDecodeError:
+                item_data['payload_hash'] = None
+                return
+            # Hashed from the re-serialized text, like _canonical_payload_hash
+            item_data['payload_hash'] = payload_hash(fastjson.dumps(parsed, allow_nan=True))
+            item_data[PARSED_PAYLOAD_KEY] = parsed
+        else:
+            item_data['item_data_payload'] = fastjson.dumps(payload, allow_nan=True)
+            item_data['payload_hash'] = payload_hash(item_data['item_data_payload'])
+            item_data[PARSED_PAYLOAD_KEY] = payload
+
+    @staticmethod
+    def _item_payload(item_data: Dict[str, Any]) -> Any:
+        """The payload of an item as an object: the one kept by _serialize_item_payload, else item_data_payload
+           parsed if it is JSON text (rows read back from the table). None if the text is not valid JSON.
+        """
+        if PARSED_PAYLOAD_KEY in item_data:
+            return item_data[PARSED_PAYLOAD_KEY]
+        payload = item_data.get('item_data_payload')
+        if isinstance(payload, str):
+            try:
+                return fastjson.loads(payload)
+            except json.JSONDecodeError:
+                return None
+        return payload
+
+    @staticmethod
+    def _data_item_key(item_data: Dict[str, Any]) -> Tuple[str, str, str, datetime]:
+        """(ticker, item_type, item_time_coverage, item_key_date) of an item or row, matched like the NOCASE unique constraint."""
+        return (item_data['ticker'].upper(), item_data['item_type'].upper(), item_data['item_time_coverage'].upper(), item_data['item_key_date'])
+
+    @staticmethod
+    def _prepare_data_items_for_insert(items_data: List[Dict[str, Any]], now_local: datetime, log_prefix: str) -> List[Dict[str, Any]]:
+        """Returns insert-ready copies of the items: dates defaulted/parsed, payloads serialized to JSON.
+           Items with an invalid date, an unserializable payload or missing required fields are logged and skipped.
+        """
+        processed_items = []
+        for item_data in items_data:
+            item_copy = item_data.copy()
+
+            # Use naive local time
+            if 'item_key_date' not in item_copy:
+                 item_copy['item_key_date'] = now_local
+            if 'fetch_timestamp_utc' not in item_copy:
+                item_copy['fetch_timestamp_utc'] = now_local
+            
+            # Convert string date to datetime object if needed (naive)
+            if isinstance(item_copy.get('item_key_date'), str):
+                try:
+                    item_copy['item_key_date'] = datetime.fromisoformat(item_copy['item_key_date'])
+                except ValueError:
+                    logger.error(f"{log_prefix} Invalid date format {item_copy.get('item_key_date')} for ticker {item_copy.get('ticker')}. Skipping.")
+                    continue
+            
+            try:
+                YahooDataRepository._serialize_item_payload(item_copy)
+            except TypeError as e:
+                logger.error(f"{log_prefix} Could not serialize payload for {item_copy.get('ticker')}: {e}. Skipping.")
+                continue
+            
+            required_fields = ['ticker', 'item_type', 'item_time_coverage', 'item_key_date', 'item_data_payload']
+            missing_fields = [field for field in required_fields if field not in item_copy or item_copy[field] is None]
+            if missing_fields:
+                logger.error(f"{log_prefix} Missing fields {missing_fields} for ticker {item_copy.get('ticker')}. Skipping.")
+                continue
+
+            processed_items.append(item_copy)
+        return processed_items
+    # --- End Data Item Insert Preparation ---
+
+    # --- Payload Hash Comparison / Upsert Helpers ---
+    async def _existing_item_hashes(self, session: AsyncSession, items: List[Dict[str, Any]]) -> Dict[Tuple[str, str, str, datetime], Tuple[int, Optional[str]]]:
+        """Maps the _data_item_key of every stored row that shares a ticker and item_type with the items to
+           (data_item_id, payload_hash). Rows stored before payload_hash existed are hashed from their payload,
+           and the hash is saved so later writes only compare hashes.
+        """
+        stmt = select(
+            TickerDataItemsModel.data_item_id,
+            TickerDataItemsModel.ticker,
+            TickerDataItemsModel.item_type,
+            TickerDataItemsModel.item_time_coverage,
+            TickerDataItemsModel.item_key_date,
+            TickerDataItemsModel.payload_hash
+        ).where(
+            TickerDataItemsModel.ticker.in_({item['ticker'] for item in items}),
+            TickerDataItemsModel.item_type.in_({item['item_type'] for item in items})
+        )
+        existing = {}
+        legacy_keys = {}
+        for row in await session.execute(stmt):
+            key = self._data_item_key(row._mapping)
+            existing[key] = (row.data_item_id, row.payload_hash)
+            if row.payload_hash is None:
+                legacy_keys[row.data_item_id] = key
+
+        if legacy_keys:
+            hash_updates = []
+            result = await session.execute(
+                select(TickerDataItemsModel.data_item_id, TickerDataItemsModel.item_data_payload)
+                .where(TickerDataItemsModel.data_item_id.in_(list(legacy_keys)))
+            )
+            for row in result:
+                stored_hash = _canonical_payload_hash(row.item_data_payload)
+                existing[legacy_keys[row.data_item_id]] = (row.data_item_id, stored_hash)
+                if stored_hash:
+                    hash_updates.append({'data_item_id': row.data_item_id, 'payload_hash': stored_hash})
+            if hash_updates:
+                await session.execute(update(TickerDataItemsModel), hash_updates)
+                logger.debug(f"[DB DataItems Hash] Stored payload_hash for {len(hash_updates)} rows written before the column existed.")
+        return existing
+
+    @staticmethod
+    @functools.lru_cache(maxsize=None)
+    def _data_item_upsert_statement():
+        """INSERT ... ON CONFLICT (uq_ticker_item_coverage_date) DO UPDATE for ticker_data_items.
+           A conflicting row keeps its data_item_id and is only rewritten when its payload_hash differs, so
+           RETURNING yields the inserted and the changed rows but not the unchanged ones.
+           Built once on the Core table: the ORM bulk-insert path adds about a millisecond per execute.
+        """
+        table = TickerDataItemsModel.__table__
+        stmt = sqlite_insert(table)
+        return stmt.on_conflict_do_update(
+            index_elements=['ticker', 'item_type', 'item_time_coverage', 'item_key_date'],
+            set_={
+                'item_data_payload': stmt.excluded.item_data_payload,
+                'payload_hash': stmt.excluded.payload_hash,
+                'fetch_timestamp_utc': stmt.excluded.fetch_timestamp_utc,
+                'item_source': stmt.excluded.item_source
+            },
+            where=table.c.payload_hash.is_distinct_from(stmt.excluded.payload_hash)
+        ).returning(
+            table.c.data_item_id,
+            table.c.ticker,
+            table.c.item_type,
+            table.c.item_time_coverage,
+            table.c.item_key_date
+        )
+
+    async def _upsert_prepared_items(
+        self,
+        session: AsyncSession,
+        prepared_items: List[Dict[str, Any]],
+        existing: Dict[Tuple[str, str, str, datetime], Tuple[int, Optional[str]]]
+    ) -> Dict[str, Any]:
+        """Writes prepared items with one _data_item_upsert_statement executemany inside the caller's transaction
+           and syncs ticker_data_values for the rows that were inserted or changed.
+
+        Args:
+            prepared_items: Items from _prepare_data_items_for_insert (serialized payload and payload_hash).
+            existing: _existing_item_hashes result; a written key found in it counts as 'updated', else 'new'.
+
+        Returns:
+            Dict with 'items_new', 'items_updated', 'items_unchanged' and 'changed_items' (one dict per written
+            row with its 'data_item_id', 'ticker', 'item_type', 'item_time_coverage', 'item_key_date' and 'change').
+        """
+        stats = {'items_new': 0, 'items_updated': 0, 'items_unchanged': 0, 'changed_items': []}
+        if not prepared_items:
+            return stats
+        # A single item is executed directly rather than through the executemany (insertmanyvalues) path
+        params = prepared_items[0] if len(prepared_items) == 1 else prepared_items
+        result = await session.execute(self._data_item_upsert_statement(), params)
+        # Unchanged rows return nothing, so written ids are matched back to their items by key
+        written_ids = {self._data_item_key(row._mapping): row.data_item_id for row in result}
+
+        updated_ids = []
+        value_rows = []
+        for item in prepared_items:
+            key = self._data_item_key(item)
+            data_item_id = written_ids.pop(key, None)
+            if data_item_id is None:
+                stats['items_unchanged'] += 1
+                continue
+            change = 'updated' if key in existing else 'new'
+            stats['items_updated' if change == 'updated' else 'items_new'] += 1
+            stats['changed_items'].append({
+                'data_item_id': data_item_id,
+                'ticker': item['ticker'],
+                'item_type': item['item_type'],
+                'item_time_coverage': item['item_time_coverage'],
+                'item_key_date': item['item_key_date'],
+                'change': change
+            })
+            if change == 'updated' and item['item_type'].upper() in DATA_VALUE_ITEM_TYPES:
+                updated_ids.append(data_item_id)
+            value_rows.extend(self._build_data_value_rows(data_item_id, item))
+
+        if updated_ids:
+            await session.execute(delete(TickerDataValuesModel).where(TickerDataValuesModel.data_item_id.in_(updated_ids)))
+        await self._insert_data_value_rows(session, value_rows)
+        return stats
+    # --- End Payload Hash Comparison / Upsert Helpers ---
+
     # --- Method to Insert Single Ticker Data Item (Table 2) - From Class --- 
     async def insert_ticker_data_item(self, item_data: Dict[str, Any]) -> Optional[int]:
         """Inserts a single data item into the ticker_data_items table.
@@ -161,12 +659,11 @@ class YahooDataRepository:
                 logger.error(f"[DB DataItems Insert - Yahoo Repo] Invalid date format: {item_copy.get('item_key_date')}. Must be ISO format for ticker {item_copy.get('ticker')}.")
                 return None
         
-        if not isinstance(item_copy.get('item_data_payload'), str):
-            try:
-                item_copy['item_data_payload'] = json.dumps(item_copy['item_data_payload'])
-            except TypeError as e:
-                logger.error(f"[DB DataItems Insert - Yahoo Repo] Could not serialize payload for ticker {item_copy.get('ticker')}: {e}")
-                return None
+        try:
+            self._serialize_item_payload(item_copy)
+        except TypeError as e:
+            logger.error(f"[DB DataItems Insert - Yahoo Repo] Could not serialize payload for ticker {item_copy.get('ticker')}: {e}")
+            return None
 
         required_fields = ['ticker', 'item_type', 'item_time_coverage', 'item_key_date', 'item_data_payload']
         missing_fields = [field for field in required_fields if field not in item_copy or item_copy[field] is None]
@@ -175,17 +672,20 @@ class YahooDataRepository:
             return None
 
         # Use sqlite_insert for ON CONFLICT DO NOTHING
-        stmt = sqlite_insert(TickerDataItemsModel).values(**item_copy)
+        stmt = sqlite_insert(TickerDataItemsModel).values(**{key: value for key, value in item_copy.items() if key != PARSED_PAYLOAD_KEY})
         stmt = stmt.on_conflict_do_nothing(
             index_elements=['ticker', 'item_type', 'item_time_coverage', 'item_key_date']
         )
         
         try:
-            async with self.async_session_factory() as session:
+            async with self._field_catalog_updates() as catalog_recorded, self._write_session() as session:
                 async with session.begin():
                     result = await session.execute(stmt)
-                    inserted_id = result.inserted_primary_key[0] if result.inserted_primary_key else None
+                    # rowcount is 0 when the conflict clause skipped the row (lastrowid is then stale)
+                    inserted_id = result.inserted_primary_key[0] if result.inserted_primary_key and result.rowcount == 1 else None
                     if inserted_id:
+                        await self._insert_data_value_rows(session, self._build_data_value_rows(inserted_id, item_copy))
+                        await self._record_field_catalog(session, catalog_recorded, items=[item_copy])
                         logger.info(f"[DB DataItems Insert - Yahoo Repo] Inserted item for ticker '{item_copy.get('ticker')}', type '{item_copy.get('item_type')}', id {inserted_id}.")
                     else:
                         # This case means the conflict occurred and the row was ignored.
@@ -214,48 +714,25 @@ class YahooDataRepository:
             logger.info("[DB DataItems Batch - Yahoo Repo] No items provided for batch insert.")
             return 0
 
-        processed_items = []
         now_local = datetime.now() # Get current local time once
-        for item_data in items_data:
-            item_copy = item_data.copy()
-
-            # Use naive local time
-            if 'item_key_date' not in item_copy:
-                 item_copy['item_key_date'] = now_local
-            if 'fetch_timestamp_utc' not in item_copy:
-                item_copy['fetch_timestamp_utc'] = now_local
-            
-            # Convert string date to datetime object if needed (naive)
-            if isinstance(item_copy.get('item_key_date'), str):
-                try:
-                    item_copy['item_key_date'] = datetime.fromisoformat(item_copy['item_key_date'])
-                except ValueError:
-                    logger.error(f"[DB DataItems Batch - Yahoo Repo] Invalid date format {item_copy.get('item_key_date')} for ticker {item_copy.get('ticker')}. Skipping.")
-                    continue
-            
-            if not isinstance(item_copy.get('item_data_payload'), str):
-                try:
-                    item_copy['item_data_payload'] = json.dumps(item_copy['item_data_payload'])
-                except TypeError as e:
-                    logger.error(f"[DB DataItems Batch - Yahoo Repo] Could not serialize payload for {item_copy.get('ticker')}: {e}. Skipping.")
-                    continue
-            
-            required_fields = ['ticker', 'item_type', 'item_time_coverage', 'item_key_date', 'item_data_payload']
-            missing_fields = [field for field in required_fields if field not in item_copy or item_copy[field] is None]
-            if missing_fields:
-                logger.error(f"[DB DataItems Batch - Yahoo Repo] Missing fields {missing_fields} for ticker {item_copy.get('ticker')}. Skipping.")
-                continue
-
-            processed_items.append(item_copy)
+        processed_items = self._prepare_data_items_for_insert(items_data, now_local, "[DB DataItems Batch - Yahoo Repo]")
 
         if not processed_items:
             logger.warning("[DB DataItems Batch - Yahoo Repo] No valid items for batch insert after preprocessing.")
             return 0
         
         try:
-            async with self.async_session_factory() as session:
+            async with self._field_catalog_updates() as catalog_recorded, self._write_session() as session:
                 async with session.begin():
-                    await session.execute(insert(TickerDataItemsModel), processed_items)
+                    result = await session.execute(
+                        insert(TickerDataItemsModel).returning(TickerDataItemsModel.data_item_id, sort_by_parameter_order=True),
+                        processed_items
+                    )
+                    value_rows = []
+                    for inserted_id, item_copy in zip(result.scalars().all(), processed_items):
+                        value_rows.extend(self._build_data_value_rows(inserted_id, item_copy))
+                    await self._insert_data_value_rows(session, value_rows)
+                    await self._record_field_catalog(session, catalog_recorded, items=processed_items)
                 logger.info(f"[DB DataItems Batch - Yahoo Repo] Attempted bulk insert for {len(processed_items)} items.")
                 return len(processed_items)
         except IntegrityError as e:
@@ -266,11 +743,16 @@ class YahooDataRepository:
             return 0
     # --- End Insert Multiple Ticker Data Items ---
 
-    # --- Upsert Single Ticker Data Item (Delete-then-Insert) ---
+    # --- Upsert Single Ticker Data Item (one row per ticker/item_type) ---
     async def upsert_ticker_data_item(self, item_data: Dict[str, Any]) -> Optional[int]:
-        """Upserts a single data item by deleting existing items with the same 
-           ticker and item_type, then inserting the new item. 
-           Suitable for CUMULATIVE_SNAPSHOT or similar. Uses models from yahoo_models.py.
+        """Upserts the single data item kept per ticker and item_type (CUMULATIVE_SNAPSHOT or similar).
+           Uses models from yahoo_models.py.
+
+           The stored item keeps its data_item_id: with the same key (item_time_coverage, item_key_date) the item
+           is written with INSERT ... ON CONFLICT DO UPDATE (rewritten only if its payload_hash changed); with a
+           new key the newest stored item is re-keyed and rewritten by a single UPDATE. Any further items of the
+           same ticker/item_type are deleted. If the single stored item already has the same payload_hash,
+           nothing is written. Returns the item's id, or None on error.
         """
         ticker = item_data.get('ticker')
         item_type = item_data.get('item_type')
@@ -279,43 +761,57 @@ class YahooDataRepository:
             logger.error("[DB DataItems Upsert - Yahoo Repo] Ticker and Item Type required. Skipping.")
             return None
 
-        if not isinstance(item_data.get('item_data_payload'), str):
-            try:
-                item_data['item_data_payload'] = json.dumps(item_data['item_data_payload'])
-            except TypeError as e:
-                logger.error(f"[DB DataItems Upsert - Yahoo Repo] Could not serialize payload for {ticker}/{item_type}: {e}")
-                return None
-        if isinstance(item_data.get('item_key_date'), str):
-             try:
-                 item_data['item_key_date'] = datetime.fromisoformat(item_data.get('item_key_date'))
-             except ValueError:
-                 logger.error(f"[DB DataItems Upsert - Yahoo Repo] Invalid date format {item_data.get('item_key_date')} for {ticker}/{item_type}.")
-                 return None
+        prepared = self._prepare_data_items_for_insert([item_data], datetime.now(), "[DB DataItems Upsert - Yahoo Repo]")
+        if not prepared:
+            return None
+        item = prepared[0]
+        item_key = self._data_item_key(item)
 
         logger.info(f"[DB DataItems Upsert - Yahoo Repo] Upserting item for ticker '{ticker}', type '{item_type}'")
 
         try:
-            async with self.async_session_factory() as session:
+            async with self._field_catalog_updates() as catalog_recorded, self._write_session() as session:
                 async with session.begin():
-                    delete_stmt = delete(TickerDataItemsModel).where(
-                        TickerDataItemsModel.ticker == ticker,
-                        TickerDataItemsModel.item_type == item_type
-                    )
-                    delete_result = await session.execute(delete_stmt)
-                    logger.debug(f"[DB DataItems Upsert - Yahoo Repo] Deleted {delete_result.rowcount} existing for {ticker}/{item_type}.")
-
-                    if 'fetch_timestamp_utc' not in item_data:
-                        item_data['fetch_timestamp_utc'] = datetime.now()
-                        
-                    insert_stmt = insert(TickerDataItemsModel).values(**item_data)
-                    insert_result = await session.execute(insert_stmt)
-                    inserted_id = insert_result.inserted_primary_key[0] if insert_result.inserted_primary_key else None
-                    
-                    if inserted_id:
-                        logger.info(f"[DB DataItems Upsert - Yahoo Repo] Successfully upserted {ticker}/{item_type}, new id {inserted_id}.")
+                    existing = await self._existing_item_hashes(session, [item])
+                    if len(existing) == 1:
+                        existing_id, existing_hash = next(iter(existing.values()))
+                        if existing_hash is not None and existing_hash == item['payload_hash']:
+                            logger.info(f"[DB DataItems Upsert - Yahoo Repo] Payload for {ticker}/{item_type} unchanged (id {existing_id}). Nothing rewritten.")
+                            return existing_id
+
+                    rekeyed_id = None
+                    if existing and item_key not in existing:
+                        # New key: the newest stored item takes it over, keeping its id
+                        rekeyed_id = existing.pop(max(existing, key=lambda key: key[3]))[0]
+
+                    other_ids = [data_item_id for key, (data_item_id, _) in existing.items() if key != item_key]
+                    if other_ids:
+                        await session.execute(delete(TickerDataItemsModel).where(TickerDataItemsModel.data_item_id.in_(other_ids)))
+                        await session.execute(delete(TickerDataValuesModel).where(TickerDataValuesModel.data_item_id.in_(other_ids)))
+                        logger.debug(f"[DB DataItems Upsert - Yahoo Repo] Deleted {len(other_ids)} additional items for {ticker}/{item_type}.")
+
+                    if rekeyed_id is None:
+                        stats = await self._upsert_prepared_items(session, [item], existing)
+                        if not stats['changed_items']:
+                            logger.info(f"[DB DataItems Upsert - Yahoo Repo] Payload for {ticker}/{item_type} unchanged (id {existing[item_key][0]}).")
+                            return existing[item_key][0]
+                        data_item_id = stats['changed_items'][0]['data_item_id']
                     else:
-                        logger.warning(f"[DB DataItems Upsert - Yahoo Repo] Insert for {ticker}/{item_type} gave no ID.")
-                    return inserted_id
+                        data_item_id = rekeyed_id
+                        await session.execute(
+                            update(TickerDataItemsModel)
+                            .where(TickerDataItemsModel.data_item_id == data_item_id)
+                            .values(**{column: item.get(column) for column in (
+                                'item_time_coverage', 'item_key_date', 'item_data_payload', 'payload_hash', 'fetch_timestamp_utc', 'item_source'
+                            )})
+                        )
+                        value_rows = self._build_data_value_rows(data_item_id, item)
+                        if value_rows or item_type.upper() in DATA_VALUE_ITEM_TYPES:
+                            await session.execute(delete(TickerDataValuesModel).where(TickerDataValuesModel.data_item_id == data_item_id))
+                            await self._insert_data_value_rows(session, value_rows)
+                    await self._record_field_catalog(session, catalog_recorded, items=[item])
+                    logger.info(f"[DB DataItems Upsert - Yahoo Repo] Successfully upserted {ticker}/{item_type}, id {data_item_id}.")
+                    return data_item_id
 
         except IntegrityError as e:
             logger.error(f"[DB DataItems Upsert - Yahoo Repo] IntegrityError for {ticker}/{item_type}: {e}", exc_info=False)
@@ -323,87 +819,140 @@ class YahooDataRepository:
         except Exception as e:
             logger.error(f"[DB DataItems Upsert - Yahoo Repo] Unexpected error for {ticker}/{item_type}: {e}", exc_info=True)
             return None
-    # --- End Upsert Single Ticker Data Item --- 
+    # --- End Upsert Single Ticker Data Item ---
+
+    # --- Upsert Multiple Ticker Data Items (INSERT ... ON CONFLICT DO UPDATE) ---
+    async def upsert_ticker_data_items(self, items_data: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Inserts or updates many data items by their unique key (ticker, item_type, item_time_coverage,
+           item_key_date) in one transaction, with a single INSERT ... ON CONFLICT DO UPDATE executemany.
+           Existing rows keep their data_item_id and are only rewritten if their payload_hash changed;
+           ticker_data_values rows are synced for every written statement item.
+
+        Args:
+            items_data: A list of dictionaries like the ones passed to insert_ticker_data_items.
+
+        Returns:
+            Dict with 'items_new', 'items_updated', 'items_unchanged' and 'changed_items' (see store_ticker_statements).
+        """
+        prepared = self._prepare_data_items_for_insert(items_data, datetime.now(), "[DB DataItems Batch Upsert - Yahoo Repo]")
+        if not prepared:
+            logger.info("[DB DataItems Batch Upsert - Yahoo Repo] No valid items to upsert.")
+            return {'items_new': 0, 'items_updated': 0, 'items_unchanged': 0, 'changed_items': []}
+        try:
+            async with self._field_catalog_updates() as catalog_recorded, self._write_session() as session:
+                async with session.begin():
+                    existing = await self._existing_item_hashes(session, prepared)
+                    stats = await self._upsert_prepared_items(session, prepared, existing)
+                    await self._record_field_catalog(session, catalog_recorded, items=prepared)
+            logger.info(f"[DB DataItems Batch Upsert - Yahoo Repo] Upserted {len(prepared)} items: {stats['items_new']} new, {stats['items_updated']} updated, {stats['items_unchanged']} unchanged.")
+            return stats
+        except SQLAlchemyError as e:
+            logger.error(f"[DB DataItems Batch Upsert - Yahoo Repo] SQLAlchemyError upserting {len(prepared)} items: {e}. Batch rolled back.", exc_info=True)
+            raise
+    # --- End Upsert Multiple Ticker Data Items ---
+
+
+    async def _store_ttm_item(
+        self,
+        session: AsyncSession,
+        item: Dict[str, Any],
+        existing: Dict[Tuple[str, str, str, datetime], Tuple[int, Optional[str]]]
+    ) -> Dict[str, Any]:
+        """Writes a TTM (or similar single-representative) item inside the caller's transaction. The rule shared by
+           upsert_single_ttm_statement and store_ticker_statements: a ticker/item_type/item_time_coverage series keeps
+           one row, and it ends up with the item's key date and payload.
+            - same key date stored: written with _upsert_prepared_items, i.e. rewritten only if payload_hash changed
+            - other key date stored: the newest stored row is re-keyed to the item's key date (keeping its
+              data_item_id) and takes its payload, fetch_timestamp_utc and source; counted as updated
+            - nothing stored: inserted
+           Any further rows of the series are deleted. An unchanged payload under the same key date is not written,
+           so its fetch_timestamp_utc keeps the time the payload was last written (what the incremental analytics
+           refresh compares against), not the time it was last fetched.
+
+        Args:
+            item: A prepared item (see _prepare_data_items_for_insert).
+            existing: _existing_item_hashes result covering the item's ticker and item_type.
+
+        Returns:
+            The _upsert_prepared_items stats plus 'ttm_items_replaced' (rows of the series deleted) and
+            'data_item_id' (the series' row).
+        """
+        item_key = self._data_item_key(item)
+        series = {key: value for key, value in existing.items() if key[:3] == item_key[:3]}
+        if item_key in series or not series:
+            stats = await self._upsert_prepared_items(session, [item], series)
+            data_item_id = series[item_key][0] if item_key in series else stats['changed_items'][0]['data_item_id']
+        else:
+            data_item_id, stored_hash = series[max(series, key=lambda key: key[3])]
+            await session.execute(
+                update(TickerDataItemsModel)
+                .where(TickerDataItemsModel.data_item_id == data_item_id)
+                .values(**{column: item.get(column) for column in (
+                    'item_key_date', 'item_data_payload', 'payload_hash', 'fetch_timestamp_utc', 'item_source'
+                )})
+            )
+            if stored_hash is not None and stored_hash == item['payload_hash']:
+                await session.execute(
+                    update(TickerDataValuesModel)
+                    .where(TickerDataValuesModel.data_item_id == data_item_id)
+                    .values(item_key_date=item['item_key_date'])
+                )
+            else:
+                await session.execute(delete(TickerDataValuesModel).where(TickerDataValuesModel.data_item_id == data_item_id))
+                await self._insert_data_value_rows(session, self._build_data_value_rows(data_item_id, item))
+            stats = {'items_new': 0, 'items_updated': 1, 'items_unchanged': 0, 'changed_items': [{
+                'data_item_id': data_item_id,
+                'ticker': item['ticker'],
+                'item_type': item['item_type'],
+                'item_time_coverage': item['item_time_coverage'],
+                'item_key_date': item['item_key_date'],
+                'change': 'updated'
+            }]}
+
+        other_ids = [other_id for other_id, _ in series.values() if other_id != data_item_id]
+        if other_ids:
+            await session.execute(delete(TickerDataItemsModel).where(TickerDataItemsModel.data_item_id.in_(other_ids)))
+            await session.execute(delete(TickerDataValuesModel).where(TickerDataValuesModel.data_item_id.in_(other_ids)))
+        stats['ttm_items_replaced'] = len(other_ids)
+        stats['data_item_id'] = data_item_id
+        return stats
 
     async def upsert_single_ttm_statement(self, item_data: Dict[str, Any]) -> Optional[int]:
         """
-        Upserts a TTM (or similar single-representative) data item.
-        1. Tries to insert the new item. If it has an identical unique key (ticker, type, coverage, key_date),
-           the insert is ignored.
-        2. If the new item was successfully inserted (meaning its key_date is new for this TTM item),
-           it then deletes all other items for the same ticker/type/coverage
-           that have a *different* item_key_date.
-        This ensures only one TTM record (the one with the specific item_key_date from item_data) remains.
+        Upserts a TTM (or similar single-representative) data item: the series of its ticker/type/coverage keeps a
+        single row, with this item's key date and payload (see _store_ttm_item, shared with store_ticker_statements).
+        An existing row keeps its data_item_id; an unchanged payload with the stored key date writes nothing.
+        Returns the id of the series' row, or None on error.
         """
         ticker = item_data.get('ticker')
         item_type = item_data.get('item_type')
         item_time_coverage = item_data.get('item_time_coverage')
-        current_item_key_date = item_data.get('item_key_date') # This is the key_date of the TTM data being processed
 
-        if not all([ticker, item_type, item_time_coverage, current_item_key_date]):
+        if not all([ticker, item_type, item_time_coverage, item_data.get('item_key_date')]):
             logger.error(f"[DB TTM Upsert - Yahoo Repo] Missing critical fields for TTM upsert: ticker, item_type, item_time_coverage, or item_key_date. Data: {item_data}")
             return None
+        prepared = self._prepare_data_items_for_insert([item_data], datetime.now(), "[DB TTM Upsert - Yahoo Repo]")
+        if not prepared:
+            return None
+        item = prepared[0]
 
-        # Ensure payload is JSON string and key_date is datetime
-        if not isinstance(item_data.get('item_data_payload'), str):
-            try:
-                item_data['item_data_payload'] = json.dumps(item_data['item_data_payload'])
-            except TypeError as e:
-                logger.error(f"[DB TTM Upsert - Yahoo Repo] Could not serialize payload for {ticker}/{item_type}/{item_time_coverage}: {e}")
-                return None
-        
-        if isinstance(current_item_key_date, str):
-            try:
-                current_item_key_date = datetime.fromisoformat(current_item_key_date)
-                item_data['item_key_date'] = current_item_key_date # Update dict with datetime object
-            except ValueError:
-                logger.error(f"[DB TTM Upsert - Yahoo Repo] Invalid date format for item_key_date \'{current_item_key_date}\' for {ticker}/{item_type}/{item_time_coverage}.")
-                return None
-        
-        if 'fetch_timestamp_utc' not in item_data: # Should be set before calling this normally
-            item_data['fetch_timestamp_utc'] = datetime.now()
-
-
-        logger.info(f"[DB TTM Upsert - Yahoo Repo] Processing TTM item for {ticker}, type '{item_type}', coverage '{item_time_coverage}', key_date '{current_item_key_date.date()}'.")
+        logger.info(f"[DB TTM Upsert - Yahoo Repo] Processing TTM item for {ticker}, type '{item_type}', coverage '{item_time_coverage}', key_date '{item['item_key_date'].date()}'.")
 
-        inserted_id: Optional[int] = None
-        
         try:
-            async with self.async_session_factory() as session:
+            async with self._field_catalog_updates() as catalog_recorded, self._write_session() as session:
                 async with session.begin():
-                    # Step 1: Attempt to insert the new TTM record
-                    # ON CONFLICT DO NOTHING for the exact same record (same ticker, type, coverage, key_date)
-                    insert_stmt = sqlite_insert(TickerDataItemsModel).values(**item_data)
-                    insert_stmt = insert_stmt.on_conflict_do_nothing(
-                        index_elements=['ticker', 'item_type', 'item_time_coverage', 'item_key_date']
-                    )
-                    result = await session.execute(insert_stmt)
-                    inserted_id = result.inserted_primary_key[0] if result.inserted_primary_key else None
-
-                    if inserted_id:
-                        logger.info(f"[DB TTM Upsert - Yahoo Repo] Successfully inserted new TTM record for {ticker}/{item_type}/{item_time_coverage} with key_date {current_item_key_date.date()}, ID: {inserted_id}.")
-                        
-                        # Step 2: If insert was successful, delete all other TTM records for this ticker/type/coverage
-                        # that have a *different* item_key_date.
-                        delete_stmt = delete(TickerDataItemsModel).where(
-                            TickerDataItemsModel.ticker == ticker,
-                            TickerDataItemsModel.item_type == item_type,
-                            TickerDataItemsModel.item_time_coverage == item_time_coverage,
-                            TickerDataItemsModel.item_key_date != current_item_key_date # Crucial: DO NOT delete the one just inserted
-                        )
-                        delete_result = await session.execute(delete_stmt)
-                        if delete_result.rowcount > 0:
-                            logger.info(f"[DB TTM Upsert - Yahoo Repo] Deleted {delete_result.rowcount} older TTM records for {ticker}/{item_type}/{item_time_coverage} to keep only key_date {current_item_key_date.date()}.")
-                        else:
-                            logger.info(f"[DB TTM Upsert - Yahoo Repo] No older TTM records found to delete for {ticker}/{item_type}/{item_time_coverage} (other than key_date {current_item_key_date.date()}).")
-                    else:
-                        # Insert was ignored due to conflict on the full unique key.
-                        logger.info(f"[DB TTM Upsert - Yahoo Repo] TTM record for {ticker}/{item_type}/{item_time_coverage} with key_date {current_item_key_date.date()} already exists. No changes made.")
-                
-                # session.commit() is handled by async with session.begin()
-            return inserted_id
+                    existing = await self._existing_item_hashes(session, [item])
+                    stats = await self._store_ttm_item(session, item, existing)
+                    if stats['changed_items']:
+                        await self._record_field_catalog(session, catalog_recorded, items=[item])
+            if stats['changed_items']:
+                logger.info(f"[DB TTM Upsert - Yahoo Repo] Stored TTM record for {ticker}/{item_type}/{item_time_coverage} with key_date {item['item_key_date'].date()}, "
+                            f"ID: {stats['data_item_id']} ({stats['changed_items'][0]['change']}, {stats['ttm_items_replaced']} older records deleted).")
+            else:
+                logger.info(f"[DB TTM Upsert - Yahoo Repo] Payload for {ticker}/{item_type}/{item_time_coverage} unchanged (id {stats['data_item_id']}). Nothing rewritten.")
+            return stats['data_item_id']
 
-        except IntegrityError as e: # Should ideally not be hit due to on_conflict_do_nothing for insert
+        except IntegrityError as e:
             logger.error(f"[DB TTM Upsert - Yahoo Repo] IntegrityError for {ticker}/{item_type}/{item_time_coverage}: {e}", exc_info=False) # Less verbose for integrity
             return None
         except Exception as e:
@@ -411,6 +960,64 @@ class YahooDataRepository:
             return None
     # --- End Upsert Single TTM Statement ---
 
+    # --- Store All Statements For A Ticker ---
+    async def store_ticker_statements(
+        self,
+        period_items: List[Dict[str, Any]],
+        ttm_items: Optional[List[Dict[str, Any]]] = None
+    ) -> Dict[str, Any]:
+        """
+        Stores every financial statement fetched for a ticker in a single transaction.
+
+        Period items are written with one INSERT ... ON CONFLICT DO UPDATE executemany (see upsert_ticker_data_items)
+        and classified by payload_hash against the stored row of the same (ticker, item_type, item_time_coverage,
+        item_key_date):
+            - new: no such row; inserted.
+            - updated: the payload differs (e.g. a restated report). Rewritten in place, keeping its data_item_id.
+            - unchanged: same hash. Nothing is written.
+        ttm_items follow the single-row rule of upsert_single_ttm_statement (_store_ttm_item): a new key date
+        re-keys the stored row (updated) and the series' other rows are deleted (ttm_items_replaced).
+        ticker_data_values rows are written for every new item and rebuilt for every updated one.
+
+        Returns:
+            Dict with the counters 'items_new', 'items_updated', 'items_unchanged', 'ttm_items_replaced'
+            (older TTM rows deleted) and 'changed_items': one dict per new or updated row with its
+            'data_item_id', 'ticker', 'item_type', 'item_time_coverage', 'item_key_date' and 'change'
+            ('new' or 'updated').
+        """
+        now_local = datetime.now()
+        prepared_periods = self._prepare_data_items_for_insert(period_items, now_local, "[DB Statements Store]")
+        prepared_ttm = self._prepare_data_items_for_insert(ttm_items or [], now_local, "[DB Statements Store]")
+        if not prepared_periods and not prepared_ttm:
+            logger.info("[DB Statements Store] No valid statement items to store.")
+            return {'items_new': 0, 'items_updated': 0, 'items_unchanged': 0, 'ttm_items_replaced': 0, 'changed_items': []}
+
+        tickers = {item['ticker'] for item in prepared_periods + prepared_ttm}
+        try:
+            async with self._field_catalog_updates() as catalog_recorded, self._write_session() as session:
+                async with session.begin():
+                    existing = await self._existing_item_hashes(session, prepared_periods + prepared_ttm)
+                    stats = await self._upsert_prepared_items(session, prepared_periods, existing)
+                    stats['ttm_items_replaced'] = 0
+                    for item in prepared_ttm:
+                        ttm_stats = await self._store_ttm_item(session, item, existing)
+                        for counter in ('items_new', 'items_updated', 'items_unchanged', 'ttm_items_replaced'):
+                            stats[counter] += ttm_stats[counter]
+                        stats['changed_items'].extend(ttm_stats['changed_items'])
+                    await self._record_field_catalog(session, catalog_recorded, items=prepared_periods + prepared_ttm)
+            logger.info(
+                f"[DB Statements Store] Stored statements for {', '.join(sorted(tickers))}: {stats['items_new']} new, "
+                f"{stats['items_updated']} updated, {stats['items_unchanged']} unchanged, {stats['ttm_items_replaced']} older TTM rows replaced."
+            )
+            return stats
+        except SQLAlchemyError as e:
+            logger.error(f"[DB Statements Store] SQLAlchemyError storing statements for {', '.join(sorted(tickers))}: {e}. Transaction rolled back.", exc_info=True)
+            raise
+        except Exception as e:
+            logger.error(f"[DB Statements Store] Unexpected error storing statements for {', '.join(sorted(tickers))}: {e}. Transaction rolled back.", exc_info=True)
+            raise
+    # --- End Store All Statements For A Ticker ---
+
     async def get_latest_item_payload(
         self, 
         ticker: str, 
@@ -438,14 +1045,14 @@ class YahooDataRepository:
         )
 
         try:
-            async with self.async_session_factory() as session:
+            async with self.read_session_factory() as session:
                 result = await session.execute(stmt)
                 scalar_result = result.scalar_one_or_none()
                 
                 if scalar_result:
                     logger.debug(f"[DB Get Latest Payload] Found existing payload for {ticker}/{item_type}/{item_time_coverage}.")
                     try:
-                        payload_dict = json.loads(scalar_result) # scalar_result is the JSON string
+                        payload_dict = fastjson.loads(scalar_result) # scalar_result is the JSON string
                         return payload_dict
                     except json.JSONDecodeError as e:
                         logger.error(f"[DB Get Latest Payload] Error decoding JSON payload for {ticker}/{item_type}/{item_time_coverage}: {e}. Payload: {scalar_result[:200]}")
@@ -479,6 +1086,15 @@ class YahooDataRepository:
                 dict_representation[column.name] = value
         return dict_representation
 
+    @staticmethod
+    def _row_to_dict(row_map: Any, columns: List[Any]) -> Dict[str, Any]:
+        """_model_to_dict for rows selected column by column (e.g. without the payload)."""
+        dict_representation = {}
+        for column in columns:
+            value = row_map[column.key]
+            dict_representation[column.key] = value.isoformat() if isinstance(value, datetime) else value
+        return dict_representation
+
     async def get_ticker_master_by_ticker(self, ticker_symbol: str) -> Optional[Dict[str, Any]]:
         """Retrieves a ticker_master record by ticker symbol (case-insensitive via DB collation) 
            and returns it as a dictionary.
@@ -492,7 +1108,7 @@ class YahooDataRepository:
         stmt = select(YahooTickerMasterModel).where(YahooTickerMasterModel.ticker == ticker_symbol)
         
         try:
-            async with self.async_session_factory() as session:
+            async with self.read_session_factory() as session:
                 result = await session.execute(stmt)
                 model_instance = result.scalar_one_or_none()
                 
@@ -509,38 +1125,65 @@ class YahooDataRepository:
             logger.error(f"[DB Get Master] Unexpected error fetching master record for {ticker_symbol}: {e}", exc_info=True)
             return None
 
-    async def get_ticker_masters_by_criteria(self, filters: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+    @staticmethod
+    def _ticker_master_columns(columns: Optional[List[str]], log_prefix: str) -> List[Any]:
+        """ticker_master Column objects to select: all columns if columns is None, else the named ones
+           (unknown names are logged and skipped). The ticker is always included, first.
+        """
+        table_columns = YahooTickerMasterModel.__table__.columns
+        if columns is None:
+            return list(table_columns)
+        selected = [table_columns['ticker']]
+        for column_name in columns:
+            if column_name == 'ticker':
+                continue
+            if column_name in table_columns:
+                selected.append(table_columns[column_name])
+            else:
+                logger.warning(f"{log_prefix} Invalid column: {column_name}. Skipping it.")
+        return selected
+
+    @staticmethod
+    def _ticker_master_filter_clauses(filters: Optional[Dict[str, Any]], log_prefix: str) -> List[Any]:
+        """WHERE clauses for column filters: a scalar value is compared with == (string columns are NOCASE),
+           a list/tuple/set becomes IN, None becomes IS NULL. Unknown columns are logged and skipped.
+        """
+        clauses = []
+        for column_name, value in (filters or {}).items():
+            if not hasattr(YahooTickerMasterModel, column_name):
+                logger.warning(f"{log_prefix} Invalid filter column: {column_name}. Skipping this filter.")
+                continue
+            column = getattr(YahooTickerMasterModel, column_name)
+            if value is None:
+                clauses.append(column.is_(None))
+            elif isinstance(value, (list, tuple, set)):
+                clauses.append(column.in_(list(value)))
+            else:
+                # Direct comparison, relies on COLLATE NOCASE in schema for string columns
+                clauses.append(column == value)
+        return clauses
+
+    async def get_ticker_masters_by_criteria(
+        self,
+        filters: Optional[Dict[str, Any]] = None,
+        columns: Optional[List[str]] = None
+    ) -> List[Dict[str, Any]]:
         """Retrieves ticker_master records based on filter criteria (case-insensitivity for string fields 
            handled by DB collation) and returns them as a list of dictionaries.
+
+        Args:
+            filters: {column: value}; see _ticker_master_filter_clauses.
+            columns: Columns to return (plus 'ticker'). None returns every column.
         """
         logger.debug(f"[DB Get Masters By Criteria] Fetching records with filters: {filters}")
-        
-        # String columns list is no longer needed here as collation handles it
-        # string_columns_for_case_insensitive_filter = [
-        #     'ticker', 'company_name', 'country', 'exchange', 'industry', 'sector', 
-        #     'trade_currency', 'asset_type', 'recommendation_key'
-        # ]
-
-        stmt = select(YahooTickerMasterModel)
-        if filters:
-            for column_name, value in filters.items():
-                if hasattr(YahooTickerMasterModel, column_name):
-                    # Direct comparison, relies on COLLATE NOCASE in schema for string columns
-                    stmt = stmt.where(getattr(YahooTickerMasterModel, column_name) == value)
-                else:
-                    logger.warning(f"[DB Get Masters By Criteria] Invalid filter column: {column_name}. Skipping this filter.")
-        
-        records = []
+
+        selected_columns = self._ticker_master_columns(columns, "[DB Get Masters By Criteria]")
+        stmt = select(*selected_columns).where(*self._ticker_master_filter_clauses(filters, "[DB Get Masters By Criteria]"))
+
         try:
-            async with self.async_session_factory() as session:
+            async with self.read_session_factory() as session:
                 result = await session.execute(stmt)
-                model_instances = result.scalars().all()
-                
-                for instance in model_instances:
-                    dict_repr = self._model_to_dict(instance)
-                    if dict_repr:
-                        records.append(dict_repr)
-                
+                records = [self._row_to_dict(row, selected_columns) for row in result.mappings()]
                 logger.info(f"[DB Get Masters By Criteria] Found {len(records)} records matching criteria.")
             return records
         except SQLAlchemyError as e:
@@ -550,6 +1193,139 @@ class YahooDataRepository:
             logger.error(f"[DB Get Masters By Criteria] Unexpected error: {e}", exc_info=True)
             return [] # Return empty list on error
 
+    async def get_ticker_masters_page(
+        self,
+        columns: Optional[List[str]] = None,
+        filters: Optional[Dict[str, Any]] = None,
+        after_ticker: Optional[str] = None,
+        page_size: int = TICKER_MASTER_PAGE_SIZE
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """Retrieves one keyset page of ticker_master records in ticker order.
+
+        Args:
+            columns: Columns to return (plus 'ticker'). None returns every column.
+            filters: {column: value}; see _ticker_master_filter_clauses.
+            after_ticker: Cursor: the page starts after this ticker (None for the first page).
+            page_size: Maximum number of records in the page.
+
+        Returns:
+            (records, next_cursor). next_cursor is the ticker to pass as after_ticker for the next page,
+            or None if this was the last page. Raises SQLAlchemyError on database errors.
+        """
+        page_size = max(1, page_size)
+        selected_columns = self._ticker_master_columns(columns, "[DB Get Masters Page]")
+        clauses = self._ticker_master_filter_clauses(filters, "[DB Get Masters Page]")
+        if after_ticker is not None:
+            # The primary key index walks in NOCASE order, the same collation this comparison uses
+            clauses.append(YahooTickerMasterModel.ticker > after_ticker)
+        stmt = select(*selected_columns).where(*clauses).order_by(YahooTickerMasterModel.ticker).limit(page_size)
+        async with self.read_session_factory() as session:
+            result = await session.execute(stmt)
+            records = [self._row_to_dict(row, selected_columns) for row in result.mappings()]
+        next_cursor = records[-1]['ticker'] if len(records) == page_size else None
+        return records, next_cursor
+
+    async def iter_ticker_masters(
+        self,
+        columns: Optional[List[str]] = None,
+        filters: Optional[Dict[str, Any]] = None,
+        page_size: int = TICKER_MASTER_PAGE_SIZE
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Streams ticker_master records in ticker order, one keyset page (and one short read) at a time,
+           so callers never hold the whole table. See get_ticker_masters_page for the arguments.
+        """
+        cursor = None
+        records_yielded = 0
+        while True:
+            records, cursor = await self.get_ticker_masters_page(columns, filters, cursor, page_size)
+            for record in records:
+                yield record
+            records_yielded += len(records)
+            if cursor is None:
+                break
+        logger.debug(f"[DB Iter Masters] Streamed {records_yielded} ticker_master records.")
+
+    async def get_ticker_masters_for_tickers(
+        self,
+        tickers: List[str],
+        chunk_size: int = LATEST_PAYLOAD_TICKER_CHUNK_SIZE
+    ) -> Dict[str, Dict[str, Any]]:
+        """Retrieves ticker_master records for many tickers with chunked IN queries.
+           Returns {ticker: record_dict}, keyed by the tickers as passed in; tickers without a
+           master record are omitted.
+        """
+        if not tickers:
+            return {}
+
+        requested_tickers = {ticker.upper(): ticker for ticker in tickers}
+        chunk_size = max(1, chunk_size)
+        records: Dict[str, Dict[str, Any]] = {}
+        try:
+            async with self.read_session_factory() as session:
+                for chunk_start in range(0, len(tickers), chunk_size):
+                    ticker_chunk = tickers[chunk_start:chunk_start + chunk_size]
+                    stmt = select(YahooTickerMasterModel).where(YahooTickerMasterModel.ticker.in_(ticker_chunk))
+                    result = await session.execute(stmt)
+                    for instance in result.scalars():
+                        dict_repr = self._model_to_dict(instance)
+                        if dict_repr:
+                            records[requested_tickers.get(instance.ticker.upper(), instance.ticker)] = dict_repr
+            logger.debug(f"[DB Get Masters For Tickers] Found {len(records)} of {len(tickers)} requested records.")
+            return records
+        except SQLAlchemyError as e:
+            logger.error(f"[DB Get Masters For Tickers] SQLAlchemyError: {e}", exc_info=True)
+            return {}
+        except Exception as e:
+            logger.error(f"[DB Get Masters For Tickers] Unexpected error: {e}", exc_info=True)
+            return {}
+
+    @staticmethod
+    def _json_field_projection(field_keys: List[str]) -> List[Any]:
+        """Select columns that pull the requested top-level keys out of item_data_payload with json_extract,
+           so only those values leave the database. Keys are addressed as '$."<key>"' (they contain spaces).
+
+           Compressed payloads (see payload_codec) and payloads SQLite cannot parse (json.dumps writes
+           NaN/Infinity literals, which are not valid JSON) are not projected; the raw payload column is
+           selected for those rows instead and _projected_payload decodes it in Python. json_type is selected alongside each value so objects,
+           arrays and booleans can be restored to the types json.loads would produce.
+        """
+        payload_column = TickerDataItemsModel.item_data_payload
+        is_valid_json = and_(func.typeof(payload_column) == 'text', func.json_valid(payload_column) == 1)
+        columns = [case((is_valid_json, null()), else_=payload_column).label('raw_payload')]
+        for index, field_key in enumerate(field_keys):
+            json_path = f'$."{field_key}"'
+            columns.append(case((is_valid_json, func.json_extract(payload_column, json_path)), else_=null()).label(f'field_value_{index}'))
+            columns.append(case((is_valid_json, func.json_type(payload_column, json_path)), else_=null()).label(f'field_type_{index}'))
+        return columns
+
+    @staticmethod
+    def _projected_payload(row_map: Any, field_keys: List[str]) -> Dict[str, Any]:
+        """Builds the payload dict for a row selected with _json_field_projection. Keys missing from the
+           stored payload are left out, as they would be from the json.loads result.
+        """
+        raw_payload = row_map['raw_payload']
+        if raw_payload is not None:
+            # The CASE expression is untyped, so the column codec is applied here
+            payload = fastjson.loads(decode_payload(raw_payload))
+            if not isinstance(payload, dict):
+                return {}
+            return {field_key: payload[field_key] for field_key in field_keys if field_key in payload}
+
+        projected: Dict[str, Any] = {}
+        for index, field_key in enumerate(field_keys):
+            json_type = row_map[f'field_type_{index}']
+            if json_type is None: # Key not present
+                continue
+            value = row_map[f'field_value_{index}']
+            if json_type in ('object', 'array'):
+                value = fastjson.loads(value)
+            elif json_type == 'true':
+                value = True
+            elif json_type == 'false':
+                value = False
+            projected[field_key] = value
+        return projected
+
     async def get_data_items_by_criteria(
         self,
         ticker: str,
@@ -559,16 +1335,25 @@ class YahooDataRepository:
         start_date: Optional[datetime] = None,
         end_date: Optional[datetime] = None,
         order_by_key_date_desc: bool = True,
-        limit: Optional[int] = None
+        limit: Optional[int] = None,
+        fields: Optional[List[str]] = None
     ) -> List[Dict[str, Any]]:
         """Retrieves ticker_data_items records based on criteria, parses JSON payload.
            String comparisons for ticker, item_type, and item_time_coverage are case-insensitive 
            via DB collation.
+
+           If fields is given, only those payload keys are extracted (json_extract) and item_data_payload
+           contains just them; the full payload is neither transferred nor decoded.
         """
-        logger.debug(f"[DB Get DataItems By Criteria] Fetching for {ticker}, type: {item_type}, coverage: {item_time_coverage}, key_date: {key_date}, start: {start_date}, end: {end_date}, limit: {limit}")
+        logger.debug(f"[DB Get DataItems By Criteria] Fetching for {ticker}, type: {item_type}, coverage: {item_time_coverage}, key_date: {key_date}, start: {start_date}, end: {end_date}, limit: {limit}, fields: {fields}")
 
+        if fields:
+            item_columns = [column for column in TickerDataItemsModel.__table__.columns if column.key != 'item_data_payload']
+            stmt = select(*item_columns, *self._json_field_projection(fields))
+        else:
+            stmt = select(TickerDataItemsModel)
         # Direct comparisons, relies on COLLATE NOCASE in schema
-        stmt = select(TickerDataItemsModel).where(
+        stmt = stmt.where(
             TickerDataItemsModel.ticker == ticker,
             TickerDataItemsModel.item_type == item_type
         )
@@ -593,15 +1378,28 @@ class YahooDataRepository:
 
         items = []
         try:
-            async with self.async_session_factory() as session:
+            async with self.read_session_factory() as session:
                 result = await session.execute(stmt)
+                if fields:
+                    for row in result:
+                        row_map = row._mapping
+                        item_dict = self._row_to_dict(row_map, item_columns)
+                        try:
+                            item_dict['item_data_payload'] = self._projected_payload(row_map, fields)
+                        except json.JSONDecodeError as e_json:
+                            logger.error(f"[DB Get DataItems By Criteria] JSONDecodeError for item {item_dict.get('data_item_id')}: {e_json}")
+                            item_dict['item_data_payload'] = {"error": "Failed to parse payload"}
+                        items.append(item_dict)
+                    logger.info(f"[DB Get DataItems By Criteria] Found {len(items)} items for {ticker}/{item_type} (fields: {fields}).")
+                    return items
+
                 model_instances = result.scalars().all()
 
                 for instance in model_instances:
                     item_dict = self._model_to_dict(instance) # Use existing helper
                     if item_dict and 'item_data_payload' in item_dict and isinstance(item_dict['item_data_payload'], str):
                         try:
-                            item_dict['item_data_payload'] = json.loads(item_dict['item_data_payload'])
+                            item_dict['item_data_payload'] = fastjson.loads(item_dict['item_data_payload'])
                         except json.JSONDecodeError as e_json:
                             logger.error(f"[DB Get DataItems By Criteria] JSONDecodeError for item {item_dict.get('data_item_id')}: {e_json}. Payload: {item_dict['item_data_payload'][:200]}")
                             item_dict['item_data_payload'] = {"error": "Failed to parse payload"} # Or None, or keep string
@@ -617,6 +1415,542 @@ class YahooDataRepository:
             logger.error(f"[DB Get DataItems By Criteria] Unexpected error for {ticker}/{item_type}: {e_gen}", exc_info=True)
             return []
 
+    async def get_data_items_for_tickers(
+        self,
+        tickers: List[str],
+        item_specs: List[Tuple[str, str]],
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        order_by_key_date_desc: bool = False,
+        chunk_size: int = LATEST_PAYLOAD_TICKER_CHUNK_SIZE,
+        field_keys: Optional[List[str]] = None
+    ) -> Dict[str, Dict[Tuple[str, str], List[Dict[str, Any]]]]:
+        """Batched multi-ticker variant of get_data_items_by_criteria.
+
+        Runs one ticker IN (...) query per chunk of tickers covering every (item_type, item_time_coverage)
+        pair in item_specs, decodes each payload once and groups the rows as
+        {ticker: {(ITEM_TYPE, ITEM_TIME_COVERAGE): [item_dict, ...]}}. Tickers are keyed as passed in and
+        spec keys are uppercased; item dicts have the same shape as get_data_items_by_criteria results.
+        Every requested ticker is present in the result, with an empty dict if it has no rows.
+
+        If field_keys is given, callers only read those payload keys and the payloads contain just the
+        requested fields: assembled from ticker_data_values for statement items once it is backfilled,
+        otherwise extracted from the stored payload with json_extract.
+        """
+        results: Dict[str, Dict[Tuple[str, str], List[Dict[str, Any]]]] = {ticker: {} for ticker in tickers}
+        if not tickers or not item_specs:
+            return results
+
+        if field_keys and all(item_type.upper() in DATA_VALUE_ITEM_TYPES for item_type, _ in item_specs) \
+                and await self.is_ticker_data_values_ready():
+            return await self._get_data_item_fields_for_tickers(
+                tickers, item_specs, field_keys, start_date, end_date, order_by_key_date_desc, chunk_size
+            )
+
+        requested_tickers = {ticker.upper(): ticker for ticker in tickers}
+        spec_filter = or_(*[
+            and_(
+                TickerDataItemsModel.item_type == item_type,
+                TickerDataItemsModel.item_time_coverage == item_time_coverage
+            )
+            for item_type, item_time_coverage in item_specs
+        ])
+        if field_keys:
+            item_columns = [column for column in TickerDataItemsModel.__table__.columns if column.key != 'item_data_payload']
+            projection_columns = self._json_field_projection(field_keys)
+        chunk_size = max(1, chunk_size)
+        logger.debug(f"[DB Get DataItems For Tickers] Fetching {item_specs} for {len(tickers)} tickers, start: {start_date}, end: {end_date}, fields: {field_keys}")
+
+        rows_found = 0
+        try:
+            async with self.read_session_factory() as session:
+                for chunk_start in range(0, len(tickers), chunk_size):
+                    ticker_chunk = tickers[chunk_start:chunk_start + chunk_size]
+                    if field_keys:
+                        stmt = select(*item_columns, *projection_columns)
+                    else:
+                        stmt = select(TickerDataItemsModel)
+                    stmt = stmt.where(
+                        TickerDataItemsModel.ticker.in_(ticker_chunk),
+                        spec_filter
+                    )
+                    if start_date:
+                        stmt = stmt.where(TickerDataItemsModel.item_key_date >= start_date)
+                    if end_date:
+                        stmt = stmt.where(TickerDataItemsModel.item_key_date <= end_date)
+                    if order_by_key_date_desc:
+                        stmt = stmt.order_by(TickerDataItemsModel.item_key_date.desc())
+                    else:
+                        stmt = stmt.order_by(TickerDataItemsModel.item_key_date.asc())
+
+                    result = await session.execute(stmt)
+                    for row in result:
+                        if field_keys:
+                            row_map = row._mapping
+                            item_dict = self._row_to_dict(row_map, item_columns)
+                            try:
+                                item_dict['item_data_payload'] = self._projected_payload(row_map, field_keys)
+                            except json.JSONDecodeError as e_json:
+                                logger.error(f"[DB Get DataItems For Tickers] JSONDecodeError for item {item_dict.get('data_item_id')}: {e_json}")
+                                item_dict['item_data_payload'] = {"error": "Failed to parse payload"}
+                        else:
+                            item_dict = self._model_to_dict(row[0])
+                        if item_dict is None:
+                            continue
+                        if isinstance(item_dict.get('item_data_payload'), str):
+                            try:
+                                item_dict['item_data_payload'] = fastjson.loads(item_dict['item_data_payload'])
+                            except json.JSONDecodeError as e_json:
+                                logger.error(f"[DB Get DataItems For Tickers] JSONDecodeError for item {item_dict.get('data_item_id')}: {e_json}. Payload: {item_dict['item_data_payload'][:200]}")
+                                item_dict['item_data_payload'] = {"error": "Failed to parse payload"}
+                        ticker = requested_tickers.get(item_dict['ticker'].upper(), item_dict['ticker'])
+                        spec_key = (item_dict['item_type'].upper(), item_dict['item_time_coverage'].upper())
+                        results.setdefault(ticker, {}).setdefault(spec_key, []).append(item_dict)
+                        rows_found += 1
+            logger.info(f"[DB Get DataItems For Tickers] Found {rows_found} items for {len(tickers)} tickers in {(len(tickers) + chunk_size - 1) // chunk_size} chunk(s).")
+            return results
+        except SQLAlchemyError as e_sql:
+            logger.error(f"[DB Get DataItems For Tickers] SQLAlchemyError: {e_sql}", exc_info=True)
+            return {ticker: {} for ticker in tickers}
+        except Exception as e_gen:
+            logger.error(f"[DB Get DataItems For Tickers] Unexpected error: {e_gen}", exc_info=True)
+            return {ticker: {} for ticker in tickers}
+
+    async def _get_data_item_fields_for_tickers(
+        self,
+        tickers: List[str],
+        item_specs: List[Tuple[str, str]],
+        field_keys: List[str],
+        start_date: Optional[datetime],
+        end_date: Optional[datetime],
+        order_by_key_date_desc: bool,
+        chunk_size: int
+    ) -> Dict[str, Dict[Tuple[str, str], List[Dict[str, Any]]]]:
+        """get_data_items_for_tickers backed by ticker_data_values: selects the item columns without the
+           payload and LEFT JOINs the requested fields, so every matching item is returned (with an empty
+           payload if it has none of the fields) and no JSON is decoded. NULL values come back as NaN,
+           matching what json.loads produces for the stored payload.
+        """
+        results: Dict[str, Dict[Tuple[str, str], List[Dict[str, Any]]]] = {ticker: {} for ticker in tickers}
+        requested_tickers = {ticker.upper(): ticker for ticker in tickers}
+        spec_filter = or_(*[
+            and_(
+                TickerDataItemsModel.item_type == item_type,
+                TickerDataItemsModel.item_time_coverage == item_time_coverage
+            )
+            for item_type, item_time_coverage in item_specs
+        ])
+        item_columns = [column for column in TickerDataItemsModel.__table__.columns if column.key != 'item_data_payload']
+        chunk_size = max(1, chunk_size)
+        logger.debug(f"[DB Get DataItem Fields For Tickers] Fetching {field_keys} of {item_specs} for {len(tickers)} tickers, start: {start_date}, end: {end_date}")
+
+        items_found = 0
+        try:
+            async with self.read_session_factory() as session:
+                for chunk_start in range(0, len(tickers), chunk_size):
+                    ticker_chunk = tickers[chunk_start:chunk_start + chunk_size]
+                    stmt = select(*item_columns, TickerDataValuesModel.field_key, TickerDataValuesModel.value).outerjoin(
+                        TickerDataValuesModel,
+                        and_(
+                            TickerDataValuesModel.data_item_id == TickerDataItemsModel.data_item_id,
+                            TickerDataValuesModel.field_key.in_(field_keys)
+                        )
+                    ).where(
+                        TickerDataItemsModel.ticker.in_(ticker_chunk),
+                        spec_filter
+                    )
+                    if start_date:
+                        stmt = stmt.where(TickerDataItemsModel.item_key_date >= start_date)
+                    if end_date:
+                        stmt = stmt.where(TickerDataItemsModel.item_key_date <= end_date)
+                    key_date_order = TickerDataItemsModel.item_key_date.desc() if order_by_key_date_desc else TickerDataItemsModel.item_key_date.asc()
+                    # data_item_id keeps the joined rows of one item adjacent
+                    stmt = stmt.order_by(key_date_order, TickerDataItemsModel.data_item_id)
+
+                    result = await session.execute(stmt)
+                    current_item: Optional[Dict[str, Any]] = None
+                    for row in result:
+                        row_map = row._mapping
+                        if current_item is None or current_item['data_item_id'] != row_map['data_item_id']:
+                            current_item = self._row_to_dict(row_map, item_columns)
+                            current_item['item_data_payload'] = {}
+                            ticker = requested_tickers.get(current_item['ticker'].upper(), current_item['ticker'])
+                            spec_key = (current_item['item_type'].upper(), current_item['item_time_coverage'].upper())
+                            results.setdefault(ticker, {}).setdefault(spec_key, []).append(current_item)
+                            items_found += 1
+                        if row_map['field_key'] is not None:
+                            value = row_map['value']
+                            current_item['item_data_payload'][row_map['field_key']] = float('nan') if value is None else value
+            logger.info(f"[DB Get DataItem Fields For Tickers] Found {items_found} items for {len(tickers)} tickers in {(len(tickers) + chunk_size - 1) // chunk_size} chunk(s).")
+            return results
+        except SQLAlchemyError as e_sql:
+            logger.error(f"[DB Get DataItem Fields For Tickers] SQLAlchemyError: {e_sql}", exc_info=True)
+            return {ticker: {} for ticker in tickers}
+        except Exception as e_gen:
+            logger.error(f"[DB Get DataItem Fields For Tickers] Unexpected error: {e_gen}", exc_info=True)
+            return {ticker: {} for ticker in tickers}
+
+    async def get_field_values_for_tickers(
+        self,
+        tickers: List[str],
+        item_type: str,
+        item_time_coverage: str,
+        field_key: str,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        chunk_size: int = LATEST_PAYLOAD_TICKER_CHUNK_SIZE
+    ) -> Dict[str, List[Dict[str, Any]]]:
+        """Reads one payload field for many tickers from ticker_data_values.
+
+        Each chunk is a range scan on ix_ticker_data_values_lookup; no payload is loaded or decoded.
+        Returns {ticker: [{'item_key_date': datetime, 'value': float}, ...]} in ascending key date order,
+        keyed by the tickers as passed in (every requested ticker is present). NULL values come back as NaN.
+        Only meaningful once is_ticker_data_values_ready() is True.
+        """
+        results: Dict[str, List[Dict[str, Any]]] = {ticker: [] for ticker in tickers}
+        if not tickers:
+            return results
+
+        requested_tickers = {ticker.upper(): ticker for ticker in tickers}
+        chunk_size = max(1, chunk_size)
+        logger.debug(f"[DB Get Field Values] Fetching '{field_key}' of {item_type}/{item_time_coverage} for {len(tickers)} tickers, start: {start_date}, end: {end_date}")
+
+        rows_found = 0
+        try:
+            async with self.read_session_factory() as session:
+                for chunk_start in range(0, len(tickers), chunk_size):
+                    ticker_chunk = tickers[chunk_start:chunk_start + chunk_size]
+                    stmt = select(
+                        TickerDataValuesModel.ticker,
+                        TickerDataValuesModel.item_key_date,
+                        TickerDataValuesModel.value
+                    ).where(
+                        TickerDataValuesModel.ticker.in_(ticker_chunk),
+                        TickerDataValuesModel.item_type == item_type,
+                        TickerDataValuesModel.item_time_coverage == item_time_coverage,
+                        TickerDataValuesModel.field_key == field_key
+                    )
+                    if start_date:
+                        stmt = stmt.where(TickerDataValuesModel.item_key_date >= start_date)
+                    if end_date:
+                        stmt = stmt.where(TickerDataValuesModel.item_key_date <= end_date)
+                    stmt = stmt.order_by(TickerDataValuesModel.ticker, TickerDataValuesModel.item_key_date.asc())
+
+                    result = await session.execute(stmt)
+                    for row_ticker, item_key_date, value in result:
+                        ticker = requested_tickers.get(row_ticker.upper(), row_ticker)
+                        results.setdefault(ticker, []).append({
+                            'item_key_date': item_key_date,
+                            'value': float('nan') if value is None else value
+                        })
+                        rows_found += 1
+            logger.info(f"[DB Get Field Values] Found {rows_found} values of '{field_key}' for {len(tickers)} tickers.")
+            return results
+        except SQLAlchemyError as e_sql:
+            logger.error(f"[DB Get Field Values] SQLAlchemyError: {e_sql}", exc_info=True)
+            return {ticker: [] for ticker in tickers}
+        except Exception as e_gen:
+            logger.error(f"[DB Get Field Values] Unexpected error: {e_gen}", exc_info=True)
+            return {ticker: [] for ticker in tickers}
+
+    async def iter_field_values_for_tickers(
+        self,
+        tickers: List[str],
+        item_type: str,
+        item_time_coverage: str,
+        field_key: str,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        chunk_size: int = LATEST_PAYLOAD_TICKER_CHUNK_SIZE
+    ) -> AsyncIterator[Tuple[str, datetime, Any]]:
+        """Streams one payload field for many tickers as compact (ticker, item_key_date, value) tuples.
+
+        Works on any item type straight from ticker_data_items: each chunk of tickers is one query that
+        extracts just field_key with json_extract (see _json_field_projection), read from a streaming
+        cursor. Tuples come in ascending key date order per ticker, with tickers as passed in. Items
+        without the field, or where it is null, are skipped.
+        """
+        if not tickers:
+            return
+
+        requested_tickers = {ticker.upper(): ticker for ticker in tickers}
+        projection_columns = self._json_field_projection([field_key])
+        chunk_size = max(1, chunk_size)
+        logger.debug(f"[DB Iter Field Values] Streaming '{field_key}' of {item_type}/{item_time_coverage} for {len(tickers)} tickers, start: {start_date}, end: {end_date}")
+
+        rows_yielded = 0
+        try:
+            async with self.read_session_factory() as session:
+                for chunk_start in range(0, len(tickers), chunk_size):
+                    ticker_chunk = tickers[chunk_start:chunk_start + chunk_size]
+                    stmt = select(
+                        TickerDataItemsModel.data_item_id,
+                        TickerDataItemsModel.ticker,
+                        TickerDataItemsModel.item_key_date,
+                        *projection_columns
+                    ).where(
+                        TickerDataItemsModel.ticker.in_(ticker_chunk),
+                        TickerDataItemsModel.item_type == item_type,
+                        TickerDataItemsModel.item_time_coverage == item_time_coverage
+                    )
+                    if start_date:
+                        stmt = stmt.where(TickerDataItemsModel.item_key_date >= start_date)
+                    if end_date:
+                        stmt = stmt.where(TickerDataItemsModel.item_key_date <= end_date)
+                    stmt = stmt.order_by(TickerDataItemsModel.ticker, TickerDataItemsModel.item_key_date.asc())
+
+                    result = await session.stream(stmt)
+                    async for row in result:
+                        row_map = row._mapping
+                        try:
+                            value = self._projected_payload(row_map, [field_key]).get(field_key)
+                        except json.JSONDecodeError as e_json:
+                            logger.error(f"[DB Iter Field Values] JSONDecodeError for item {row_map['data_item_id']}: {e_json}")
+                            continue
+                        if value is None:
+                            continue
+                        rows_yielded += 1
+                        yield requested_tickers.get(row_map['ticker'].upper(), row_map['ticker']), row_map['item_key_date'], value
+        except SQLAlchemyError as e:
+            logger.error(f"[DB Iter Field Values] SQLAlchemyError after {rows_yielded} rows: {e}", exc_info=True)
+            return
+        logger.info(f"[DB Iter Field Values] Streamed {rows_yielded} values of '{field_key}' for {len(tickers)} tickers.")
+
+    async def is_ticker_data_values_ready(self) -> bool:
+        """True once backfill_ticker_data_values has completed for this database."""
+        if self._data_values_ready:
+            return True
+        try:
+            async with self.read_session_factory() as session:
+                state = await session.get(YahooSchemaStateModel, DATA_VALUES_BACKFILL_STATE_KEY)
+            self._data_values_ready = state is not None
+        except SQLAlchemyError as e:
+            # e.g. the table does not exist yet because create_tables has not run on this database
+            logger.warning(f"[DB DataValues Ready] Could not read backfill state: {e}")
+        return self._data_values_ready
+
+    async def backfill_ticker_data_values(self, batch_size: int = DATA_VALUES_BACKFILL_BATCH_SIZE) -> Dict[str, int]:
+        """
+        One-off population of ticker_data_values from the statement items already in ticker_data_items.
+
+        Items are processed in data_item_id order, one transaction per batch; each batch replaces any value
+        rows its items already have, so the backfill can be interrupted and re-run safely. Marks the table
+        as ready in yahoo_schema_state when done.
+
+        Returns:
+            {'items_processed': int, 'values_written': int}
+        """
+        batch_size = max(1, batch_size)
+        last_item_id = 0
+        items_processed = 0
+        values_written = 0
+        logger.info(f"[DB DataValues Backfill] Starting backfill of ticker_data_values (batch size {batch_size}).")
+        try:
+            while True:
+                async with self._write_session() as session:
+                    async with session.begin():
+                        stmt = select(
+                            TickerDataItemsModel.data_item_id,
+                            TickerDataItemsModel.ticker,
+                            TickerDataItemsModel.item_type,
+                            TickerDataItemsModel.item_time_coverage,
+                            TickerDataItemsModel.item_key_date,
+                            TickerDataItemsModel.item_data_payload
+                        ).where(
+                            TickerDataItemsModel.data_item_id > last_item_id,
+                            TickerDataItemsModel.item_type.in_(DATA_VALUE_ITEM_TYPES)
+                        ).order_by(TickerDataItemsModel.data_item_id).limit(batch_size)
+                        rows = (await session.execute(stmt)).all()
+                        if not rows:
+                            break
+
+                        item_ids = [row.data_item_id for row in rows]
+                        await session.execute(delete(TickerDataValuesModel).where(TickerDataValuesModel.data_item_id.in_(item_ids)))
+                        value_rows = []
+                        for row in rows:
+                            value_rows.extend(self._build_data_value_rows(row.data_item_id, dict(row._mapping)))
+                        await self._insert_data_value_rows(session, value_rows)
+
+                last_item_id = item_ids[-1]
+                items_processed += len(rows)
+                values_written += len(value_rows)
+                logger.info(f"[DB DataValues Backfill] Processed {items_processed} items ({values_written} values) up to data_item_id {last_item_id}.")
+
+            async with self._write_session() as session:
+                async with session.begin():
+                    state_stmt = sqlite_insert(YahooSchemaStateModel).values(
+                        state_key=DATA_VALUES_BACKFILL_STATE_KEY,
+                        state_value=str(items_processed),
+                        updated_at=datetime.now()
+                    )
+                    state_stmt = state_stmt.on_conflict_do_update(
+                        index_elements=['state_key'],
+                        set_={'state_value': state_stmt.excluded.state_value, 'updated_at': state_stmt.excluded.updated_at}
+                    )
+                    await session.execute(state_stmt)
+            self._data_values_ready = True
+            logger.info(f"[DB DataValues Backfill] Completed. {items_processed} items, {values_written} values written.")
+            return {'items_processed': items_processed, 'values_written': values_written}
+        except SQLAlchemyError as e:
+            logger.error(f"[DB DataValues Backfill] SQLAlchemyError after {items_processed} items: {e}", exc_info=True)
+            raise
+
+    async def migrate_data_item_payload_encoding(self, batch_size: int = PAYLOAD_MIGRATION_BATCH_SIZE) -> Dict[str, int]:
+        """
+        Online migration of stored payloads to the configured write codec (see payload_codec).
+
+        Rewrites legacy TEXT rows, and rows stored with another codec, in data_item_id order with one short
+        transaction per batch, so the app can keep reading and writing meanwhile. A batch reads and rewrites
+        its rows in the same transaction, so a concurrent update is never overwritten with a stale payload.
+        Safe to interrupt and re-run. Freed pages are reused for new rows; the file itself only shrinks
+        after a VACUUM.
+
+        Returns:
+            {'codec': str, 'items_rewritten': int, 'bytes_before': int, 'bytes_after': int}
+        """
+        codec = get_write_codec()
+        payload_column = TickerDataItemsModel.item_data_payload
+        if codec == 'none':
+            needs_rewrite = func.typeof(payload_column) == 'blob'
+        else:
+            needs_rewrite = or_(
+                func.typeof(payload_column) == 'text',
+                func.substr(payload_column, 1, 1) != PAYLOAD_CODEC_MARKERS[codec]
+            )
+        stored_bytes = func.length(sqlalchemy.cast(payload_column, sqlalchemy.LargeBinary)).label('stored_bytes')
+
+        batch_size = max(1, batch_size)
+        last_item_id = 0
+        items_rewritten = 0
+        bytes_before = 0
+        bytes_after = 0
+        logger.info(f"[DB Payload Migration] Rewriting payloads with codec '{codec}' (batch size {batch_size}).")
+        try:
+            while True:
+                async with self._write_session() as session:
+                    async with session.begin():
+                        stmt = select(
+                            TickerDataItemsModel.data_item_id,
+                            payload_column,
+                            stored_bytes
+                        ).where(
+                            TickerDataItemsModel.data_item_id > last_item_id,
+                            needs_rewrite
+                        ).order_by(TickerDataItemsModel.data_item_id).limit(batch_size)
+                        rows = (await session.execute(stmt)).all()
+                        if not rows:
+                            break
+
+                        # Encoded here rather than by the column type, so the new sizes can be reported
+                        updates = []
+                        for row in rows:
+                            encoded_payload = encode_payload(row.item_data_payload, codec)
+                            updates.append({'data_item_id': row.data_item_id, 'item_data_payload': encoded_payload})
+                            bytes_before += row.stored_bytes or 0
+                            bytes_after += len(encoded_payload.encode('utf-8') if isinstance(encoded_payload, str) else encoded_payload)
+                        await session.execute(update(TickerDataItemsModel), updates)
+
+                last_item_id = rows[-1].data_item_id
+                items_rewritten += len(rows)
+                logger.info(f"[DB Payload Migration] Rewrote {items_rewritten} payloads up to data_item_id {last_item_id} ({bytes_before} -> {bytes_after} bytes).")
+
+            logger.info(f"[DB Payload Migration] Completed. {items_rewritten} payloads rewritten with '{codec}', {bytes_before} -> {bytes_after} bytes.")
+            return {'codec': codec, 'items_rewritten': items_rewritten, 'bytes_before': bytes_before, 'bytes_after': bytes_after}
+        except SQLAlchemyError as e:
+            logger.error(f"[DB Payload Migration] SQLAlchemyError after {items_rewritten} payloads: {e}", exc_info=True)
+            raise
+
+    async def iter_latest_data_item_payloads(
+        self,
+        item_specs: List[Tuple[str, str]],
+        tickers: Optional[List[str]] = None,
+        chunk_size: int = LATEST_PAYLOAD_TICKER_CHUNK_SIZE
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Streams the newest payload for every (ticker, item_type, item_time_coverage) combination.
+
+        Uses one ROW_NUMBER() window query per chunk of tickers (or a single query over the whole
+        table when tickers is None) instead of one SELECT per ticker and item type. Rows are
+        yielded as they arrive from the cursor, as dicts with ticker, item_type, item_time_coverage,
+        item_key_date and the JSON-decoded item_data_payload. Rows whose payload cannot be decoded
+        are logged and skipped. Comparisons are case-insensitive via DB collation.
+
+        Args:
+            item_specs: (item_type, item_time_coverage) pairs to load, as stored in the DB.
+            tickers: Restrict to these tickers. If None, all tickers are streamed.
+            chunk_size: Number of tickers per windowed query.
+        """
+        if not item_specs:
+            logger.warning("[DB Iter Latest Payloads] No item specs provided.")
+            return
+
+        if tickers is None:
+            ticker_chunks: List[Optional[List[str]]] = [None]
+        else:
+            if not tickers:
+                return
+            chunk_size = max(1, chunk_size)
+            ticker_chunks = [tickers[i:i + chunk_size] for i in range(0, len(tickers), chunk_size)]
+
+        spec_filter = or_(*[
+            and_(
+                TickerDataItemsModel.item_type == item_type,
+                TickerDataItemsModel.item_time_coverage == item_time_coverage
+            )
+            for item_type, item_time_coverage in item_specs
+        ])
+        row_number = func.row_number().over(
+            partition_by=(
+                TickerDataItemsModel.ticker,
+                TickerDataItemsModel.item_type,
+                TickerDataItemsModel.item_time_coverage
+            ),
+            order_by=TickerDataItemsModel.item_key_date.desc()
+        ).label('rn')
+
+        logger.debug(f"[DB Iter Latest Payloads] Streaming {len(item_specs)} item specs for {len(tickers) if tickers is not None else 'all'} tickers in {len(ticker_chunks)} chunk(s).")
+        rows_yielded = 0
+        try:
+            async with self.read_session_factory() as session:
+                for chunk in ticker_chunks:
+                    ranked = select(
+                        TickerDataItemsModel.ticker,
+                        TickerDataItemsModel.item_type,
+                        TickerDataItemsModel.item_time_coverage,
+                        TickerDataItemsModel.item_key_date,
+                        TickerDataItemsModel.item_data_payload,
+                        row_number
+                    ).where(spec_filter)
+                    if chunk is not None:
+                        ranked = ranked.where(TickerDataItemsModel.ticker.in_(chunk))
+                    ranked = ranked.subquery()
+                    stmt = select(
+                        ranked.c.ticker,
+                        ranked.c.item_type,
+                        ranked.c.item_time_coverage,
+                        ranked.c.item_key_date,
+                        ranked.c.item_data_payload
+                    ).where(ranked.c.rn == 1)
+
+                    result = await session.stream(stmt)
+                    async for row in result:
+                        try:
+                            payload = fastjson.loads(row.item_data_payload)
+                        except (json.JSONDecodeError, TypeError) as e_json:
+                            logger.error(f"[DB Iter Latest Payloads] Error decoding JSON payload for {row.ticker}/{row.item_type}/{row.item_time_coverage}: {e_json}")
+                            continue
+                        rows_yielded += 1
+                        yield {
+                            'ticker': row.ticker,
+                            'item_type': row.item_type,
+                            'item_time_coverage': row.item_time_coverage,
+                            'item_key_date': row.item_key_date,
+                            'item_data_payload': payload
+                        }
+        except SQLAlchemyError as e:
+            logger.error(f"[DB Iter Latest Payloads] SQLAlchemyError after {rows_yielded} rows: {e}", exc_info=True)
+            return
+        logger.info(f"[DB Iter Latest Payloads] Streamed {rows_yielded} latest payloads.")
+
     async def get_tickers_by_exchanges(self, exchanges: List[str]) -> List[str]:
         """Retrieves a list of ticker symbols for a given list of exchanges."""
         if not exchanges:
@@ -631,7 +1965,7 @@ class YahooDataRepository:
         )
 
         try:
-            async with self.async_session_factory() as session:
+            async with self.read_session_factory() as session:
                 result = await session.execute(stmt)
                 tickers = result.scalars().all()
                 logger.info(f"[DB Get Tickers By Exchanges] Found {len(tickers)} tickers for exchanges {exchanges}.")
@@ -645,19 +1979,25 @@ class YahooDataRepository:
 
     async def get_all_master_tickers(self) -> list[str]:
         """Return a list of all tickers in the Yahoo master ticker table."""
-        records = await self.get_ticker_masters_by_criteria()
-        return [rec['ticker'] for rec in records if 'ticker' in rec and rec['ticker']]
+        try:
+            return [rec['ticker'] async for rec in self.iter_ticker_masters(columns=['ticker']) if rec['ticker']]
+        except SQLAlchemyError as e:
+            logger.error(f"[DB Get All Master Tickers] SQLAlchemyError: {e}", exc_info=True)
+            return []
 
     async def get_all_master_tickers_with_names(self) -> list[dict]:
         """Return a list of dicts with 'ticker' and 'name' for all tickers in the master table."""
-        records = await self.get_ticker_masters_by_criteria()
         # Use 'company_name' from the database and map it to 'name' in the output dictionary.
         # Provide an empty string as a default if company_name is missing or None.
-        return [
-            {"ticker": rec['ticker'], "name": rec.get('company_name') or ''}
-            for rec in records
-            if 'ticker' in rec and rec['ticker']
-        ]
+        try:
+            return [
+                {"ticker": rec['ticker'], "name": rec.get('company_name') or ''}
+                async for rec in self.iter_ticker_masters(columns=['ticker', 'company_name'])
+                if rec['ticker']
+            ]
+        except SQLAlchemyError as e:
+            logger.error(f"[DB Get All Master Tickers With Names] SQLAlchemyError: {e}", exc_info=True)
+            return []
 
     async def yahoo_incremental_refresh(self, limit: int = 200) -> list[str]:
         """
@@ -669,7 +2009,7 @@ class YahooDataRepository:
         Returns:
             list[str]: A list of ticker symbols.
         """
-        async with self.async_session_factory() as session:
+        async with self.read_session_factory() as session:
             query = (
                 select(YahooTickerMasterModel.ticker)
                 .order_by(YahooTickerMasterModel.update_last_full.asc())
@@ -691,107 +2031,186 @@ class YahooDataRepository:
             return 'date'
         return 'unknown'
 
-    async def get_all_yahoo_fields_for_analytics(self) -> list[dict]:
+    async def _scan_yahoo_fields_for_analytics(self, session: AsyncSession) -> List[Dict[str, Any]]:
         """
-        Returns a list of all Yahoo fields for analytics configuration:
-        - Ticker master fields: {name: 'yf_tm_<col>', type: <normalized_type>, example: <sample_value>}
-        - Data item payload fields: {name: 'yf_<item_type>_<item_time_coverage>_<key>', type: <inferred_type>, example: <sample_value>}
-        Only samples records where prun is False (0) to ensure we get active/valid data.
+        Builds yahoo_field_catalog rows from the stored data (the seed of rebuild_field_catalog):
+        - Ticker master columns, with the first non-null value of each column as example.
+        - The payload keys of one non-pruned sample item per (item_type, item_time_coverage).
         """
-        fields = []
+        rows = []
         # --- Ticker Master fields ---
-        async with self.engine.begin() as conn:
-            def get_columns(sync_conn):
-                insp = inspect(sync_conn)
-                tm_table = YahooTickerMasterModel.__table__
-                for col in tm_table.columns:
-                    if col.primary_key:
-                        continue
-                    col_name = f"yf_tm_{col.name}"
-                    col_type_str = str(col.type)
-                    normalized_type = self._normalize_db_type(col_type_str)
-                    
-                    sample_value = None
-                    try:
-                        # Query the first non-null value for this column from YahooTickerMasterModel
-                        # Ensure the column name used in getattr matches the model's attribute name (usually same as col.name)
-                        stmt = select(getattr(YahooTickerMasterModel, col.name)).where(getattr(YahooTickerMasterModel, col.name) != None).limit(1)
-                        result = sync_conn.execute(stmt)
-                        row = result.scalar_one_or_none() # Use scalar_one_or_none to get the value directly
-                        if row is not None:
-                            sample_value = row
-                            # If the sample value is a datetime object, convert it to ISO format string
-                            if isinstance(sample_value, datetime):
-                                sample_value = sample_value.isoformat()
-                    except Exception as e:
-                        logger.warning(f"Could not fetch sample for yf_tm field {col.name}: {e}")
-                        pass # Continue if sample fetching fails for a column
-
-                    fields.append({"name": col_name, "type": normalized_type, "example": sample_value})
-            
-            await conn.run_sync(get_columns)
+        for position, col in enumerate(YahooTickerMasterModel.__table__.columns):
+            if col.primary_key:
+                continue
+            sample_value = None
+            try:
+                # Query the first non-null value for this column from YahooTickerMasterModel
+                stmt = select(getattr(YahooTickerMasterModel, col.name)).where(getattr(YahooTickerMasterModel, col.name) != None).limit(1)
+                sample_value = (await session.execute(stmt)).scalar_one_or_none()
+            except Exception as e:
+                logger.warning(f"Could not fetch sample for yf_tm field {col.name}: {e}")
+            rows.append(self._field_catalog_row(
+                f"yf_tm_{col.name}", 'ticker_master', col.name, position, self._normalize_db_type(str(col.type)), sample_value
+            ))
 
         # --- Data Item payload fields ---
-        async with self.async_session_factory() as session:
-            # Get all unique (item_type, item_time_coverage) from non-pruned records
-            stmt = sqlalchemy.select(
-                TickerDataItemsModel.item_type,
-                TickerDataItemsModel.item_time_coverage
-            ).where(
-                TickerDataItemsModel.prun == False  # Only get non-pruned records
-            ).distinct()
-            result = await session.execute(stmt)
-            unique_types = result.all()
-            
-            # For each unique type/coverage, sample one non-pruned record to analyze payload
-            for item_type, item_time_coverage in unique_types:
-                sample_stmt = (
-                    sqlalchemy.select(TickerDataItemsModel)
-                    .where(TickerDataItemsModel.item_type == item_type)
-                    .where(TickerDataItemsModel.item_time_coverage == item_time_coverage)
-                    .where(TickerDataItemsModel.prun == False)  # Only sample non-pruned records
-                    .limit(1)
+        # Get all unique (item_type, item_time_coverage) from non-pruned records
+        stmt = sqlalchemy.select(
+            TickerDataItemsModel.item_type,
+            TickerDataItemsModel.item_time_coverage
+        ).where(
+            TickerDataItemsModel.prun == False  # Only get non-pruned records
+        ).distinct()
+        unique_types = (await session.execute(stmt)).all()
+
+        # For each unique type/coverage, sample one non-pruned record to analyze payload
+        for item_type, item_time_coverage in unique_types:
+            sample_stmt = (
+                sqlalchemy.select(TickerDataItemsModel.item_data_payload)
+                .where(TickerDataItemsModel.item_type == item_type)
+                .where(TickerDataItemsModel.item_time_coverage == item_time_coverage)
+                .where(TickerDataItemsModel.prun == False)  # Only sample non-pruned records
+                .limit(1)
+            )
+            sample_payload = (await session.execute(sample_stmt)).scalar_one_or_none()
+            if not sample_payload:
+                continue
+            try:
+                payload = fastjson.loads(sample_payload) if isinstance(sample_payload, str) else sample_payload
+                if isinstance(payload, dict):
+                    for position, (key, value) in enumerate(payload.items()):
+                        rows.append(self._field_catalog_row(
+                            f"yf_{item_type.lower()}_{item_time_coverage.lower()}_{key}", 'data_item', key, position,
+                            self._infer_payload_field_type(value), value, item_type.lower(), item_time_coverage.lower()
+                        ))
+            except Exception as e:
+                logger.warning(f"Could not process payload sample for {item_type}/{item_time_coverage}: {e}")
+                continue
+        return rows
+
+    async def is_field_catalog_ready(self) -> bool:
+        """True once rebuild_field_catalog has seeded yahoo_field_catalog for this database."""
+        if self._field_catalog_ready:
+            return True
+        try:
+            async with self.read_session_factory() as session:
+                state = await session.get(YahooSchemaStateModel, FIELD_CATALOG_STATE_KEY)
+            self._field_catalog_ready = state is not None
+        except SQLAlchemyError as e:
+            logger.warning(f"[DB Field Catalog] Could not read catalog state: {e}")
+        return self._field_catalog_ready
+
+    async def rebuild_field_catalog(self) -> Dict[str, int]:
+        """
+        Replaces yahoo_field_catalog with the fields found by sampling the stored data (see
+        _scan_yahoo_fields_for_analytics) and marks it as built. Runs once per database when the field list is
+        first requested; afterwards the write methods keep the catalog current. Re-run it (db_maintenance
+        rebuild-field-catalog) to drop fields that only pruned or deleted items had.
+
+        Returns:
+            {'ticker_master_fields': int, 'data_item_fields': int}
+        """
+        # The scan (a query per ticker_master column plus the payload samples) runs on a read session, so writers
+        # are not blocked while it runs. The replace is one short write transaction: it keeps the rows the write
+        # methods recorded after the scan started, which are at least as current as the scanned ones.
+        scan_started = datetime.now()
+        async with self.read_session_factory() as session:
+            rows = await self._scan_yahoo_fields_for_analytics(session)
+        unique_rows = list({row['field_name']: row for row in reversed(rows)}.values())
+        async with self._write_session("field catalog rebuild") as session:
+            async with session.begin():
+                await session.execute(delete(YahooFieldCatalogModel).where(YahooFieldCatalogModel.updated_at < scan_started))
+                if unique_rows:
+                    await session.execute(sqlite_insert(YahooFieldCatalogModel).on_conflict_do_nothing(index_elements=['field_name']), unique_rows)
+                state_stmt = sqlite_insert(YahooSchemaStateModel).values(
+                    state_key=FIELD_CATALOG_STATE_KEY,
+                    state_value=str(len(unique_rows)),
+                    updated_at=datetime.now()
                 )
-                sample_result = await session.execute(sample_stmt)
-                sample_record = sample_result.scalar_one_or_none()
-                if sample_record and sample_record.item_data_payload:
-                    try:
-                        payload = json.loads(sample_record.item_data_payload) if isinstance(sample_record.item_data_payload, str) else sample_record.item_data_payload
-                        if isinstance(payload, dict):
-                            for key, value in payload.items():
-                                field_name = f"yf_{item_type.lower()}_{item_time_coverage.lower()}_{key}"
-                                field_type_inferred = "unknown" # Default
-                                # Infer type based on value
-                                if isinstance(value, (int, float)) and not isinstance(value, bool):
-                                    field_type_inferred = "numeric"
-                                elif isinstance(value, str):
-                                    field_type_inferred = "text"
-                                elif isinstance(value, bool):
-                                    field_type_inferred = "boolean"
-                                # Assuming date strings in payload would be handled as 'text' by default
-                                # or require specific parsing if they need to be 'date' type.
-                                # For now, only basic types are inferred here.
-                                elif value is None:
-                                    field_type_inferred = "unknown" # Or perhaps 'empty' if that distinction is useful
-                                else:
-                                    # Fallback for other complex types, or could be refined
-                                    field_type_inferred = type(value).__name__ 
-
-                                # If the value is a datetime object (less likely for JSON, but defensive)
-                                example_value_to_store = value
-                                if isinstance(example_value_to_store, datetime):
-                                    example_value_to_store = example_value_to_store.isoformat()
-
-                                fields.append({"name": field_name, "type": field_type_inferred, "example": example_value_to_store})
-                    except Exception as e:
-                        logger.warning(f"Could not process payload sample for {item_type}/{item_time_coverage}: {e}")
-                        continue
+                state_stmt = state_stmt.on_conflict_do_update(
+                    index_elements=['state_key'],
+                    set_={'state_value': state_stmt.excluded.state_value, 'updated_at': state_stmt.excluded.updated_at}
+                )
+                await session.execute(state_stmt)
+                result = await session.execute(
+                    select(YahooFieldCatalogModel.field_name, YahooFieldCatalogModel.field_type, YahooFieldCatalogModel.example_value.isnot(None))
+                )
+                catalog = result.all()
+        _field_catalog_known[self.database_url] = {
+            field_name: field_type if has_example else None for field_name, field_type, has_example in catalog
+        }
+        self._field_catalog_ready = True
+        summary = {
+            'ticker_master_fields': sum(1 for row in unique_rows if row['source'] == 'ticker_master'),
+            'data_item_fields': sum(1 for row in unique_rows if row['source'] == 'data_item')
+        }
+        logger.info(f"[DB Field Catalog] Rebuilt yahoo_field_catalog: {summary}")
+        return summary
+
+    async def get_all_yahoo_fields_for_analytics(self) -> list[dict]:
+        """
+        Returns a list of all Yahoo fields for analytics configuration, read from yahoo_field_catalog:
+        - Ticker master fields: {name: 'yf_tm_<col>', type: <normalized_type>, example: <sample_value>}
+        - Data item payload fields: {name: 'yf_<item_type>_<item_time_coverage>_<key>', type: <inferred_type>, example: <sample_value>}
+        The catalog is seeded from non-pruned records on first use (rebuild_field_catalog) and kept current by
+        the write methods, so this is a single read of a small table.
+        """
+        if not await self.is_field_catalog_ready():
+            try:
+                await self.rebuild_field_catalog()
+            except SQLAlchemyError as e:
+                logger.error(f"[DB Field Catalog] Could not build the field catalog, sampling the data directly: {e}", exc_info=True)
+                async with self.read_session_factory() as session:
+                    rows = await self._scan_yahoo_fields_for_analytics(session)
+                return [
+                    {"name": row['field_name'], "type": row['field_type'],
+                     "example": None if row['example_value'] is None else fastjson.loads(row['example_value'])}
+                    for row in rows
+                ]
+
+        async with self.read_session_factory() as session:
+            result = await session.execute(
+                select(
+                    YahooFieldCatalogModel.field_name,
+                    YahooFieldCatalogModel.source,
+                    YahooFieldCatalogModel.field_type,
+                    YahooFieldCatalogModel.example_value
+                ).order_by(
+                    YahooFieldCatalogModel.source.desc(),  # 'ticker_master' before 'data_item'
+                    YahooFieldCatalogModel.item_type,
+                    YahooFieldCatalogModel.item_time_coverage,
+                    YahooFieldCatalogModel.field_position,
+                    YahooFieldCatalogModel.field_name
+                )
+            )
+            catalog = result.all()
+
+        fields = []
+        # Ticker master fields always follow the model's columns; the catalog provides their examples
+        master_examples = {row.field_name: row.example_value for row in catalog if row.source == 'ticker_master'}
+        for col in YahooTickerMasterModel.__table__.columns:
+            if col.primary_key:
+                continue
+            field_name = f"yf_tm_{col.name}"
+            example_value = master_examples.get(field_name)
+            fields.append({
+                "name": field_name,
+                "type": self._normalize_db_type(str(col.type)),
+                "example": None if example_value is None else fastjson.loads(example_value)
+            })
+        for row in catalog:
+            if row.source == 'data_item':
+                fields.append({
+                    "name": row.field_name,
+                    "type": row.field_type,
+                    "example": None if row.example_value is None else fastjson.loads(row.example_value)
+                })
         return fields
 
-    async def get_master_data_for_analytics(self) -> List[Dict[str, Any]]:
+    async def get_master_data_for_analytics(self, tickers: Optional[List[str]] = None) -> List[Dict[str, Any]]:
         """
         Fetches a specific subset of fields from YahooTickerMasterModel 
-        for all tickers, relevant for the analytics page.
+        for all tickers (or only the given ones, in chunks of LATEST_PAYLOAD_TICKER_CHUNK_SIZE), relevant for the analytics page.
         """
         # Define the specific columns you need for analytics to optimize the query.
         # This list should be reviewed and adjusted based on the actual fields
@@ -845,12 +2264,19 @@ class YahooDataRepository:
         ]
 
         try:
-            async with self.async_session_factory() as session:
+            async with self.read_session_factory() as session:
                 stmt = select(*fields_to_select)
-                result = await session.execute(stmt)
-                # Use .mappings().all() to get a list of dict-like RowMapping objects
-                # then convert each to a plain dict.
-                ticker_data_list = [dict(row) for row in result.mappings().all()]
+                if tickers is None:
+                    result = await session.execute(stmt)
+                    # Use .mappings().all() to get a list of dict-like RowMapping objects
+                    # then convert each to a plain dict.
+                    ticker_data_list = [dict(row) for row in result.mappings().all()]
+                else:
+                    ticker_data_list = []
+                    for chunk_start in range(0, len(tickers), LATEST_PAYLOAD_TICKER_CHUNK_SIZE):
+                        ticker_chunk = tickers[chunk_start:chunk_start + LATEST_PAYLOAD_TICKER_CHUNK_SIZE]
+                        result = await session.execute(stmt.where(YahooTickerMasterModel.ticker.in_(ticker_chunk)))
+                        ticker_data_list.extend(dict(row) for row in result.mappings().all())
                 logger.info(f"Fetched {len(ticker_data_list)} records from ticker_master for analytics.")
                 return ticker_data_list
         except SQLAlchemyError as e:
@@ -860,6 +2286,84 @@ class YahooDataRepository:
             logger.error(f"Failed to get yahoo master data for analytics: {e}", exc_info=True)
             return []
 
+    async def get_ticker_master_update_times(self) -> Dict[str, Optional[datetime]]:
+        """Returns {ticker: last update} for every ticker_master row, the later of update_last_full and
+           update_marketonly (None if neither is set). Raises SQLAlchemyError on database errors."""
+        stmt = select(YahooTickerMasterModel.ticker, YahooTickerMasterModel.update_last_full, YahooTickerMasterModel.update_marketonly)
+        async with self.read_session_factory() as session:
+            result = await session.execute(stmt)
+            return {
+                row.ticker: max((ts for ts in (row.update_last_full, row.update_marketonly) if ts is not None), default=None)
+                for row in result
+            }
+
+    async def get_latest_data_item_fetch_time(self) -> Optional[datetime]:
+        """Latest fetch_timestamp_utc in ticker_data_items (one ix_ticker_data_items_fetched lookup), None if the table is empty."""
+        async with self.read_session_factory() as session:
+            return (await session.execute(select(func.max(TickerDataItemsModel.fetch_timestamp_utc)))).scalar_one_or_none()
+
+    async def get_tickers_with_data_items_fetched_since(self, since: datetime) -> List[str]:
+        """Tickers with a ticker_data_items row written (inserted or payload changed) after since.
+           A range scan of ix_ticker_data_items_fetched, so the cost follows the number of rows written since then.
+           (Deduplicated here: with DISTINCT the planner prefers a full scan of an index ordered by ticker.)"""
+        stmt = select(TickerDataItemsModel.ticker).where(TickerDataItemsModel.fetch_timestamp_utc > since)
+        async with self.read_session_factory() as session:
+            return list(dict.fromkeys((await session.execute(stmt)).scalars()))
+
+    async def get_data_items_page(
+        self,
+        after_id: Optional[int] = None,
+        page_size: int = DATA_ITEMS_PAGE_SIZE,
+        key_date_from: Optional[datetime] = None,
+        key_date_before: Optional[datetime] = None,
+        include_payload: bool = True,
+        raw_payload: bool = False
+    ) -> Tuple[List[Dict[str, Any]], Optional[int]]:
+        """Retrieves one keyset page of ticker_data_items rows in data_item_id order (a primary key range scan,
+           so every page costs the same however deep into the table it is). Used by maintenance scans.
+
+        Args:
+            after_id: Cursor: the page starts after this data_item_id (None for the first page).
+            page_size: Maximum number of rows in the page.
+            key_date_from: Only rows with item_key_date >= this.
+            key_date_before: Only rows with item_key_date < this.
+            include_payload: Select item_data_payload.
+            raw_payload: Return the payload as stored (compressed bytes or legacy text; see payload_codec.decode_payload),
+                         so decoding can happen elsewhere, e.g. in a worker process.
+
+        Returns:
+            (rows, next_cursor), rows as dicts like _model_to_dict (datetimes as ISO strings). next_cursor is the
+            after_id of the next page, or None if this was the last page. Raises SQLAlchemyError on database errors.
+        """
+        page_size = max(1, page_size)
+        table_columns = TickerDataItemsModel.__table__.columns
+        columns = [column for column in table_columns if column.key != 'item_data_payload']
+        select_columns = list(columns)
+        if include_payload:
+            payload_column = table_columns['item_data_payload']
+            select_columns.append(
+                sqlalchemy.type_coerce(payload_column, sqlalchemy.types.NullType()).label('item_data_payload') if raw_payload else payload_column
+            )
+        stmt = select(*select_columns)
+        if after_id is not None:
+            stmt = stmt.where(TickerDataItemsModel.data_item_id > after_id)
+        if key_date_from is not None:
+            stmt = stmt.where(TickerDataItemsModel.item_key_date >= key_date_from)
+        if key_date_before is not None:
+            stmt = stmt.where(TickerDataItemsModel.item_key_date < key_date_before)
+        stmt = stmt.order_by(TickerDataItemsModel.data_item_id).limit(page_size)
+
+        async with self.read_session_factory() as session:
+            result = await session.execute(stmt)
+            rows = []
+            for row in result.mappings():
+                row_dict = self._row_to_dict(row, columns)
+                if include_payload:
+                    row_dict['item_data_payload'] = row['item_data_payload']
+                rows.append(row_dict)
+        next_cursor = rows[-1]['data_item_id'] if len(rows) == page_size else None
+        return rows, next_cursor
+
     async def get_all_data_items(self) -> List[Dict[str, Any]]:
         """
         Fetches all records from the ticker_data_items table. Used for maintenance tasks.
@@ -867,7 +2371,7 @@ class YahooDataRepository:
         Returns:
             A list of dictionaries, where each dictionary represents a row.
         """
-        async with self.async_session_factory() as session:
+        async with self.read_session_factory() as session:
             try:
                 stmt = select(TickerDataItemsModel)
                 result = await session.execute(stmt)
@@ -888,21 +2392,20 @@ class YahooDataRepository:
         Returns:
             True if deletion was successful, False otherwise.
         """
-        async with self.async_session_factory() as session:
-            try:
+        try:
+            async with self._begin_write() as conn:
                 stmt = delete(YahooTickerMasterModel).where(YahooTickerMasterModel.ticker == ticker_symbol)
-                result = await session.execute(stmt)
-                await session.commit()
-                if result.rowcount > 0:
-                    logger.info(f"Successfully deleted ticker '{ticker_symbol}' from ticker_master.")
-                    return True
-                else:
-                    logger.warning(f"Ticker '{ticker_symbol}' not found in ticker_master for deletion.")
-                    return False
-            except Exception as e:
-                logger.error(f"Error deleting ticker '{ticker_symbol}' from ticker_master: {e}", exc_info=True)
-                await session.rollback()
+                result = await conn.execute(stmt)
+            if result.rowcount > 0:
+                logger.info(f"Successfully deleted ticker '{ticker_symbol}' from ticker_master.")
+                return True
+            else:
+                logger.warning(f"Ticker '{ticker_symbol}' not found in ticker_master for deletion.")
                 return False
+        except Exception as e:
+            # Rollback is handled by the _begin_write() context manager
+            logger.error(f"Error deleting ticker '{ticker_symbol}' from ticker_master: {e}", exc_info=True)
+            return False
 
     async def delete_ticker_data_item(self, data_item_id: int) -> bool:
         """
@@ -914,18 +2417,71 @@ class YahooDataRepository:
         Returns:
             True if deletion was successful, False otherwise.
         """
-        async with self.async_session_factory() as session:
-            try:
+        try:
+            async with self._begin_write() as conn:
                 stmt = delete(TickerDataItemsModel).where(TickerDataItemsModel.data_item_id == data_item_id)
-                result = await session.execute(stmt)
-                await session.commit()
-                if result.rowcount > 0:
-                    logger.info(f"Successfully deleted data item with ID '{data_item_id}'.")
-                    return True
-                else:
-                    logger.warning(f"Data item with ID '{data_item_id}' not found for deletion.")
-                    return False
-            except Exception as e:
-                logger.error(f"Error deleting data item ID '{data_item_id}': {e}", exc_info=True)
-                await session.rollback()
-                return False
\ No newline at end of file
+                result = await conn.execute(stmt)
+                await conn.execute(delete(TickerDataValuesModel).where(TickerDataValuesModel.data_item_id == data_item_id))
+            if result.rowcount > 0:
+                logger.info(f"Successfully deleted data item with ID '{data_item_id}'.")
+                return True
+            else:
+                logger.warning(f"Data item with ID '{data_item_id}' not found for deletion.")
+                return False
+        except Exception as e:
+            # Rollback is handled by the _begin_write() context manager
+            logger.error(f"Error deleting data item ID '{data_item_id}': {e}", exc_info=True)
+            return False
+
+    async def delete_ticker_data_items(self, data_item_ids: List[int], chunk_size: int = DELETE_CHUNK_SIZE) -> List[int]:
+        """
+        Deletes many data items (and their ticker_data_values rows) with one DELETE ... WHERE data_item_id IN (...)
+        per chunk. Each chunk is its own short write transaction, so other writers are not held up by a large delete.
+
+        Args:
+            data_item_ids: Primary keys of the items to delete.
+            chunk_size: Ids per DELETE statement / transaction.
+
+        Returns:
+            The ids that were deleted (ids not found are left out). Raises on database errors; chunks
+            committed before the error stay deleted.
+        """
+        chunk_size = max(1, chunk_size)
+        deleted_ids: List[int] = []
+        for chunk_start in range(0, len(data_item_ids), chunk_size):
+            id_chunk = data_item_ids[chunk_start:chunk_start + chunk_size]
+            async with self._begin_write("delete data items") as conn:
+                result = await conn.execute(
+                    delete(TickerDataItemsModel)
+                    .where(TickerDataItemsModel.data_item_id.in_(id_chunk))
+                    .returning(TickerDataItemsModel.data_item_id)
+                )
+                chunk_deleted = list(result.scalars())
+                await conn.execute(delete(TickerDataValuesModel).where(TickerDataValuesModel.data_item_id.in_(id_chunk)))
+            deleted_ids.extend(chunk_deleted)
+            logger.info(f"[DB Delete Data Items] Deleted {len(deleted_ids)} of {len(data_item_ids)} data items.")
+        return deleted_ids
+
+    async def delete_yahoo_ticker_masters(self, ticker_symbols: List[str], chunk_size: int = DELETE_CHUNK_SIZE) -> List[str]:
+        """
+        Deletes many ticker_master records with one DELETE ... WHERE ticker IN (...) per chunk, each chunk in its
+        own short write transaction. Like delete_yahoo_ticker_master, only the master rows are deleted.
+
+        Returns:
+            The tickers that were deleted, as passed in (tickers not found are left out). Raises on database errors.
+        """
+        chunk_size = max(1, chunk_size)
+        deleted: List[str] = []
+        for chunk_start in range(0, len(ticker_symbols), chunk_size):
+            ticker_chunk = ticker_symbols[chunk_start:chunk_start + chunk_size]
+            async with self._begin_write("delete ticker masters") as conn:
+                result = await conn.execute(
+                    delete(YahooTickerMasterModel)
+                    .where(YahooTickerMasterModel.ticker.in_(ticker_chunk))
+                    .returning(YahooTickerMasterModel.ticker)
+                )
+                # The ticker column is NOCASE, so match the returned symbols case-insensitively
+                chunk_deleted = {ticker.upper() for ticker in result.scalars()}
+            deleted.extend(ticker for ticker in ticker_chunk if ticker.upper() in chunk_deleted)
+            logger.info(f"[DB Delete Ticker Masters] Deleted {len(deleted)} of {len(ticker_symbols)} ticker_master records.")
+        return deleted
@@ -0,0 +1,157 @@
+import json
+import math
+import random
+from datetime import datetime
+from decimal import Decimal
+
+import pytest
+
+from src.V3_app.analytics_field_metadata import MAX_UNIQUE_TEXT_SAMPLE_SIZE, FieldAccumulator, field_metadata_from_records
+from src.V3_app.analytics_metadata_sketches import DEFAULT_QUANTILE_ACCURACY, sketch_field_metadata_from_records
+
+
+def _assert_sketch_matches_exact(records, chunk_size):
+    exact = field_metadata_from_records(records)
+    sketched = sketch_field_metadata_from_records(records, chunk_size=chunk_size)
+    assert sketched.keys() == exact.keys()
+    for name, expected in exact.items():
+        entry = sketched[name]
+        assert entry["count"] == expected["count"], name
+        assert entry["type"] == expected["type"], name
+        for key in ("min_value", "max_value"):
+            if key in expected:
+                assert entry[key] == expected[key] or (math.isnan(entry[key]) and math.isnan(expected[key])), (name, key)
+        if "avg_value" in expected:
+            if math.isnan(expected["avg_value"]):
+                assert math.isnan(entry["avg_value"]), name
+            else:
+                assert entry["avg_value"] == pytest.approx(expected["avg_value"], rel=1e-9, abs=1e-9), name
+        if "median_value" in expected:
+            if math.isnan(expected["median_value"]):
+                assert math.isnan(entry["median_value"]), name
+            else:
+                # Each of the two middle values is within the relative accuracy, their mean within that of the larger one
+                scale = max(abs(expected["min_value"]), abs(expected["max_value"]))
+                assert entry["median_value"] == pytest.approx(expected["median_value"], abs=DEFAULT_QUANTILE_ACCURACY * scale + 1e-9), name
+
+
+def test_sketch_metadata_ignores_nan_like_exact_generator():
+    records = [{"ticker": "A", "x": 1}, {"ticker": "B", "x": math.nan}, {"ticker": "C", "x": 3}, {"ticker": "D", "x": 2}]
+    exact = field_metadata_from_records(records)["x"]
+    assert (exact["count"], exact["min_value"], exact["max_value"], exact["median_value"]) == (4, 1.0, 3.0, 2.0)
+    sketched = sketch_field_metadata_from_records(records)["x"]
+    assert (sketched["count"], sketched["min_value"], sketched["max_value"]) == (4, 1.0, 3.0)
+    assert sketched["avg_value"] == pytest.approx(2.0)
+    assert sketched["median_value"] == pytest.approx(2.0, rel=DEFAULT_QUANTILE_ACCURACY)
+
+
+def test_sketch_metadata_nan_in_some_chunks():
+    records = [{"ticker": f"T{i}", "x": float(i)} for i in range(1, 8)]
+    records.insert(3, {"ticker": "NAN", "x": math.nan})
+    _assert_sketch_matches_exact(records, chunk_size=3)
+    assert sketch_field_metadata_from_records(records, chunk_size=3)["x"]["max_value"] == 7.0
+
+
+def test_sketch_metadata_only_nan():
+    records = [{"ticker": "A", "x": math.nan}, {"ticker": "B", "x": math.nan}]
+    _assert_sketch_matches_exact(records, chunk_size=1)
+
+
+def test_sketch_metadata_matches_exact_on_random_records():
+    rnd = random.Random(0)
+    choices = [lambda: rnd.uniform(-1e6, 1e6), lambda: rnd.randint(-50, 50), lambda: math.nan, lambda: None,
+               lambda: rnd.choice(["N/A", "-", "", "12.5", "abc"]), lambda: rnd.choice([True, False])]
+    for _ in range(50):
+        records = [
+            {"ticker": f"T{i}", **{field: rnd.choice(choices)() for field in ("a", "b", "c") if rnd.random() < 0.8}}
+            for i in range(rnd.randint(1, 60))
+        ]
+        _assert_sketch_matches_exact(records, chunk_size=rnd.randint(1, 10))
+
+
+def _baseline_field_metadata(records):
+    """The per-value generator the column-wise one replaced, with its two documented differences: NaN is left out
+       of min/max/avg/median, and the distinct texts are returned in full (its sample was an arbitrary subset)."""
+    stats = {}
+    for record in records:
+        for name, value in record.items():
+            if name == "ticker":
+                continue
+            field = stats.setdefault(name, {"count": 0, "numbers": [], "texts": set(), "true": 0, "false": 0,
+                                            "has_numeric": False, "has_text": False, "has_boolean": False})
+            if value is None or str(value).strip() in ("", "-"):
+                continue
+            field["count"] += 1
+            try:
+                number = float(value)
+                if isinstance(value, bool):
+                    field["has_boolean"] = True
+                    field["true" if value else "false"] += 1
+                    field["texts"].add(str(value))
+                else:
+                    field["has_numeric"] = True
+                    field["numbers"].append(number)
+            except (ValueError, TypeError):
+                field["has_text"] = True
+                if isinstance(value, (list, dict)):
+                    field["texts"].add(json.dumps(value))
+                else:
+                    field["texts"].add(str(value))
+
+    metadata = {}
+    for name, field in sorted(stats.items()):
+        entry = {"name": name, "count": field["count"]}
+        metadata[name] = entry
+        if not field["count"]:
+            entry["type"] = "empty"
+            continue
+        entry["type"] = ("numeric" if field["has_numeric"] else "text" if field["has_text"]
+                         else "boolean" if field["has_boolean"] else "unknown")
+        if field["has_numeric"]:
+            numbers = sorted(number for number in field["numbers"] if not math.isnan(number))
+            if numbers:
+                middle = len(numbers) // 2
+                entry.update(min_value=numbers[0], max_value=numbers[-1], avg_value=sum(numbers) / len(numbers),
+                             median_value=numbers[middle] if len(numbers) % 2 else (numbers[middle - 1] + numbers[middle]) / 2.0)
+            else:
+                entry.update(min_value=math.nan, max_value=math.nan, avg_value=math.nan, median_value=math.nan)
+        entry["distinct_texts"] = field["texts"]
+        if field["has_boolean"]:
+            entry["boolean_counts"] = {"true": field["true"], "false": field["false"]}
+    return metadata
+
+
+def test_field_accumulator_is_abstract():
+    with pytest.raises(TypeError):
+        FieldAccumulator("x")
+
+
+def test_field_metadata_matches_baseline_generator_on_random_records():
+    rnd = random.Random(1)
+    choices = [lambda: rnd.uniform(-1e6, 1e6), lambda: rnd.randint(-50, 50), lambda: math.nan, lambda: math.inf, lambda: None,
+               lambda: rnd.choice(["", "-", " - ", " ", "12.5", " 3 ", "1e3", "nan", "abc", "N/A", f"t{rnd.randint(0, 15)}"]),
+               lambda: rnd.choice([True, False]), lambda: [rnd.randint(0, 3)], lambda: {"k": rnd.randint(0, 3)},
+               lambda: Decimal(rnd.randint(0, 9)) / 4, lambda: datetime(2024, 1, rnd.randint(1, 28))]
+    for _ in range(200):
+        fields = rnd.sample(["a", "b", "c", "d"], rnd.randint(1, 4))
+        records = [
+            {"ticker": f"T{i}", **{field: rnd.choice(choices[:rnd.randint(1, len(choices))])() for field in fields if rnd.random() < 0.9}}
+            for i in range(rnd.randint(1, 80))
+        ]
+        expected = _baseline_field_metadata(records)
+        actual = field_metadata_from_records(records)
+        assert actual.keys() == expected.keys()
+        for name, entry in actual.items():
+            baseline = expected[name]
+            distinct_texts = baseline.pop("distinct_texts", set())
+            sample = entry.pop("unique_values_sample", [])
+            if len(distinct_texts) <= MAX_UNIQUE_TEXT_SAMPLE_SIZE:
+                assert sorted(sample) == sorted(distinct_texts), name
+            else:
+                assert len(sample) == MAX_UNIQUE_TEXT_SAMPLE_SIZE and set(sample) <= distinct_texts, name
+            assert entry.keys() == baseline.keys(), name
+            for key, value in baseline.items():
+                if isinstance(value, float) and math.isnan(value):
+                    assert math.isnan(entry[key]), (name, key)
+                else:
+                    assert entry[key] == value, (name, key)
@@ -0,0 +1,59 @@
+import random
+
+import pytest
+from sqlalchemy import create_engine
+
+from src.V3_app.V3_database import Base
+from src.V3_app.db_migrations import HOT_QUERIES, apply_migrations, verify_schema
+from src.V3_app import yahoo_models  # noqa: F401 (registers the Yahoo tables on Base)
+
+ITEM_SPECS = [("INCOME_STATEMENT", "FYEAR"), ("BALANCE_SHEET", "FYEAR"), ("INCOME_STATEMENT", "QUARTER"), ("ANALYST_PRICE_TARGETS", "CUMULATIVE_SNAPSHOT")]
+
+
+@pytest.fixture
+def migrated_engine(tmp_path):
+    """A file database created from the models, filled with some ticker_data_items rows, with the migrations applied."""
+    engine = create_engine(f"sqlite:///{tmp_path / 'schema.db'}")
+    Base.metadata.create_all(engine)
+    rnd = random.Random(0)
+    rows = []
+    for i in range(300):
+        for item_type, coverage in ITEM_SPECS:
+            for year in (2022, 2023, 2024):
+                rows.append((f"T{i:04d}", item_type, coverage, f"{year}-12-31 00:00:00.000000", "2025-01-02 00:00:00.000000",
+                             "test", "{}", None, int(rnd.random() < 0.1)))
+    with engine.begin() as conn:
+        conn.exec_driver_sql(
+            "INSERT INTO ticker_data_items (ticker, item_type, item_time_coverage, item_key_date, fetch_timestamp_utc, "
+            "item_source, item_data_payload, payload_hash, prun) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+        apply_migrations(conn)
+    yield engine
+    engine.dispose()
+
+
+def test_hot_queries_use_their_indexes(migrated_engine):
+    with migrated_engine.connect() as conn:
+        report = verify_schema(conn)
+    assert not report['pending_migrations']
+    assert not report['missing_indexes']
+    assert not report['obsolete_indexes']
+    assert [entry['name'] for entry in report['query_plans']] == [query.name for query in HOT_QUERIES]
+    for entry in report['query_plans']:
+        assert not entry['problems'], (entry['name'], entry['plan'])
+        assert not any(line.startswith("SCAN ticker_data_items") and " USING " not in line for line in entry['plan']), entry
+    assert report['ok']
+
+
+def test_verify_schema_reports_a_dropped_index(migrated_engine):
+    with migrated_engine.begin() as conn:
+        conn.exec_driver_sql("DROP INDEX ix_ticker_data_items_series")
+        report = verify_schema(conn)
+    assert not report['ok']
+    assert report['missing_indexes'] == ['ix_ticker_data_items_series']
+    problems = {entry['name']: entry['problems'] for entry in report['query_plans']}
+    assert problems['series_payload_hashes']
+
+
+def test_migrations_are_idempotent(migrated_engine):
+    with migrated_engine.begin() as conn:
+        assert apply_migrations(conn) == []
@@ -0,0 +1,99 @@
+import asyncio
+import sqlite3
+import time
+
+import pytest
+
+from src.V3_app.db_write_coordinator import DriverSQLWrite, WriteBlockTimeoutError, WriteCoordinator
+
+INSERT_SQL = "INSERT INTO items (name) VALUES (?)"
+
+
+def _names(path) -> list:
+    connection = sqlite3.connect(path)
+    try:
+        return sorted(row[0] for row in connection.execute("SELECT name FROM items"))
+    finally:
+        connection.close()
+
+
+def _run_with_coordinator(tmp_path, scenario):
+    path = tmp_path / "coordinator.db"
+    connection = sqlite3.connect(path)
+    connection.execute("CREATE TABLE items (id INTEGER PRIMARY KEY, name TEXT NOT NULL)")
+    connection.close()
+
+    async def run():
+        coordinator = WriteCoordinator(f"sqlite+aiosqlite:///{path}")
+        await coordinator.start()
+        try:
+            return await scenario(coordinator)
+        finally:
+            await coordinator.stop()
+    return asyncio.run(run()), path
+
+
+def test_commands_queued_before_a_block_commit_without_waiting_for_it(tmp_path):
+    async def scenario(coordinator):
+        before = [coordinator.submit(DriverSQLWrite(f"before {i}", INSERT_SQL, (f"before {i}",))) for i in range(5)]
+        async with coordinator.begin("slow block") as conn:
+            # The commands ahead of the block were committed in their own batch before it started
+            assert all(future.done() and not future.exception() for future in before)
+            after = [coordinator.submit(DriverSQLWrite(f"after {i}", INSERT_SQL, (f"after {i}",))) for i in range(5)]
+            await conn.exec_driver_sql(INSERT_SQL, ("block",))
+            await asyncio.sleep(0.2)
+            assert not any(future.done() for future in after)
+        await asyncio.gather(*after)
+        return coordinator.metrics()
+
+    metrics, path = _run_with_coordinator(tmp_path, scenario)
+    assert _names(path) == sorted([f"before {i}" for i in range(5)] + [f"after {i}" for i in range(5)] + ["block"])
+    assert metrics['batches_committed'] >= 3
+
+
+def test_concurrent_writers_and_a_failing_block(tmp_path):
+    async def writer(coordinator, index):
+        for j in range(20):
+            await coordinator.execute(DriverSQLWrite(f"w{index}-{j}", INSERT_SQL, (f"w{index}-{j}",)))
+
+    async def failing_block(coordinator):
+        with pytest.raises(ValueError):
+            async with coordinator.begin("failing block") as conn:
+                await conn.exec_driver_sql(INSERT_SQL, ("rolled back",))
+                await asyncio.sleep(0.05)
+                raise ValueError("block failed")
+
+    async def scenario(coordinator):
+        await asyncio.gather(*(writer(coordinator, i) for i in range(4)), failing_block(coordinator))
+
+    _, path = _run_with_coordinator(tmp_path, scenario)
+    names = _names(path)
+    assert "rolled back" not in names
+    assert len(names) == 80
+
+
+def test_block_past_its_timeout_is_rolled_back_and_writers_continue(tmp_path):
+    async def scenario(coordinator):
+        started = time.perf_counter()
+        with pytest.raises(WriteBlockTimeoutError):
+            async with coordinator.begin("stuck block", timeout=0.2) as conn:
+                await conn.exec_driver_sql(INSERT_SQL, ("stuck",))
+                await asyncio.sleep(10)
+        assert time.perf_counter() - started < 5
+        await coordinator.execute(DriverSQLWrite("after", INSERT_SQL, ("after",)))
+
+    _, path = _run_with_coordinator(tmp_path, scenario)
+    assert _names(path) == ["after"]
+
+
+def test_block_awaiting_another_writer_times_out_instead_of_deadlocking(tmp_path):
+    async def scenario(coordinator):
+        other_write = None
+        with pytest.raises(WriteBlockTimeoutError):
+            async with coordinator.begin("block awaiting a writer", timeout=0.2):
+                other_write = asyncio.ensure_future(coordinator.execute(DriverSQLWrite("other", INSERT_SQL, ("other",))))
+                await asyncio.shield(other_write)  # Queued behind this block: never completes while it is open
+        await asyncio.wait_for(other_write, 5)
+
+    _, path = _run_with_coordinator(tmp_path, scenario)
+    assert _names(path) == ["other"]
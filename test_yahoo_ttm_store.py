@@ -0,0 +1,60 @@
+import asyncio
+import sqlite3
+from datetime import datetime
+
+import pytest
+
+from src.V3_app.db_engine_registry import engine_registry
+from src.V3_app.yahoo_repository import YahooDataRepository
+
+KEY_DATE = datetime(2024, 12, 31)
+NEW_KEY_DATE = datetime(2025, 3, 31)
+
+
+def _ttm_item(key_date, payload):
+    return {"ticker": "AAPL", "item_type": "INCOME_STATEMENT", "item_time_coverage": "TTM", "item_key_date": key_date,
+            "item_source": "test", "item_data_payload": payload}
+
+
+async def _store(repo, entry_point, item):
+    if entry_point == "single":
+        await repo.upsert_single_ttm_statement(dict(item))
+    else:
+        await repo.store_ticker_statements([], [dict(item)])
+
+
+async def _series(repo):
+    items = await repo.get_data_items_by_criteria("AAPL", "INCOME_STATEMENT", item_time_coverage="TTM")
+    return [(item["data_item_id"], item["item_key_date"], item["item_data_payload"]) for item in items]
+
+
+@pytest.mark.parametrize("second_payload", [{"Total Revenue": 1.0}, {"Total Revenue": 2.0}], ids=["same-payload", "changed-payload"])
+def test_ttm_entry_points_keep_the_same_row(tmp_path, second_payload):
+    async def run(entry_point):
+        repo = YahooDataRepository(f"sqlite+aiosqlite:///{tmp_path / (entry_point + '.db')}")
+        await repo.create_tables()
+        try:
+            await _store(repo, entry_point, _ttm_item(KEY_DATE, {"Total Revenue": 1.0}))
+            first = await _series(repo)
+            await _store(repo, entry_point, _ttm_item(NEW_KEY_DATE, second_payload))
+            return first, await _series(repo)
+        finally:
+            await engine_registry.dispose()
+
+    def value_key_dates(entry_point):
+        connection = sqlite3.connect(tmp_path / (entry_point + '.db'))
+        try:
+            return connection.execute("SELECT DISTINCT item_key_date FROM ticker_data_values").fetchall()
+        finally:
+            connection.close()
+
+    results = {entry_point: asyncio.run(run(entry_point)) for entry_point in ("single", "batch")}
+    for first, final in results.values():
+        # One row, re-keyed to the new key date with the new payload, keeping its id
+        assert len(final) == 1
+        assert final[0][0] == first[0][0]
+        assert final[0][1] == NEW_KEY_DATE.isoformat()
+        assert final[0][2] == second_payload
+    assert [row[1:] for row in results["single"][1]] == [row[1:] for row in results["batch"][1]]
+    for entry_point in results:
+        assert value_key_dates(entry_point) == [(NEW_KEY_DATE.strftime("%Y-%m-%d %H:%M:%S.%f"),)]